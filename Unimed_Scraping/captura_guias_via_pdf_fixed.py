@@ -24,6 +24,8 @@ import shutil
 import tempfile
 import os.path
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 # Configurar logging
@@ -46,10 +48,24 @@ supabase = None
 if SUPABASE_URL and SUPABASE_KEY:
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Modo paralelo (--workers): limite de sessões simultâneas no portal da Unimed,
+# independente de quantos workers forem pedidos, para não sobrecarregar o site
+MAX_WORKERS_UNIMED = int(os.environ.get("UNIMED_MAX_WORKERS", "4"))
+# Tempo que uma guia reservada fica com o worker antes de voltar para a fila
+LEASE_GUIA_SEGUNDOS = 600
+# Intervalo entre o login de um worker e o do próximo
+INTERVALO_INICIO_WORKERS = 5
+
+# Os workers rodam em threads e compartilham o arquivo de cache
+_cache_lock = threading.Lock()
+
 
 class UnimedAutomation:
-    def __init__(self):
+    def __init__(self, worker_id: str = None):
         self.driver = None
+        self.worker_id = worker_id  # Definido apenas no modo paralelo
+        # Cada worker baixa os PDFs em uma pasta própria
+        self.pdf_dir = os.path.join(os.getcwd(), "guias_pdf", worker_id) if worker_id else os.path.join(os.getcwd(), "guias_pdf")
         self.wait = None
         self.captured_guides = []
         self.task_id = None  # Adicionar task_id como atributo da classe
@@ -71,7 +87,7 @@ class UnimedAutomation:
         }
 
         try:
-            with open(self.cache_file, "r") as f:
+            with _cache_lock, open(self.cache_file, "r") as f:
                 cache = json.load(f)
 
                 # Verifica expiração do cache
@@ -93,36 +109,64 @@ class UnimedAutomation:
             print("Criando novo cache")
             return default_cache
 
+    def _mesclar_cache_disco(self):
+        """
+        Incorpora ao cache em memória as entradas gravadas no arquivo por
+        outros workers (chamar com _cache_lock adquirido). Para cada entrada
+        prevalece o uso mais recente.
+        """
+        try:
+            with open(self.cache_file, "r") as f:
+                cache_disco = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return
+
+        last_update = datetime.fromisoformat(cache_disco.get("last_update", "2000-01-01"))
+        if (datetime.now() - last_update).days > self.cache_expiry_days:
+            return
+
+        for cache_type in ["carteirinhas", "pacientes", "procedimentos"]:
+            for key, valor in cache_disco.get(cache_type, {}).items():
+                self.cache[cache_type].setdefault(key, valor)
+        for timestamp_key, usado_em in cache_disco.get("timestamps", {}).items():
+            if usado_em > self.cache["timestamps"].get(timestamp_key, ""):
+                self.cache["timestamps"][timestamp_key] = usado_em
+
     def save_cache(self):
         """Salva o cache e remove entradas antigas"""
         try:
-            # Atualiza timestamp geral do cache
-            self.cache["last_update"] = datetime.now().isoformat()
-
-            # Remove entradas não utilizadas há mais de 30 dias
-            cutoff = datetime.now() - timedelta(days=self.cache_cleanup_days)
-
-            for cache_type in ["carteirinhas", "pacientes", "procedimentos"]:
-                keys_to_remove = []
-                for key in list(
-                    self.cache[cache_type].keys()
-                ):  # Usa list() para evitar modificação durante iteração
-                    timestamp_key = f"{cache_type}_{key}"
-                    last_used = datetime.fromisoformat(
-                        self.cache["timestamps"].get(timestamp_key, "2000-01-01")
-                    )
-                    if last_used < cutoff:
-                        keys_to_remove.append(key)
-                        if timestamp_key in self.cache["timestamps"]:
-                            del self.cache["timestamps"][timestamp_key]
-
-                # Remove as entradas antigas
-                for key in keys_to_remove:
-                    del self.cache[cache_type][key]
-
-            # Salva o cache atualizado
-            with open(self.cache_file, "w") as f:
-                json.dump(self.cache, f, indent=2)
+            # O arquivo é lido, mesclado e regravado sob o mesmo lock: no modo
+            # paralelo as entradas gravadas por outros workers são mantidas
+            with _cache_lock:
+                self._mesclar_cache_disco()
+
+                # Atualiza timestamp geral do cache
+                self.cache["last_update"] = datetime.now().isoformat()
+
+                # Remove entradas não utilizadas há mais de 30 dias
+                cutoff = datetime.now() - timedelta(days=self.cache_cleanup_days)
+
+                for cache_type in ["carteirinhas", "pacientes", "procedimentos"]:
+                    keys_to_remove = []
+                    for key in list(
+                        self.cache[cache_type].keys()
+                    ):  # Usa list() para evitar modificação durante iteração
+                        timestamp_key = f"{cache_type}_{key}"
+                        last_used = datetime.fromisoformat(
+                            self.cache["timestamps"].get(timestamp_key, "2000-01-01")
+                        )
+                        if last_used < cutoff:
+                            keys_to_remove.append(key)
+                            if timestamp_key in self.cache["timestamps"]:
+                                del self.cache["timestamps"][timestamp_key]
+
+                    # Remove as entradas antigas
+                    for key in keys_to_remove:
+                        del self.cache[cache_type][key]
+
+                # Salva o cache atualizado
+                with open(self.cache_file, "w") as f:
+                    json.dump(self.cache, f, indent=2)
             print("Cache salvo com sucesso")
 
         except Exception as e:
@@ -149,7 +193,7 @@ class UnimedAutomation:
         options.add_argument("--disable-infobars")
         
         # Configurar diretório de download
-        pdf_dir = os.path.join(os.getcwd(), "guias_pdf")
+        pdf_dir = self.pdf_dir
         os.makedirs(pdf_dir, exist_ok=True)
         
         prefs = {
@@ -503,7 +547,8 @@ class UnimedAutomation:
             )
             
             # Atualiza o status de processamento após cada guia individual
-            if self.task_id and guide_details_list:
+            # (no modo paralelo o progresso é somado por concluir_guia_queue)
+            if self.task_id and guide_details_list and not self.worker_id:
                 try:
                     print(f"\nAtualizando contador de guias processadas para task_id: {self.task_id}")
                     
@@ -820,6 +865,9 @@ class UnimedAutomation:
             if not self.task_id:
                 print("Não há task_id definido. Verificação de processamento ignorada.")
                 return
+            if self.worker_id:
+                # No modo paralelo a verificação é feita uma vez, ao final, pelo coordenador
+                return
                 
             print(f"\nVerificando processamento de sessões para task_id: {self.task_id}")
                 
@@ -990,9 +1038,8 @@ class UnimedAutomation:
                             "status": "executada"    # Valor válido para o enum status_guia
                         }
                         print(f"Inserindo nova guia com dados: {guia_data}")
-                        response = supabase.table("guias").insert(guia_data).execute()
-                        guia_id = response.data[0]["id"]
-                        print(f"Nova guia criada com ID: {guia_id}")
+                        guia_id = self._inserir_ou_buscar_id("guias", guia_data, ("numero_guia",))
+                        print(f"Guia criada ou encontrada com ID: {guia_id}")
 
                     # Save execution
                     if self.save_unimed_execution(guia_id, guide_details):
@@ -1022,8 +1069,8 @@ class UnimedAutomation:
                     self.verificar_processamento_sessoes()
                     continue
 
-            # Atualiza o status final
-            if self.task_id:
+            # Atualiza o status final (no modo paralelo, feito pelo coordenador)
+            if self.task_id and not self.worker_id:
                 try:
                     num_unique_guides = len(processed_guides)
 
@@ -1116,6 +1163,27 @@ class UnimedAutomation:
             print("Navegador fechado")
 
     ######## FUNCOES AUXILIARES ########
+    def _inserir_ou_buscar_id(self, tabela: str, dados: dict, chave: tuple):
+        """
+        Insere o registro e retorna o id. Se outro worker já inseriu a mesma
+        chave (índice único), não insere de novo e retorna o id existente.
+        """
+        response = (
+            supabase.table(tabela)
+            .upsert(dados, on_conflict=",".join(chave), ignore_duplicates=True)
+            .execute()
+        )
+        if response.data:
+            return response.data[0]["id"]
+
+        query = supabase.table(tabela).select("id")
+        for coluna in chave:
+            query = query.eq(coluna, dados[coluna])
+        response = query.execute()
+        if not response.data:
+            raise Exception(f"Registro de {tabela} não encontrado após conflito: {dados}")
+        return response.data[0]["id"]
+
     async def check_guia_exists(self, numero_guia):
         response = (
             await supabase.table("guias")
@@ -1172,10 +1240,7 @@ class UnimedAutomation:
                     "nome": nome_beneficiario,
                     "id_origem": f"UNIMED_{numero_carteira}"  # Valor padrão para id_origem
                 }
-                paciente_response = (
-                    supabase.table("pacientes").insert(paciente_data).execute()
-                )
-                paciente_id = paciente_response.data[0]["id"]
+                paciente_id = self._inserir_ou_buscar_id("pacientes", paciente_data, ("id_origem",))
 
                 # Agora cria a carteirinha associada ao paciente e plano
                 insert_data = {
@@ -1184,9 +1249,10 @@ class UnimedAutomation:
                     "paciente_id": paciente_id,
                     "status": "ativa",  # Este é do enum status_carteirinha
                 }
-                response = supabase.table("carteirinhas").insert(insert_data).execute()
-                carteirinha_id = response.data[0]["id"]
-                print(f"Nova carteirinha criada: {carteirinha_id}")
+                carteirinha_id = self._inserir_ou_buscar_id(
+                    "carteirinhas", insert_data, ("plano_saude_id", "numero_carteirinha")
+                )
+                print(f"Carteirinha criada ou encontrada: {carteirinha_id}")
 
             # Guarda no cache e salva imediatamente
             self.cache["carteirinhas"][numero_carteira] = carteirinha_id
@@ -1231,9 +1297,7 @@ class UnimedAutomation:
                         "status": "ativo",
                         "id_origem": f"UNIMED_{numero_carteira}"  # Valor padrão para id_origem
                     }
-                    paciente_response = (
-                        supabase.table("pacientes").insert(insert_data).execute()
-                    )
+                    paciente_id = self._inserir_ou_buscar_id("pacientes", insert_data, ("id_origem",))
 
                     # Atualiza a carteirinha com o paciente_id
                     supabase.table("carteirinhas").update(
@@ -1284,9 +1348,8 @@ class UnimedAutomation:
                     "tipo": "procedimento",  # Adicionando o tipo obrigatório
                     "ativo": True,
                 }
-                response = supabase.table("procedimentos").insert(insert_data).execute()
-                procedimento_id = response.data[0]["id"]
-                print(f"Novo procedimento criado: {procedimento_id}")
+                procedimento_id = self._inserir_ou_buscar_id("procedimentos", insert_data, ("codigo",))
+                print(f"Procedimento criado ou encontrado: {procedimento_id}")
 
             # Adiciona ao cache e salva
             self.cache["procedimentos"][codigo] = procedimento_id
@@ -1400,7 +1463,7 @@ class UnimedAutomation:
             print(f"Tentando baixar PDF da guia {guide_number}")
             
             # Cria um diretório para armazenar os PDFs se não existir
-            pdf_dir = os.path.join(os.getcwd(), "guias_pdf")
+            pdf_dir = self.pdf_dir
             os.makedirs(pdf_dir, exist_ok=True)
             
             # Nome do arquivo PDF
@@ -1608,7 +1671,7 @@ class UnimedAutomation:
             print(f"Tentando baixar PDF da guia {guide_number} com Playwright")
             
             # Preparar diretório e caminho do arquivo
-            pdf_dir = os.path.join(os.getcwd(), "guias_pdf")
+            pdf_dir = self.pdf_dir
             os.makedirs(pdf_dir, exist_ok=True)
             pdf_filename = f"{guide_number}_{date_str.replace('/', '_')}.pdf"
             pdf_path = os.path.join(pdf_dir, pdf_filename)
@@ -1768,12 +1831,102 @@ class UnimedAutomation:
             return None
 
 
-def executar_scraping(start_date=None, end_date=None, max_guides=None):
+def executar_worker(task_id, worker_id, username, password, atraso_inicial=0):
+    """
+    Worker do modo paralelo: abre o próprio navegador, faz login e reserva guias
+    da guias_queue (reservar_guia_queue) até a fila da task esvaziar. Cada guia é
+    concluída com concluir_guia_queue, que também soma o progresso do worker em
+    processing_status. Guias com erro voltam para a fila até max_retry_attempts.
+    """
+    time.sleep(atraso_inicial)
+    automation = UnimedAutomation(worker_id=worker_id)
+    automation.task_id = task_id
+    resultado = {"worker_id": worker_id, "processadas": 0, "erros": 0}
+    try:
+        automation.setup_driver()
+        if not automation.login(username, password):
+            print(f"[{worker_id}] Falha no login")
+            resultado["erro"] = "Falha no login"
+            return resultado
+
+        while True:
+            reserva = supabase.rpc(
+                "reservar_guia_queue",
+                {"p_task_id": task_id, "p_worker_id": worker_id, "p_lease_segundos": LEASE_GUIA_SEGUNDOS},
+            ).execute()
+            if not reserva.data:
+                print(f"[{worker_id}] Fila vazia, encerrando")
+                break
+
+            item = reserva.data[0]
+            guide = {"guide_number": item["numero_guia"], "date": item["data_atendimento_completa"]}
+            print(f"[{worker_id}] Processando guia {guide['guide_number']} (tentativa {item['attempts']})")
+            try:
+                guide_details = automation.process_single_guide(guide)
+                if not guide_details:
+                    raise Exception("Nenhuma execução encontrada para a guia")
+                automation.save_to_supabase(guide_details)
+
+                # save_to_supabase registra os erros sem levantar exceção;
+                # a guia só é concluída se foi marcada como processada
+                status_fila = supabase.table("guias_queue").select("status").eq("id", item["id"]).execute()
+                if not status_fila.data or status_fila.data[0]["status"] != "processado":
+                    raise Exception("Falha ao salvar as execuções da guia")
+
+                status, erro = "processado", None
+                resultado["processadas"] += 1
+            except Exception as e:
+                print(f"[{worker_id}] Erro ao processar guia {guide['guide_number']}: {str(e)}")
+                resultado["erros"] += 1
+                status = "falha_permanente" if item["attempts"] >= automation.max_retry_attempts else "erro"
+                erro = str(e)
+
+            supabase.rpc(
+                "concluir_guia_queue",
+                {"p_id": item["id"], "p_worker_id": worker_id, "p_status": status, "p_erro": erro},
+            ).execute()
+
+        return resultado
+    finally:
+        automation.close()
+
+
+def executar_workers(task_id, workers, username, password):
+    """Roda os workers em paralelo, cada um em uma thread com o próprio navegador"""
+    supabase.table("processing_status").update(
+        {"status": "processing", "last_update": datetime.now().isoformat()}
+    ).eq("task_id", task_id).execute()
+
+    resultados = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="unimed_worker") as executor:
+        futuros = [
+            executor.submit(
+                executar_worker, task_id, f"worker_{n}", username, password,
+                atraso_inicial=(n - 1) * INTERVALO_INICIO_WORKERS,
+            )
+            for n in range(1, workers + 1)
+        ]
+        for futuro in futuros:
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                print(f"Erro em worker: {str(e)}")
+
+    for resultado in resultados:
+        print(f"{resultado['worker_id']}: {resultado['processadas']} guias processadas, {resultado['erros']} erros")
+    return resultados
+
+
+def executar_scraping(start_date=None, end_date=None, max_guides=None, workers=1):
     """Função principal que executa o scraping"""
     print("\n=== INICIANDO SCRAPING DA UNIMED ===")
     print(f"Período: {start_date} a {end_date}")
     print(f"Máximo de guias: {max_guides if max_guides else 'Sem limite'}")
 
+    if workers > MAX_WORKERS_UNIMED:
+        print(f"Workers limitados a {MAX_WORKERS_UNIMED} (UNIMED_MAX_WORKERS)")
+        workers = MAX_WORKERS_UNIMED
+
     # Verifica se as datas foram fornecidas
     if not start_date or not end_date:
         start_date = end_date = datetime.now().strftime("%d/%m/%Y")
@@ -1837,6 +1990,18 @@ def executar_scraping(start_date=None, end_date=None, max_guides=None):
                     return
 
                 print(f"\nFase 1: Capturadas {len(guides)} guias")
+
+                if workers > 1:
+                    # Modo paralelo: o navegador da captura é fechado e os workers
+                    # processam a fila da task, cada um com a sua sessão
+                    automation.driver.quit()
+                    automation.driver = None
+                    print(f"\nFase 2: Processando a fila com {workers} workers")
+                    executar_workers(task_id, workers, username, password)
+                    print("\nVerificando processamento final das sessões")
+                    automation.verificar_processamento_sessoes()
+                    return
+
                 processed_guides = []
                 skipped_count = 0
 
@@ -1934,6 +2099,7 @@ if __name__ == "__main__":
     parser.add_argument('--start_date', type=str, help='Data inicial no formato dd/mm/yyyy')
     parser.add_argument('--end_date', type=str, help='Data final no formato dd/mm/yyyy')
     parser.add_argument('--max_guides', type=int, help='Número máximo de guias a serem processadas')
+    parser.add_argument('--workers', type=int, default=1, help='Navegadores processando a fila em paralelo (limitado por UNIMED_MAX_WORKERS)')
     
     args = parser.parse_args()
     
@@ -1943,5 +2109,5 @@ if __name__ == "__main__":
     if not args.end_date:
         args.end_date = args.start_date
         
-    print(f"Executando scraping com parâmetros: start_date={args.start_date}, end_date={args.end_date}, max_guides={args.max_guides}")
-    executar_scraping(args.start_date, args.end_date, args.max_guides)
+    print(f"Executando scraping com parâmetros: start_date={args.start_date}, end_date={args.end_date}, max_guides={args.max_guides}, workers={args.workers}")
+    executar_scraping(args.start_date, args.end_date, args.max_guides, args.workers)
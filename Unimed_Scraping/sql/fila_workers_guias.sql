@@ -0,0 +1,84 @@
+-- Script para o modo de workers paralelos do scraping (captura_guias_via_pdf_fixed.py --workers N)
+-- Cada worker reserva guias da guias_queue com um lease: a guia fica com o worker
+-- até ser concluída ou até o lease expirar (worker travado/encerrado), quando volta
+-- a ficar disponível para outro worker.
+
+ALTER TABLE guias_queue ADD COLUMN IF NOT EXISTS worker_id TEXT;
+ALTER TABLE guias_queue ADD COLUMN IF NOT EXISTS lease_expira_em TIMESTAMPTZ;
+
+-- Progresso de cada worker: {"worker_1": {"processadas": 10, "erros": 1, "last_update": "..."}}
+ALTER TABLE processing_status ADD COLUMN IF NOT EXISTS progresso_workers JSONB DEFAULT '{}'::jsonb;
+
+CREATE INDEX IF NOT EXISTS idx_guias_queue_task_status ON guias_queue(task_id, status);
+
+-- Reserva a próxima guia pendente da task para o worker.
+-- FOR UPDATE SKIP LOCKED garante que dois workers nunca recebam a mesma guia.
+CREATE OR REPLACE FUNCTION reservar_guia_queue(
+    p_task_id TEXT,
+    p_worker_id TEXT,
+    p_lease_segundos INTEGER DEFAULT 600
+)
+RETURNS SETOF guias_queue AS $$
+    UPDATE guias_queue g
+    SET worker_id = p_worker_id,
+        lease_expira_em = now() + make_interval(secs => p_lease_segundos),
+        attempts = COALESCE(g.attempts, 0) + 1,
+        updated_at = now()
+    WHERE g.id = (
+        SELECT id
+        FROM guias_queue
+        WHERE task_id = p_task_id
+          AND status = 'pending'
+          AND (lease_expira_em IS NULL OR lease_expira_em < now())
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING g.*;
+$$ LANGUAGE sql;
+
+-- Conclui a guia reservada: 'processado', 'erro' (volta para a fila) ou 'falha_permanente'.
+-- Também soma o resultado no progresso do worker e no total da task em uma única
+-- atualização, sem a leitura seguida de escrita que perderia incrementos concorrentes.
+CREATE OR REPLACE FUNCTION concluir_guia_queue(
+    p_id UUID,
+    p_worker_id TEXT,
+    p_status TEXT,
+    p_erro TEXT DEFAULT NULL
+)
+RETURNS VOID AS $$
+DECLARE
+    v_task_id TEXT;
+BEGIN
+    UPDATE guias_queue
+    SET status = CASE WHEN p_status = 'erro' THEN 'pending' ELSE p_status END,
+        error = p_erro,
+        processed_at = CASE WHEN p_status = 'processado' THEN now() ELSE processed_at END,
+        worker_id = NULL,
+        lease_expira_em = NULL,
+        updated_at = now()
+    WHERE id = p_id AND worker_id = p_worker_id
+    RETURNING task_id INTO v_task_id;
+
+    IF v_task_id IS NULL THEN
+        RETURN; -- lease expirado e guia reservada por outro worker
+    END IF;
+
+    UPDATE processing_status
+    SET processed_guides = COALESCE(processed_guides, 0) + CASE WHEN p_status = 'processado' THEN 1 ELSE 0 END,
+        retry_guides = COALESCE(retry_guides, 0) + CASE WHEN p_status = 'processado' THEN 0 ELSE 1 END,
+        progresso_workers = jsonb_set(
+            COALESCE(progresso_workers, '{}'::jsonb),
+            ARRAY[p_worker_id],
+            jsonb_build_object(
+                'processadas', COALESCE((progresso_workers -> p_worker_id ->> 'processadas')::int, 0)
+                    + CASE WHEN p_status = 'processado' THEN 1 ELSE 0 END,
+                'erros', COALESCE((progresso_workers -> p_worker_id ->> 'erros')::int, 0)
+                    + CASE WHEN p_status = 'processado' THEN 0 ELSE 1 END,
+                'last_update', now()
+            )
+        ),
+        last_update = now()
+    WHERE task_id = v_task_id;
+END;
+$$ LANGUAGE plpgsql;
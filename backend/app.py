@@ -12,7 +12,10 @@ from .config.config import supabase
 from .services.storage_r2 import storage
 from .utils.pdf_processor import extract_info_from_pdf
 from .repositories.database_supabase import create_execucao, create_storage, get_supabase_client
+from .repositories.database_async import close_async_supabase_client
+from .repositories.database_mysql import close_gerenciador_mysql
 from .utils.date_utils import DateEncoder
+from .utils.json_response import FastJSONResponse
 import json
 import time
 from logging.config import dictConfig
@@ -68,7 +71,8 @@ async def lifespan(app: FastAPI):
     try:
         yield
     finally:
-        pass
+        await close_async_supabase_client()
+        close_gerenciador_mysql()
 
 
 # Configuração do FastAPI
@@ -77,7 +81,7 @@ app = FastAPI(
     description="API da Clínica",
     version="1.0.0",
     lifespan=lifespan,
-    default_response_class=JSONResponse
+    default_response_class=FastJSONResponse
 )
 
 # Configurar o encoder JSON padrão para lidar com datas
@@ -23,6 +23,25 @@ class Settings(BaseSettings):
     JWT_EXPIRES_IN: str | None = None
     SUPABASE_JWT_SECRET: str | None = None
     SUPABASE_PASSWORD: str | None = None
+    # Cliente assíncrono (repositories/database_async.py)
+    SUPABASE_TIMEOUT: float = 30.0
+    SUPABASE_MAX_CONNECTIONS: int = 20
+    SUPABASE_MAX_CONCURRENCY: int = 10
+    # Pool de conexões MySQL via túnel SSH (repositories/database_mysql.py)
+    MYSQL_POOL_SIZE: int = 3
+    MYSQL_POOL_TIMEOUT: float = 30.0
+    # Extração de PDFs com IA (utils/pdf_processor.py): chamadas simultâneas por provedor
+    EXTRACAO_CONCORRENCIA_CLAUDE: int = 5
+    EXTRACAO_CONCORRENCIA_GEMINI: int = 5
+    EXTRACAO_CONCORRENCIA_MISTRAL: int = 3
+    EXTRACAO_MAX_TENTATIVAS: int = 4
+    # Leitura local da camada de texto antes da IA (utils/pdf_texto.py)
+    EXTRACAO_TEXTO_LOCAL_ATIVO: bool = True
+    # Cache das extrações por hash do PDF + modelo + prompt (utils/cache_extracao.py)
+    EXTRACAO_CACHE_ATIVO: bool = True
+    EXTRACAO_CACHE_CAMINHO: str = "cache/extracoes_pdf.sqlite3"
+    EXTRACAO_CACHE_TTL_DIAS: int = 90
+    EXTRACAO_CACHE_MAX_ENTRADAS: int = 20000
     
     class Config:
         env_file = env_path
@@ -175,4 +175,5 @@ class Divergencia(DivergenciaBase):
     updated_at: Optional[datetime] = None
     deleted_at: Optional[datetime] = None
     data_resolucao: Optional[datetime] = None
-    resolvido_por: Optional[str] = None
\ No newline at end of file
+    resolvido_por: Optional[str] = None
+    chave_auditoria: Optional[str] = None
\ No newline at end of file
@@ -1,6 +1,6 @@
 from uuid import UUID
 from typing import Optional, Dict, List
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 from ..models.auditoria_execucao import AuditoriaExecucaoCreate, AuditoriaExecucaoUpdate
 import logging
 from datetime import datetime, date
@@ -13,7 +13,7 @@ logger.setLevel(logging.DEBUG)
 AUDITORIA_DATE_FIELDS = DATE_FIELDS + ['data_execucao', 'data_inicial', 'data_final']
 
 class AuditoriaExecucaoRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "auditoria_execucoes"
 
@@ -35,8 +35,8 @@ class AuditoriaExecucaoRepository:
                 query = query.order(order_column)
 
             query = query.range(offset, offset + limit - 1)
-            result = query.execute()
-            count_result = self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
+            result = await query.execute()
+            count_result = await self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
             items = [format_date_fields(item, AUDITORIA_DATE_FIELDS) for item in (result.data or [])]
 
             return {
@@ -50,7 +50,7 @@ class AuditoriaExecucaoRepository:
             raise
 
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
         if result.data:
             return format_date_fields(result.data[0], AUDITORIA_DATE_FIELDS)
         return None
@@ -75,7 +75,7 @@ class AuditoriaExecucaoRepository:
             if data.get('data_final'):
                 data['data_final'] = data['data_final'].isoformat()
             
-            result = self.db.from_(self.table).insert(data).execute()
+            result = await self.db.from_(self.table).insert(data).execute()
             if result.data:
                 return format_date_fields(result.data[0], AUDITORIA_DATE_FIELDS)
             return None
@@ -99,7 +99,7 @@ class AuditoriaExecucaoRepository:
                     if isinstance(data[field], (datetime, date)):
                         data[field] = data[field].isoformat()
             
-            result = self.db.from_(self.table).update(data)\
+            result = await self.db.from_(self.table).update(data)\
                 .eq("id", str(id))\
                 .is_("deleted_at", "null")\
                 .execute()
@@ -114,7 +114,7 @@ class AuditoriaExecucaoRepository:
     async def get_ultima_auditoria(self) -> Optional[Dict]:
         """Obtém o resultado da última auditoria realizada"""
         try:
-            result = self.db.from_(self.table)\
+            result = await self.db.from_(self.table)\
                 .select("*")\
                 .is_("deleted_at", "null")\
                 .order("data_execucao", desc=True)\
@@ -129,7 +129,7 @@ class AuditoriaExecucaoRepository:
             raise
 
     async def delete(self, id: UUID) -> bool:
-        result = self.db.from_(self.table)\
+        result = await self.db.from_(self.table)\
             .update({"deleted_at": datetime.now().isoformat()})\
             .eq("id", str(id))\
             .is_("deleted_at", "null")\
@@ -184,7 +184,7 @@ class AuditoriaExecucaoRepository:
                 "updated_at": datetime.now().isoformat()
             }
 
-            result = self.db.from_(self.table).insert(data).execute()
+            result = await self.db.from_(self.table).insert(data).execute()
             if result.data:
                 return format_date_fields(result.data[0], AUDITORIA_DATE_FIELDS)
             return None
@@ -197,7 +197,7 @@ class AuditoriaExecucaoRepository:
                            data_final: datetime) -> List[Dict]:
         """Obtém auditorias em um período específico"""
         try:
-            result = self.db.from_(self.table)\
+            result = await self.db.from_(self.table)\
                 .select("*")\
                 .gte("data_execucao", data_inicial.isoformat())\
                 .lte("data_execucao", data_final.isoformat())\
@@ -212,7 +212,7 @@ class AuditoriaExecucaoRepository:
     async def get_by_id(self, id: str) -> Optional[Dict]:
         """Obtém uma auditoria pelo ID"""
         try:
-            result = self.db.from_(self.table)\
+            result = await self.db.from_(self.table)\
                 .select("*")\
                 .eq("id", id)\
                 .is_("deleted_at", "null")\
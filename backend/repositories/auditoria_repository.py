@@ -2,14 +2,22 @@ from typing import Dict, List, Optional
 from datetime import datetime, timezone
 import logging
 import traceback
-from backend.config.config import supabase
+from backend.repositories.database_async import get_async_supabase_client
+from postgrest.types import ReturnMethod
 from math import ceil
 import uuid
 from backend.utils.date_utils import formatar_data
+from backend.repositories.estatisticas_divergencias import (
+    estatisticas_vazias,
+    invalidar_cache_estatisticas_divergencias,
+    obter_estatisticas_divergencias,
+)
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 
+supabase = get_async_supabase_client()
+
 """
 PADRONIZAÇÃO DE CAMPOS NA API DE DIVERGÊNCIAS:
 
@@ -19,7 +27,7 @@ PADRONIZAÇÃO DE CAMPOS NA API DE DIVERGÊNCIAS:
 - O retorno da API usa 'items' como chave para a lista de divergências
 """
 
-def registrar_execucao_auditoria(
+async def registrar_execucao_auditoria(
     data_inicial: str = None,
     data_final: str = None,
     total_protocolos: int = 0,
@@ -28,6 +36,8 @@ def registrar_execucao_auditoria(
     total_fichas: int = 0,
     total_execucoes: int = 0,
     total_resolvidas: int = 0,
+    data_execucao: Optional[str] = None,
+    metricas_adicionais: Optional[Dict] = None,
 ) -> bool:
     """
     Registra uma nova execução de auditoria com seus metadados.
@@ -41,6 +51,9 @@ def registrar_execucao_auditoria(
     - total_fichas: Total de fichas verificadas
     - total_execucoes: Total de execuções verificadas
     - total_resolvidas: Total de divergências resolvidas
+    - data_execucao: Início da auditoria (padrão: agora). A auditoria incremental
+      seguinte considera as alterações feitas a partir deste instante.
+    - metricas_adicionais: Informações extras (modo, registros alterados etc.)
     
     Returns:
         bool: True se o registro foi bem-sucedido, False caso contrário
@@ -75,7 +88,7 @@ def registrar_execucao_auditoria(
         # Preparar dados para inserção
         data = {
             "id": new_id,
-            "data_execucao": datetime.now(timezone.utc).isoformat(),
+            "data_execucao": data_execucao or datetime.now(timezone.utc).isoformat(),
             "data_inicial": data_inicial,
             "data_final": data_final,
             "total_protocolos": total_protocolos,
@@ -84,16 +97,17 @@ def registrar_execucao_auditoria(
             "total_execucoes": total_execucoes,
             "total_resolvidas": total_resolvidas,
             "divergencias_por_tipo": tipos_base,
+            "metricas_adicionais": metricas_adicionais,
             "status": "finalizado"
         }
 
         logging.info(f"Tentando inserir dados: {data}")
         
         # Remover campos vazios antes da inserção
-        insert_data = {k: v for k, v in data.items() if v != ""}
+        insert_data = {k: v for k, v in data.items() if v != "" and v is not None}
         
         # Inserir novo registro de auditoria
-        response = supabase.table("auditoria_execucoes").insert(insert_data).execute()
+        response = await supabase.table("auditoria_execucoes").insert(insert_data).execute()
         
         if response.data:
             logging.info("Execução de auditoria registrada com sucesso")
@@ -107,60 +121,24 @@ def registrar_execucao_auditoria(
         traceback.print_exc()
         return False
 
-def calcular_estatisticas_divergencias() -> Dict:
+async def calcular_estatisticas_divergencias() -> Dict:
     """
     Calcula estatísticas das divergências para os cards.
-    
+
+    As contagens são agrupadas no banco (função estatisticas_divergencias) e
+    ficam em cache por alguns segundos (ver estatisticas_divergencias.py).
+
     Returns:
         Dict: Dicionário com estatísticas das divergências
     """
     try:
-        # Busca todas as divergências
-        response = supabase.table("divergencias").select("*").execute()
-        divergencias = response.data if response.data else []
-
-        # Inicializa contadores
-        por_tipo = {}
-        por_prioridade = {"ALTA": 0, "MEDIA": 0}
-        por_status = {"pendente": 0, "em_analise": 0, "resolvida": 0, "cancelada": 0}
-
-        # Conta divergências por tipo, prioridade e status
-        for div in divergencias:
-            # Por tipo
-            tipo = div.get("tipo", div.get("tipo_divergencia", "outros"))
-            por_tipo[tipo] = por_tipo.get(tipo, 0) + 1
-
-            # Por prioridade
-            prioridade = div.get("prioridade", "MEDIA")
-            por_prioridade[prioridade] = por_prioridade.get(prioridade, 0) + 1
-
-            # Por status
-            status = div.get("status", "pendente")
-            por_status[status] = por_status.get(status, 0) + 1
-
-        # Garantir que todos os campos são inteiros
-        por_tipo = {k: int(v) for k, v in por_tipo.items()}
-        por_prioridade = {k: int(v) for k, v in por_prioridade.items()}
-        por_status = {k: int(v) for k, v in por_status.items()}
-
-        return {
-            "total": len(divergencias),
-            "por_tipo": por_tipo,
-            "por_prioridade": por_prioridade,
-            "por_status": por_status,
-        }
-
+        return await obter_estatisticas_divergencias(supabase)
     except Exception as e:
         logging.error(f"Erro ao calcular estatísticas: {str(e)}")
         logging.error(traceback.format_exc())
-        return {
-            "total": 0,
-            "por_tipo": {},
-            "por_prioridade": {"ALTA": 0, "MEDIA": 0},
-            "por_status": {"pendente": 0, "em_analise": 0, "resolvida": 0, "cancelada": 0},
-        }
+        return estatisticas_vazias()
 
-def buscar_divergencias_view(
+async def buscar_divergencias_view(
     page: int = 1,
     per_page: int = 10,
     status: Optional[str] = None,
@@ -265,7 +243,7 @@ def buscar_divergencias_view(
             total_query = total_query.eq("execucao_id", execucao_id)
         
         # Executa a query de contagem
-        total_response = total_query.execute()
+        total_response = await total_query.execute()
         total_registros = total_response.count if total_response.count is not None else len(total_response.data)
         
         logging.info(f"Total de registros encontrados: {total_registros}")
@@ -274,7 +252,7 @@ def buscar_divergencias_view(
         query = query.range(offset, offset + per_page - 1)
         
         # Executa a query principal
-        response = query.execute()
+        response = await query.execute()
         divergencias = response.data if response.data else []
         
         logging.info(f"Divergências retornadas na página atual: {len(divergencias)}")
@@ -325,7 +303,7 @@ def buscar_divergencias_view(
             # Buscar dados das fichas
             codigos_ficha = list(set(d["codigo_ficha"] for d in divergencias_para_atualizar))
             fichas_response = (
-                supabase.table("fichas")
+                await supabase.table("fichas")
                 .select("id,codigo_ficha,data_atendimento")
                 .in_("codigo_ficha", codigos_ficha)
                 .execute()
@@ -353,7 +331,7 @@ def buscar_divergencias_view(
                     
                     try:
                         response = (
-                            supabase.table("divergencias")
+                            await supabase.table("divergencias")
                             .update(update_data)
                             .eq("id", div["id"])
                             .execute()
@@ -389,7 +367,7 @@ def buscar_divergencias_view(
             "por_pagina": per_page
         }
 
-def registrar_divergencia_detalhada(divergencia: Dict) -> bool:
+async def registrar_divergencia_detalhada(divergencia: Dict) -> bool:
     """
     Registra uma divergência com detalhes específicos.
     
@@ -427,6 +405,8 @@ def registrar_divergencia_detalhada(divergencia: Dict) -> bool:
         
         # Se não tiver prioridade definida, usa a padrão para o tipo
         if not divergencia.get("prioridade"):
+            # Importar aqui para evitar circular imports
+            from backend.services.auditoria import get_divergencia_priority
             divergencia["prioridade"] = get_divergencia_priority(tipo)
             
         # Manter as datas no formato original (YYYY-MM-DD) do banco
@@ -452,7 +432,8 @@ def registrar_divergencia_detalhada(divergencia: Dict) -> bool:
             "ficha_id": divergencia.get("ficha_id"),
             "execucao_id": divergencia.get("execucao_id"),
             "sessao_id": divergencia.get("sessao_id"),
-            "paciente_id": divergencia.get("paciente_id")
+            "paciente_id": divergencia.get("paciente_id"),
+            "chave_auditoria": divergencia.get("chave_auditoria") or gerar_chave_divergencia(divergencia)
         }
 
         # Remover campos None para evitar erro de tipo no banco
@@ -461,14 +442,14 @@ def registrar_divergencia_detalhada(divergencia: Dict) -> bool:
         # Log dos dados antes do insert para debug
         logging.info(f"Registrando divergência: {dados}")
         
-        return registrar_divergencia(**dados)
+        return await registrar_divergencia(**dados)
 
     except Exception as e:
         logging.error(f"Erro ao registrar divergência detalhada: {e}")
         traceback.print_exc()
         return False
 
-def limpar_divergencias_db() -> bool:
+async def limpar_divergencias_db() -> bool:
     """
     Limpa a tabela de divergências
     
@@ -480,11 +461,12 @@ def limpar_divergencias_db() -> bool:
         
         # Simplificar o processo de exclusão
         response = (
-            supabase.table("divergencias")
+            await supabase.table("divergencias")
             .delete()
             .neq("id", "00000000-0000-0000-0000-000000000000")
             .execute()
         )
+        invalidar_cache_estatisticas_divergencias()
         
         logging.info("Tabela divergencias limpa com sucesso!")
         return True
@@ -494,7 +476,7 @@ def limpar_divergencias_db() -> bool:
         logging.error(traceback.format_exc())
         return False
 
-def atualizar_status_divergencia(
+async def atualizar_status_divergencia(
     id: str, novo_status: str, usuario_id: Optional[str] = None
 ) -> bool:
     """
@@ -518,7 +500,7 @@ def atualizar_status_divergencia(
         logging.info(f"Tentando atualizar divergência {id} para status: {novo_status}")
 
         # Primeiro busca a divergência para obter o ficha_id
-        divergencia = supabase.table("divergencias").select("*").eq("id", id).execute()
+        divergencia = await supabase.table("divergencias").select("*").eq("id", id).execute()
         
         if not divergencia.data:
             logging.error("Divergência não encontrada")
@@ -537,13 +519,14 @@ def atualizar_status_divergencia(
             "resolvido_por": usuario_id if novo_status == "resolvida" else None,
         }
         
-        response = supabase.table("divergencias").update(dados).eq("id", id).execute()
+        response = await supabase.table("divergencias").update(dados).eq("id", id).execute()
+        invalidar_cache_estatisticas_divergencias()
         
         # Se a divergência foi resolvida e temos um ficha_id, atualiza a ficha
         if novo_status == "resolvida" and ficha_id:
             logging.info(f"Atualizando status da ficha {ficha_id} para conferida")
             ficha_response = (
-                supabase.table("fichas")
+                await supabase.table("fichas")
                 .update({"status": "conferida"})
                 .eq("id", ficha_id)
                 .execute()
@@ -558,7 +541,32 @@ def atualizar_status_divergencia(
         traceback.print_exc()
         return False
 
-def obter_ultima_auditoria() -> Dict:
+async def obter_marca_auditoria_incremental() -> Optional[str]:
+    """
+    Retorna o início (data_execucao) da última auditoria sem janela de datas,
+    completa ou incremental, a partir do qual a próxima auditoria
+    incremental busca as alterações.
+
+    Auditorias limitadas por data_inicial/data_final não contam: elas não
+    olham as alterações fora da janela, e usá-las como marca faria a
+    auditoria incremental seguinte pular essas alterações.
+
+    Returns:
+        Optional[str]: data_execucao da auditoria, ou None se não houver
+    """
+    response = (
+        await supabase.table("auditoria_execucoes")
+        .select("data_execucao")
+        .is_("data_inicial", "null")
+        .is_("data_final", "null")
+        .is_("deleted_at", "null")
+        .order("data_execucao", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return response.data[0]["data_execucao"] if response.data else None
+
+async def obter_ultima_auditoria() -> Dict:
     """
     Obtém o resultado da última auditoria realizada
     
@@ -567,7 +575,7 @@ def obter_ultima_auditoria() -> Dict:
     """
     try:
         response = (
-            supabase.table("auditoria_execucoes")
+            await supabase.table("auditoria_execucoes")
             .select("*")
             .order("data_execucao", desc=True)
             .limit(1)
@@ -618,7 +626,7 @@ def obter_ultima_auditoria() -> Dict:
         logging.error(f"Erro ao obter última auditoria: {str(e)}")
         return None
 
-def listar_divergencias(
+async def listar_divergencias(
     page: int = 1,
     per_page: int = 10,
     data_inicio: Optional[str] = None,
@@ -646,7 +654,7 @@ def listar_divergencias(
     Returns:
         Dict: Lista paginada de divergências
     """
-    return buscar_divergencias_view(
+    return await buscar_divergencias_view(
         page=page,
         per_page=per_page,
         data_inicio=data_inicio,
@@ -660,7 +668,36 @@ def listar_divergencias(
     )
 
 
-def registrar_divergencia(
+def _parse_data(date_str):
+    """Normaliza datas (YYYY-MM-DD, DD/MM/YYYY ou timestamp ISO) para YYYY-MM-DD."""
+    if not date_str:
+        return None
+    try:
+        # Se já estiver no formato YYYY-MM-DD
+        if isinstance(date_str, str):
+            if len(date_str) == 10 and "-" in date_str:
+                # Validar formato da data
+                datetime.strptime(date_str, "%Y-%m-%d")
+                return date_str
+
+            # Se estiver no formato DD/MM/YYYY
+            if "/" in date_str:
+                day, month, year = date_str.split("/")
+                # Converter para YYYY-MM-DD
+                date_obj = datetime(int(year), int(month), int(day))
+                return date_obj.strftime("%Y-%m-%d")
+
+            # Se for timestamp, extrair apenas a data
+            if "T" in date_str:
+                return date_str.split("T")[0]
+
+        return None
+    except Exception as e:
+        logging.error(f"Erro ao parsear data: {date_str} - {str(e)}")
+        return None
+
+
+async def registrar_divergencia(
     numero_guia: str,
     tipo: str,  # Padronizado para usar "tipo" em vez de "tipo_divergencia"
     descricao: str,
@@ -675,10 +712,15 @@ def registrar_divergencia(
     ficha_id: str = None,
     execucao_id: str = None,
     sessao_id: str = None,
-    paciente_id: str = None
+    paciente_id: str = None,
+    chave_auditoria: str = None
 ) -> bool:
     """
     Registra uma divergência no banco de dados.
+
+    Quando `chave_auditoria` é informada, a divergência é gravada com upsert
+    por essa chave: uma divergência já existente é atualizada (mantendo status
+    e data de identificação) em vez de duplicada.
     
     Nota: Este método usa o campo "tipo" consistentemente em vez de "tipo_divergencia"
     para manter compatibilidade com o resto do sistema. Em alguns lugares do código
@@ -701,6 +743,7 @@ def registrar_divergencia(
         execucao_id: ID da execução relacionada (opcional)
         sessao_id: ID da sessão relacionada (opcional)
         paciente_id: ID do paciente (opcional)
+        chave_auditoria: Chave estável da divergência (opcional)
         
     Returns:
         bool: True se a operação foi bem-sucedida, False caso contrário
@@ -711,34 +754,6 @@ def registrar_divergencia(
             logging.error("Campos obrigatórios não informados")
             return False
 
-        # Função melhorada para parsear datas
-        def parse_date(date_str):
-            if not date_str:
-                return None
-            try:
-                # Se já estiver no formato YYYY-MM-DD
-                if isinstance(date_str, str):
-                    if len(date_str) == 10 and "-" in date_str:
-                        # Validar formato da data
-                        datetime.strptime(date_str, "%Y-%m-%d")
-                        return date_str
-
-                    # Se estiver no formato DD/MM/YYYY
-                    if "/" in date_str:
-                        day, month, year = date_str.split("/")
-                        # Converter para YYYY-MM-DD
-                        date_obj = datetime(int(year), int(month), int(day))
-                        return date_obj.strftime("%Y-%m-%d")
-
-                    # Se for timestamp, extrair apenas a data
-                    if "T" in date_str:
-                        return date_str.split("T")[0]
-
-                return None
-            except Exception as e:
-                logging.error(f"Erro ao parsear data: {date_str} - {str(e)}")
-                return None
-
         # Log adicional para busca de dados da ficha
         if codigo_ficha:
             try:
@@ -746,7 +761,7 @@ def registrar_divergencia(
                 
                 # Primeiro verificar se a ficha existe
                 ficha_exists_response = (
-                    supabase.table("fichas")
+                    await supabase.table("fichas")
                     .select("count", count="exact")
                     .eq("codigo_ficha", codigo_ficha)
                     .execute()
@@ -757,7 +772,7 @@ def registrar_divergencia(
 
                 # Então obter os dados reais
                 ficha_response = (
-                    supabase.table("fichas")
+                    await supabase.table("fichas")
                     .select("*")  # Selecionar todos os campos para melhor debug
                     .eq("codigo_ficha", codigo_ficha)
                     .execute()
@@ -806,14 +821,15 @@ def registrar_divergencia(
             "data_identificacao": data_identificacao,
             "prioridade": prioridade,
             "codigo_ficha": codigo_ficha,
-            "data_execucao": parse_date(data_execucao),
-            "data_atendimento": parse_date(data_atendimento),
+            "data_execucao": _parse_data(data_execucao),
+            "data_atendimento": _parse_data(data_atendimento),
             "carteirinha": carteirinha,
             "detalhes": detalhes,
             "ficha_id": ficha_id if 'ficha_id' in locals() else None,
             "execucao_id": execucao_id,
             "sessao_id": sessao_id,
-            "paciente_id": paciente_id
+            "paciente_id": paciente_id,
+            "chave_auditoria": chave_auditoria
         }
 
         # Log de dados completos antes da inserção
@@ -826,8 +842,19 @@ def registrar_divergencia(
         # Log de dados finais a serem inseridos
         logging.info(f"Dados finais para insert: {dados}")
 
-        # Inserir no banco
-        response = supabase.table("divergencias").insert(dados).execute()
+        if chave_auditoria:
+            # Divergência já conhecida: preserva o status e a data de identificação
+            dados.pop("status", None)
+            dados.pop("data_identificacao", None)
+            response = (
+                await supabase.table("divergencias")
+                .upsert(dados, on_conflict="chave_auditoria")
+                .execute()
+            )
+        else:
+            # Inserir no banco
+            response = await supabase.table("divergencias").insert(dados).execute()
+        invalidar_cache_estatisticas_divergencias()
         
         if response.data:
             logging.info(f"Divergência registrada com sucesso: {response.data[0]}")
@@ -841,7 +868,7 @@ def registrar_divergencia(
         traceback.print_exc()
         return False
 
-def atualizar_ficha_ids_divergencias(divergencias: Optional[List[Dict]] = None) -> bool:
+async def atualizar_ficha_ids_divergencias(divergencias: Optional[List[Dict]] = None) -> bool:
     """
     Atualiza os ficha_ids e data_atendimento nas divergências.
     
@@ -855,7 +882,7 @@ def atualizar_ficha_ids_divergencias(divergencias: Optional[List[Dict]] = None)
         if divergencias == None:
             # Busca divergências sem ficha_id
             response = (
-                supabase.table("divergencias")
+                await supabase.table("divergencias")
                 .select("*")
                 .is_("ficha_id", "null")
                 .not_.is_("codigo_ficha", "null")
@@ -879,7 +906,7 @@ def atualizar_ficha_ids_divergencias(divergencias: Optional[List[Dict]] = None)
 
         # Incluir data_atendimento no select
         fichas_response = (
-            supabase.table("fichas")
+            await supabase.table("fichas")
             .select("id,codigo_ficha,data_atendimento")
             .in_("codigo_ficha", codigos_ficha)
             .execute()
@@ -901,7 +928,7 @@ def atualizar_ficha_ids_divergencias(divergencias: Optional[List[Dict]] = None)
                 try:
                     # Atualizar tanto ficha_id quanto data_atendimento
                     response = (
-                        supabase.table("divergencias")
+                        await supabase.table("divergencias")
                         .update({
                             "ficha_id": ficha_data["id"],
                             "data_atendimento": ficha_data["data_atendimento"]
@@ -921,4 +948,502 @@ def atualizar_ficha_ids_divergencias(divergencias: Optional[List[Dict]] = None)
     except Exception as e:
         logging.error(f"Erro ao atualizar ficha_ids: {str(e)}")
         traceback.print_exc()
-        return False
\ No newline at end of file
+        return False
+
+# ---------------------------------------------------------------------------
+# Auditoria incremental
+# ---------------------------------------------------------------------------
+
+# Limite de linhas por requisição do PostgREST e tamanho dos lotes em filtros in_()
+TAMANHO_PAGINA = 1000
+TAMANHO_LOTE_IN = 200
+
+# Status em que a divergência ainda está aberta
+STATUS_ABERTOS = ["pendente", "em_analise"]
+
+# Tipos de divergência identificados pela guia (os demais pela ficha/execução)
+TIPOS_POR_GUIA = {"quantidade_excedida", "guia_vencida"}
+
+
+def gerar_chave_divergencia(divergencia: Dict) -> Optional[str]:
+    """
+    Gera a chave estável de uma divergência (tipo + identificador do registro
+    que a originou). A mesma inconsistência encontrada em auditorias diferentes
+    produz sempre a mesma chave.
+
+    Returns:
+        str: Chave no formato "<tipo>:<identificador>" ou None se não houver identificador
+    """
+    tipo = divergencia.get("tipo") or divergencia.get("tipo_divergencia")
+    if not tipo:
+        return None
+
+    detalhes = divergencia.get("detalhes") or {}
+    sessao_id = divergencia.get("sessao_id") or detalhes.get("sessao_id")
+
+    if tipo in TIPOS_POR_GUIA:
+        identificador = divergencia.get("numero_guia")
+    elif tipo == "sessao_sem_assinatura":
+        identificador = sessao_id
+    elif tipo == "duplicidade":
+        # Um grupo por (ficha, sessão, guia, data), como em verificar_duplicidade_execucoes
+        partes = (
+            divergencia.get("codigo_ficha"),
+            sessao_id,
+            divergencia.get("numero_guia"),
+            divergencia.get("data_execucao"),
+        )
+        identificador = "|".join("" if p is None else str(p) for p in partes) if sessao_id else None
+    elif tipo in ("data_divergente", "falta_data_execucao"):
+        identificador = divergencia.get("execucao_id") or divergencia.get("codigo_ficha")
+    else:
+        identificador = divergencia.get("codigo_ficha")
+
+    return f"{tipo}:{identificador}" if identificador else None
+
+
+def _aplicar_periodo(query, coluna: str, data_inicial: Optional[str], data_final: Optional[str]):
+    """Aplica a janela de datas da auditoria à consulta."""
+    if data_inicial:
+        query = query.gte(coluna, data_inicial)
+    if data_final:
+        query = query.lte(coluna, data_final)
+    return query
+
+
+async def _buscar_paginado(montar_query) -> List[Dict]:
+    """
+    Busca todas as linhas de uma consulta página a página, evitando o limite
+    de linhas por resposta do PostgREST. `montar_query` deve retornar uma nova
+    consulta (ordenada) a cada chamada.
+    """
+    resultado = []
+    inicio = 0
+    while True:
+        response = await montar_query().range(inicio, inicio + TAMANHO_PAGINA - 1).execute()
+        dados = response.data or []
+        resultado.extend(dados)
+        if len(dados) < TAMANHO_PAGINA:
+            return resultado
+        inicio += TAMANHO_PAGINA
+
+
+async def _buscar_por_valores(montar_query, coluna: str, valores) -> List[Dict]:
+    """Executa a consulta filtrando `coluna` pelos valores informados, em lotes de in_()."""
+    valores = sorted({v for v in valores if v})
+    resultado = []
+    for i in range(0, len(valores), TAMANHO_LOTE_IN):
+        lote = valores[i:i + TAMANHO_LOTE_IN]
+        resultado.extend(await _buscar_paginado(lambda: montar_query().in_(coluna, lote)))
+    return resultado
+
+
+def _sem_repeticao(*listas: List[Dict]) -> List[Dict]:
+    """Une listas de registros descartando ids repetidos."""
+    vistos = {}
+    for lista in listas:
+        for item in lista:
+            vistos.setdefault(item.get("id"), item)
+    return list(vistos.values())
+
+
+async def buscar_escopo_alterado(desde: str) -> Dict[str, set]:
+    """
+    Identifica as fichas e guias afetadas por alterações em fichas, sessões,
+    execuções e guias desde `desde` (data da última auditoria).
+
+    Returns:
+        Dict: {"codigos_ficha": set, "numeros_guia": set}
+    """
+    fichas = await _buscar_paginado(
+        lambda: supabase.table("fichas")
+        .select("id, codigo_ficha, numero_guia")
+        .gte("updated_at", desde)
+        .order("id")
+    )
+    sessoes = await _buscar_paginado(
+        lambda: supabase.table("sessoes")
+        .select("id, fichas!sessoes_ficha_id_fkey(codigo_ficha, numero_guia)")
+        .gte("updated_at", desde)
+        .order("id")
+    )
+    execucoes = await _buscar_paginado(
+        lambda: supabase.table("execucoes")
+        .select("id, codigo_ficha, numero_guia")
+        .gte("updated_at", desde)
+        .order("id")
+    )
+    guias = await _buscar_paginado(
+        lambda: supabase.table("guias")
+        .select("id, numero_guia")
+        .gte("updated_at", desde)
+        .order("id")
+    )
+
+    codigos_ficha = set()
+    numeros_guia = set()
+    for registro in fichas + execucoes + [s.get("fichas") or {} for s in sessoes] + guias:
+        if registro.get("codigo_ficha"):
+            codigos_ficha.add(registro["codigo_ficha"])
+        if registro.get("numero_guia"):
+            numeros_guia.add(registro["numero_guia"])
+
+    logging.info(
+        f"Alterações desde {desde}: {len(fichas)} fichas, {len(sessoes)} sessões, "
+        f"{len(execucoes)} execuções, {len(guias)} guias "
+        f"({len(codigos_ficha)} códigos de ficha, {len(numeros_guia)} guias afetadas)"
+    )
+    return {"codigos_ficha": codigos_ficha, "numeros_guia": numeros_guia}
+
+
+async def carregar_dados_auditoria(
+    data_inicial: Optional[str] = None,
+    data_final: Optional[str] = None,
+    escopo: Optional[Dict[str, set]] = None,
+) -> Dict[str, List[Dict]]:
+    """
+    Carrega sessões, execuções e guias para a auditoria.
+
+    Sem `escopo` carrega todos os registros (respeitando a janela de datas).
+    Com `escopo` carrega apenas as fichas e guias afetadas, ampliando o escopo
+    para que os dois lados de cada comparação (ficha x execução, guia x
+    execuções) estejam sempre presentes. O `escopo` é atualizado in-place com
+    os códigos e guias efetivamente auditados.
+
+    Returns:
+        Dict: {"sessoes", "execucoes", "guias", "execucoes_guias"}, onde
+        "execucoes_guias" são todas as execuções das guias carregadas (sem a
+        janela de datas), usadas na verificação de quantidade.
+    """
+    select_sessoes = "*, fichas!sessoes_ficha_id_fkey(*)"
+    select_execucoes = "*, guias!execucoes_guia_id_fkey(*)"
+    select_guias = "*, carteirinhas!guias_carteirinha_id_fkey(*)"
+
+    def query_sessoes():
+        return _aplicar_periodo(
+            supabase.table("sessoes").select(select_sessoes).order("id"),
+            "data_sessao", data_inicial, data_final
+        )
+
+    def query_execucoes(com_periodo: bool = True):
+        query = supabase.table("execucoes").select(select_execucoes).order("id")
+        if com_periodo:
+            query = _aplicar_periodo(query, "data_execucao", data_inicial, data_final)
+        return query
+
+    def query_guias():
+        return supabase.table("guias").select(select_guias).order("id")
+
+    if escopo is None:
+        sessoes = await _buscar_paginado(query_sessoes)
+        execucoes = await _buscar_paginado(query_execucoes)
+        if data_inicial or data_final:
+            numeros_guia = {e.get("numero_guia") for e in execucoes}
+            guias = await _buscar_por_valores(query_guias, "numero_guia", numeros_guia)
+            execucoes_guias = await _buscar_por_valores(
+                lambda: query_execucoes(com_periodo=False), "numero_guia", numeros_guia
+            )
+        else:
+            guias = await _buscar_paginado(query_guias)
+            execucoes_guias = execucoes
+        return {
+            "sessoes": sessoes,
+            "execucoes": execucoes,
+            "guias": guias,
+            "execucoes_guias": execucoes_guias,
+        }
+
+    codigos_ficha = escopo.setdefault("codigos_ficha", set())
+    numeros_guia = escopo.setdefault("numeros_guia", set())
+
+    # Guias das fichas/execuções alteradas entram no escopo (quantidade por guia)
+    execucoes_codigos = await _buscar_por_valores(
+        lambda: supabase.table("execucoes").select("id, codigo_ficha, numero_guia").order("id"),
+        "codigo_ficha", codigos_ficha
+    )
+    numeros_guia.update(e["numero_guia"] for e in execucoes_codigos if e.get("numero_guia"))
+
+    # Todas as execuções dessas guias; seus códigos de ficha também são reauditados
+    execucoes_guias = await _buscar_por_valores(
+        lambda: query_execucoes(com_periodo=False), "numero_guia", numeros_guia
+    )
+    codigos_ficha.update(e["codigo_ficha"] for e in execucoes_guias if e.get("codigo_ficha"))
+
+    fichas = await _buscar_por_valores(
+        lambda: supabase.table("fichas").select("id").order("id"),
+        "codigo_ficha", codigos_ficha
+    )
+    sessoes = await _buscar_por_valores(query_sessoes, "ficha_id", [f["id"] for f in fichas])
+    execucoes = await _buscar_por_valores(query_execucoes, "codigo_ficha", codigos_ficha)
+    guias = await _buscar_por_valores(query_guias, "numero_guia", numeros_guia)
+
+    return {
+        "sessoes": sessoes,
+        "execucoes": execucoes,
+        "guias": guias,
+        "execucoes_guias": execucoes_guias,
+    }
+
+
+async def resolver_divergencias_ausentes(
+    chaves_encontradas: set,
+    escopo: Optional[Dict[str, set]] = None,
+) -> int:
+    """
+    Marca como resolvidas as divergências abertas que não foram encontradas
+    novamente pela auditoria. Com `escopo`, considera apenas as divergências
+    das fichas/guias auditadas; sem escopo, todas as divergências abertas.
+
+    Returns:
+        int: Quantidade de divergências resolvidas
+    """
+    def query_abertas():
+        return (
+            supabase.table("divergencias")
+            .select("id, tipo, chave_auditoria")
+            .in_("status", STATUS_ABERTOS)
+            .order("id")
+        )
+
+    if escopo is None:
+        abertas = await _buscar_paginado(query_abertas)
+    else:
+        por_ficha = await _buscar_por_valores(query_abertas, "codigo_ficha", escopo.get("codigos_ficha", set()))
+        por_guia = await _buscar_por_valores(query_abertas, "numero_guia", escopo.get("numeros_guia", set()))
+        abertas = _sem_repeticao(
+            [d for d in por_ficha if d.get("tipo") not in TIPOS_POR_GUIA],
+            [d for d in por_guia if d.get("tipo") in TIPOS_POR_GUIA],
+        )
+
+    ids = [
+        d["id"] for d in abertas
+        if d.get("chave_auditoria") and d["chave_auditoria"] not in chaves_encontradas
+    ]
+
+    agora = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    for i in range(0, len(ids), TAMANHO_LOTE_IN):
+        await (
+            supabase.table("divergencias")
+            .update({"status": "resolvida", "data_resolucao": agora})
+            .in_("id", ids[i:i + TAMANHO_LOTE_IN])
+            .execute()
+        )
+    if ids:
+        invalidar_cache_estatisticas_divergencias()
+
+    logging.info(f"{len(ids)} divergências resolvidas automaticamente pela auditoria")
+    return len(ids)
+
+
+async def reabrir_divergencias_encontradas(chaves_encontradas: set) -> int:
+    """
+    Volta para "pendente" as divergências resolvidas que a auditoria encontrou
+    novamente (a inconsistência continua nos dados). Divergências canceladas
+    não são alteradas.
+
+    Returns:
+        int: Quantidade de divergências reabertas
+    """
+    chaves = sorted(chaves_encontradas)
+    total = 0
+    for i in range(0, len(chaves), TAMANHO_LOTE_IN):
+        response = await (
+            supabase.table("divergencias")
+            .update({"status": "pendente", "data_resolucao": None, "resolvido_por": None})
+            .eq("status", "resolvida")
+            .in_("chave_auditoria", chaves[i:i + TAMANHO_LOTE_IN])
+            .execute()
+        )
+        total += len(response.data or [])
+
+    if total:
+        invalidar_cache_estatisticas_divergencias()
+        logging.info(f"{total} divergências resolvidas foram reabertas pela auditoria")
+    return total
+
+
+async def limpar_divergencias_sem_chave() -> bool:
+    """
+    Remove as divergências gravadas antes da chave estável (chave_auditoria nula).
+    Elas são recriadas com chave na auditoria completa.
+    """
+    try:
+        await (
+            supabase.table("divergencias")
+            .delete()
+            .is_("chave_auditoria", "null")
+            .execute()
+        )
+        invalidar_cache_estatisticas_divergencias()
+        return True
+    except Exception as e:
+        logging.error(f"Erro ao remover divergências sem chave: {e}")
+        logging.error(traceback.format_exc())
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Gravação de divergências em lote
+# ---------------------------------------------------------------------------
+
+# Divergências por requisição de upsert
+TAMANHO_LOTE_DIVERGENCIAS = 500
+
+# Colunas enviadas no upsert em lote. Todas as linhas do lote precisam ter as
+# mesmas chaves; status e data_identificacao ficam de fora para preservar os
+# valores das divergências já existentes (novas recebem o default da tabela).
+COLUNAS_DIVERGENCIA = [
+    "numero_guia", "tipo", "descricao", "paciente_nome", "codigo_ficha",
+    "data_execucao", "data_atendimento", "carteirinha", "prioridade",
+    "detalhes", "ficha_id", "execucao_id", "sessao_id", "paciente_id",
+    "chave_auditoria",
+]
+
+
+class ColetorDivergencias:
+    """
+    Acumula em memória as divergências encontradas pela auditoria e grava
+    tudo em lote no `flush()`:
+
+    - os dados das fichas (ficha_id, data_atendimento, carteirinha) são
+      resolvidos com uma busca `in_()` por lote de códigos, em vez de uma
+      consulta por divergência;
+    - as divergências são gravadas com upsert por `chave_auditoria` em lotes
+      de `tamanho_lote`.
+
+    Divergências com a mesma chave dentro da auditoria são consolidadas
+    (prevalece a última).
+    """
+
+    def __init__(self, tamanho_lote: int = TAMANHO_LOTE_DIVERGENCIAS):
+        self.tamanho_lote = tamanho_lote
+        self.chaves: set = set()
+        self.gravadas = 0
+        self.invalidas = 0
+        self.falhas = 0
+        self._por_chave: Dict[str, Dict] = {}
+        self._sem_chave: List[Dict] = []
+
+    def __len__(self) -> int:
+        return len(self._por_chave) + len(self._sem_chave)
+
+    def adicionar(self, divergencia: Dict) -> bool:
+        """
+        Valida e normaliza uma divergência (mesmas regras de
+        registrar_divergencia_detalhada) e a adiciona ao lote.
+
+        Returns:
+            bool: False se faltarem campos obrigatórios
+        """
+        if "tipo_divergencia" in divergencia:
+            tipo_divergencia = divergencia.pop("tipo_divergencia")
+            divergencia.setdefault("tipo", tipo_divergencia)
+
+        tipo = divergencia.get("tipo")
+        if not all([
+            divergencia.get("numero_guia"),
+            tipo,
+            divergencia.get("descricao"),
+            divergencia.get("paciente_nome")
+        ]):
+            logging.error(f"Campos obrigatórios faltando: {divergencia}")
+            self.invalidas += 1
+            return False
+
+        if not divergencia.get("prioridade"):
+            # Importar aqui para evitar circular imports
+            from backend.services.auditoria import get_divergencia_priority
+            divergencia["prioridade"] = get_divergencia_priority(tipo)
+
+        detalhes = divergencia.get("detalhes") or {}
+        registro = {
+            "numero_guia": divergencia.get("numero_guia"),
+            "tipo": tipo,
+            "descricao": divergencia.get("descricao"),
+            "paciente_nome": divergencia["paciente_nome"].upper(),
+            "codigo_ficha": divergencia.get("codigo_ficha") or "",
+            "data_execucao": _parse_data(divergencia.get("data_execucao")),
+            "data_atendimento": _parse_data(divergencia.get("data_atendimento")),
+            "carteirinha": divergencia.get("carteirinha") or "",
+            "prioridade": divergencia.get("prioridade"),
+            "detalhes": divergencia.get("detalhes"),
+            "ficha_id": divergencia.get("ficha_id"),
+            "execucao_id": divergencia.get("execucao_id"),
+            "sessao_id": divergencia.get("sessao_id") or detalhes.get("sessao_id"),
+            "paciente_id": divergencia.get("paciente_id"),
+            "chave_auditoria": divergencia.get("chave_auditoria") or gerar_chave_divergencia(divergencia),
+        }
+
+        chave = registro["chave_auditoria"]
+        if chave:
+            self.chaves.add(chave)
+            self._por_chave[chave] = registro
+        else:
+            self._sem_chave.append(registro)
+        return True
+
+    async def _completar_dados_fichas(self, registros: List[Dict]) -> None:
+        """Preenche ficha_id, data_atendimento e carteirinha a partir das fichas, em lote."""
+        codigos = {r["codigo_ficha"] for r in registros if r.get("codigo_ficha")}
+        if not codigos:
+            return
+
+        fichas = await _buscar_por_valores(
+            lambda: supabase.table("fichas")
+            .select("id, codigo_ficha, data_atendimento, paciente_carteirinha, deleted_at")
+            .order("id"),
+            "codigo_ficha", codigos
+        )
+
+        # Fichas ativas têm preferência sobre as excluídas com o mesmo código
+        mapa_fichas = {}
+        for ficha in sorted(fichas, key=lambda f: f.get("deleted_at") is None):
+            mapa_fichas[ficha["codigo_ficha"]] = ficha
+
+        for registro in registros:
+            ficha = mapa_fichas.get(registro.get("codigo_ficha"))
+            if not ficha:
+                continue
+            registro["ficha_id"] = ficha["id"]
+            registro["data_atendimento"] = _parse_data(ficha.get("data_atendimento")) or registro["data_atendimento"]
+            registro["carteirinha"] = ficha.get("paciente_carteirinha") or registro["carteirinha"]
+
+    async def flush(self) -> int:
+        """
+        Grava as divergências acumuladas e esvazia o coletor.
+
+        Returns:
+            int: Quantidade de divergências gravadas neste flush
+        """
+        registros = list(self._por_chave.values()) + self._sem_chave
+        self._por_chave = {}
+        self._sem_chave = []
+        if not registros:
+            return 0
+
+        try:
+            await self._completar_dados_fichas(registros)
+        except Exception as e:
+            logging.error(f"Erro ao buscar dados das fichas das divergências: {e}")
+            logging.error(traceback.format_exc())
+
+        gravadas = 0
+        for i in range(0, len(registros), self.tamanho_lote):
+            lote = [{coluna: r.get(coluna) for coluna in COLUNAS_DIVERGENCIA} for r in registros[i:i + self.tamanho_lote]]
+            try:
+                await (
+                    supabase.table("divergencias")
+                    .upsert(lote, on_conflict="chave_auditoria", returning=ReturnMethod.minimal)
+                    .execute()
+                )
+                gravadas += len(lote)
+            except Exception as e:
+                logging.error(f"Erro ao gravar lote de {len(lote)} divergências: {e}")
+                logging.error(traceback.format_exc())
+                self.falhas += len(lote)
+
+        self.gravadas += gravadas
+        if gravadas:
+            invalidar_cache_estatisticas_divergencias()
+        logging.info(f"{gravadas} de {len(registros)} divergências gravadas em lote")
+        return gravadas
@@ -1,17 +1,16 @@
 from uuid import UUID
 from typing import Optional, Dict, List, Tuple
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 from ..models.carteirinha import CarteirinhaCreate, CarteirinhaUpdate
 import logging
 from datetime import datetime
 from ..utils.date_utils import format_date_fields, DATE_FIELDS
-import asyncio
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 class CarteirinhaRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "carteirinhas"
 
@@ -47,15 +46,13 @@ class CarteirinhaRepository:
             logger.info(str(params))
 
             # Chamar a função RPC
-            result = await asyncio.to_thread(
-                lambda: self.db.rpc("listar_carteirinhas_com_detalhes", params).execute()
-            )
+            result = await self.db.rpc("listar_carteirinhas_com_detalhes", params).execute()
             
             logger.info("Resultado da RPC:")
             logger.info(str(result.data))
 
             # Obter contagem total
-            count_result = self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
+            count_result = await self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
             total = count_result.count if hasattr(count_result, 'count') else 0
 
             # Formatar datas e garantir que created_by e updated_by não sejam nulos
@@ -80,7 +77,7 @@ class CarteirinhaRepository:
             raise
 
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
-        result = self.db.from_(self.table).select(
+        result = await self.db.from_(self.table).select(
             f"{self.table}.*, pacientes.nome as paciente_nome, planos_saude.nome as plano_saude_nome"
         ).join(
             "pacientes", f"{self.table}.paciente_id=pacientes.id"
@@ -100,7 +97,7 @@ class CarteirinhaRepository:
         return None
 
     async def get_by_numero_and_plano(self, numero: str, plano_id: UUID) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*")\
+        result = await self.db.from_(self.table).select("*")\
             .eq("numero_carteirinha", numero)\
             .eq("plano_saude_id", str(plano_id))\
             .is_("deleted_at", "null")\
@@ -121,7 +118,7 @@ class CarteirinhaRepository:
     async def get_by_paciente(self, paciente_id: UUID) -> List[Dict]:
         try:
             # Usar a sintaxe correta para selects no Supabase
-            result = self.db.from_(self.table).select(
+            result = await self.db.from_(self.table).select(
                 "*,planos_saude(id,nome)"
             ).eq("paciente_id", str(paciente_id)).is_("deleted_at", "null").execute()
             
@@ -159,7 +156,7 @@ class CarteirinhaRepository:
             # Formata as datas antes de enviar para o banco
             formatted_data = format_date_fields(data, DATE_FIELDS)
             
-            result = self.db.from_(self.table).insert(formatted_data).execute()
+            result = await self.db.from_(self.table).insert(formatted_data).execute()
             if result.data:
                 return format_date_fields(result.data[0], DATE_FIELDS)
             return None
@@ -192,13 +189,13 @@ class CarteirinhaRepository:
             logger.info(f"Dados formatados para atualização: {formatted_data}")
             
             # Atualizar a carteirinha
-            result = self.db.from_(self.table).update(formatted_data).eq("id", str(id)).is_("deleted_at", "null").execute()
+            result = await self.db.from_(self.table).update(formatted_data).eq("id", str(id)).is_("deleted_at", "null").execute()
             
             if not result.data:
                 return None
             
             # Buscar os dados atualizados com uma consulta simples
-            get_result = self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
+            get_result = await self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
             
             if not get_result.data:
                 return None
@@ -223,7 +220,7 @@ class CarteirinhaRepository:
             raise
 
     async def delete(self, id: UUID) -> bool:
-        result = self.db.from_(self.table)\
+        result = await self.db.from_(self.table)\
             .update({"deleted_at": "now()"})\
             .eq("id", str(id))\
             .is_("deleted_at", "null")\
@@ -0,0 +1,187 @@
+# database_async.py
+"""
+Camada de acesso assíncrono ao Supabase (PostgREST).
+
+O cliente síncrono de `config.config` bloqueia o event loop do uvicorn a cada
+`.execute()`. Este módulo mantém um único cliente HTTP assíncrono por processo,
+com pool de conexões, timeout por requisição e limite de requisições
+simultâneas. A interface (`table`, `from_`, `rpc`) é a mesma do cliente
+síncrono, bastando usar `await` no `.execute()`.
+"""
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Union
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest._async.request_builder import AsyncRequestBuilder, AsyncRPCFilterRequestBuilder
+
+from ..config.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Timeout (em segundos) aplicado às requisições feitas dentro de `request_timeout()`
+_timeout_override: ContextVar[Optional[float]] = ContextVar("supabase_timeout_override", default=None)
+
+
+@contextmanager
+def request_timeout(seconds: float):
+    """
+    Sobrescreve o timeout das requisições feitas dentro do bloco.
+
+    Exemplo:
+        with request_timeout(120):
+            await db.table("execucoes").select("*").execute()
+    """
+    token = _timeout_override.set(seconds)
+    try:
+        yield
+    finally:
+        _timeout_override.reset(token)
+
+
+class _LimitedAsyncClient(httpx.AsyncClient):
+    """httpx.AsyncClient que limita o número de requisições em andamento."""
+
+    def __init__(self, *args, max_concurrency: int, acquire_timeout: Optional[float], **kwargs):
+        super().__init__(*args, **kwargs)
+        self._max_concurrency = max_concurrency
+        self._acquire_timeout = acquire_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        override = _timeout_override.get()
+        if override is not None:
+            request.extensions["timeout"] = httpx.Timeout(override).as_dict()
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self._acquire_timeout)
+        except asyncio.TimeoutError:
+            raise httpx.PoolTimeout(
+                f"Limite de {self._max_concurrency} requisições simultâneas ao Supabase atingido",
+                request=request,
+            )
+        try:
+            return await super().send(request, **kwargs)
+        finally:
+            self._semaphore.release()
+
+
+class _PooledPostgrestClient(AsyncPostgrestClient):
+    """AsyncPostgrestClient que usa o `_LimitedAsyncClient` com pool de conexões."""
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        headers: Dict[str, str],
+        timeout: httpx.Timeout,
+        limits: httpx.Limits,
+        max_concurrency: int,
+    ) -> None:
+        self._limits = limits
+        self._max_concurrency = max_concurrency
+        super().__init__(base_url, headers=headers, timeout=timeout)
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True,
+        proxy: Optional[str] = None,
+    ) -> httpx.AsyncClient:
+        return _LimitedAsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=True,
+            limits=self._limits,
+            max_concurrency=self._max_concurrency,
+            acquire_timeout=timeout.pool if isinstance(timeout, httpx.Timeout) else None,
+        )
+
+
+class AsyncSupabaseClient:
+    """
+    Cliente assíncrono do Supabase com a mesma interface usada pelos
+    repositórios (`table`, `from_` e `rpc`).
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        supabase_key: str,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        max_concurrency: int = 10,
+    ):
+        headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "apiKey": supabase_key,
+            "Authorization": f"Bearer {supabase_key}",
+        }
+        self.postgrest = _PooledPostgrestClient(
+            f"{supabase_url.rstrip('/')}/rest/v1",
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            max_concurrency=max_concurrency,
+        )
+
+    def table(self, table_name: str) -> AsyncRequestBuilder:
+        return self.postgrest.from_(table_name)
+
+    def from_(self, table_name: str) -> AsyncRequestBuilder:
+        return self.table(table_name)
+
+    def rpc(self, fn: str, params: Optional[Dict[Any, Any]] = None, count: Optional[str] = None) -> AsyncRPCFilterRequestBuilder:
+        return self.postgrest.rpc(fn, params or {}, count=count)
+
+    async def aclose(self) -> None:
+        await self.postgrest.aclose()
+
+
+_client: Optional[AsyncSupabaseClient] = None
+
+
+def get_async_supabase_client() -> AsyncSupabaseClient:
+    """
+    Retorna o cliente assíncrono compartilhado, criando-o na primeira chamada.
+    Pode ser usado diretamente ou como dependência do FastAPI.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncSupabaseClient(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_KEY,
+            timeout=settings.SUPABASE_TIMEOUT,
+            max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            max_concurrency=settings.SUPABASE_MAX_CONCURRENCY,
+        )
+        logger.info(
+            f"Cliente Supabase assíncrono criado (timeout={settings.SUPABASE_TIMEOUT}s, "
+            f"conexões={settings.SUPABASE_MAX_CONNECTIONS}, "
+            f"concorrência={settings.SUPABASE_MAX_CONCURRENCY})"
+        )
+    return _client
+
+
+async def close_async_supabase_client() -> None:
+    """Fecha as conexões do cliente assíncrono (usado no shutdown da aplicação)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,242 @@
+# database_mysql.py
+"""
+Conexões com o MySQL do sistema legado (ABA) através do túnel SSH.
+
+Abrir o túnel e a conexão a cada requisição custa o handshake SSH completo
+em todas as rotas de verificação e importação. Este módulo mantém um único
+túnel por processo e um pool pequeno e limitado de conexões por banco, que
+são verificadas (ping) antes de cada uso e recriadas quando caem; se o túnel
+cair, ele é reaberto na próxima conexão.
+
+obter/devolver/conexao bloqueiam (semáforo do pool, túnel SSH, connect). No
+código assíncrono use obter_async/devolver_async/conexao_async, que fazem o
+empréstimo em uma thread: quem espera por uma vaga não trava o event loop, e
+as corrotinas que seguram conexões podem continuar e devolvê-las.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+import pymysql
+import sshtunnel
+from dotenv import load_dotenv
+
+from ..config.config import settings
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SSH_CONFIG = {
+    'host': os.getenv('SSH_HOST'),
+    'user': os.getenv('SSH_USER'),
+    'password': os.getenv('SSH_PASSWORD'),
+    'port': int(os.getenv('SSH_PORT') or 22)
+}
+
+MYSQL_CONFIG = {
+    'remote_host': os.getenv('MYSQL_HOST', '127.0.0.1'), # Host MySQL no servidor remoto
+    'remote_port': int(os.getenv('MYSQL_PORT') or 3306), # Porta MySQL no servidor remoto
+    'user': os.getenv('MYSQL_USER'),
+    'password': os.getenv('MYSQL_PASSWORD'),
+    'charset': 'utf8mb4',
+    'cursorclass': pymysql.cursors.DictCursor
+}
+
+
+class GerenciadorConexoesMySQL:
+    """
+    Mantém o túnel SSH aberto e um pool de conexões MySQL por banco.
+
+    Uso:
+        with gerenciador.conexao("abalarissa_db") as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+    """
+
+    def __init__(self, tamanho_pool: int = 3, timeout: float = 30.0):
+        self.tamanho_pool = tamanho_pool
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._tunnel: Optional[sshtunnel.SSHTunnelForwarder] = None
+        self._livres: Dict[str, queue.LifoQueue] = {}
+        self._vagas: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _garantir_tunel(self) -> int:
+        """Abre (ou reabre) o túnel SSH e retorna a porta local."""
+        with self._lock:
+            if self._tunnel is None or not self._tunnel.is_active:
+                if self._tunnel is not None:
+                    logger.warning("Túnel SSH inativo, reabrindo")
+                    self._parar_tunel()
+                logger.info(f"Abrindo túnel SSH para {SSH_CONFIG['host']}:{SSH_CONFIG['port']} como {SSH_CONFIG['user']}")
+                tunnel = sshtunnel.SSHTunnelForwarder(
+                    (SSH_CONFIG['host'], SSH_CONFIG['port']),
+                    ssh_username=SSH_CONFIG['user'],
+                    ssh_password=SSH_CONFIG['password'],
+                    remote_bind_address=(MYSQL_CONFIG['remote_host'], MYSQL_CONFIG['remote_port']),
+                    local_bind_address=('127.0.0.1', 0),  # porta local livre escolhida pelo sistema
+                    set_keepalive=30.0
+                )
+                tunnel.start()
+                self._tunnel = tunnel
+                logger.info(
+                    f"Túnel SSH estabelecido: localhost:{tunnel.local_bind_port} -> "
+                    f"{MYSQL_CONFIG['remote_host']}:{MYSQL_CONFIG['remote_port']} via {SSH_CONFIG['host']}"
+                )
+            return self._tunnel.local_bind_port
+
+    def _parar_tunel(self):
+        try:
+            self._tunnel.stop()
+        except Exception as e:
+            logger.error(f"Erro ao fechar túnel SSH: {e}")
+        self._tunnel = None
+
+    def _conectar(self, database_name: str):
+        """Cria uma nova conexão; se falhar, reabre o túnel e tenta mais uma vez."""
+        for tentativa in range(2):
+            porta = self._garantir_tunel()
+            try:
+                return pymysql.connect(
+                    host='127.0.0.1',
+                    port=porta,
+                    user=MYSQL_CONFIG['user'],
+                    password=MYSQL_CONFIG['password'],
+                    database=database_name,
+                    charset=MYSQL_CONFIG['charset'],
+                    cursorclass=MYSQL_CONFIG['cursorclass'],
+                    # Sem transação aberta entre usos: cada consulta vê os dados atuais
+                    autocommit=True
+                )
+            except pymysql.err.OperationalError as e:
+                if tentativa:
+                    raise
+                logger.warning(f"Falha ao conectar ao MySQL ({e}), reabrindo túnel SSH")
+                with self._lock:
+                    if self._tunnel is not None:
+                        self._parar_tunel()
+
+    def _pool(self, database_name: str):
+        with self._lock:
+            if database_name not in self._livres:
+                self._livres[database_name] = queue.LifoQueue()
+                self._vagas[database_name] = threading.BoundedSemaphore(self.tamanho_pool)
+            return self._livres[database_name], self._vagas[database_name]
+
+    def obter(self, database_name: str):
+        """
+        Retorna uma conexão do pool do banco (verificada com ping) ou cria uma
+        nova. Bloqueia até `timeout` segundos se todas estiverem em uso.
+        """
+        livres, vagas = self._pool(database_name)
+        if not vagas.acquire(timeout=self.timeout):
+            raise TimeoutError(
+                f"Limite de {self.tamanho_pool} conexões MySQL simultâneas com {database_name} atingido"
+            )
+        try:
+            while True:
+                try:
+                    connection = livres.get_nowait()
+                except queue.Empty:
+                    return self._conectar(database_name)
+                try:
+                    connection.ping(reconnect=False)
+                    return connection
+                except Exception:
+                    logger.info(f"Conexão MySQL ociosa com {database_name} caiu, descartando")
+                    self._fechar(connection)
+        except Exception:
+            vagas.release()
+            raise
+
+    def devolver(self, database_name: str, connection, descartar: bool = False):
+        """Devolve a conexão ao pool (ou a fecha, se descartar ou se já estiver fechada)."""
+        livres, vagas = self._pool(database_name)
+        try:
+            if descartar or not connection.open:
+                self._fechar(connection)
+            else:
+                livres.put(connection)
+        finally:
+            vagas.release()
+
+    @contextmanager
+    def conexao(self, database_name: str):
+        """Empresta uma conexão do pool durante o bloco."""
+        connection = self.obter(database_name)
+        descartar = False
+        try:
+            yield connection
+        except pymysql.err.OperationalError:
+            descartar = True
+            raise
+        finally:
+            self.devolver(database_name, connection, descartar)
+
+    async def obter_async(self, database_name: str):
+        """obter() em uma thread, para uso no código assíncrono."""
+        return await asyncio.to_thread(self.obter, database_name)
+
+    async def devolver_async(self, database_name: str, connection, descartar: bool = False):
+        """devolver() em uma thread, para uso no código assíncrono."""
+        await asyncio.to_thread(self.devolver, database_name, connection, descartar)
+
+    @asynccontextmanager
+    async def conexao_async(self, database_name: str):
+        """Empresta uma conexão do pool durante o bloco (código assíncrono)."""
+        connection = await self.obter_async(database_name)
+        descartar = False
+        try:
+            yield connection
+        except pymysql.err.OperationalError:
+            descartar = True
+            raise
+        finally:
+            await self.devolver_async(database_name, connection, descartar)
+
+    @staticmethod
+    def _fechar(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def fechar(self):
+        """Fecha todas as conexões ociosas e o túnel (shutdown da aplicação)."""
+        with self._lock:
+            for livres in self._livres.values():
+                while True:
+                    try:
+                        self._fechar(livres.get_nowait())
+                    except queue.Empty:
+                        break
+            if self._tunnel is not None:
+                self._parar_tunel()
+                logger.info("Túnel SSH fechado.")
+
+
+_gerenciador: Optional[GerenciadorConexoesMySQL] = None
+
+
+def get_gerenciador_mysql() -> GerenciadorConexoesMySQL:
+    """Retorna o gerenciador de conexões MySQL compartilhado."""
+    global _gerenciador
+    if _gerenciador is None:
+        _gerenciador = GerenciadorConexoesMySQL(
+            tamanho_pool=settings.MYSQL_POOL_SIZE,
+            timeout=settings.MYSQL_POOL_TIMEOUT,
+        )
+    return _gerenciador
+
+
+def close_gerenciador_mysql() -> None:
+    """Fecha o túnel e as conexões do gerenciador compartilhado."""
+    global _gerenciador
+    if _gerenciador is not None:
+        _gerenciador.fechar()
+        _gerenciador = None
@@ -7,6 +7,9 @@ from dotenv import load_dotenv
 from functools import lru_cache
 from datetime import datetime, UTC
 from backend.utils.date_utils import format_date_fields
+from backend.repositories.database_async import AsyncSupabaseClient, get_async_supabase_client
+from backend.repositories.estatisticas_divergencias import invalidar_cache_estatisticas_divergencias
+from backend.repositories.paginacao import aplicar_ordenacao, pagina_cursor
 
 load_dotenv()
 
@@ -33,41 +36,46 @@ SupabaseClient = Client
 
 
 async def list_pacientes(
-    supabase: SupabaseClient = Depends(get_supabase_client),
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
     limit: int = 10,
     offset: int = 0,
     search: Optional[str] = None,
     order_column: str = "nome",
-    order_direction: str = "asc"
+    order_direction: str = "asc",
+    cursor: Optional[str] = None,
+    count: str = "exact"
 ):
-    query = supabase.table('pacientes').select('*').eq('deleted_at', None)
+    # O total vem na mesma requisição (count), sem buscar a tabela inteira
+    query = supabase.table('pacientes').select('*', count=count).is_('deleted_at', 'null')
 
     if search:
         query = query.or_(f"nome.ilike.%{search}%,cpf.ilike.%{search}%")
 
-    # Ordenação
-    if order_direction == "desc":
-        query = query.order(order_column, desc=True)
-    else:
-        query = query.order(order_column)
-
-    # Total de registros
-    total = len(await query.execute())
+    # Ordenação (e filtro do cursor, na paginação keyset)
+    query = aplicar_ordenacao(query, order_column, order_direction, cursor)
 
     # Paginação
-    query = query.range(offset, offset + limit - 1)
+    if cursor is not None:
+        query = query.limit(limit + 1)
+    else:
+        query = query.range(offset, offset + limit - 1)
     response = await query.execute()
 
+    linhas, next_cursor = response.data or [], None
+    if cursor is not None:
+        linhas, next_cursor = pagina_cursor(linhas, limit, order_column)
+
     return {
-        'items': format_response_list(response.data),
-        'total': total,
+        'items': format_response_list(linhas),
+        'total': response.count or 0,
         'limit': limit,
-        'offset': offset
+        'offset': offset,
+        'next_cursor': next_cursor
     }
 
 
 async def get_paciente(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         result = await supabase.table('pacientes').select(
@@ -79,7 +87,7 @@ async def get_paciente(
 
 async def create_paciente(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         result = await supabase.table('pacientes').insert(data).execute()
@@ -91,7 +99,7 @@ async def create_paciente(
 async def update_paciente(
     id: str,
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         result = await supabase.table('pacientes').update(data).eq('id', id).execute()
@@ -101,7 +109,7 @@ async def update_paciente(
 
 
 async def delete_paciente(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove um paciente (soft delete)"""
     try:
         result = await supabase.table("pacientes").update({"deleted_at": "now()"}).eq("id", id).is_("deleted_at", "null").execute()
@@ -111,8 +119,7 @@ async def delete_paciente(
 
 
 # Funções para Planos de Saúde
-async def list_planos_saude(supabase: SupabaseClient = Depends(
-    get_supabase_client),
+async def list_planos_saude(supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
                             limit: int = 10,
                             offset: int = 0,
                             search: Optional[str] = None,
@@ -134,7 +141,7 @@ async def list_planos_saude(supabase: SupabaseClient = Depends(
         else:
             query = query.order(order_column)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": result.data,
@@ -147,11 +154,11 @@ async def list_planos_saude(supabase: SupabaseClient = Depends(
 
 
 async def get_plano_saude(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca um plano de saúde pelo ID"""
     try:
-        result = supabase.table("planos_saude")\
+        result = await supabase.table("planos_saude")\
             .select("*")\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -162,11 +169,11 @@ async def get_plano_saude(
 
 
 async def get_plano_saude_by_codigo(
-    codigo: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    codigo: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca um plano de saúde pelo código da operadora"""
     try:
-        result = supabase.table("planos_saude")\
+        result = await supabase.table("planos_saude")\
             .select("*")\
             .eq("codigo_operadora", codigo)\
             .is_("deleted_at", "null")\
@@ -178,10 +185,10 @@ async def get_plano_saude_by_codigo(
 
 async def create_plano_saude(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria um novo plano de saúde"""
     try:
-        result = supabase.table("planos_saude").insert(data).execute()
+        result = await supabase.table("planos_saude").insert(data).execute()
         return result.data[0]
     except Exception as e:
         raise Exception(f"Erro ao criar plano de saúde: {str(e)}")
@@ -190,11 +197,11 @@ async def create_plano_saude(
 async def update_plano_saude(
     id: str,
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza um plano de saúde existente"""
     try:
-        result = supabase.table("planos_saude")\
+        result = await supabase.table("planos_saude")\
             .update(data)\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -205,10 +212,10 @@ async def update_plano_saude(
 
 
 async def delete_plano_saude(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove um plano de saúde (soft delete)"""
     try:
-        result = supabase.table("planos_saude")\
+        result = await supabase.table("planos_saude")\
             .update({"deleted_at": "now()"})\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -219,8 +226,7 @@ async def delete_plano_saude(
 
 
 # Funções para Carteirinhas
-async def list_carteirinhas(supabase: SupabaseClient = Depends(
-    get_supabase_client),
+async def list_carteirinhas(supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
                             limit: int = 10,
                             offset: int = 0,
                             search: Optional[str] = None,
@@ -239,7 +245,7 @@ async def list_carteirinhas(supabase: SupabaseClient = Depends(
         else:
             query = query.order(order_column)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": result.data,
@@ -252,11 +258,11 @@ async def list_carteirinhas(supabase: SupabaseClient = Depends(
 
 
 async def get_carteirinha(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma carteirinha pelo ID"""
     try:
-        result = supabase.table("carteirinhas")\
+        result = await supabase.table("carteirinhas")\
             .select("*")\
             .eq("id", id)\
             .execute()
@@ -266,7 +272,7 @@ async def get_carteirinha(
 
 
 async def get_carteirinhas_by_paciente(paciente_id: str,
-                                       supabase: SupabaseClient,
+                                       supabase: AsyncSupabaseClient,
                                        limit: int = 10,
                                        offset: int = 0) -> Dict[str, Any]:
     """Busca todas as carteirinhas de um paciente"""
@@ -276,7 +282,7 @@ async def get_carteirinhas_by_paciente(paciente_id: str,
             .eq("paciente_id", paciente_id)\
             .is_("deleted_at", "null")
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
         
         # Processar os resultados para incluir o nome do plano de saúde diretamente no objeto
         items = []
@@ -300,11 +306,11 @@ async def get_carteirinhas_by_paciente(paciente_id: str,
 async def get_carteirinha_by_numero_and_plano(
     numero: str,
     plano_id: str,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma carteirinha pelo número e plano de saúde"""
     try:
-        result = supabase.table("carteirinhas")\
+        result = await supabase.table("carteirinhas")\
             .select("*")\
             .eq("numero_carteirinha", numero)\
             .eq("plano_saude_id", plano_id)\
@@ -317,10 +323,10 @@ async def get_carteirinha_by_numero_and_plano(
 
 async def create_carteirinha(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria uma nova carteirinha"""
     try:
-        result = supabase.table("carteirinhas").insert(data).execute()
+        result = await supabase.table("carteirinhas").insert(data).execute()
         return result.data[0]
     except Exception as e:
         raise Exception(f"Erro ao criar carteirinha: {str(e)}")
@@ -329,11 +335,11 @@ async def create_carteirinha(
 async def update_carteirinha(
     id: str,
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza uma carteirinha existente"""
     try:
-        result = supabase.table("carteirinhas")\
+        result = await supabase.table("carteirinhas")\
             .update(data)\
             .eq("id", id)\
             .execute()
@@ -343,10 +349,10 @@ async def update_carteirinha(
 
 
 async def delete_carteirinha(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove uma carteirinha"""
     try:
-        result = supabase.table("carteirinhas")\
+        result = await supabase.table("carteirinhas")\
             .delete()\
             .eq("id", id)\
             .execute()
@@ -356,7 +362,7 @@ async def delete_carteirinha(
 
 
 # Funções para Guias
-async def list_guias(supabase: SupabaseClient = Depends(get_supabase_client),
+async def list_guias(supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
                      limit: int = 10,
                      offset: int = 0,
                      search: Optional[str] = None,
@@ -376,7 +382,7 @@ async def list_guias(supabase: SupabaseClient = Depends(get_supabase_client),
         else:
             query = query.order(order_column)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": result.data,
@@ -389,11 +395,11 @@ async def list_guias(supabase: SupabaseClient = Depends(get_supabase_client),
 
 
 async def get_guia(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma guia pelo ID"""
     try:
-        result = supabase.table("guias")\
+        result = await supabase.table("guias")\
             .select("*")\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -405,11 +411,11 @@ async def get_guia(
 
 async def get_guias_by_carteirinha(
     carteirinha_id: str,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> List[Dict]:
     """Busca todas as guias de uma carteirinha"""
     try:
-        result = supabase.table("guias")\
+        result = await supabase.table("guias")\
             .select("*")\
             .eq("carteirinha_id", carteirinha_id)\
             .is_("deleted_at", "null")\
@@ -422,11 +428,11 @@ async def get_guias_by_carteirinha(
 async def get_guia_by_numero_and_carteirinha(
     numero: str,
     carteirinha_id: str,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma guia pelo número e carteirinha"""
     try:
-        result = supabase.table("guias")\
+        result = await supabase.table("guias")\
             .select("*")\
             .eq("numero_guia", numero)\
             .eq("carteirinha_id", carteirinha_id)\
@@ -440,10 +446,10 @@ async def get_guia_by_numero_and_carteirinha(
 
 async def create_guia(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria uma nova guia"""
     try:
-        result = supabase.table("guias").insert(data).execute()
+        result = await supabase.table("guias").insert(data).execute()
         return result.data[0]
     except Exception as e:
         raise Exception(f"Erro ao criar guia: {str(e)}")
@@ -452,11 +458,11 @@ async def create_guia(
 async def update_guia(
     id: str,
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza uma guia existente"""
     try:
-        result = supabase.table("guias")\
+        result = await supabase.table("guias")\
             .update(data)\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -467,10 +473,10 @@ async def update_guia(
 
 
 async def delete_guia(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove uma guia (soft delete)"""
     try:
-        result = supabase.table("guias")\
+        result = await supabase.table("guias")\
             .update({"deleted_at": "now()"})\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -482,7 +488,7 @@ async def delete_guia(
 
 # Funções para Auditoria de Execuções
 async def list_auditoria_execucoes(
-        supabase: SupabaseClient = Depends(get_supabase_client),
+        supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
         limit: int = 10,
         offset: int = 0,
         search: Optional[str] = None,
@@ -502,7 +508,7 @@ async def list_auditoria_execucoes(
         else:
             query = query.order(order_column)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": result.data,
@@ -515,11 +521,11 @@ async def list_auditoria_execucoes(
 
 
 async def get_auditoria_execucao(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma auditoria de execução pelo ID"""
     try:
-        result = supabase.table("auditoria_execucoes")\
+        result = await supabase.table("auditoria_execucoes")\
             .select("*")\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -532,11 +538,11 @@ async def get_auditoria_execucao(
 async def get_auditoria_execucao_por_periodo(
     data_inicial: datetime,
     data_final: datetime,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma auditoria de execução por período"""
     try:
-        result = supabase.table("auditoria_execucoes")\
+        result = await supabase.table("auditoria_execucoes")\
             .select("*")\
             .gte("data_execucao", data_inicial.isoformat())\
             .lte("data_execucao", data_final.isoformat())\
@@ -550,10 +556,10 @@ async def get_auditoria_execucao_por_periodo(
 
 async def create_auditoria_execucao(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria uma nova auditoria de execução"""
     try:
-        result = supabase.table("auditoria_execucoes").insert(data).execute()
+        result = await supabase.table("auditoria_execucoes").insert(data).execute()
         return result.data[0]
     except Exception as e:
         raise Exception(f"Erro ao criar auditoria de execução: {str(e)}")
@@ -562,11 +568,11 @@ async def create_auditoria_execucao(
 async def update_auditoria_execucao(
     id: str,
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza uma auditoria de execução existente"""
     try:
-        result = supabase.table("auditoria_execucoes")\
+        result = await supabase.table("auditoria_execucoes")\
             .update(data)\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -577,10 +583,10 @@ async def update_auditoria_execucao(
 
 
 async def delete_auditoria_execucao(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove uma auditoria de execução (soft delete)"""
     try:
-        result = supabase.table("auditoria_execucoes")\
+        result = await supabase.table("auditoria_execucoes")\
             .update({"deleted_at": "now()"})\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -591,8 +597,7 @@ async def delete_auditoria_execucao(
 
 
 # Funções para Divergências
-async def list_divergencias(supabase: SupabaseClient = Depends(
-    get_supabase_client),
+async def list_divergencias(supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
                             limit: int = 10,
                             offset: int = 0,
                             search: Optional[str] = None,
@@ -621,7 +626,7 @@ async def list_divergencias(supabase: SupabaseClient = Depends(
         else:
             query = query.order(order_column)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": result.data,
@@ -634,11 +639,11 @@ async def list_divergencias(supabase: SupabaseClient = Depends(
 
 
 async def get_divergencia(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma divergência pelo ID"""
     try:
-        result = supabase.table("divergencias")\
+        result = await supabase.table("divergencias")\
             .select("*")\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -650,10 +655,11 @@ async def get_divergencia(
 
 async def create_divergencia(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria uma nova divergência"""
     try:
-        result = supabase.table("divergencias").insert(data).execute()
+        result = await supabase.table("divergencias").insert(data).execute()
+        invalidar_cache_estatisticas_divergencias()
         return result.data[0]
     except Exception as e:
         raise Exception(f"Erro ao criar divergência: {str(e)}")
@@ -662,29 +668,31 @@ async def create_divergencia(
 async def update_divergencia(
     id: str,
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza uma divergência existente"""
     try:
-        result = supabase.table("divergencias")\
+        result = await supabase.table("divergencias")\
             .update(data)\
             .eq("id", id)\
             .is_("deleted_at", "null")\
             .execute()
+        invalidar_cache_estatisticas_divergencias()
         return result.data[0] if result.data else None
     except Exception as e:
         raise Exception(f"Erro ao atualizar divergência: {str(e)}")
 
 
 async def delete_divergencia(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove uma divergência (soft delete)"""
     try:
-        result = supabase.table("divergencias")\
+        result = await supabase.table("divergencias")\
             .update({"deleted_at": "now()"})\
             .eq("id", id)\
             .is_("deleted_at", "null")\
             .execute()
+        invalidar_cache_estatisticas_divergencias()
         return bool(result.data)
     except Exception as e:
         raise Exception(f"Erro ao deletar divergência: {str(e)}")
@@ -693,7 +701,7 @@ async def delete_divergencia(
 async def resolver_divergencia(
     id: str,
     user_id: str,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Marca uma divergência como resolvida"""
     try:
@@ -704,22 +712,23 @@ async def resolver_divergencia(
             "updated_at": datetime.now(UTC).isoformat(),
             "updated_by": user_id
         }
-        result = supabase.table("divergencias")\
+        result = await supabase.table("divergencias")\
             .update(data)\
             .eq("id", id)\
             .is_("deleted_at", "null")\
             .execute()
+        invalidar_cache_estatisticas_divergencias()
         return result.data[0] if result.data else None
     except Exception as e:
         raise Exception(f"Erro ao resolver divergência: {str(e)}")
 
 
 async def incrementar_tentativas_divergencia(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Incrementa o contador de tentativas de resolução"""
     try:
-        result = supabase.table("divergencias")\
+        result = await supabase.table("divergencias")\
             .rpc("incrementar_tentativas", {"divergencia_id": id})\
             .execute()
         return result.data[0] if result.data else None
@@ -728,7 +737,7 @@ async def incrementar_tentativas_divergencia(
 
 
 # Funções para Fichas
-async def list_fichas(supabase: SupabaseClient = Depends(get_supabase_client),
+async def list_fichas(supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
                       limit: int = 10,
                       offset: int = 0,
                       search: Optional[str] = None,
@@ -748,7 +757,7 @@ async def list_fichas(supabase: SupabaseClient = Depends(get_supabase_client),
         else:
             query = query.order(order_column)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": result.data,
@@ -761,11 +770,11 @@ async def list_fichas(supabase: SupabaseClient = Depends(get_supabase_client),
 
 
 async def get_ficha(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma ficha pelo ID"""
     try:
-        result = supabase.table("fichas")\
+        result = await supabase.table("fichas")\
             .select("*")\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -776,11 +785,11 @@ async def get_ficha(
 
 
 async def get_ficha_by_codigo(
-    codigo: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    codigo: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma ficha pelo código"""
     try:
-        result = supabase.table("fichas")\
+        result = await supabase.table("fichas")\
             .select("*")\
             .eq("codigo_ficha", codigo)\
             .is_("deleted_at", "null")\
@@ -792,10 +801,10 @@ async def get_ficha_by_codigo(
 
 async def create_ficha(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria uma nova ficha"""
     try:
-        result = supabase.table("fichas").insert(data).execute()
+        result = await supabase.table("fichas").insert(data).execute()
         return result.data[0]
     except Exception as e:
         raise Exception(f"Erro ao criar ficha: {str(e)}")
@@ -804,11 +813,11 @@ async def create_ficha(
 async def update_ficha(
     id: str,
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza uma ficha existente"""
     try:
-        result = supabase.table("fichas")\
+        result = await supabase.table("fichas")\
             .update(data)\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -819,10 +828,10 @@ async def update_ficha(
 
 
 async def delete_ficha(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove uma ficha (soft delete)"""
     try:
-        result = supabase.table("fichas")\
+        result = await supabase.table("fichas")\
             .update({"deleted_at": "now()"})\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -834,7 +843,7 @@ async def delete_ficha(
 
 # Funções para Sessões
 async def list_sessoes(
-    supabase: SupabaseClient = Depends(get_supabase_client),
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
     limit: int = 10,
     offset: int = 0,
     search: Optional[str] = None,
@@ -854,7 +863,7 @@ async def list_sessoes(
         else:
             query = query.order(order_column)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": format_response_list(result.data),
@@ -867,11 +876,11 @@ async def list_sessoes(
 
 
 async def get_sessao(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma sessão pelo ID"""
     try:
-        result = supabase.table("sessoes")\
+        result = await supabase.table("sessoes")\
             .select("*")\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -883,11 +892,11 @@ async def get_sessao(
 
 async def get_sessoes_by_ficha_presenca(
     ficha_presenca_id: str,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> List[Dict]:
     """Busca todas as sessões de uma ficha de presença"""
     try:
-        result = supabase.table("sessoes")\
+        result = await supabase.table("sessoes")\
             .select("*")\
             .eq("ficha_id", ficha_presenca_id)\
             .is_("deleted_at", "null")\
@@ -900,7 +909,7 @@ async def get_sessoes_by_ficha_presenca(
 
 async def create_sessao(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria uma nova sessão"""
     try:
         result = await supabase.table('sessoes').insert(data).execute()
@@ -912,7 +921,7 @@ async def create_sessao(
 async def update_sessao(
     id: str,
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza uma sessão existente"""
     try:
@@ -923,10 +932,10 @@ async def update_sessao(
 
 
 async def delete_sessao(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove uma sessão (soft delete)"""
     try:
-        result = supabase.table("sessoes")\
+        result = await supabase.table("sessoes")\
             .update({"deleted_at": "now()"})\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -937,11 +946,11 @@ async def delete_sessao(
 
 
 async def get_sessoes_by_paciente(
-    paciente_id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    paciente_id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> List[Dict]:
     """Busca todas as sessões de um paciente"""
     try:
-        result = supabase.table("sessoes")\
+        result = await supabase.table("sessoes")\
             .select("*")\
             .eq("paciente_id", paciente_id)\
             .is_("deleted_at", "null")\
@@ -952,8 +961,7 @@ async def get_sessoes_by_paciente(
 
 
 # Funções para Procedimentos
-async def list_procedimentos(supabase: SupabaseClient = Depends(
-    get_supabase_client),
+async def list_procedimentos(supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
                              limit: int = 10,
                              offset: int = 0,
                              search: Optional[str] = None,
@@ -983,7 +991,7 @@ async def list_procedimentos(supabase: SupabaseClient = Depends(
         else:
             query = query.order(order_column)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": format_response_list(result.data),
@@ -996,11 +1004,11 @@ async def list_procedimentos(supabase: SupabaseClient = Depends(
 
 
 async def get_procedimento(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca um procedimento pelo ID"""
     try:
-        result = supabase.table("procedimentos")\
+        result = await supabase.table("procedimentos")\
             .select("*")\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -1011,11 +1019,11 @@ async def get_procedimento(
 
 
 async def get_procedimento_by_codigo(
-    codigo: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    codigo: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca um procedimento pelo código"""
     try:
-        result = supabase.table("procedimentos")\
+        result = await supabase.table("procedimentos")\
             .select("*")\
             .eq("codigo", codigo)\
             .is_("deleted_at", "null")\
@@ -1027,7 +1035,7 @@ async def get_procedimento_by_codigo(
 
 async def create_procedimento(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria um novo procedimento"""
     try:
         # Calcula o valor total se não fornecido
@@ -1050,7 +1058,7 @@ async def create_procedimento(
 async def update_procedimento(
     id: str,
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza um procedimento existente"""
     try:
@@ -1082,10 +1090,10 @@ async def update_procedimento(
 
 
 async def delete_procedimento(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove um procedimento (soft delete)"""
     try:
-        result = supabase.table("procedimentos")\
+        result = await supabase.table("procedimentos")\
             .update({"deleted_at": "now()"})\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -1098,7 +1106,7 @@ async def delete_procedimento(
 async def inativar_procedimento(
     id: str,
     user_id: str,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Inativa um procedimento"""
     try:
@@ -1107,7 +1115,7 @@ async def inativar_procedimento(
             "updated_at": datetime.now(UTC).isoformat(),
             "updated_by": user_id
         }
-        result = supabase.table("procedimentos")\
+        result = await supabase.table("procedimentos")\
             .update(data)\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -1118,11 +1126,11 @@ async def inativar_procedimento(
 
 
 async def get_procedimentos_by_tipo(
-    tipo: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    tipo: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> List[Dict]:
     """Busca procedimentos por tipo"""
     try:
-        result = supabase.table("procedimentos")\
+        result = await supabase.table("procedimentos")\
             .select("*")\
             .eq("tipo", tipo)\
             .is_("deleted_at", "null")\
@@ -1132,11 +1140,10 @@ async def get_procedimentos_by_tipo(
         raise Exception(f"Erro ao buscar procedimentos por tipo: {str(e)}")
 
 
-async def get_procedimentos_ativos(supabase: SupabaseClient = Depends(
-    get_supabase_client)) -> List[Dict]:
+async def get_procedimentos_ativos(supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> List[Dict]:
     """Busca todos os procedimentos ativos"""
     try:
-        result = supabase.table("procedimentos")\
+        result = await supabase.table("procedimentos")\
             .select("*")\
             .eq("ativo", True)\
             .is_("deleted_at", "null")\
@@ -1147,17 +1154,18 @@ async def get_procedimentos_ativos(supabase: SupabaseClient = Depends(
 
 
 # Funções para Execuções
-async def list_execucoes(supabase: SupabaseClient = Depends(
-    get_supabase_client),
+async def list_execucoes(supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
                          limit: int = 10,
                          offset: int = 0,
                          search: Optional[str] = None,
                          order_column: str = "data_execucao",
-                         order_direction: str = "desc") -> Dict[str, Any]:
-    """Lista execuções com suporte a paginação, busca e ordenação"""
+                         order_direction: str = "desc",
+                         cursor: Optional[str] = None,
+                         count: str = "exact") -> Dict[str, Any]:
+    """Lista execuções com suporte a paginação (offset ou cursor), busca e ordenação"""
     try:
         query = supabase.table("execucoes")\
-            .select("*", count="exact")\
+            .select("*", count=count)\
             .is_("deleted_at", "null")
 
         if search:
@@ -1169,29 +1177,32 @@ async def list_execucoes(supabase: SupabaseClient = Depends(
                               f"conselho_profissional.ilike.%{search}%," 
                               f"numero_conselho.ilike.%{search}%")
 
-        if order_direction == "desc":
-            query = query.order(order_column, desc=True)
-        else:
-            query = query.order(order_column)
+        query = aplicar_ordenacao(query, order_column, order_direction, cursor)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        if cursor is not None:
+            result = await query.limit(limit + 1).execute()
+            linhas, next_cursor = pagina_cursor(result.data or [], limit, order_column)
+        else:
+            result = await query.range(offset, offset + limit - 1).execute()
+            linhas, next_cursor = result.data, None
 
         return {
-            "items": format_response_list(result.data),
+            "items": format_response_list(linhas),
             "total": result.count,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         raise Exception(f"Erro ao listar execuções: {str(e)}")
 
 
 async def get_execucao(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Busca uma execução pelo ID"""
     try:
-        result = supabase.table("execucoes")\
+        result = await supabase.table("execucoes")\
             .select("*")\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -1202,11 +1213,11 @@ async def get_execucao(
 
 
 async def get_execucoes_by_guia(
-    guia_id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    guia_id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> List[Dict]:
     """Busca todas as execuções de uma guia"""
     try:
-        result = supabase.table("execucoes")\
+        result = await supabase.table("execucoes")\
             .select("*")\
             .eq("guia_id", guia_id)\
             .is_("deleted_at", "null")\
@@ -1217,11 +1228,11 @@ async def get_execucoes_by_guia(
 
 
 async def get_execucoes_by_sessao(
-    sessao_id: str, supabase: SupabaseClient = Depends(get_supabase_client)
+    sessao_id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> List[Dict]:
     """Busca todas as execuções de uma sessão"""
     try:
-        result = supabase.table("execucoes")\
+        result = await supabase.table("execucoes")\
             .select("*")\
             .eq("sessao_id", sessao_id)\
             .is_("deleted_at", "null")\
@@ -1233,10 +1244,10 @@ async def get_execucoes_by_sessao(
 
 async def create_execucao(
     data: Dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria uma nova execução"""
     try:
-        result = supabase.table("execucoes").insert(data).execute()
+        result = await supabase.table("execucoes").insert(data).execute()
         return result.data[0]
     except Exception as e:
         raise Exception(f"Erro ao criar execução: {str(e)}")
@@ -1246,14 +1257,14 @@ async def update_execucao(
     id: str,
     data: Dict,
     user_id: str,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza uma execução existente"""
     try:
         data["updated_at"] = datetime.now(UTC).isoformat()
         data["updated_by"] = user_id
 
-        result = supabase.table("execucoes")\
+        result = await supabase.table("execucoes")\
             .update(data)\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -1264,10 +1275,10 @@ async def update_execucao(
 
 
 async def delete_execucao(
-    id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+    id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove uma execução (soft delete)"""
     try:
-        result = supabase.table("execucoes")\
+        result = await supabase.table("execucoes")\
             .update({"deleted_at": datetime.now(UTC).isoformat()})\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -1281,7 +1292,7 @@ async def verificar_biometria_execucao(
     id: str,
     status_biometria: str,
     user_id: str,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ) -> Optional[Dict]:
     """Atualiza o status de verificação biométrica de uma execução"""
     try:
@@ -1290,7 +1301,7 @@ async def verificar_biometria_execucao(
             "updated_at": datetime.now(UTC).isoformat(),
             "updated_by": user_id
         }
-        result = supabase.table("execucoes")\
+        result = await supabase.table("execucoes")\
             .update(data)\
             .eq("id", id)\
             .is_("deleted_at", "null")\
@@ -1301,7 +1312,7 @@ async def verificar_biometria_execucao(
 
 
 async def get_guias_by_paciente(paciente_id: str,
-                                supabase: SupabaseClient,
+                                supabase: AsyncSupabaseClient,
                                 limit: int = 10,
                                 offset: int = 0) -> Dict[str, Any]:
     """Busca todas as guias de um paciente"""
@@ -1311,7 +1322,7 @@ async def get_guias_by_paciente(paciente_id: str,
             .eq("paciente_id", paciente_id)\
             .is_("deleted_at", "null")
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": result.data,
@@ -1328,7 +1339,7 @@ async def get_fichas_by_paciente(carteirinha: str,
                                  offset: int = 0,
                                  order_column: str = "data_atendimento",
                                  order_direction: str = "desc",
-                                 supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+                                 supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     try:
         query = supabase.from_("fichas")\
             .select("*, guias!fichas_guia_id_fkey(*)")\
@@ -1341,8 +1352,8 @@ async def get_fichas_by_paciente(carteirinha: str,
             query = query.order(order_column)
 
         query = query.range(offset, offset + limit - 1)
-        result = query.execute()
-        count_result = supabase.from_("fichas").select("id", count="exact").is_("deleted_at", "null").execute()
+        result = await query.execute()
+        count_result = await supabase.from_("fichas").select("id", count="exact").is_("deleted_at", "null").execute()
         
         # Formata os dados antes de retornar
         items = []
@@ -1369,7 +1380,7 @@ async def get_fichas_by_paciente(carteirinha: str,
         raise
 
 
-async def list_storage(supabase: SupabaseClient = Depends(get_supabase_client),
+async def list_storage(supabase: AsyncSupabaseClient = Depends(get_async_supabase_client),
                       limit: int = 10,
                       offset: int = 0,
                       search: Optional[str] = None,
@@ -1389,7 +1400,7 @@ async def list_storage(supabase: SupabaseClient = Depends(get_supabase_client),
         else:
             query = query.order(order_column)
 
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
 
         return {
             "items": result.data,
@@ -1400,19 +1411,19 @@ async def list_storage(supabase: SupabaseClient = Depends(get_supabase_client),
     except Exception as e:
         raise Exception(f"Erro ao listar arquivos: {str(e)}")
 
-async def get_storage(id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> Optional[Dict]:
+async def get_storage(id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Optional[Dict]:
     """Busca um arquivo pelo ID"""
     try:
-        result = supabase.table("storage").select("*").eq("id", id).is_("deleted_at", "null").execute()
+        result = await supabase.table("storage").select("*").eq("id", id).is_("deleted_at", "null").execute()
         return result.data[0] if result.data else None
     except Exception as e:
         raise Exception(f"Erro ao buscar arquivo: {str(e)}")
 
 async def get_storage_by_reference(reference_id: str, reference_type: str, 
-                                 supabase: SupabaseClient = Depends(get_supabase_client)) -> List[Dict]:
+                                 supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> List[Dict]:
     """Busca arquivos por referência"""
     try:
-        result = supabase.table("storage").select("*")\
+        result = await supabase.table("storage").select("*")\
             .eq("referencia_id", reference_id)\
             .eq("tipo_referencia", reference_type)\
             .is_("deleted_at", "null").execute()
@@ -1420,26 +1431,26 @@ async def get_storage_by_reference(reference_id: str, reference_type: str,
     except Exception as e:
         raise Exception(f"Erro ao buscar arquivos por referência: {str(e)}")
 
-async def create_storage(data: Dict, supabase: SupabaseClient = Depends(get_supabase_client)) -> Dict:
+async def create_storage(data: Dict, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Dict:
     """Cria um novo registro de storage"""
     try:
-        result = supabase.table("storage").insert(data).execute()
+        result = await supabase.table("storage").insert(data).execute()
         return result.data[0] if result.data else None
     except Exception as e:
         raise Exception(f"Erro ao criar registro de storage: {str(e)}")
 
-async def update_storage(id: str, data: Dict, supabase: SupabaseClient = Depends(get_supabase_client)) -> Optional[Dict]:
+async def update_storage(id: str, data: Dict, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> Optional[Dict]:
     """Atualiza um registro de storage existente"""
     try:
-        result = supabase.table("storage").update(data).eq("id", id).is_("deleted_at", "null").execute()
+        result = await supabase.table("storage").update(data).eq("id", id).is_("deleted_at", "null").execute()
         return result.data[0] if result.data else None
     except Exception as e:
         raise Exception(f"Erro ao atualizar registro de storage: {str(e)}")
 
-async def delete_storage(id: str, supabase: SupabaseClient = Depends(get_supabase_client)) -> bool:
+async def delete_storage(id: str, supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> bool:
     """Remove um registro de storage (soft delete)"""
     try:
-        result = supabase.table("storage").update({"deleted_at": "now()"}).eq("id", id).is_("deleted_at", "null").execute()
+        result = await supabase.table("storage").update({"deleted_at": "now()"}).eq("id", id).is_("deleted_at", "null").execute()
         return bool(result.data)
     except Exception as e:
         raise Exception(f"Erro ao remover registro de storage: {str(e)}")
@@ -1,6 +1,6 @@
 from uuid import UUID
 from typing import Optional, Dict, List, Any
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 from ..models.divergencia import DivergenciaCreate, DivergenciaUpdate, TipoDivergencia, StatusDivergencia
 import logging
 from datetime import datetime, timezone, date
@@ -8,12 +8,17 @@ from ..utils.date_utils import format_date_fields, DATE_FIELDS, formatar_data
 import traceback
 from math import ceil
 from fastapi import HTTPException
+from .estatisticas_divergencias import (
+    estatisticas_vazias,
+    invalidar_cache_estatisticas_divergencias,
+    obter_estatisticas_divergencias,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 class DivergenciaRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "divergencias"
 
@@ -75,14 +80,14 @@ class DivergenciaRepository:
                 count_query = count_query.eq("prioridade", prioridade)
             
             # Executar query de contagem
-            count_result = count_query.execute()
+            count_result = await count_query.execute()
             total = count_result.count if hasattr(count_result, 'count') else 0
             
             # Aplicar paginação na query principal
             query = query.range(offset, offset + limit - 1)
             
             # Executar query principal
-            result = query.execute()
+            result = await query.execute()
             items = result.data if result.data else []
             
             # Formatar datas e ajustar campos nos itens
@@ -130,13 +135,13 @@ class DivergenciaRepository:
             )
 
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
         if result.data:
             return format_date_fields(result.data[0], DATE_FIELDS)
         return None
 
     async def get_by_guia(self, guia_id: UUID) -> List[Dict]:
-        result = self.db.from_(self.table).select("*")\
+        result = await self.db.from_(self.table).select("*")\
             .eq("guia_id", str(guia_id))\
             .is_("deleted_at", "null")\
             .execute()
@@ -153,7 +158,8 @@ class DivergenciaRepository:
             # Garante que data_identificacao seja apenas a data, sem componente de tempo
             dados["data_identificacao"] = date.today().isoformat()
             
-            result = self.db.from_(self.table).insert(dados).execute()
+            result = await self.db.from_(self.table).insert(dados).execute()
+            invalidar_cache_estatisticas_divergencias()
             return result.data[0] if result.data else None
         except Exception as e:
             logger.error(f"Erro ao criar divergência: {str(e)}")
@@ -165,7 +171,8 @@ class DivergenciaRepository:
     async def update(self, divergencia_id: str, divergencia: DivergenciaUpdate) -> Dict:
         """Atualiza uma divergência"""
         try:
-            result = self.db.from_(self.table).update(divergencia.model_dump()).eq("id", divergencia_id).execute()
+            result = await self.db.from_(self.table).update(divergencia.model_dump()).eq("id", divergencia_id).execute()
+            invalidar_cache_estatisticas_divergencias()
             if not result.data:
                 raise HTTPException(status_code=404, detail="Divergência não encontrada")
             return result.data[0]
@@ -181,7 +188,8 @@ class DivergenciaRepository:
     async def delete(self, divergencia_id: str) -> bool:
         """Deleta uma divergência"""
         try:
-            result = self.db.from_(self.table).delete().eq("id", divergencia_id).execute()
+            result = await self.db.from_(self.table).delete().eq("id", divergencia_id).execute()
+            invalidar_cache_estatisticas_divergencias()
             return bool(result.data)
         except Exception as e:
             logger.error(f"Erro ao deletar divergência: {str(e)}")
@@ -200,10 +208,11 @@ class DivergenciaRepository:
                 "updated_at": datetime.now().isoformat()
             }
             
-            result = self.db.from_(self.table).update(update_data)\
+            result = await self.db.from_(self.table).update(update_data)\
                 .eq("id", str(id))\
                 .is_("deleted_at", "null")\
                 .execute()
+            invalidar_cache_estatisticas_divergencias()
             
             if result.data:
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -214,7 +223,7 @@ class DivergenciaRepository:
 
     async def incrementar_tentativas(self, id: UUID) -> Optional[Dict]:
         try:
-            result = self.db.rpc(
+            result = await self.db.rpc(
                 "increment_divergencia_tentativas",
                 {"divergencia_id": str(id)}
             ).execute()
@@ -237,7 +246,8 @@ class DivergenciaRepository:
                 "usuario_atualizacao_id": usuario_id
             }
             
-            result = self.db.from_(self.table).update(dados).eq("id", divergencia_id).execute()
+            result = await self.db.from_(self.table).update(dados).eq("id", divergencia_id).execute()
+            invalidar_cache_estatisticas_divergencias()
             return bool(result.data)
         except Exception as e:
             logger.error(f"Erro ao atualizar status da divergência: {str(e)}")
@@ -251,7 +261,8 @@ class DivergenciaRepository:
         Limpa todas as divergências
         """
         try:
-            result = self.db.from_(self.table).delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
+            result = await self.db.from_(self.table).delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
+            invalidar_cache_estatisticas_divergencias()
             return True
         except Exception as e:
             logger.error(f"Erro ao limpar divergências: {str(e)}")
@@ -265,42 +276,7 @@ class DivergenciaRepository:
             Dict: Estatísticas das divergências
         """
         try:
-            # Buscar contagem total
-            total_result = self.db.from_(self.table).select("id", count="exact").execute()
-            total = total_result.count if hasattr(total_result, 'count') else len(total_result.data)
-            
-            # Buscar contagem por tipo
-            tipos_result = self.db.from_(self.table).select("tipo, count(*)").group("tipo").execute()
-            por_tipo = {
-                item["tipo"]: item["count"]
-                for item in tipos_result.data
-            } if tipos_result.data else {}
-            
-            # Buscar contagem por status
-            status_result = self.db.from_(self.table).select("status, count(*)").group("status").execute()
-            por_status = {
-                item["status"]: item["count"]
-                for item in status_result.data
-            } if status_result.data else {}
-            
-            # Buscar contagem por prioridade
-            prioridade_result = self.db.from_(self.table).select("prioridade, count(*)").group("prioridade").execute()
-            por_prioridade = {
-                item["prioridade"]: item["count"]
-                for item in prioridade_result.data
-            } if prioridade_result.data else {}
-            
-            return {
-                "total": total,
-                "por_tipo": por_tipo,
-                "por_status": por_status,
-                "por_prioridade": por_prioridade
-            }
+            return await obter_estatisticas_divergencias(self.db)
         except Exception as e:
             logger.error(f"Erro ao obter estatísticas: {str(e)}")
-            return {
-                "total": 0,
-                "por_tipo": {},
-                "por_status": {},
-                "por_prioridade": {}
-            } 
\ No newline at end of file
+            return estatisticas_vazias()
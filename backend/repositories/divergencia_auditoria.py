@@ -1,9 +1,13 @@
 from uuid import UUID
 from typing import Optional, Dict, List
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 import logging
 from datetime import datetime
 from ..utils.date_utils import format_date_fields, DATE_FIELDS, formatar_data
+from .estatisticas_divergencias import (
+    invalidar_cache_estatisticas_divergencias,
+    obter_estatisticas_divergencias,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -12,7 +16,7 @@ logger.setLevel(logging.DEBUG)
 DIVERGENCIA_DATE_FIELDS = DATE_FIELDS + ['data_execucao', 'data_atendimento']
 
 class DivergenciaAuditoriaRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "divergencias"
 
@@ -41,12 +45,12 @@ class DivergenciaAuditoriaRepository:
                 query = query.lte("data_execucao", data_fim)
 
             # Primeiro faz a contagem
-            count_result = query.execute()
+            count_result = await query.execute()
             total = len(count_result.data) if count_result.data else 0
 
             # Depois aplica a paginação
             query = query.range(offset, offset + per_page - 1)
-            result = query.execute()
+            result = await query.execute()
 
             items = [format_date_fields(item, DIVERGENCIA_DATE_FIELDS) for item in (result.data or [])]
 
@@ -64,7 +68,8 @@ class DivergenciaAuditoriaRepository:
     async def create(self, divergencia: Dict) -> Dict:
         """Registra uma nova divergência"""
         try:
-            result = self.db.from_(self.table).insert(divergencia).execute()
+            result = await self.db.from_(self.table).insert(divergencia).execute()
+            invalidar_cache_estatisticas_divergencias()
             if result.data:
                 return format_date_fields(result.data[0], DIVERGENCIA_DATE_FIELDS)
             return None
@@ -80,10 +85,11 @@ class DivergenciaAuditoriaRepository:
                 "updated_at": datetime.now().isoformat(),
                 "updated_by": user_id
             }
-            result = self.db.from_(self.table)\
+            result = await self.db.from_(self.table)\
                 .update(data)\
                 .eq("id", id)\
                 .execute()
+            invalidar_cache_estatisticas_divergencias()
             
             if result.data:
                 return format_date_fields(result.data[0], DIVERGENCIA_DATE_FIELDS)
@@ -95,10 +101,11 @@ class DivergenciaAuditoriaRepository:
     async def delete_all(self) -> bool:
         """Limpa a tabela de divergências"""
         try:
-            result = self.db.from_(self.table)\
+            result = await self.db.from_(self.table)\
                 .update({"deleted_at": datetime.now().isoformat()})\
                 .is_("deleted_at", "null")\
                 .execute()
+            invalidar_cache_estatisticas_divergencias()
             return True
         except Exception as e:
             logger.error(f"Erro ao limpar divergências: {str(e)}")
@@ -109,7 +116,7 @@ class DivergenciaAuditoriaRepository:
         try:
             for divergencia in divergencias:
                 if divergencia.get("ficha_id"):
-                    self.db.from_(self.table)\
+                    await self.db.from_(self.table)\
                         .update({
                             "ficha_id": divergencia["ficha_id"],
                             "data_atendimento": divergencia.get("data_atendimento")
@@ -124,42 +131,7 @@ class DivergenciaAuditoriaRepository:
     async def get_statistics(self) -> Dict:
         """Obtém estatísticas das divergências"""
         try:
-            # Buscar contagem por tipo e status
-            result = self.db.from_(self.table)\
-                .select("tipo, status, count")\
-                .group("tipo, status")\
-                .execute()
-            
-            # Inicializar contadores
-            por_tipo = {}
-            por_status = {"pendente": 0, "em_analise": 0, "resolvida": 0, "cancelada": 0}
-            
-            # Processar resultados
-            for row in result.data:
-                tipo = row.get("tipo")
-                status = row.get("status", "pendente")
-                count = row.get("count", 0)
-                
-                # Contagem por tipo
-                if tipo:
-                    por_tipo[tipo] = por_tipo.get(tipo, 0) + int(count)
-                
-                # Contagem por status
-                if status in por_status:
-                    por_status[status] += int(count)
-            
-            # Buscar contagem total
-            total_result = self.db.from_(self.table)\
-                .select("id", count="exact")\
-                .execute()
-            
-            total = total_result.count if hasattr(total_result, 'count') else len(total_result.data)
-            
-            return {
-                "total": total,
-                "por_tipo": por_tipo,
-                "por_status": por_status
-            }
+            return await obter_estatisticas_divergencias(self.db)
         except Exception as e:
             logger.error(f"Erro ao calcular estatísticas: {str(e)}")
             raise
@@ -0,0 +1,81 @@
+"""
+Estatísticas das divergências para os cards do dashboard.
+
+As contagens por tipo, prioridade e status vêm da função SQL
+estatisticas_divergencias (migração 26), que agrupa a tabela no banco e
+devolve um único JSON pequeno, qualquer que seja o tamanho da tabela.
+
+O resultado fica em cache no processo por TTL_CACHE_ESTATISTICAS segundos.
+Quem grava divergências ou altera o status delas chama
+invalidar_cache_estatisticas_divergencias(), para que os cards não mostrem
+números antigos depois de uma auditoria ou de uma resolução.
+"""
+import asyncio
+import copy
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from .database_async import AsyncSupabaseClient
+
+logger = logging.getLogger(__name__)
+
+TTL_CACHE_ESTATISTICAS = 30  # segundos
+
+PRIORIDADES_PADRAO = ("ALTA", "MEDIA")
+STATUS_PADRAO = ("pendente", "em_analise", "resolvida", "cancelada")
+
+_cache: Optional[Tuple[float, Dict]] = None
+# Incrementada a cada invalidação: um cálculo iniciado antes dela não é guardado
+_versao = 0
+_lock = asyncio.Lock()
+
+
+def invalidar_cache_estatisticas_divergencias() -> None:
+    """Descarta as estatísticas em cache (chamar após gravar divergências)."""
+    global _cache, _versao
+    _cache = None
+    _versao += 1
+
+
+def estatisticas_vazias() -> Dict:
+    return {
+        "total": 0,
+        "por_tipo": {},
+        "por_prioridade": {prioridade: 0 for prioridade in PRIORIDADES_PADRAO},
+        "por_status": {status: 0 for status in STATUS_PADRAO},
+    }
+
+
+def _formatar(dados: Optional[Dict]) -> Dict:
+    """Mantém o formato de sempre: prioridades e status padrão presentes, mesmo com zero."""
+    estatisticas = estatisticas_vazias()
+    dados = dados or {}
+    estatisticas["total"] = int(dados.get("total") or 0)
+    estatisticas["por_tipo"] = {tipo: int(qtd) for tipo, qtd in (dados.get("por_tipo") or {}).items()}
+    for campo in ("por_prioridade", "por_status"):
+        estatisticas[campo].update({chave: int(qtd) for chave, qtd in (dados.get(campo) or {}).items()})
+    return estatisticas
+
+
+async def obter_estatisticas_divergencias(db: AsyncSupabaseClient) -> Dict:
+    """
+    Retorna total, por_tipo, por_prioridade e por_status das divergências,
+    usando o cache enquanto ele for válido.
+    """
+    global _cache
+
+    if _cache and time.monotonic() - _cache[0] < TTL_CACHE_ESTATISTICAS:
+        return copy.deepcopy(_cache[1])
+
+    async with _lock:
+        # Outra requisição pode ter calculado enquanto esta esperava o lock
+        if _cache and time.monotonic() - _cache[0] < TTL_CACHE_ESTATISTICAS:
+            return copy.deepcopy(_cache[1])
+
+        versao = _versao
+        response = await db.rpc("estatisticas_divergencias", {}).execute()
+        estatisticas = _formatar(response.data)
+        if versao == _versao:
+            _cache = (time.monotonic(), estatisticas)
+        return copy.deepcopy(estatisticas)
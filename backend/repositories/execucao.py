@@ -1,17 +1,24 @@
 from uuid import UUID
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from fastapi import HTTPException
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 import logging
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from ..utils.date_utils import format_date_fields, DATE_FIELDS
 from ..models.execucao import ExecucaoCreate, ExecucaoUpdate
+from .paginacao import aplicar_ordenacao, pagina_cursor
+from .views_execucoes import (
+    DIAS_VIEW_RECENTES,
+    VIEW_EXECUCOES,
+    VIEW_EXECUCOES_RECENTES,
+    obter_atualizacao_views,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 class ExecucaoRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "execucoes"
 
@@ -21,7 +28,7 @@ class ExecucaoRepository:
             data = execucao.model_dump()
             # Formata as datas antes de enviar para o banco
             formatted_data = format_date_fields(data, DATE_FIELDS)
-            result = self.db.from_(self.table).insert(formatted_data).execute()
+            result = await self.db.from_(self.table).insert(formatted_data).execute()
             if result.data:
                 # Formata as datas na resposta
                 logger.info(f"Execução criada com sucesso. ID: {result.data[0]['id']}")
@@ -50,7 +57,7 @@ class ExecucaoRepository:
 
             # Formata as datas antes de enviar para o banco
             formatted_data = format_date_fields(data, DATE_FIELDS)
-            result = self.db.from_(self.table).update(formatted_data).eq('id', str(id)).execute()
+            result = await self.db.from_(self.table).update(formatted_data).eq('id', str(id)).execute()
             if result.data:
                 # Formata as datas na resposta
                 logger.info(f"Execução {id} atualizada com sucesso")
@@ -62,7 +69,7 @@ class ExecucaoRepository:
 
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
         try:
-            result = self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
+            result = await self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
             if result.data:
                 return format_date_fields(result.data[0], DATE_FIELDS)
             return None
@@ -70,6 +77,80 @@ class ExecucaoRepository:
             logger.error(f"Erro ao buscar execução por ID {id}: {str(e)}")
             raise
 
+    def _aplicar_filtros(
+        self,
+        query,
+        search: Optional[str] = None,
+        numero_guia: Optional[str] = None,
+        data_inicio: Optional[date] = None,
+        data_fim: Optional[date] = None,
+        is_vinculada: Optional[bool] = None,
+        link_manual_necessario: Optional[bool] = None
+    ):
+        if search:
+            query = query.or_(
+                f"paciente_nome.ilike.%{search}%,"
+                f"paciente_carteirinha.ilike.%{search}%,"
+                f"numero_guia.ilike.%{search}%,"
+                f"codigo_ficha.ilike.%{search}%,"
+                f"profissional_executante.ilike.%{search}%,"
+                f"observacoes.ilike.%{search}%"
+            )
+        if numero_guia:
+            query = query.eq("numero_guia", numero_guia)
+        if data_inicio:
+            query = query.gte("data_execucao", data_inicio.isoformat())
+        if data_fim:
+            query = query.lte("data_execucao", data_fim.isoformat())
+        if is_vinculada is not None:
+            if is_vinculada:
+                query = query.not_.is_("sessao_id", "null")
+            else:
+                query = query.is_("sessao_id", "null")
+        if link_manual_necessario is not None:
+            query = query.eq("link_manual_necessario", link_manual_necessario)
+        return query
+
+    async def _fonte_view(self, filtros: Dict) -> Tuple[str, Optional[str]]:
+        """
+        Escolhe a view materializada para a listagem e retorna (fonte,
+        atualizado_em). Usa mv_execucoes_recentes quando data_inicio cabe na
+        janela dela. Se qualquer execução foi inserida, alterada ou excluída
+        depois do último refresh, a leitura volta para a tabela, para não
+        mostrar dados desatualizados.
+        """
+        try:
+            atualizacao = await obter_atualizacao_views(self.db)
+        except Exception as e:
+            logger.warning(f"Não foi possível ler a atualização das views de execuções, lendo da tabela: {str(e)}")
+            return self.table, None
+
+        view = VIEW_EXECUCOES
+        data_inicio = filtros.get("data_inicio")
+        atualizado_recentes = atualizacao.get(VIEW_EXECUCOES_RECENTES)
+        if data_inicio and atualizado_recentes:
+            # Margem de um dia para a diferença entre o fuso do banco e o UTC
+            inicio_janela = date.fromisoformat(atualizado_recentes[:10]) - timedelta(days=DIAS_VIEW_RECENTES - 1)
+            if data_inicio >= inicio_janela:
+                view = VIEW_EXECUCOES_RECENTES
+
+        atualizado_em = atualizacao.get(view)
+        if not atualizado_em:
+            return self.table, None
+
+        # Sem os filtros da listagem: uma alteração pode tirar a execução do
+        # filtro (ex.: vinculada a uma sessão) enquanto a view ainda a mostra
+        # nele. Sem filtro de deleted_at: exclusões também contam.
+        alteradas = await self.db.from_(self.table)\
+            .select("id")\
+            .gt("updated_at", atualizado_em)\
+            .limit(1)\
+            .execute()
+        if alteradas.data:
+            logger.info(f"Execuções alteradas desde o refresh de {view} ({atualizado_em}): lendo da tabela")
+            return self.table, None
+        return view, atualizado_em
+
     async def list(
         self,
         offset: int = 0,
@@ -82,65 +163,67 @@ class ExecucaoRepository:
         is_vinculada: Optional[bool] = None,
         link_manual_necessario: Optional[bool] = None,
         order_column: str = "data_execucao",
-        order_direction: str = "desc"
+        order_direction: str = "desc",
+        cursor: Optional[str] = None,
+        count: str = "exact",
+        fonte: str = "tabela"
     ) -> Dict:
         try:
             logger.info("Listando execuções com novos filtros")
-            query = self.db.from_(self.table).select("*", count="exact").is_("deleted_at", "null")
-
-            if search:
-                query = query.or_(
-                    f"paciente_nome.ilike.%{search}%,"
-                    f"paciente_carteirinha.ilike.%{search}%,"
-                    f"numero_guia.ilike.%{search}%,"
-                    f"codigo_ficha.ilike.%{search}%,"
-                    f"profissional_executante.ilike.%{search}%,"
-                    f"observacoes.ilike.%{search}%"
-                )
-            if numero_guia:
-                query = query.eq("numero_guia", numero_guia)
-            if paciente_id:
-                pass
-            if data_inicio:
-                query = query.gte("data_execucao", data_inicio.isoformat())
-            if data_fim:
-                query = query.lte("data_execucao", data_fim.isoformat())
-            if is_vinculada is not None:
-                if is_vinculada:
-                    query = query.not_.is_("sessao_id", "null")
-                else:
-                    query = query.is_("sessao_id", "null")
-            if link_manual_necessario is not None:
-                query = query.eq("link_manual_necessario", link_manual_necessario)
-
-            if order_direction.lower() == "desc":
-                query = query.order(order_column, desc=True)
+            filtros = {
+                "search": search,
+                "numero_guia": numero_guia,
+                "data_inicio": data_inicio,
+                "data_fim": data_fim,
+                "is_vinculada": is_vinculada,
+                "link_manual_necessario": link_manual_necessario,
+            }
+
+            origem, atualizado_em = self.table, None
+            if fonte == "view":
+                origem, atualizado_em = await self._fonte_view(filtros)
+
+            query = self.db.from_(origem).select("*", count=count).is_("deleted_at", "null")
+            query = self._aplicar_filtros(query, **filtros)
+            query = aplicar_ordenacao(query, order_column, order_direction, cursor)
+
+            # No modo cursor (keyset) busca uma linha a mais para saber se há próxima página
+            if cursor is not None:
+                query = query.limit(limit + 1)
             else:
-                query = query.order(order_column)
+                query = query.range(offset, offset + limit - 1)
+            result = await query.execute()
 
-            query = query.range(offset, offset + limit - 1)
-            result = query.execute()
+            linhas = result.data or []
+            next_cursor = None
+            if cursor is not None:
+                linhas, next_cursor = pagina_cursor(linhas, limit, order_column)
+
+            items = [format_date_fields(item, DATE_FIELDS) for item in linhas]
 
-            items = [format_date_fields(item, DATE_FIELDS) for item in (result.data or [])]
-            
             if items and len(items) > 0:
                 logger.debug(f"Primeiro item retornado: {items[0]}")
 
-            total_count = result.count if hasattr(result, 'count') else 0
+            total_count = result.count or 0
 
             return {
                 "items": items,
                 "total": total_count,
                 "limit": limit,
-                "offset": offset
+                "offset": offset,
+                "next_cursor": next_cursor,
+                "fonte": origem,
+                "atualizado_em": atualizado_em
             }
+        except HTTPException:
+            raise
         except Exception as e:
             logger.exception(f"Erro ao listar execuções no repositório: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Erro interno no repositório ao listar execuções: {str(e)}")
 
     async def get_by_guia(self, guia_id: UUID) -> List[Dict]:
         try:
-            result = self.db.from_(self.table).select("*")\
+            result = await self.db.from_(self.table).select("*")\
                 .eq("guia_id", str(guia_id))\
                 .is_("deleted_at", "null")\
                 .execute()
@@ -151,7 +234,7 @@ class ExecucaoRepository:
 
     async def get_by_sessao(self, sessao_id: UUID) -> List[Dict]:
         try:
-            result = self.db.from_(self.table).select("*")\
+            result = await self.db.from_(self.table).select("*")\
                 .eq("sessao_id", str(sessao_id))\
                 .is_("deleted_at", "null")\
                 .execute()
@@ -163,7 +246,7 @@ class ExecucaoRepository:
     async def delete(self, id: UUID, user_id: str) -> bool:
         try:
             logger.info(f"Deletando execução {id} pelo usuário {user_id}")
-            result = self.db.from_(self.table)\
+            result = await self.db.from_(self.table)\
                 .update({
                     "deleted_at": datetime.now().isoformat(),
                     "updated_by": user_id
@@ -185,7 +268,7 @@ class ExecucaoRepository:
                 "updated_at": datetime.now().isoformat()
             }
             
-            result = self.db.from_(self.table).update(update_data)\
+            result = await self.db.from_(self.table).update(update_data)\
                 .eq("id", str(id))\
                 .is_("deleted_at", "null")\
                 .execute()
@@ -1,6 +1,6 @@
 from uuid import UUID
 from typing import Optional, Dict, List, Tuple
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 from ..models.ficha import FichaCreate, FichaUpdate
 import logging
 from datetime import datetime
@@ -11,7 +11,7 @@ logger.setLevel(logging.DEBUG)
 
 
 class FichaRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "fichas"
 
@@ -43,10 +43,10 @@ class FichaRepository:
             query = query.range(offset, offset + limit - 1)
 
             # Executa a query
-            result = query.execute()
+            result = await query.execute()
 
             # Contagem total
-            count_result = (
+            count_result = await (
                 self.db.from_(self.table)
                 .select("id", count="exact")
                 .is_("deleted_at", "null")
@@ -64,7 +64,7 @@ class FichaRepository:
             raise
 
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
-        result = (
+        result = await (
             self.db.from_(self.table)
             .select("*")
             .eq("id", str(id))
@@ -76,7 +76,7 @@ class FichaRepository:
         return None
 
     async def get_by_codigo(self, codigo: str) -> Optional[Dict]:
-        result = (
+        result = await (
             self.db.from_(self.table)
             .select("*")
             .eq("codigo_ficha", codigo)
@@ -92,7 +92,7 @@ class FichaRepository:
             data = ficha.model_dump()
             # Formata as datas antes de enviar para o banco
             formatted_data = format_date_fields(data, DATE_FIELDS)
-            result = self.db.from_(self.table).insert(formatted_data).execute()
+            result = await self.db.from_(self.table).insert(formatted_data).execute()
             if result.data:
                 # Formata as datas na resposta
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -111,7 +111,7 @@ class FichaRepository:
             # Formata as datas antes de enviar para o banco
             formatted_data = format_date_fields(data, DATE_FIELDS)
             
-            result = (
+            result = await (
                 self.db.from_(self.table)
                 .update(formatted_data)
                 .eq("id", str(id))
@@ -126,7 +126,7 @@ class FichaRepository:
             raise
 
     async def delete(self, id: UUID) -> bool:
-        result = (
+        result = await (
             self.db.from_(self.table)
             .update({"deleted_at": "now()"})
             .eq("id", str(id))
@@ -138,7 +138,7 @@ class FichaRepository:
     async def update_status(self, id: UUID, status: str) -> Optional[Dict]:
         try:
             data = {"status": status, "updated_at": datetime.now().isoformat()}
-            result = (
+            result = await (
                 self.db.from_(self.table)
                 .update(data)
                 .eq("id", str(id))
@@ -161,7 +161,7 @@ class FichaRepository:
     ) -> Dict:
         try:
             # Primeiro busca as guias do paciente
-            guias_query = (
+            guias_query = await (
                 self.db.from_("guias")
                 .select("id")
                 .eq("paciente_id", paciente_id)
@@ -189,10 +189,10 @@ class FichaRepository:
 
             # Aplica paginação e executa
             query = query.range(offset, offset + limit - 1)
-            result = query.execute()
+            result = await query.execute()
 
             # Query para contagem total
-            count_result = (
+            count_result = await (
                 self.db.from_(self.table)
                 .select("id", count="exact")
                 .is_("deleted_at", "null")
@@ -1,7 +1,6 @@
-import asyncio
 from uuid import UUID
 from typing import Optional, Dict, List
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 import logging
 from datetime import datetime, date
 from ..utils.date_utils import format_date_fields, DATE_FIELDS
@@ -14,7 +13,7 @@ logger.setLevel(logging.DEBUG)
 
 class GuiaRepository:
 
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "guias"
 
@@ -48,9 +47,7 @@ class GuiaRepository:
             logger.info("Chamando RPC listar_guias_com_detalhes com parâmetros:")
             logger.info(str(params))
 
-            result = await asyncio.to_thread(
-                lambda: self.db.rpc("listar_guias_com_detalhes", params).execute()
-            )
+            result = await self.db.rpc("listar_guias_com_detalhes", params).execute()
             logger.info("Resultado da RPC:")
             logger.info(str(result.data))
 
@@ -90,9 +87,7 @@ class GuiaRepository:
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
         try:
             params = {"p_guia_id": str(id)}
-            result = await asyncio.to_thread(
-                lambda: self.db.rpc("obter_guia_com_detalhes", params).execute()
-            )
+            result = await self.db.rpc("obter_guia_com_detalhes", params).execute()
             if result.data and len(result.data) > 0:
                 return format_date_fields(result.data[0], DATE_FIELDS)
             return None
@@ -114,7 +109,7 @@ class GuiaRepository:
             if status:
                 query = query.eq("status", status)
 
-            result = await asyncio.to_thread(query.execute)
+            result = await query.execute()
             return [
                 format_date_fields(item, DATE_FIELDS) for item in (result.data or [])
             ]
@@ -126,8 +121,8 @@ class GuiaRepository:
         self, numero: str, carteirinha_id: UUID
     ) -> Optional[Dict]:
         try:
-            result = await asyncio.to_thread(
-                lambda: self.db.from_(self.table)
+            result = await (
+                self.db.from_(self.table)
                 .select("*")
                 .eq("numero_guia", numero)
                 .eq("carteirinha_id", str(carteirinha_id))
@@ -145,9 +140,7 @@ class GuiaRepository:
         try:
             data = guia.model_dump()
             formatted_data = self._format_data(data)
-            result = await asyncio.to_thread(
-                lambda: self.db.from_(self.table).insert(formatted_data).execute()
-            )
+            result = await self.db.from_(self.table).insert(formatted_data).execute()
             if result.data:
                 return format_date_fields(result.data[0], DATE_FIELDS)
             return None
@@ -159,8 +152,8 @@ class GuiaRepository:
         try:
             data = guia.model_dump(exclude_unset=True)
             formatted_data = self._format_data(data)
-            result = await asyncio.to_thread(
-                lambda: self.db.from_(self.table)
+            result = await (
+                self.db.from_(self.table)
                 .update(formatted_data)
                 .eq("id", str(id))
                 .execute()
@@ -175,8 +168,8 @@ class GuiaRepository:
     async def soft_delete(self, id: UUID) -> bool:
         try:
             delete_data = {"deleted_at": datetime.now().isoformat()}
-            result = await asyncio.to_thread(
-                lambda: self.db.from_(self.table)
+            result = await (
+                self.db.from_(self.table)
                 .update(delete_data)
                 .eq("id", str(id))
                 .is_("deleted_at", None)
@@ -2,18 +2,18 @@ from typing import Optional, Dict, Any, List
 import uuid
 from fastapi import HTTPException
 from datetime import datetime
-from ..config.config import supabase
+from .database_async import get_async_supabase_client
 
 class ImportacaoAgendamentosRepository:
     def __init__(self):
         self.table = 'controle_importacao_agendamentos'
         self.agendamentos_table = 'agendamentos'
-        self.client = supabase
+        self.client = get_async_supabase_client()
 
     async def obter_ultima_importacao(self) -> Optional[Dict[str, Any]]:
         """Obtém os dados da última importação feita."""
         try:
-            result = self.client.table(self.table).select('*').order('timestamp_importacao', desc=True).limit(1).execute()
+            result = await self.client.table(self.table).select('*').order('timestamp_importacao', desc=True).limit(1).execute()
             
             if not result.data or len(result.data) == 0:
                 return None
@@ -30,7 +30,7 @@ class ImportacaoAgendamentosRepository:
             if "id" not in dados_importacao:
                 dados_importacao["id"] = str(uuid.uuid4())
                 
-            result = self.client.table(self.table).insert(dados_importacao).execute()
+            result = await self.client.table(self.table).insert(dados_importacao).execute()
             
             if not result.data or len(result.data) == 0:
                 raise HTTPException(status_code=500, detail="Falha ao registrar importação")
@@ -58,7 +58,7 @@ class ImportacaoAgendamentosRepository:
             for agendamento_dados in agendamentos_dados:
                 try:
                     # Verificar se o agendamento já existe por id_origem
-                    result = self.client.table(self.agendamentos_table).select('*').eq('id_origem', agendamento_dados['id_origem']).execute()
+                    result = await self.client.table(self.agendamentos_table).select('*').eq('id_origem', agendamento_dados['id_origem']).execute()
                     
                     # Extrair as datas do registro original (se disponíveis)
                     data_registro_origem = None
@@ -95,7 +95,7 @@ class ImportacaoAgendamentosRepository:
                         agendamento_id = result.data[0]['id']
                         agendamento_dados['updated_at'] = current_time
                         
-                        update_result = self.client.table(self.agendamentos_table).update(agendamento_dados).eq('id', agendamento_id).execute()
+                        update_result = await self.client.table(self.agendamentos_table).update(agendamento_dados).eq('id', agendamento_id).execute()
                         if update_result.data and len(update_result.data) > 0:
                             atualizados += 1
                     else:
@@ -107,7 +107,7 @@ class ImportacaoAgendamentosRepository:
                         if "id" not in agendamento_dados:
                             agendamento_dados["id"] = str(uuid.uuid4())
                         
-                        insert_result = self.client.table(self.agendamentos_table).insert(agendamento_dados).execute()
+                        insert_result = await self.client.table(self.agendamentos_table).insert(agendamento_dados).execute()
                         if insert_result.data and len(insert_result.data) > 0:
                             importados += 1
                 
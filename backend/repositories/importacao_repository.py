@@ -4,7 +4,7 @@ from fastapi import HTTPException
 from datetime import datetime
 import logging
 import json
-from ..config.config import supabase
+from .database_async import get_async_supabase_client
 from ..utils.date_utils import DateEncoder, ensure_serializable
 
 logger = logging.getLogger(__name__)
@@ -13,12 +13,12 @@ class ImportacaoRepository:
     def __init__(self):
         self.table = 'controle_importacao_pacientes'
         self.pacientes_table = 'pacientes'
-        self.client = supabase
+        self.client = get_async_supabase_client()
 
     async def obter_ultima_importacao(self) -> Optional[Dict[str, Any]]:
         """Obtém os dados da última importação feita."""
         try:
-            result = self.client.table(self.table).select('*').order('timestamp_importacao', desc=True).limit(1).execute()
+            result = await self.client.table(self.table).select('*').order('timestamp_importacao', desc=True).limit(1).execute()
             
             if not result.data or len(result.data) == 0:
                 return None
@@ -38,7 +38,7 @@ class ImportacaoRepository:
             # Garantir que não há objetos datetime sem serializar
             dados_importacao = ensure_serializable(dados_importacao)
                 
-            result = self.client.table(self.table).insert(dados_importacao).execute()
+            result = await self.client.table(self.table).insert(dados_importacao).execute()
             
             if not result.data or len(result.data) == 0:
                 raise HTTPException(status_code=500, detail="Falha ao registrar importação")
@@ -70,7 +70,7 @@ class ImportacaoRepository:
                     
                     # Verificar se o paciente já existe por id_origem
                     id_origem = paciente_dados.get('id_origem') or paciente_dados.get('client_id', '')
-                    result = self.client.table(self.pacientes_table).select('*').eq('id_origem', id_origem).execute()
+                    result = await self.client.table(self.pacientes_table).select('*').eq('id_origem', id_origem).execute()
                     
                     # Extrair as datas do registro original (se disponíveis)
                     data_registro_origem = None
@@ -113,7 +113,7 @@ class ImportacaoRepository:
                         # Verificar serialização final
                         paciente_dados = ensure_serializable(paciente_dados)
                             
-                        update_result = self.client.table(self.pacientes_table).update(paciente_dados).eq('id', paciente_id).execute()
+                        update_result = await self.client.table(self.pacientes_table).update(paciente_dados).eq('id', paciente_id).execute()
                         if update_result.data and len(update_result.data) > 0:
                             atualizados += 1
                     else:
@@ -128,7 +128,7 @@ class ImportacaoRepository:
                         # Verificar serialização final
                         paciente_dados = ensure_serializable(paciente_dados)
                             
-                        insert_result = self.client.table(self.pacientes_table).insert(paciente_dados).execute()
+                        insert_result = await self.client.table(self.pacientes_table).insert(paciente_dados).execute()
                         if insert_result.data and len(insert_result.data) > 0:
                             importados += 1
                 
@@ -1,19 +1,19 @@
 from uuid import UUID
 from typing import Optional, Dict, List, Tuple, Any
-from backend.repositories.database_supabase import SupabaseClient, get_supabase_client
+from backend.repositories.database_async import AsyncSupabaseClient
 from backend.models.paciente import PacienteCreate, PacienteUpdate
 import logging
 from datetime import datetime
 from ..utils.date_utils import format_date_fields, DATE_FIELDS, DateEncoder
+from .paginacao import aplicar_ordenacao, campos_com_cursor, pagina_cursor
 import json
 from fastapi import HTTPException
-from ..config.config import supabase
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 class PacienteRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "pacientes"
 
@@ -23,62 +23,88 @@ class PacienteRepository:
                   search: Optional[str] = None,
                   fields: str = "*",
                   order_column: str = "nome",
-                  order_direction: str = "asc") -> Dict:
+                  order_direction: str = "asc",
+                  cursor: Optional[str] = None,
+                  count: str = "exact") -> Dict:
         """
         Lista pacientes com paginação, busca e ordenação.
         
         Args:
-            offset: Offset para paginação
+            offset: Offset para paginação (ignorado quando há cursor)
             limit: Limite de resultados por página
             search: Termo de busca
             fields: Campos a serem retornados (ex: "id,nome,cpf"). Por padrão, retorna todos os campos.
             order_column: Coluna para ordenação
             order_direction: Direção da ordenação (asc ou desc)
+            cursor: Cursor da página anterior (paginação keyset). Use "" para a primeira página.
+            count: Tipo de contagem do total (exact, planned ou estimated)
             
         Returns:
-            Dicionário com os resultados paginados
+            Dicionário com os resultados paginados (e next_cursor no modo cursor)
         """
         try:
-            # Query paginada com os campos especificados
-            query = self.db.from_(self.table).select(fields).is_("deleted_at", "null")
+            modo_cursor = cursor is not None
+            if modo_cursor:
+                fields = campos_com_cursor(fields, order_column)
+
+            # Query paginada com os campos especificados; o total vem na mesma requisição
+            query = self.db.from_(self.table).select(fields, count=count).is_("deleted_at", "null")
 
             if search:
                 query = query.or_(f"nome.ilike.%{search}%,cpf.ilike.%{search}%")
 
-            # Adiciona ordenação
-            if order_direction.lower() == "desc":
-                query = query.order(order_column, desc=True)
-            else:
-                query = query.order(order_column)
+            # Adiciona ordenação (e o filtro do cursor, se houver)
+            query = aplicar_ordenacao(query, order_column, order_direction, cursor)
 
-            # Aplica paginação
-            query = query.range(offset, offset + limit - 1)
+            # Aplica paginação: no modo cursor busca uma linha a mais para saber se há próxima página
+            if modo_cursor:
+                query = query.limit(limit + 1)
+            else:
+                query = query.range(offset, offset + limit - 1)
 
             # Executa a query
-            result = query.execute()
+            result = await query.execute()
 
-            # Contagem total
-            count_query = self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null")
-            
-            # Aplica o mesmo filtro de busca na contagem total
-            if search:
-                count_query = count_query.or_(f"nome.ilike.%{search}%,cpf.ilike.%{search}%")
-                
-            count_result = count_query.execute()
+            linhas = result.data or []
+            next_cursor = None
+            if modo_cursor:
+                linhas, next_cursor = pagina_cursor(linhas, limit, order_column)
 
             # Formata as datas
-            items = [format_date_fields(item, DATE_FIELDS) for item in (result.data or [])]
+            items = [format_date_fields(item, DATE_FIELDS) for item in linhas]
 
             return {
                 "items": items,
-                "total": count_result.count if hasattr(count_result, 'count') else 0,
+                "total": result.count or 0,
                 "limit": limit,
-                "offset": offset
+                "offset": offset,
+                "next_cursor": next_cursor
             }
         except Exception as e:
             logger.error(f"Erro ao listar pacientes: {str(e)}")
             raise
 
+    async def buscar(self, termo: str, limite: int = 20, prefixo: bool = False) -> List[Dict]:
+        """
+        Busca pacientes por nome, CPF, carteirinha ou número da guia pela função
+        buscar_pacientes_guias (índices trigram, migração 24).
+
+        Args:
+            termo: Texto digitado (mínimo de 2 caracteres)
+            limite: Número máximo de resultados
+            prefixo: True para o modo autocomplete (início das palavras/documentos)
+
+        Returns:
+            Lista de {tipo, id, paciente_id, paciente_nome, valor, relevancia}
+            ordenada pela relevância
+        """
+        result = await self.db.rpc("buscar_pacientes_guias", {
+            "p_termo": termo,
+            "p_limite": limite,
+            "p_prefixo": prefixo,
+        }).execute()
+        return result.data or []
+
     async def get_by_id(self, id: UUID, fields: str = "*") -> Optional[Dict]:
         """
         Busca um paciente pelo ID.
@@ -90,7 +116,7 @@ class PacienteRepository:
         Returns:
             Dicionário com os dados do paciente ou None se não encontrado
         """
-        result = self.db.from_(self.table).select(fields).eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select(fields).eq("id", str(id)).is_("deleted_at", "null").execute()
         if result.data:
             return format_date_fields(result.data[0], DATE_FIELDS)
         return None
@@ -109,7 +135,7 @@ class PacienteRepository:
                 # Se falhar, usar o DateEncoder para serializar
                 formatted_data = json.loads(json.dumps(formatted_data, cls=DateEncoder))
             
-            result = self.db.from_(self.table).insert(formatted_data).execute()
+            result = await self.db.from_(self.table).insert(formatted_data).execute()
             if result.data:
                 # Formata as datas na resposta
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -157,7 +183,7 @@ class PacienteRepository:
                 # Se falhar, usar o DateEncoder para serializar
                 formatted_data = json.loads(json.dumps(formatted_data, cls=DateEncoder))
             
-            result = self.db.from_(self.table).update(formatted_data).eq('id', str(id)).execute()
+            result = await self.db.from_(self.table).update(formatted_data).eq('id', str(id)).execute()
             if result.data:
                 # Formata as datas na resposta
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -167,17 +193,17 @@ class PacienteRepository:
             raise
 
     async def delete(self, id: UUID) -> bool:
-        result = self.db.from_(self.table).update({"deleted_at": "now()"}).eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).update({"deleted_at": "now()"}).eq("id", str(id)).is_("deleted_at", "null").execute()
         return bool(result.data)
 
     async def get_by_cpf(self, cpf: str) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*").eq("cpf", cpf).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select("*").eq("cpf", cpf).is_("deleted_at", "null").execute()
         return result.data[0] if result.data else None
 
     async def get_by_id_origem(self, id_origem: int) -> Optional[Dict]:
         """Busca um paciente pelo ID de origem."""
         try:
-            result = self.db.from_(self.table).select("*").eq("id_origem", id_origem).is_("deleted_at", "null").execute()
+            result = await self.db.from_(self.table).select("*").eq("id_origem", id_origem).is_("deleted_at", "null").execute()
             return result.data[0] if result.data else None
         except Exception as e:
             logger.error(f"Erro ao buscar paciente por id_origem: {str(e)}")
@@ -193,7 +219,7 @@ class PacienteRepository:
         try:
             # Abordagem mais direta para evitar problemas com await
             # Buscamos todos os dados em uma única consulta
-            result = self.db.from_(self.table).select("created_at, updated_at").is_("deleted_at", "null").execute()
+            result = await self.db.from_(self.table).select("created_at, updated_at").is_("deleted_at", "null").execute()
             
             # Processamos os resultados em memória
             created_dates = []
@@ -220,7 +246,7 @@ class PacienteRepository:
                 ultima_atualizacao = format_date_fields(ultima_atualizacao_dict, ['updated_at'])['updated_at']
             
             # Contamos os pacientes ativos
-            count_result = self.db.from_(self.table).select("*", count="exact").is_("deleted_at", "null").execute()
+            count_result = await self.db.from_(self.table).select("*", count="exact").is_("deleted_at", "null").execute()
             
             return {
                 "ultima_criacao": ultima_criacao,
@@ -0,0 +1,109 @@
+"""
+Paginação por cursor (keyset) e tipo de contagem para as listagens.
+
+Com `range(offset, ...)` o Postgres precisa ler e descartar todas as linhas
+anteriores à página, o que fica lento nas páginas profundas. No modo cursor a
+próxima página é filtrada a partir da última linha da página atual
+(valor da coluna de ordenação + id como desempate), usando o índice da coluna.
+
+O cursor é opaco para o cliente: a resposta traz `next_cursor` e o cliente o
+devolve no parâmetro `cursor` para buscar a página seguinte.
+
+A contagem também é configurável: `exact` (COUNT(*), padrão), `planned`
+(estimativa do planejador, sem ler a tabela) ou `estimated` (exata até um
+limite, estimada acima dele).
+"""
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+TIPOS_CONTAGEM = ("exact", "planned", "estimated")
+# Para os parâmetros Query das rotas
+REGEX_TIPO_CONTAGEM = "^(exact|planned|estimated)$"
+
+
+def codificar_cursor(linha: Dict[str, Any], order_column: str) -> str:
+    """Gera o cursor a partir da última linha (ainda sem formatação) de uma página."""
+    conteudo = json.dumps([linha.get(order_column), linha.get("id")], default=str)
+    return base64.urlsafe_b64encode(conteudo.encode("utf-8")).decode("ascii")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Retorna (valor da coluna de ordenação, id) do cursor."""
+    try:
+        valor, id_linha = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+    if id_linha is None:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+    return valor, id_linha
+
+
+def _literal(valor: Any) -> str:
+    """Valor entre aspas para os filtros or/and do PostgREST (aceita vírgulas e parênteses)."""
+    if isinstance(valor, bool):
+        valor = str(valor).lower()
+    texto = str(valor).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{texto}"'
+
+
+def aplicar_ordenacao(query, order_column: str, order_direction: str, cursor: Optional[str] = None):
+    """
+    Ordena a query pela coluna + id (desempate estável) e, se houver cursor,
+    filtra as linhas posteriores a ele.
+
+    Segue a ordem padrão do Postgres para nulos (por último no asc, primeiro no
+    desc), já que o PostgREST não recebe NULLS LAST pelo cliente.
+    """
+    desc = order_direction.lower() == "desc"
+
+    if cursor:
+        valor, id_linha = decodificar_cursor(cursor)
+        id_literal = _literal(id_linha)
+        operador = "lt" if desc else "gt"
+        if order_column == "id":
+            query = query.filter("id", operador, id_linha)
+        elif valor is None:
+            condicoes = [f"and({order_column}.is.null,id.{operador}.{id_literal})"]
+            if desc:
+                # Os nulos vêm primeiro no desc: depois deles vêm todos os não nulos
+                condicoes.append(f"{order_column}.not.is.null")
+            query = query.or_(",".join(condicoes))
+        else:
+            valor_literal = _literal(valor)
+            condicoes = [
+                f"{order_column}.{operador}.{valor_literal}",
+                f"and({order_column}.eq.{valor_literal},id.{operador}.{id_literal})",
+            ]
+            if not desc:
+                condicoes.append(f"{order_column}.is.null")
+            query = query.or_(",".join(condicoes))
+
+    query = query.order(order_column, desc=desc)
+    if order_column != "id":
+        query = query.order("id", desc=desc)
+    return query
+
+
+def campos_com_cursor(fields: str, order_column: str) -> str:
+    """Garante que a projeção traga as colunas usadas para montar o cursor."""
+    if fields.strip() == "*":
+        return fields
+    campos = [campo.strip() for campo in fields.split(",") if campo.strip()]
+    for coluna in ("id", order_column):
+        if coluna not in campos:
+            campos.append(coluna)
+    return ",".join(campos)
+
+
+def pagina_cursor(linhas: List[Dict[str, Any]], limit: int, order_column: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Recebe as linhas buscadas com limit + 1 e retorna (linhas da página,
+    next_cursor). O cursor só é gerado quando existe uma linha além da página.
+    """
+    if len(linhas) <= limit:
+        return linhas, None
+    linhas = linhas[:limit]
+    return linhas, codificar_cursor(linhas[-1], order_column)
@@ -1,6 +1,6 @@
 from uuid import UUID
 from typing import Optional, Dict, List, Tuple
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 import logging
 from ..models.plano_saude import PlanoSaudeCreate
 from ..utils.date_utils import format_date_fields, DATE_FIELDS
@@ -9,7 +9,7 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 class PlanoSaudeRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "planos_saude"
 
@@ -31,9 +31,9 @@ class PlanoSaudeRepository:
                 query = query.order(order_column)
 
             query = query.range(offset, offset + limit - 1)
-            result = query.execute()
+            result = await query.execute()
 
-            count_result = self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
+            count_result = await self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
 
             items = [format_date_fields(item, DATE_FIELDS) for item in (result.data or [])]
 
@@ -48,11 +48,11 @@ class PlanoSaudeRepository:
             raise
 
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
         return result.data[0] if result.data else None
 
     async def get_by_registro_ans(self, registro_ans: str) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*").eq("registro_ans", registro_ans).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select("*").eq("registro_ans", registro_ans).is_("deleted_at", "null").execute()
         return result.data[0] if result.data else None
 
     async def create(self, plano: PlanoSaudeCreate):
@@ -60,7 +60,7 @@ class PlanoSaudeRepository:
             data = plano.model_dump()
             # Formata as datas antes de enviar para o banco
             formatted_data = format_date_fields(data, DATE_FIELDS)
-            result = self.db.from_(self.table).insert(formatted_data).execute()
+            result = await self.db.from_(self.table).insert(formatted_data).execute()
             if result.data:
                 # Formata as datas na resposta
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -76,12 +76,12 @@ class PlanoSaudeRepository:
                 "updated_by": str(user_id)
             }
             
-            result = self.db.from_(self.table).update(update_data).eq("id", str(id)).is_("deleted_at", "null").execute()
+            result = await self.db.from_(self.table).update(update_data).eq("id", str(id)).is_("deleted_at", "null").execute()
             return result.data[0] if result.data else None
         except Exception as e:
             logger.error(f"Erro ao atualizar plano de saúde: {str(e)}")
             raise
 
     async def delete(self, id: UUID) -> bool:
-        result = self.db.from_(self.table).update({"deleted_at": "now()"}).eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).update({"deleted_at": "now()"}).eq("id", str(id)).is_("deleted_at", "null").execute()
         return bool(result.data)
\ No newline at end of file
@@ -1,6 +1,6 @@
 from uuid import UUID
 from typing import Optional, Dict, List
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 import logging
 from datetime import datetime
 from decimal import Decimal
@@ -22,7 +22,7 @@ def convert_decimal_to_float(data: Dict) -> Dict:
     return converted
 
 class ProcedimentoRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "procedimentos"
 
@@ -52,9 +52,9 @@ class ProcedimentoRepository:
                 query = query.order(order_column)
 
             query = query.range(offset, offset + limit - 1)
-            result = query.execute()
+            result = await query.execute()
 
-            count_result = self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
+            count_result = await self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
 
             items = [format_date_fields(item, DATE_FIELDS) for item in (result.data or [])]
 
@@ -69,13 +69,13 @@ class ProcedimentoRepository:
             raise
 
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
         if result.data:
             return format_date_fields(result.data[0], DATE_FIELDS)
         return None
 
     async def get_by_codigo(self, codigo: str) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*")\
+        result = await self.db.from_(self.table).select("*")\
             .eq("codigo", codigo)\
             .is_("deleted_at", "null")\
             .execute()
@@ -87,7 +87,7 @@ class ProcedimentoRepository:
             data = convert_decimal_to_float(data)
             # Formata as datas antes de enviar para o banco
             formatted_data = format_date_fields(data, DATE_FIELDS)
-            result = self.db.from_(self.table).insert(formatted_data).execute()
+            result = await self.db.from_(self.table).insert(formatted_data).execute()
             if result.data:
                 # Formata as datas na resposta
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -106,7 +106,7 @@ class ProcedimentoRepository:
                 "updated_by": str(user_id)
             })
             
-            result = self.db.from_(self.table).update(update_data)\
+            result = await self.db.from_(self.table).update(update_data)\
                 .eq("id", str(id))\
                 .is_("deleted_at", "null")\
                 .execute()
@@ -119,7 +119,7 @@ class ProcedimentoRepository:
             raise
 
     async def delete(self, id: UUID) -> bool:
-        result = self.db.from_(self.table)\
+        result = await self.db.from_(self.table)\
             .update({"deleted_at": "now()"})\
             .eq("id", str(id))\
             .is_("deleted_at", "null")\
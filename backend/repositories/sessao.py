@@ -1,6 +1,6 @@
 from uuid import UUID
 from typing import Optional, Dict, List
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 import logging
 from datetime import datetime
 from ..utils.date_utils import format_date_fields, DATE_FIELDS
@@ -10,7 +10,7 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 class SessaoRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "sessoes"
 
@@ -32,9 +32,9 @@ class SessaoRepository:
                 query = query.order(order_column)
 
             query = query.range(offset, offset + limit - 1)
-            result = query.execute()
+            result = await query.execute()
 
-            count_result = self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
+            count_result = await self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
 
             items = [format_date_fields(item, DATE_FIELDS) for item in (result.data or [])]
 
@@ -49,20 +49,20 @@ class SessaoRepository:
             raise
 
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
         if result.data:
             return format_date_fields(result.data[0], DATE_FIELDS)
         return None
 
     async def get_by_guia(self, guia_id: UUID) -> List[Dict]:
-        result = self.db.from_(self.table).select("*")\
+        result = await self.db.from_(self.table).select("*")\
             .eq("guia_id", str(guia_id))\
             .is_("deleted_at", "null")\
             .execute()
         return [format_date_fields(item, DATE_FIELDS) for item in (result.data or [])]
 
     async def get_by_paciente(self, paciente_id: UUID) -> List[Dict]:
-        result = self.db.from_(self.table).select("*")\
+        result = await self.db.from_(self.table).select("*")\
             .eq("paciente_id", str(paciente_id))\
             .is_("deleted_at", "null")\
             .execute()
@@ -73,7 +73,7 @@ class SessaoRepository:
             data = sessao.model_dump()
             # Formata as datas antes de enviar para o banco
             formatted_data = format_date_fields(data, DATE_FIELDS)
-            result = self.db.from_(self.table).insert(formatted_data).execute()
+            result = await self.db.from_(self.table).insert(formatted_data).execute()
             if result.data:
                 # Formata as datas na resposta
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -89,7 +89,7 @@ class SessaoRepository:
                 "updated_by": str(user_id)
             }
 
-            result = self.db.from_(self.table).update(update_data).eq("id", str(id)).is_("deleted_at", "null").execute()
+            result = await self.db.from_(self.table).update(update_data).eq("id", str(id)).is_("deleted_at", "null").execute()
 
             if result.data:
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -99,7 +99,7 @@ class SessaoRepository:
             raise
 
     async def delete(self, id: UUID) -> bool:
-        result = self.db.from_(self.table).update({"deleted_at": "now()"}).eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).update({"deleted_at": "now()"}).eq("id", str(id)).is_("deleted_at", "null").execute()
         return bool(result.data)
 
     async def update_status(self, id: UUID, status: str, user_id: UUID) -> Optional[Dict]:
@@ -110,7 +110,7 @@ class SessaoRepository:
                 "updated_at": datetime.now().isoformat()
             }
             
-            result = self.db.from_(self.table).update(update_data)\
+            result = await self.db.from_(self.table).update(update_data)\
                 .eq("id", str(id))\
                 .is_("deleted_at", "null")\
                 .execute()
@@ -124,7 +124,7 @@ class SessaoRepository:
 
     async def get_by_ficha_presenca(self, ficha_id: UUID) -> List[Dict]:
         """Busca todas as sessões de uma ficha"""
-        result = self.db.from_(self.table).select("*")\
+        result = await self.db.from_(self.table).select("*")\
             .eq("ficha_id", str(ficha_id))\
             .is_("deleted_at", "null")\
             .order("ordem_execucao", desc=False)\
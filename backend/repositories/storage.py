@@ -1,6 +1,6 @@
 from uuid import UUID
 from typing import Optional, Dict, List
-from backend.repositories.database_supabase import SupabaseClient
+from backend.repositories.database_async import AsyncSupabaseClient
 import logging
 from datetime import datetime
 from ..utils.date_utils import format_date_fields, DATE_FIELDS
@@ -10,7 +10,7 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 class StorageRepository:
-    def __init__(self, db: SupabaseClient):
+    def __init__(self, db: AsyncSupabaseClient):
         self.db = db
         self.table = "storage"
 
@@ -32,9 +32,9 @@ class StorageRepository:
                 query = query.order(order_column)
 
             query = query.range(offset, offset + limit - 1)
-            result = query.execute()
+            result = await query.execute()
 
-            count_result = self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
+            count_result = await self.db.from_(self.table).select("id", count="exact").is_("deleted_at", "null").execute()
 
             items = [format_date_fields(item, DATE_FIELDS) for item in (result.data or [])]
 
@@ -49,13 +49,13 @@ class StorageRepository:
             raise
 
     async def get_by_id(self, id: UUID) -> Optional[Dict]:
-        result = self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select("*").eq("id", str(id)).is_("deleted_at", "null").execute()
         if result.data:
             return format_date_fields(result.data[0], DATE_FIELDS)
         return None
 
     async def get_by_entidade(self, entidade: str, entidade_id: str) -> List[Dict]:
-        result = self.db.from_(self.table).select("*")\
+        result = await self.db.from_(self.table).select("*")\
             .eq("entidade", entidade)\
             .eq("entidade_id", entidade_id)\
             .is_("deleted_at", "null")\
@@ -64,7 +64,7 @@ class StorageRepository:
 
     async def get_by_path(self, path: str) -> Optional[Dict]:
         """Busca um arquivo pela URL no R2"""
-        result = self.db.from_(self.table).select("*").eq("url", path).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).select("*").eq("url", path).is_("deleted_at", "null").execute()
         if result.data:
             return format_date_fields(result.data[0], DATE_FIELDS)
         return None
@@ -75,7 +75,7 @@ class StorageRepository:
             data = storage.model_dump(mode='json')
             # Formata as datas antes de enviar para o banco
             formatted_data = format_date_fields(data, DATE_FIELDS)
-            result = self.db.from_(self.table).insert(formatted_data).execute()
+            result = await self.db.from_(self.table).insert(formatted_data).execute()
             if result.data:
                 # Formata as datas na resposta
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -91,7 +91,7 @@ class StorageRepository:
                 "updated_by": str(user_id)
             }
 
-            result = self.db.from_(self.table).update(update_data).eq("id", str(id)).is_("deleted_at", "null").execute()
+            result = await self.db.from_(self.table).update(update_data).eq("id", str(id)).is_("deleted_at", "null").execute()
 
             if result.data:
                 return format_date_fields(result.data[0], DATE_FIELDS)
@@ -101,5 +101,5 @@ class StorageRepository:
             raise
 
     async def delete(self, id: UUID) -> bool:
-        result = self.db.from_(self.table).update({"deleted_at": "now()"}).eq("id", str(id)).is_("deleted_at", "null").execute()
+        result = await self.db.from_(self.table).update({"deleted_at": "now()"}).eq("id", str(id)).is_("deleted_at", "null").execute()
         return bool(result.data)
@@ -0,0 +1,70 @@
+"""
+Views materializadas de execuções (mv_execucoes e mv_execucoes_recentes).
+
+A listagem de execuções pode ler das views (fonte=view) em vez da tabela.
+A migração 27 mantém em controle_views_materializadas quando cada view foi
+atualizada; esse momento é devolvido na resposta da listagem para o cliente
+saber a idade dos dados.
+
+O refresh não é feito aqui: solicitar_refresh_views_execucoes() só marca o
+pedido, e o job refresh_execucoes_views_pendente (pg_cron) o executa quando
+os pedidos param de chegar, juntando os de uma importação inteira em um só.
+"""
+import copy
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from .database_async import AsyncSupabaseClient
+
+logger = logging.getLogger(__name__)
+
+VIEW_EXECUCOES = "mv_execucoes"
+VIEW_EXECUCOES_RECENTES = "mv_execucoes_recentes"
+DIAS_VIEW_RECENTES = 90  # janela de mv_execucoes_recentes, contada do último refresh
+TTL_CACHE_ATUALIZACAO = 15  # segundos
+
+_cache: Optional[Tuple[float, Dict[str, str]]] = None
+
+
+def invalidar_cache_atualizacao_views() -> None:
+    global _cache
+    _cache = None
+
+
+async def obter_atualizacao_views(db: AsyncSupabaseClient) -> Dict[str, str]:
+    """
+    Retorna {nome da view: atualizado_em (ISO)} das views de execuções,
+    com cache de TTL_CACHE_ATUALIZACAO segundos.
+    """
+    global _cache
+
+    if _cache and time.monotonic() - _cache[0] < TTL_CACHE_ATUALIZACAO:
+        return copy.copy(_cache[1])
+
+    response = await db.from_("controle_views_materializadas")\
+        .select("nome, atualizado_em")\
+        .in_("nome", [VIEW_EXECUCOES, VIEW_EXECUCOES_RECENTES])\
+        .execute()
+    atualizacao = {
+        linha["nome"]: linha["atualizado_em"]
+        for linha in (response.data or [])
+        if linha.get("atualizado_em")
+    }
+    _cache = (time.monotonic(), atualizacao)
+    return copy.copy(atualizacao)
+
+
+async def solicitar_refresh_views_execucoes(db: AsyncSupabaseClient) -> bool:
+    """
+    Pede o refresh das views de execuções (após importações e vinculações em
+    lote). Falhas só são registradas no log: o job de 30 minutos atualiza as
+    views de qualquer forma.
+    """
+    try:
+        await db.rpc("solicitar_refresh_execucoes_views", {}).execute()
+        logger.info("Refresh das views de execuções solicitado")
+        return True
+    except Exception as e:
+        logger.warning(f"Não foi possível solicitar o refresh das views de execuções: {str(e)}")
+        return False
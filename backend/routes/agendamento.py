@@ -1,49 +1,29 @@
 import json
-import os
 import uuid
 import datetime
 import logging
 import asyncio # Adicionar import asyncio
+from contextlib import aclosing
 from typing import Dict, List, Any, Optional
 from uuid import UUID
 import pymysql
-import sshtunnel
 from fastapi import APIRouter, HTTPException, Query, Path, status, Depends
 from pydantic import BaseModel
 from pymysql.cursors import DictCursor
+from postgrest.types import ReturnMethod
 from dateutil import parser
 
 from ..config.config import Settings
 from ..utils.date_utils import DateEncoder, format_date_fields, DATE_FIELDS, ensure_serializable, format_time
 from ..utils.agendamento_utils import limpar_campos_invalidos, adicionar_dados_relacionados
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
+from backend.repositories.database_mysql import get_gerenciador_mysql
+from backend.repositories.paginacao import REGEX_TIPO_CONTAGEM
 from dotenv import load_dotenv
 
 load_dotenv()  # Carrega as variáveis do .env
 
-# Definir as configurações de SSH e MySQL para a importação
-# Configurações SSH (CORRIGIDO - usa variáveis SSH_*)
-ssh_port_str = os.getenv('SSH_PORT') # Usar SSH_PORT
-ssh_port = int(ssh_port_str) if ssh_port_str and ssh_port_str.isdigit() else 22 # Converte para int, padrão 22
-SSH_CONFIG = {
-    'host': os.getenv('SSH_HOST'), # Usar SSH_HOST
-    'user': os.getenv('SSH_USER'), # Usar SSH_USER
-    'password': os.getenv('SSH_PASSWORD'), # Usar SSH_PASSWORD
-    'port': ssh_port # Usa a porta SSH convertida para inteiro
-}
-
-# Configurações de conexão MySQL (usado para remote_bind_address e conexão final)
-# Assegurar que a porta MySQL seja lida como inteiro
-mysql_port_str = os.getenv('MYSQL_PORT')
-mysql_port = int(mysql_port_str) if mysql_port_str and mysql_port_str.isdigit() else 3306
-MYSQL_CONFIG = {
-    'remote_host': os.getenv('MYSQL_HOST', '127.0.0.1'), # Host MySQL no servidor remoto
-    'remote_port': mysql_port, # Porta MySQL no servidor remoto (convertida)
-    'user': os.getenv('MYSQL_USER'),
-    'password': os.getenv('MYSQL_PASSWORD'),
-    'charset': 'utf8mb4',
-    'cursorclass': pymysql.cursors.DictCursor
-}
+# Conexões MySQL via túnel SSH: pool compartilhado de repositories/database_mysql.py
 
 router = APIRouter(tags=["Agendamentos"])
 
@@ -53,65 +33,145 @@ logging.basicConfig(level=logging.INFO)
 
 async def testar_conexao_mysql(database):
     """Testa a conexão com o banco de dados MySQL via túnel SSH."""
-    tunnel = None
     try:
-        # Configuração MySQL para conexão *final* (via túnel)
-        config_final = {
-            'host': '127.0.0.1', # Conecta ao túnel local
-            'port': 3307,        # Porta local do túnel
-            'user': MYSQL_CONFIG['user'],
-            'password': MYSQL_CONFIG['password'],
-            'database': database,
-            'charset': MYSQL_CONFIG['charset'],
-            'cursorclass': MYSQL_CONFIG['cursorclass']
-        }
-
-        logger.info(f"Abrindo túnel SSH para {SSH_CONFIG['host']}:{SSH_CONFIG['port']}...")
-        try:
-            # Criar túnel SSH (CORRIGIDO - usa remote_bind_address do MYSQL_CONFIG)
-            tunnel = sshtunnel.SSHTunnelForwarder(
-                (SSH_CONFIG['host'], SSH_CONFIG['port']),
-                ssh_username=SSH_CONFIG['user'],
-                ssh_password=SSH_CONFIG['password'],
-                remote_bind_address=(MYSQL_CONFIG['remote_host'], MYSQL_CONFIG['remote_port']), # Usa host/porta MySQL remotos
-                local_bind_address=('127.0.0.1', 3307)
-            )
-            tunnel.start()
-            logger.info("Túnel SSH estabelecido com sucesso!")
+        logger.info(f"Testando conexão com MySQL (banco: {database})...")
 
-        except Exception as e:
-            logger.error(f"Erro ao abrir túnel SSH: {str(e)}")
-            return False, f"Erro ao abrir túnel SSH: {str(e)}"
-
-        # Conectar ao MySQL através do túnel (usando config_final)
-        logger.info(f"Conectando ao MySQL em {config_final['host']}:{config_final['port']} (banco: {database})...")
-        try:
-            conexao = pymysql.connect(**config_final)
-            logger.info("Conexão estabelecida com sucesso!")
-        except Exception as e:
-            logger.error(f"Erro ao conectar ao MySQL: {str(e)}")
-            raise Exception(f"Erro ao conectar ao banco de dados MySQL: {str(e)}")
+        def _testar():
+            with get_gerenciador_mysql().conexao(database) as conexao:
+                # Testar uma consulta simples
+                with conexao.cursor() as cursor:
+                    cursor.execute("SELECT 1")
 
-        # Testar uma consulta simples
-        cursor = conexao.cursor()
-        cursor.execute("SELECT 1")
-        cursor.close()
-        conexao.close()
+        # Em uma thread: a espera por uma vaga no pool não trava o event loop
+        await asyncio.to_thread(_testar)
 
         return True, "Conexão estabelecida com sucesso!"
     except Exception as e:
         logger.error(f"Erro ao testar conexão com MySQL: {str(e)}")
         return False, f"Erro ao conectar: {str(e)}"
+
+
+TAMANHO_LOTE_MYSQL = 1000
+
+
+def _montar_consulta_agendamentos(tabela, limite=None, ultima_data_registro=None, ultima_data_atualizacao=None, periodo_semanas=None):
+    """Monta a consulta (sql, params) dos agendamentos alterados desde a última importação."""
+    # Construir a consulta SQL com JOIN
+    sql = f"""SELECT s.*, sp.professional_id 
+             FROM {tabela} s 
+             LEFT JOIN ps_schedule_professionals sp ON s.schedule_id = sp.schedule_id 
+             WHERE 1=1"""
+    params = []
+    
+    # Filtrar por período em semanas se fornecido
+    if periodo_semanas:
+        sql += f" AND s.schedule_date_start >= DATE_SUB(NOW(), INTERVAL %s WEEK)" # Alias s.
+        params.append(periodo_semanas)
+        logger.info(f"Filtrando agendamentos das últimas {periodo_semanas} semanas")
+    
+    # Filtrar por datas se fornecidas (usando alias s.)
+    if ultima_data_registro or ultima_data_atualizacao:
+        registro_campo = "s.schedule_registration_date"
+        atualizacao_campo = "s.schedule_lastupdate"
+        
+        sql += " AND (" # Iniciar grupo OR
+        first_condition = True
+        if ultima_data_registro:
+            sql += f" IFNULL({registro_campo}, '1900-01-01') > %s"
+            params.append(ultima_data_registro)
+            first_condition = False
+            
+        if ultima_data_atualizacao:
+            if not first_condition:
+                sql += " OR"
+            sql += f" IFNULL({atualizacao_campo}, '1900-01-01') > %s"
+            params.append(ultima_data_atualizacao)
+        sql += ")" # Fechar grupo OR
+
+    # Ordenar por data de agendamento (usando alias s.)
+    sql += " ORDER BY s.schedule_date_start DESC"
+    
+    # Adicionar limite se fornecido
+    if limite:
+        sql += " LIMIT %s"
+        params.append(int(limite))
+
+    return sql, params
+
+
+def _montar_consulta_agendamentos_desde_data(tabela, data_inicial, data_final=None):
+    """Monta a consulta (sql, params) dos agendamentos entre data_inicial e data_final."""
+    # Construir a consulta SQL com JOIN
+    sql = f"""SELECT s.*, sp.professional_id 
+             FROM {tabela} s 
+             LEFT JOIN ps_schedule_professionals sp ON s.schedule_id = sp.schedule_id 
+             WHERE s.schedule_date_start >= %s""" # Alias s.
+    params = [data_inicial]
+
+    if data_final:
+         sql += " AND s.schedule_date_start <= %s" # Alias s.
+         params.append(data_final)
+    
+    sql += " ORDER BY s.schedule_date_start ASC" # Alias s.
+    return sql, params
+
+
+async def stream_agendamentos_mysql(database, sql, params, tamanho_lote=TAMANHO_LOTE_MYSQL):
+    """
+    Executa a consulta com cursor não bufferizado (SSDictCursor) e entrega os
+    agendamentos em lotes de `tamanho_lote`.
+
+    O próximo lote é lido do MySQL (em uma thread) enquanto o lote atual é
+    processado pelo chamador, então a gravação começa antes do fim da leitura
+    e no máximo dois lotes ficam em memória, qualquer que seja o período.
+    """
+    gerenciador = get_gerenciador_mysql()
+    conexao = await gerenciador.obter_async(database)
+    cursor = None
+    proximo = None
+    concluido = False
+    try:
+        logger.debug(f"Consulta SQL: {sql} - Parâmetros: {params}")
+        cursor = conexao.cursor(pymysql.cursors.SSDictCursor)
+        await asyncio.to_thread(cursor.execute, sql, params)
+
+        total = 0
+        proximo = asyncio.ensure_future(asyncio.to_thread(cursor.fetchmany, tamanho_lote))
+        while True:
+            lote = await proximo
+            proximo = None
+            if not lote:
+                break
+            total += len(lote)
+            if len(lote) == tamanho_lote:
+                proximo = asyncio.ensure_future(asyncio.to_thread(cursor.fetchmany, tamanho_lote))
+            yield lote
+            if proximo is None:
+                break
+
+        concluido = True
+        logger.info(f"Leitura do MySQL concluída: {total} agendamentos")
     finally:
-        # Fechar o túnel SSH se estiver aberto
-        if tunnel and tunnel.is_active:
-            tunnel.close()
+        if proximo is not None:
+            # Aguardar a leitura em andamento antes de liberar a conexão
+            try:
+                await proximo
+            except Exception:
+                pass
+        if concluido and cursor is not None:
+            await asyncio.to_thread(cursor.close)
+        # Leitura interrompida: o restante do resultado ainda está pendente na
+        # conexão, que é descartada em vez de voltar ao pool
+        await gerenciador.devolver_async(database, conexao, descartar=not concluido)
 
 
 async def buscar_agendamentos_mysql(database, tabela, limite=None, ultima_data_registro=None, ultima_data_atualizacao=None, periodo_semanas=None):
     """
     Busca agendamentos no banco de dados MySQL, incluindo o ID do profissional.
     
+    Carrega todo o resultado em memória; as rotas de importação usam
+    `stream_agendamentos_mysql` para processar em lotes.
+    
     Args:
         database: Nome do banco de dados MySQL
         tabela: Nome da tabela de agendamentos no MySQL
@@ -123,91 +183,21 @@ async def buscar_agendamentos_mysql(database, tabela, limite=None, ultima_data_r
     Returns:
         list: Lista de agendamentos encontrados
     """
-    tunnel = None
     try:
-        # Configuração MySQL para conexão *final* (via túnel)
-        config_final = {
-            'host': '127.0.0.1',
-            'port': 3307,
-            'user': MYSQL_CONFIG['user'],
-            'password': MYSQL_CONFIG['password'],
-            'database': database,
-            'charset': MYSQL_CONFIG['charset'],
-            'cursorclass': MYSQL_CONFIG['cursorclass']
-        }
-
-        logger.info(f"Abrindo túnel SSH para {SSH_CONFIG['host']}:{SSH_CONFIG['port']}...")
-        # Criar túnel SSH (CORRIGIDO - usa remote_bind_address do MYSQL_CONFIG)
-        tunnel = sshtunnel.SSHTunnelForwarder(
-            (SSH_CONFIG['host'], SSH_CONFIG['port']),
-            ssh_username=SSH_CONFIG['user'],
-            ssh_password=SSH_CONFIG['password'],
-            remote_bind_address=(MYSQL_CONFIG['remote_host'], MYSQL_CONFIG['remote_port']), # Usa host/porta MySQL remotos
-            local_bind_address=('127.0.0.1', 3307)
+        sql, params = _montar_consulta_agendamentos(
+            tabela, limite, ultima_data_registro, ultima_data_atualizacao, periodo_semanas
         )
-        tunnel.start()
-
-        # Conectar ao MySQL (usando config_final)
-        conexao = pymysql.connect(**config_final)
-        
-        # Construir a consulta SQL com JOIN
-        sql = f"""SELECT s.*, sp.professional_id 
-                 FROM {tabela} s 
-                 LEFT JOIN ps_schedule_professionals sp ON s.schedule_id = sp.schedule_id 
-                 WHERE 1=1"""
-        params = []
-        
-        # Filtrar por período em semanas se fornecido
-        if periodo_semanas:
-            sql += f" AND s.schedule_date_start >= DATE_SUB(NOW(), INTERVAL %s WEEK)" # Alias s.
-            params.append(periodo_semanas)
-            logger.info(f"Filtrando agendamentos das últimas {periodo_semanas} semanas")
-        
-        # Filtrar por datas se fornecidas (usando alias s.)
-        if ultima_data_registro or ultima_data_atualizacao:
-            registro_campo = "s.schedule_registration_date"
-            atualizacao_campo = "s.schedule_lastupdate"
-            
-            sql += " AND (" # Iniciar grupo OR
-            first_condition = True
-            if ultima_data_registro:
-                sql += f" IFNULL({registro_campo}, '1900-01-01') > %s"
-                params.append(ultima_data_registro)
-                first_condition = False
-                
-            if ultima_data_atualizacao:
-                if not first_condition:
-                    sql += " OR"
-                sql += f" IFNULL({atualizacao_campo}, '1900-01-01') > %s"
-                params.append(ultima_data_atualizacao)
-            sql += ")" # Fechar grupo OR
-
-        # Ordenar por data de agendamento (usando alias s.)
-        sql += " ORDER BY s.schedule_date_start DESC"
-        
-        # Adicionar limite se fornecido
-        if limite:
-            sql += " LIMIT %s"
-            params.append(int(limite))
-        
-        # Executar a consulta
-        with conexao.cursor() as cursor:
-            cursor.execute(sql, params)
-            agendamentos = cursor.fetchall()
+        agendamentos = []
+        async with aclosing(stream_agendamentos_mysql(database, sql, params)) as lotes:
+            async for lote in lotes:
+                agendamentos.extend(lote)
             
-            logger.info(f"Encontrados {len(agendamentos)} agendamentos para importação")
-            return agendamentos
+        logger.info(f"Encontrados {len(agendamentos)} agendamentos para importação")
+        return agendamentos
     
     except Exception as e:
         logger.error(f"Erro ao buscar agendamentos no MySQL: {str(e)}")
         raise
-    
-    finally:
-        # Fechar conexão e túnel
-        if 'conexao' in locals() and conexao:
-            conexao.close()
-        if tunnel and tunnel.is_active:
-            tunnel.close()
 
 async def buscar_agendamentos_mysql_desde_data(database, tabela, data_inicial, data_final=None):
     """
@@ -219,53 +209,12 @@ async def buscar_agendamentos_mysql_desde_data(database, tabela, data_inicial, d
     - data_inicial: Data inicial para buscar agendamentos (formato YYYY-MM-DD)
     - data_final: Data final para buscar agendamentos (formato YYYY-MM-DD)
     """
-    tunnel = None
     try:
-        # Configuração MySQL para conexão *final* (via túnel)
-        config_final = {
-             'host': '127.0.0.1',
-             'port': 3307,
-             'user': MYSQL_CONFIG['user'],
-             'password': MYSQL_CONFIG['password'],
-             'database': database,
-             'charset': MYSQL_CONFIG['charset'],
-             'cursorclass': MYSQL_CONFIG['cursorclass']
-         }
-
-        logger.info(f"Abrindo túnel SSH para {SSH_CONFIG['host']}:{SSH_CONFIG['port']}...")
-        # Criar túnel SSH (CORRIGIDO - usa remote_bind_address do MYSQL_CONFIG)
-        tunnel = sshtunnel.SSHTunnelForwarder(
-            (SSH_CONFIG['host'], SSH_CONFIG['port']),
-            ssh_username=SSH_CONFIG['user'],
-            ssh_password=SSH_CONFIG['password'],
-            remote_bind_address=(MYSQL_CONFIG['remote_host'], MYSQL_CONFIG['remote_port']), # Usa host/porta MySQL remotos
-            local_bind_address=('127.0.0.1', 3307)
-        )
-        tunnel.start()
-
-        # Conectar ao MySQL (usando config_final)
-        conexao = pymysql.connect(**config_final)
-        
-        # Construir a consulta SQL com JOIN
-        sql = f"""SELECT s.*, sp.professional_id 
-                 FROM {tabela} s 
-                 LEFT JOIN ps_schedule_professionals sp ON s.schedule_id = sp.schedule_id 
-                 WHERE s.schedule_date_start >= %s""" # Alias s.
-        params = [data_inicial]
-
-        if data_final:
-             sql += " AND s.schedule_date_start <= %s" # Alias s.
-             params.append(data_final)
-        
-        sql += " ORDER BY s.schedule_date_start ASC" # Alias s.
-        
-        # Log completo da consulta para debug
-        logger.debug(f"Consulta SQL: {sql} - Parâmetros: {params}")
-        
-        # Executar a consulta
-        with conexao.cursor() as cursor:
-            cursor.execute(sql, params)
-            resultado = cursor.fetchall()
+        sql, params = _montar_consulta_agendamentos_desde_data(tabela, data_inicial, data_final)
+        resultado = []
+        async with aclosing(stream_agendamentos_mysql(database, sql, params)) as lotes:
+            async for lote in lotes:
+                resultado.extend(lote)
             
         logger.info(f"Encontrados {len(resultado)} agendamentos para importação de {data_inicial} até {data_final if data_final else 'hoje'}")
         
@@ -274,13 +223,6 @@ async def buscar_agendamentos_mysql_desde_data(database, tabela, data_inicial, d
     except Exception as e:
         logger.error(f"Erro ao buscar agendamentos do MySQL: {str(e)}")
         return []
-    
-    finally:
-        # Fechar conexão e túnel
-        if 'conexao' in locals() and conexao:
-            conexao.close()
-        if tunnel and tunnel.is_active:
-            tunnel.close()
 
 # Função auxiliar para dividir uma lista em lotes
 def chunks(lst, n):
@@ -288,9 +230,112 @@ def chunks(lst, n):
     for i in range(0, len(lst), n):
         yield lst[i:i + n]
 
-def mapear_agendamento(agendamento_mysql, usuario_id, supabase_client=None):
-    """Mapeia os dados de um agendamento MySQL para o formato do Supabase."""
-    
+
+class CacheMapeamentoAgendamento:
+    """
+    Cache dos IDs usados por `mapear_agendamento` para traduzir os IDs do
+    MySQL em UUIDs do Supabase, válido durante uma importação.
+
+    `carregar()` lê de uma vez as tabelas de pacientes, profissionais
+    (usuarios_aba), salas, locais e especialidades em dicionários, além do
+    procedimento padrão. IDs que não estão no cache são buscados no Supabase e
+    memorizados, inclusive quando não existem, para não repetir a consulta nas
+    linhas seguintes. Cada importação cria o seu cache; `invalidar()` descarta
+    os dados carregados.
+    """
+
+    # nome do mapa -> (tabela, coluna com o ID de origem)
+    TABELAS = {
+        "pacientes": ("pacientes", "id_origem"),
+        "profissionais": ("usuarios_aba", "user_id"),
+        "salas": ("salas", "room_id"),
+        "locais": ("locais", "local_id"),
+        "especialidades": ("especialidades", "especialidade_id"),
+    }
+    TAMANHO_PAGINA = 1000
+
+    def __init__(self, supabase_client: AsyncSupabaseClient):
+        self.supabase = supabase_client
+        self.invalidar()
+
+    def invalidar(self):
+        """Descarta todos os mapeamentos carregados."""
+        self.mapas: Dict[str, Dict[str, Optional[str]]] = {nome: {} for nome in self.TABELAS}
+        self._procedimento_padrao: Optional[str] = None
+        self._procedimento_carregado = False
+        self.consultas = 0
+
+    async def carregar(self):
+        """Pré-carrega as tabelas de mapeamento (uma consulta paginada por tabela)."""
+        for nome, (tabela, coluna) in self.TABELAS.items():
+            inicio = 0
+            while True:
+                response = await self.supabase.table(tabela) \
+                    .select(f"id, {coluna}") \
+                    .not_.is_(coluna, "null") \
+                    .order("id") \
+                    .range(inicio, inicio + self.TAMANHO_PAGINA - 1) \
+                    .execute()
+                self.consultas += 1
+                for registro in response.data or []:
+                    self.mapas[nome][str(registro[coluna])] = registro["id"]
+                if len(response.data or []) < self.TAMANHO_PAGINA:
+                    break
+                inicio += self.TAMANHO_PAGINA
+
+        await self.procedimento_padrao()
+        logger.info(
+            "Cache de mapeamento carregado: " +
+            ", ".join(f"{nome}={len(mapa)}" for nome, mapa in self.mapas.items()) +
+            f" ({self.consultas} consultas)"
+        )
+
+    async def obter_id(self, nome: str, id_origem) -> Optional[str]:
+        """
+        Retorna o UUID do Supabase para o ID de origem no mapa `nome`,
+        consultando o Supabase apenas se o ID ainda não estiver no cache.
+        """
+        chave = str(id_origem)
+        mapa = self.mapas[nome]
+        if chave in mapa:
+            return mapa[chave]
+
+        tabela, coluna = self.TABELAS[nome]
+        response = await self.supabase.table(tabela) \
+            .select("id") \
+            .eq(coluna, chave) \
+            .limit(1) \
+            .execute()
+        self.consultas += 1
+        mapa[chave] = response.data[0]["id"] if response.data else None
+        if mapa[chave] is None:
+            logger.warning(f"ID de origem {chave} não encontrado na tabela {tabela} ({coluna})")
+        return mapa[chave]
+
+    async def procedimento_padrao(self) -> Optional[str]:
+        """Retorna o procedimento padrão usado nos agendamentos importados."""
+        if not self._procedimento_carregado:
+            response = await self.supabase.table("procedimentos") \
+                .select("id") \
+                .limit(1) \
+                .execute()
+            self.consultas += 1
+            self._procedimento_padrao = response.data[0]["id"] if response.data else None
+            self._procedimento_carregado = True
+            logger.info(f"Usando procedimento padrão: {self._procedimento_padrao}")
+        return self._procedimento_padrao
+
+
+async def mapear_agendamento(agendamento_mysql, usuario_id, supabase_client=None, cache: Optional[CacheMapeamentoAgendamento] = None):
+    """
+    Mapeia os dados de um agendamento MySQL para o formato do Supabase.
+
+    Com um `cache` pré-carregado o mapeamento não faz consultas ao Supabase;
+    sem ele, é criado um cache vazio e cada ID é consultado sob demanda.
+    """
+    if cache is None and supabase_client:
+        cache = CacheMapeamentoAgendamento(supabase_client)
+
     # Funções auxiliares de conversão
     def converter_para_bool(valor):
         if valor is None:
@@ -357,41 +402,23 @@ def mapear_agendamento(agendamento_mysql, usuario_id, supabase_client=None):
     paciente_id = None
     id_paciente_origem = agendamento_mysql.get('schedule_pacient_id')
     
-    # Tenta mapear o paciente usando diretamente a tabela de pacientes (em vez da tabela de mapeamento)
-    if id_paciente_origem and supabase_client:
+    # Mapeia o paciente pelo id_origem da tabela de pacientes
+    if id_paciente_origem and cache:
         try:
             # Limpa o ID para garantir que é um número
             if isinstance(id_paciente_origem, str) and id_paciente_origem.isdigit():
                 id_paciente_origem = int(id_paciente_origem)
             
             if isinstance(id_paciente_origem, (int, float)):
-                # Buscar paciente pelo campo id_origem diretamente na tabela de pacientes
-                response = supabase_client.table("pacientes") \
-                    .select("id") \
-                    .eq("id_origem", str(id_paciente_origem)) \
-                    .execute()
-                
-                if response.data and len(response.data) > 0:
-                    paciente_id = response.data[0]["id"]
-                    logger.info(f"Paciente encontrado pelo id_origem: {id_paciente_origem} -> {paciente_id}")
-                else:
-                    logger.warning(f"ID de paciente não encontrado na tabela de pacientes: {id_paciente_origem}")
+                paciente_id = await cache.obter_id("pacientes", id_paciente_origem)
         except Exception as e:
             logger.error(f"Erro ao mapear ID do paciente: {str(e)}")
     
     # Tenta encontrar um procedimento adequado (simplificado por enquanto)
     procedimento_id = None
     try:
-        if supabase_client:
-            # Buscar um procedimento padrão
-            response = supabase_client.table("procedimentos") \
-                .select("id") \
-                .limit(1) \
-                .execute()
-            
-            if response.data and len(response.data) > 0:
-                procedimento_id = response.data[0]["id"]
-                logger.info(f"Usando procedimento padrão: {procedimento_id}")
+        if cache:
+            procedimento_id = await cache.procedimento_padrao()
     except Exception as e:
         logger.error(f"Erro ao buscar procedimento padrão: {str(e)}")
     
@@ -399,7 +426,7 @@ def mapear_agendamento(agendamento_mysql, usuario_id, supabase_client=None):
     profissional_supabase_id = None
     id_profissional_origem = agendamento_mysql.get('professional_id') # Usar o alias da query com JOIN
     
-    if id_profissional_origem and supabase_client:
+    if id_profissional_origem and cache:
         try:
             # Tenta converter para INT, pois pode vir como string do DB
             try:
@@ -409,77 +436,36 @@ def mapear_agendamento(agendamento_mysql, usuario_id, supabase_client=None):
                 id_profissional_int = None
 
             if id_profissional_int is not None:
-                # Buscar usuário na tabela usuarios_aba pelo user_id (INT)
-                response = supabase_client.table("usuarios_aba") \
-                    .select("id") \
-                    .eq("user_id", id_profissional_int) \
-                    .execute()
-                
-                if response.data and len(response.data) > 0:
-                    profissional_supabase_id = response.data[0]["id"]
-                    logger.info(f"Profissional mapeado: {id_profissional_int} -> {profissional_supabase_id}")
-                else:
-                    logger.warning(f"ID de profissional (user_id) não encontrado na tabela usuarios_aba: {id_profissional_int}")
+                # Usuário da tabela usuarios_aba pelo user_id (INT)
+                profissional_supabase_id = await cache.obter_id("profissionais", id_profissional_int)
         except Exception as e:
             logger.error(f"Erro ao mapear ID do profissional: {str(e)}")
     # --- Fim Mapeamento Profissional ---
 
-    # --- Mapeamento de Sala (MySQL INT -> Supabase UUID) ---
+    # --- Mapeamento de Sala, Local e Especialidade (MySQL INT -> Supabase UUID) ---
     sala_supabase_id = None
+    local_supabase_id = None
+    especialidade_supabase_id = None
     id_sala_origem = converter_para_int(agendamento_mysql.get('schedule_room_id'))
-    if id_sala_origem and supabase_client:
+    id_local_origem = converter_para_int(agendamento_mysql.get('schedule_local_id'))
+    id_especialidade_origem = converter_para_int(agendamento_mysql.get('schedule_especialidade_id'))
+    if cache:
         try:
-            response = supabase_client.table("salas") \
-                .select("id") \
-                .eq("room_id", str(id_sala_origem)) \
-                .limit(1) \
-                .execute()
-            if response.data and len(response.data) > 0:
-                sala_supabase_id = response.data[0]["id"]
-                logger.info(f"Sala mapeada: {id_sala_origem} -> {sala_supabase_id}")
-            else:
-                logger.warning(f"ID de Sala (room_id) não encontrado na tabela salas: {id_sala_origem}")
+            if id_sala_origem:
+                sala_supabase_id = await cache.obter_id("salas", id_sala_origem)
         except Exception as e:
             logger.error(f"Erro ao mapear ID da Sala: {str(e)}")
-    # --- Fim Mapeamento Sala ---
-
-    # --- Mapeamento de Local (MySQL INT -> Supabase UUID) ---
-    local_supabase_id = None
-    id_local_origem = converter_para_int(agendamento_mysql.get('schedule_local_id'))
-    if id_local_origem and supabase_client:
         try:
-            response = supabase_client.table("locais") \
-                .select("id") \
-                .eq("local_id", str(id_local_origem)) \
-                .limit(1) \
-                .execute()
-            if response.data and len(response.data) > 0:
-                local_supabase_id = response.data[0]["id"]
-                logger.info(f"Local mapeado: {id_local_origem} -> {local_supabase_id}")
-            else:
-                logger.warning(f"ID de Local (local_id) não encontrado na tabela locais: {id_local_origem}")
+            if id_local_origem:
+                local_supabase_id = await cache.obter_id("locais", id_local_origem)
         except Exception as e:
             logger.error(f"Erro ao mapear ID do Local: {str(e)}")
-    # --- Fim Mapeamento Local ---
-
-    # --- Mapeamento de Especialidade (MySQL INT -> Supabase UUID) ---
-    especialidade_supabase_id = None
-    id_especialidade_origem = converter_para_int(agendamento_mysql.get('schedule_especialidade_id'))
-    if id_especialidade_origem and supabase_client:
         try:
-            response = supabase_client.table("especialidades") \
-                .select("id") \
-                .eq("especialidade_id", str(id_especialidade_origem)) \
-                .limit(1) \
-                .execute()
-            if response.data and len(response.data) > 0:
-                especialidade_supabase_id = response.data[0]["id"]
-                logger.info(f"Especialidade mapeada: {id_especialidade_origem} -> {especialidade_supabase_id}")
-            else:
-                logger.warning(f"ID de Especialidade (especialidade_id) não encontrado na tabela especialidades: {id_especialidade_origem}")
+            if id_especialidade_origem:
+                especialidade_supabase_id = await cache.obter_id("especialidades", id_especialidade_origem)
         except Exception as e:
             logger.error(f"Erro ao mapear ID da Especialidade: {str(e)}")
-    # --- Fim Mapeamento Especialidade ---
+    # --- Fim Mapeamento Sala, Local e Especialidade ---
 
     # Mapear o pagamento (nome descritivo)
     pagamento = None
@@ -606,6 +592,134 @@ def safe_str(obj):
     return str(obj)
 
 
+TAMANHO_LOTE_UPSERT = 500
+
+
+async def _upsert_agendamentos_individualmente(
+    supabase: AsyncSupabaseClient,
+    linhas: List[Dict[str, Any]],
+    resultado: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Grava as linhas uma a uma, registrando os erros; retorna as gravadas."""
+    gravadas = []
+    for agendamento in linhas:
+        try:
+            await supabase.table("agendamentos") \
+                .upsert(agendamento, on_conflict="id_origem", returning=ReturnMethod.minimal) \
+                .execute()
+            gravadas.append(agendamento)
+        except Exception as e:
+            mensagem = f"Erro ao gravar agendamento {agendamento['id_origem']}: {safe_str(e)}"
+            logger.error(mensagem)
+            resultado["mensagens"].append(mensagem)
+            resultado["erros"] += 1
+    return gravadas
+
+
+async def upsert_agendamentos_em_lotes(
+    supabase: AsyncSupabaseClient,
+    agendamentos_dados: List[Dict[str, Any]],
+    tamanho_lote: int = TAMANHO_LOTE_UPSERT
+) -> Dict[str, Any]:
+    """
+    Grava os agendamentos mapeados com upsert em lote pelo id_origem.
+
+    Em cada lote é feita uma consulta para saber quais id_origem já existem
+    (para os contadores de importados/atualizados) e um upsert por conjunto
+    de colunas: como `mapear_agendamento` remove os campos nulos, linhas com
+    colunas diferentes são gravadas separadamente para que um campo ausente
+    não apague o valor já gravado. Se um upsert falhar, as suas linhas são
+    gravadas uma a uma, isolando apenas as que têm erro.
+
+    Returns:
+        Dict: importados, atualizados, erros e mensagens de erro
+    """
+    resultado = {"importados": 0, "atualizados": 0, "erros": 0, "mensagens": []}
+
+    # Um mesmo id_origem não pode aparecer duas vezes no mesmo upsert;
+    # prevalece a última ocorrência, como no processamento linha a linha
+    por_id_origem = {a["id_origem"]: a for a in agendamentos_dados}
+    unicos = list(por_id_origem.values())
+
+    for numero_lote, lote in enumerate(chunks(unicos, tamanho_lote), start=1):
+        try:
+            response = await supabase.table("agendamentos") \
+                .select("id_origem") \
+                .in_("id_origem", [a["id_origem"] for a in lote]) \
+                .execute()
+            existentes = {r["id_origem"] for r in response.data or []}
+        except Exception as e:
+            mensagem = f"Erro ao consultar agendamentos existentes do lote {numero_lote}: {safe_str(e)}"
+            logger.error(mensagem)
+            resultado["mensagens"].append(mensagem)
+            resultado["erros"] += len(lote)
+            continue
+
+        grupos: Dict[frozenset, List[Dict[str, Any]]] = {}
+        for agendamento in lote:
+            grupos.setdefault(frozenset(agendamento), []).append(agendamento)
+
+        for linhas in grupos.values():
+            try:
+                await supabase.table("agendamentos") \
+                    .upsert(linhas, on_conflict="id_origem", returning=ReturnMethod.minimal) \
+                    .execute()
+            except Exception as e:
+                logger.error(f"Erro no upsert do lote {numero_lote}, gravando linha a linha: {safe_str(e)}")
+                linhas = await _upsert_agendamentos_individualmente(supabase, linhas, resultado)
+            for agendamento in linhas:
+                resultado["atualizados" if agendamento["id_origem"] in existentes else "importados"] += 1
+
+        logger.info(f"Lote {numero_lote} de agendamentos gravado ({len(lote)} registros)")
+
+    return resultado
+
+
+async def importar_lote_agendamentos(
+    lote_mysql: List[Dict[str, Any]],
+    usuario_id: str,
+    supabase: AsyncSupabaseClient,
+    cache_mapeamento: CacheMapeamentoAgendamento
+) -> Dict[str, Any]:
+    """
+    Mapeia um lote de agendamentos do MySQL (sem consultas ao Supabase,
+    usando o cache) e grava o lote com upsert pelo id_origem.
+
+    Returns:
+        Dict: importados, atualizados, erros e mensagens de erro
+    """
+    erros = 0
+    mensagens = []
+    agendamentos_dados = []
+    for agendamento_mysql in lote_mysql:
+        try:
+            # Obter o ID de origem do agendamento
+            id_origem = str(agendamento_mysql.get('schedule_id', ''))
+            
+            if not id_origem:
+                logger.warning(f"Agendamento sem ID de origem: {agendamento_mysql}")
+                mensagens.append("Agendamento sem ID de origem")
+                erros += 1
+                continue
+            
+            # Mapear o agendamento do formato MySQL para o formato Supabase
+            agendamento_dados = await mapear_agendamento(agendamento_mysql, usuario_id, supabase, cache_mapeamento)
+            
+            # Serializar objetos datetime e decimais antes de qualquer operação
+            agendamentos_dados.append(ensure_serializable(agendamento_dados))
+        
+        except Exception as e:
+            erro = f"Erro ao processar agendamento: {safe_str(e)}"
+            logger.error(erro)
+            mensagens.append(erro)
+            erros += 1
+
+    resultado = await upsert_agendamentos_em_lotes(supabase, agendamentos_dados)
+    resultado["erros"] += erros
+    resultado["mensagens"] = mensagens + resultado["mensagens"]
+    return resultado
+
+
 @router.post(
     "/importar",
     summary="Importar Agendamentos do MySQL",
@@ -613,7 +727,7 @@ def safe_str(obj):
 )
 async def importar_agendamentos_mysql(
     dados: dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     """
     Importa agendamentos do MySQL para o Supabase com controle de datas e pré-processamento.
@@ -640,17 +754,17 @@ async def importar_agendamentos_mysql(
         
         # Se o usuário for "sistema", vamos verificar se o UUID correspondente existe
         if usuario_id == "sistema":
-            db = get_supabase_client()
+            db = get_async_supabase_client()
             sistema_uuid = "00000000-0000-0000-0000-000000000000"
             
             # Verificar se o usuário sistema já existe
-            result = db.table("usuarios").select("*").eq("id", sistema_uuid).execute()
+            result = await db.table("usuarios").select("*").eq("id", sistema_uuid).execute()
             
             if not result.data:
                 logger.info("Usuário sistema não encontrado, criando-o agora")
                 try:
                     # Criar usuário sistema se não existir
-                    db.table("usuarios").insert({
+                    await db.table("usuarios").insert({
                         "id": sistema_uuid,
                         "nome": "Sistema",
                         "email": "sistema@sistema.com",
@@ -675,8 +789,8 @@ async def importar_agendamentos_mysql(
         
         # Buscar a última importação para controle de datas
         # Utilizamos a tabela controle_importacao_agendamentos
-        db = get_supabase_client()
-        ultima_importacao_result = db.table("controle_importacao_agendamentos") \
+        db = get_async_supabase_client()
+        ultima_importacao_result = await db.table("controle_importacao_agendamentos") \
             .select("*") \
             .order("timestamp_importacao", desc=True) \
             .limit(1) \
@@ -715,81 +829,36 @@ async def importar_agendamentos_mysql(
         # else:
         #     logger.info(f"Mapeamento de pacientes: {mapeamento_msg}")
         
-        # Buscar os agendamentos do MySQL
-        agendamentos_mysql = await buscar_agendamentos_mysql(
-            database, 
+        # Tabelas de mapeamento carregadas uma vez para toda a importação
+        cache_mapeamento = CacheMapeamentoAgendamento(supabase)
+        await cache_mapeamento.carregar()
+        
+        # Contadores para o relatório
+        total_lidos = 0
+        contador_importados = 0
+        contador_atualizados = 0
+        contador_erros = 0
+        
+        # Ler os agendamentos do MySQL em lotes e gravar cada lote assim que chega
+        sql, params = _montar_consulta_agendamentos(
             tabela, 
             limit, 
             ultima_data_registro, 
             ultima_data_atualizacao,
             periodo_semanas
         )
-        
-        if not agendamentos_mysql:
+        async with aclosing(stream_agendamentos_mysql(database, sql, params)) as lotes:
+            async for lote_mysql in lotes:
+                total_lidos += len(lote_mysql)
+                logger.info(f"Importando lote de {len(lote_mysql)} agendamentos ({total_lidos} lidos)")
+                resultado_lote = await importar_lote_agendamentos(lote_mysql, usuario_id, supabase, cache_mapeamento)
+                contador_importados += resultado_lote["importados"]
+                contador_atualizados += resultado_lote["atualizados"]
+                contador_erros += resultado_lote["erros"]
+        
+        if not total_lidos:
             return {"message": "Nenhum agendamento encontrado para importação", "quantidade": 0}
         
-        logger.info(f"Iniciando importação de {len(agendamentos_mysql)} agendamentos")
-        
-        # Contadores para o relatório
-        contador_importados = 0
-        contador_atualizados = 0
-        contador_erros = 0
-        
-        # Processar os agendamentos
-        for agendamento_mysql in agendamentos_mysql:
-            try:
-                # Obter o ID de origem do agendamento
-                id_origem = str(agendamento_mysql.get('schedule_id', ''))
-                
-                if not id_origem:
-                    logger.warning(f"Agendamento sem ID de origem: {agendamento_mysql}")
-                    contador_erros += 1
-                    continue
-                
-                # Verificar se o agendamento já existe no Supabase
-                response = supabase.table('agendamentos') \
-                    .select('*') \
-                    .eq('id_origem', id_origem) \
-                    .execute()
-                
-                agendamento_existente = response.data[0] if response.data else None
-                
-                # Mapear o agendamento do formato MySQL para o formato Supabase
-                agendamento_dados = mapear_agendamento(agendamento_mysql, usuario_id, supabase)
-                
-                # Serializar objetos datetime antes de qualquer operação
-                agendamento_dados = ensure_serializable(agendamento_dados)
-                
-                if agendamento_existente:
-                    # Atualizar o agendamento existente
-                    response = supabase.table('agendamentos') \
-                        .update(agendamento_dados) \
-                        .eq('id', agendamento_existente['id']) \
-                        .execute()
-                    
-                    if response.data:
-                        logger.info(f"Agendamento atualizado com sucesso: {id_origem}")
-                        contador_atualizados += 1
-                    else:
-                        logger.error(f"Erro ao atualizar agendamento: {id_origem}")
-                        contador_erros += 1
-                else:
-                    # Criar um novo agendamento
-                    response = supabase.table('agendamentos') \
-                        .insert(agendamento_dados) \
-                        .execute()
-                    
-                    if response.data:
-                        logger.info(f"Agendamento importado com sucesso: {id_origem}")
-                        contador_importados += 1
-                    else:
-                        logger.error(f"Erro ao importar agendamento: {id_origem}")
-                        contador_erros += 1
-            
-            except Exception as e:
-                logger.error(f"Erro ao processar agendamento: {str(e)}")
-                contador_erros += 1
-        
         # Preparar variáveis de data para uso em todo o escopo da função
         # Verificar se as variáveis são objetos datetime ou strings
         if ultima_data_registro:
@@ -846,7 +915,7 @@ async def importar_agendamentos_mysql(
                 
                 # Inserir na tabela de controle
                 logger.info(f"Registrando na tabela controle_importacao_agendamentos: {import_data}")
-                db.table("controle_importacao_agendamentos").insert(import_data).execute()
+                await db.table("controle_importacao_agendamentos").insert(import_data).execute()
                 logger.info("Registro de importação salvo com sucesso")
             except Exception as e:
                 logger.error(f"Erro ao registrar importação: {str(e)}")
@@ -857,7 +926,7 @@ async def importar_agendamentos_mysql(
             "success": True,
             "message": f"Importação concluída. {contador_importados} agendamentos importados das últimas {periodo_semanas} semanas, {contador_atualizados} atualizados com sucesso.",
             "importados": contador_importados,
-            "total": len(agendamentos_mysql),
+            "total": total_lidos,
             "total_erros": contador_erros,
             "total_atualizados": contador_atualizados,
             "erros": [],
@@ -893,7 +962,7 @@ async def importar_agendamentos_mysql(
 )
 async def importar_agendamentos_desde_data(
     dados: dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     """
     Importa agendamentos do MySQL para o Supabase a partir de uma data específica até uma data final.
@@ -904,7 +973,6 @@ async def importar_agendamentos_desde_data(
     - data_inicial: Data inicial para importar agendamentos (formato YYYY-MM-DD)
     - data_final: Data final para importar agendamentos (formato YYYY-MM-DD)
     """
-    tunnel = None
     try:
         # Extrair os parâmetros do corpo da requisição
         database = dados.get("database", "abalarissa_db")  # Valor padrão
@@ -931,17 +999,17 @@ async def importar_agendamentos_desde_data(
         
         # Se o usuário for "sistema", vamos verificar se o UUID correspondente existe
         if usuario_id == "sistema":
-            db = get_supabase_client()
+            db = get_async_supabase_client()
             sistema_uuid = "00000000-0000-0000-0000-000000000000"
             
             # Verificar se o usuário sistema já existe
-            result = db.table("usuarios").select("*").eq("id", sistema_uuid).execute()
+            result = await db.table("usuarios").select("*").eq("id", sistema_uuid).execute()
             
             if not result.data:
                 logger.info("Usuário sistema não encontrado, criando-o agora")
                 try:
                     # Criar usuário sistema se não existir
-                    db.table("usuarios").insert({
+                    await db.table("usuarios").insert({
                         "id": sistema_uuid,
                         "nome": "Sistema",
                         "email": "sistema@sistema.com",
@@ -980,15 +1048,32 @@ async def importar_agendamentos_desde_data(
         # else:
         #     logger.info(f"Mapeamento de pacientes: {mapeamento_msg}")
         
-        # Buscar os agendamentos do MySQL desde a data específica
-        agendamentos_mysql = await buscar_agendamentos_mysql_desde_data(
-            database, 
-            tabela, 
-            data_inicial,
-            data_final
-        )
+        # Tabelas de mapeamento carregadas uma vez para toda a importação
+        cache_mapeamento = CacheMapeamentoAgendamento(supabase)
+        await cache_mapeamento.carregar()
         
-        if not agendamentos_mysql:
+        # Contadores para o relatório
+        total_lidos = 0
+        contador_importados = 0
+        contador_atualizados = 0
+        contador_erros = 0
+        erros = []
+        
+        # Ler os agendamentos do MySQL desde a data específica em lotes e
+        # gravar cada lote assim que chega
+        logger.info(f"Iniciando importação de agendamentos a partir de {data_inicial}")
+        sql, params = _montar_consulta_agendamentos_desde_data(tabela, data_inicial, data_final)
+        async with aclosing(stream_agendamentos_mysql(database, sql, params)) as lotes:
+            async for lote_mysql in lotes:
+                total_lidos += len(lote_mysql)
+                logger.info(f"Importando lote de {len(lote_mysql)} agendamentos ({total_lidos} lidos)")
+                resultado_lote = await importar_lote_agendamentos(lote_mysql, usuario_id, supabase, cache_mapeamento)
+                contador_importados += resultado_lote["importados"]
+                contador_atualizados += resultado_lote["atualizados"]
+                contador_erros += resultado_lote["erros"]
+                erros.extend(resultado_lote["mensagens"])
+        
+        if not total_lidos:
             return {
                 "success": True,
                 "message": f"Nenhum agendamento encontrado a partir de {data_inicial}",
@@ -1002,77 +1087,6 @@ async def importar_agendamentos_desde_data(
                 "data_inicial": data_inicial
             }
         
-        logger.info(f"Iniciando importação de {len(agendamentos_mysql)} agendamentos a partir de {data_inicial}")
-        
-        # Contadores para o relatório
-        contador_importados = 0
-        contador_atualizados = 0
-        contador_erros = 0
-        erros = []
-        
-        # Processar os agendamentos
-        for agendamento_mysql in agendamentos_mysql:
-            try:
-                # Obter o ID de origem do agendamento
-                id_origem = str(agendamento_mysql.get('schedule_id', ''))
-                
-                if not id_origem:
-                    logger.warning(f"Agendamento sem ID de origem: {agendamento_mysql}")
-                    erro = f"Agendamento sem ID de origem"
-                    erros.append(erro)
-                    contador_erros += 1
-                    continue
-                
-                # Verificar se o agendamento já existe no Supabase
-                response = supabase.table('agendamentos') \
-                    .select('*') \
-                    .eq('id_origem', id_origem) \
-                    .execute()
-                
-                agendamento_existente = response.data[0] if response.data else None
-                
-                # Mapear o agendamento do formato MySQL para o formato Supabase
-                agendamento_dados = mapear_agendamento(agendamento_mysql, usuario_id, supabase)
-                
-                # Serializar objetos datetime e decimais antes de qualquer operação
-                agendamento_dados = ensure_serializable(agendamento_dados)
-                
-                if agendamento_existente:
-                    # Atualizar o agendamento existente
-                    response = supabase.table('agendamentos') \
-                        .update(agendamento_dados) \
-                        .eq('id', agendamento_existente['id']) \
-                        .execute()
-                    
-                    if response.data:
-                        logger.info(f"Agendamento atualizado com sucesso: {id_origem}")
-                        contador_atualizados += 1
-                    else:
-                        erro = f"Erro ao atualizar agendamento: {id_origem}"
-                        logger.error(erro)
-                        erros.append(erro)
-                        contador_erros += 1
-                else:
-                    # Criar um novo agendamento
-                    response = supabase.table('agendamentos') \
-                        .insert(agendamento_dados) \
-                        .execute()
-                    
-                    if response.data:
-                        logger.info(f"Agendamento importado com sucesso: {id_origem}")
-                        contador_importados += 1
-                    else:
-                        erro = f"Erro ao importar agendamento: {id_origem}"
-                        logger.error(erro)
-                        erros.append(erro)
-                        contador_erros += 1
-            
-            except Exception as e:
-                erro = f"Erro ao processar agendamento: {safe_str(e)}"
-                logger.error(erro)
-                erros.append(erro)
-                contador_erros += 1
-        
         # Registrar a importação no controle de importação
         if contador_importados > 0 or contador_atualizados > 0:
             try:
@@ -1117,7 +1131,7 @@ async def importar_agendamentos_desde_data(
                 
                 # Inserir na tabela de controle
                 logger.info(f"Registrando na tabela controle_importacao_agendamentos: {import_data}")
-                db.table("controle_importacao_agendamentos").insert(import_data).execute()
+                await db.table("controle_importacao_agendamentos").insert(import_data).execute()
                 logger.info("Registro de importação salvo com sucesso")
             except Exception as e:
                 logger.error(f"Erro ao registrar importação: {str(e)}")
@@ -1132,7 +1146,7 @@ async def importar_agendamentos_desde_data(
             "success": True,
             "message": f"Importação concluída. {contador_importados} novos agendamentos importados a partir de {data_inicial}, {contador_atualizados} atualizados.",
             "importados": contador_importados + contador_atualizados,
-            "total": len(agendamentos_mysql),
+            "total": total_lidos,
             "total_erros": contador_erros,
             "total_atualizados": contador_atualizados,
             "erros": erros,
@@ -1167,7 +1181,7 @@ async def importar_agendamentos_desde_data(
 )
 async def verificar_quantidade_agendamentos(
     dados: dict,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     """
     Verifica a quantidade de agendamentos disponíveis para importação sem realizar a importação.
@@ -1177,7 +1191,6 @@ async def verificar_quantidade_agendamentos(
     - tabela: Nome da tabela de agendamentos
     - data_inicial: Data inicial para verificar agendamentos (formato YYYY-MM-DD)
     """
-    tunnel = None
     try:
         # Extrair os parâmetros do corpo da requisição
         database = dados.get("database", "abalarissa_db")  # Valor padrão
@@ -1217,31 +1230,6 @@ async def verificar_quantidade_agendamentos(
                 logger.error(f"Erro ao formatar data: {str(e)}")
                 data_formatada = data_inicial
         
-        # Configuração MySQL para conexão *final* (via túnel)
-        config_final = {
-            'host': '127.0.0.1',
-            'port': 3307,
-            'user': MYSQL_CONFIG['user'],
-            'password': MYSQL_CONFIG['password'],
-            'database': database, # 'database' foi extraído dos 'dados'
-            'charset': MYSQL_CONFIG['charset'],
-            'cursorclass': MYSQL_CONFIG['cursorclass']
-        }
-
-        logger.info(f"Abrindo túnel SSH para {SSH_CONFIG['host']}:{SSH_CONFIG['port']}...")
-        # Criar túnel SSH (CORRIGIDO - usa remote_bind_address do MYSQL_CONFIG)
-        tunnel = sshtunnel.SSHTunnelForwarder(
-            (SSH_CONFIG['host'], SSH_CONFIG['port']),
-            ssh_username=SSH_CONFIG['user'],
-            ssh_password=SSH_CONFIG['password'],
-            remote_bind_address=(MYSQL_CONFIG['remote_host'], MYSQL_CONFIG['remote_port']), # Usa host/porta MySQL remotos
-            local_bind_address=('127.0.0.1', 3307)
-        )
-        tunnel.start()
-
-        # Conectar ao MySQL (usando config_final)
-        conexao = pymysql.connect(**config_final)
-        
         # Construir a consulta SQL para contar
         sql = f"SELECT COUNT(*) as total FROM {tabela} WHERE schedule_date_start >= %s"
         params = [data_formatada]
@@ -1278,11 +1266,15 @@ async def verificar_quantidade_agendamentos(
         # Log completo da consulta para debug
         logger.debug(f"Consulta SQL para contagem: {sql} - Parâmetros: {params}")
         
-        # Executar a consulta de contagem
-        with conexao.cursor() as cursor:
-            cursor.execute(sql, params)
-            resultado = cursor.fetchone()
-            quantidade = resultado['total'] if resultado and 'total' in resultado else 0
+        # Executar a consulta de contagem (em uma thread, como o empréstimo da conexão)
+        def _contar():
+            with get_gerenciador_mysql().conexao(database) as conexao:
+                with conexao.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return cursor.fetchone()
+
+        resultado = await asyncio.to_thread(_contar)
+        quantidade = resultado['total'] if resultado and 'total' in resultado else 0
             
         logger.info(f"Encontrados {quantidade} agendamentos para importação a partir de {data_formatada}")
         
@@ -1300,13 +1292,6 @@ async def verificar_quantidade_agendamentos(
             "message": f"Erro ao verificar quantidade de agendamentos: {str(e)}",
             "quantidade": 0
         }
-    
-    finally:
-        # Fechar conexão e túnel
-        if 'conexao' in locals() and conexao:
-            conexao.close()
-        if tunnel and tunnel.is_active:
-            tunnel.close()
 
 # Definir modelo para agendamento
 class AgendamentoBase(BaseModel):
@@ -1376,7 +1361,8 @@ async def listar_agendamentos(
     status_vinculacao: Optional[str] = Query(None, description="Filtrar por status de vinculação específico (Pendente, Ficha OK, Unimed OK, Completo)"), 
     order_column: str = Query("data_agendamento", description="Coluna para ordenação"),
     order_direction: str = Query("desc", description="Direção da ordenação (asc ou desc)"),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    count: str = Query("exact", regex=REGEX_TIPO_CONTAGEM, description="Contagem do total: exact, planned (estimativa do planejador) ou estimated"),
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     """
     Lista agendamentos usando a função func_listar_agendamentos_view via RPC.
@@ -1395,18 +1381,11 @@ async def listar_agendamentos(
         }
         params = {k: v for k, v in params.items() if v is not None}
 
-        # --- INÍCIO DA ALTERAÇÃO: Usar asyncio.to_thread ---
-        # Executa a chamada síncrona em um thread separado
-        response = await asyncio.to_thread(
-            lambda: supabase.rpc("func_listar_agendamentos_view", params).execute()
-        )
-        # --- FIM DA ALTERAÇÃO ---
+        response = await supabase.rpc("func_listar_agendamentos_view", params).execute()
         
         # Contagem total (simplificada para evitar erro de permissão na view)
         # Conta diretamente na tabela agendamentos (não reflete filtros da view/rpc)
-        count_response = await asyncio.to_thread(
-            lambda: supabase.table("agendamentos").select("id", count="exact").execute() 
-        )
+        count_response = await supabase.table("agendamentos").select("id", count=count).limit(1).execute()
         total_count = count_response.count if count_response.count is not None else 0
         
         if not hasattr(response, 'data'):
@@ -1447,11 +1426,11 @@ async def listar_agendamentos(
 )
 async def obter_agendamento(
     id: str = Path(..., description="ID do agendamento"),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         # Buscar o agendamento pelo ID
-        result = supabase.table("agendamentos").select("*").eq("id", id).execute()
+        result = await supabase.table("agendamentos").select("*").eq("id", id).execute()
 
         # Verificar se o agendamento foi encontrado
         if not result.data or len(result.data) == 0:
@@ -1468,19 +1447,19 @@ async def obter_agendamento(
         carteirinha = None
         if agendamento.get("paciente_id"):
             # Buscar dados do paciente
-            paciente_result = supabase.table("pacientes").select("nome").eq("id", agendamento["paciente_id"]).execute()
+            paciente_result = await supabase.table("pacientes").select("nome").eq("id", agendamento["paciente_id"]).execute()
             if paciente_result.data and len(paciente_result.data) > 0:
                 paciente_nome = paciente_result.data[0].get("nome")
                 
             # Buscar carteirinha do paciente
-            carteirinha_result = supabase.table("carteirinhas").select("numero_carteirinha").eq("paciente_id", agendamento["paciente_id"]).execute()
+            carteirinha_result = await supabase.table("carteirinhas").select("numero_carteirinha").eq("paciente_id", agendamento["paciente_id"]).execute()
             if carteirinha_result.data and len(carteirinha_result.data) > 0:
                 carteirinha = carteirinha_result.data[0].get("numero_carteirinha")
         
         # Buscar nome do procedimento
         procedimento_nome = None
         if agendamento.get("procedimento_id"):
-            procedimento_result = supabase.table("procedimentos").select("nome").eq("id", agendamento["procedimento_id"]).execute()
+            procedimento_result = await supabase.table("procedimentos").select("nome").eq("id", agendamento["procedimento_id"]).execute()
             if procedimento_result.data and len(procedimento_result.data) > 0:
                 procedimento_nome = procedimento_result.data[0].get("nome")
         
@@ -1511,7 +1490,7 @@ async def obter_agendamento(
 )
 async def criar_agendamento(
     agendamento: AgendamentoCreate,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         # Preparar dados para inserção
@@ -1525,7 +1504,7 @@ async def criar_agendamento(
         agendamento_dict = format_date_fields(agendamento_dict, DATE_FIELDS)
         
         # Inserir no banco de dados
-        result = supabase.table("agendamentos").insert(agendamento_dict).execute()
+        result = await supabase.table("agendamentos").insert(agendamento_dict).execute()
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -1555,11 +1534,11 @@ async def criar_agendamento(
 async def atualizar_agendamento(
     id: str = Path(..., description="ID do agendamento"),
     agendamento: AgendamentoUpdate = None,
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         # Verificar se o agendamento existe
-        check_result = supabase.table("agendamentos").select("id").eq("id", id).execute()
+        check_result = await supabase.table("agendamentos").select("id").eq("id", id).execute()
         
         if not check_result.data or len(check_result.data) == 0:
             raise HTTPException(
@@ -1577,7 +1556,7 @@ async def atualizar_agendamento(
         agendamento_dict = format_date_fields(agendamento_dict, DATE_FIELDS)
         
         # Atualizar no banco de dados
-        result = supabase.table("agendamentos").update(agendamento_dict).eq("id", id).execute()
+        result = await supabase.table("agendamentos").update(agendamento_dict).eq("id", id).execute()
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -1606,11 +1585,11 @@ async def atualizar_agendamento(
 )
 async def excluir_agendamento(
     id: str = Path(..., description="ID do agendamento"),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         # Verificar se o agendamento existe
-        check_result = supabase.table("agendamentos").select("id").eq("id", id).execute()
+        check_result = await supabase.table("agendamentos").select("id").eq("id", id).execute()
         
         if not check_result.data or len(check_result.data) == 0:
             raise HTTPException(
@@ -1619,7 +1598,7 @@ async def excluir_agendamento(
             )
         
         # Excluir do banco de dados
-        result = supabase.table("agendamentos").delete().eq("id", id).execute()
+        result = await supabase.table("agendamentos").delete().eq("id", id).execute()
         
         return {
             "success": True,
@@ -6,7 +6,7 @@ from ..repositories.divergencia import DivergenciaRepository
 from ..repositories.auditoria_execucao import AuditoriaExecucaoRepository
 from ..models.divergencia import DivergenciaCreate, DivergenciaUpdate, TipoDivergencia, StatusDivergencia
 from ..utils.date_utils import formatar_data
-from backend.repositories.database_supabase import get_supabase_client
+from backend.repositories.database_async import get_async_supabase_client
 from uuid import UUID
 
 router = APIRouter(prefix="/auditoria", tags=["Auditoria"])
@@ -15,7 +15,7 @@ router = APIRouter(prefix="/auditoria", tags=["Auditoria"])
 async def iniciar_auditoria(
     data_inicio: Optional[str] = None,
     data_fim: Optional[str] = None,
-    db = Depends(get_supabase_client)
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
     """Inicia uma nova auditoria"""
     try:
@@ -31,15 +31,16 @@ async def iniciar_auditoria(
 async def executar_auditoria(
     data_inicio: Optional[str] = None,
     data_fim: Optional[str] = None,
-    db = Depends(get_supabase_client)
+    incremental: bool = Query(False, description="Audita apenas o que mudou desde a última auditoria"),
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
-    """Executa uma auditoria completa"""
+    """Executa uma auditoria (completa ou incremental)"""
     try:
         divergencia_repository = DivergenciaRepository(db)
         auditoria_repository = AuditoriaExecucaoRepository(db)
         service = AuditoriaService(divergencia_repository, auditoria_repository)
         
-        return await service.realizar_auditoria_completa(data_inicio, data_fim)
+        return await service.realizar_auditoria_completa(data_inicio, data_fim, incremental)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -52,7 +53,7 @@ async def listar_divergencias(
     status: Optional[str] = None,
     tipo: Optional[str] = None,
     prioridade: Optional[str] = None,
-    db = Depends(get_supabase_client)
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
     """Lista divergências com paginação e filtros"""
     try:
@@ -75,7 +76,7 @@ async def listar_divergencias(
 @router.get("/divergencias/{divergencia_id}")
 async def obter_divergencia(
     divergencia_id: str,
-    db = Depends(get_supabase_client)
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
     """Obtém uma divergência pelo ID"""
     try:
@@ -90,7 +91,7 @@ async def obter_divergencia(
 async def atualizar_divergencia(
     divergencia_id: str,
     divergencia: DivergenciaUpdate,
-    db = Depends(get_supabase_client)
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
     """Atualiza uma divergência"""
     try:
@@ -106,7 +107,7 @@ async def atualizar_status_divergencia(
     divergencia_id: str,
     novo_status: str,
     usuario_id: Optional[str] = None,
-    db = Depends(get_supabase_client)
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
     """Atualiza o status de uma divergência"""
     try:
@@ -131,7 +132,7 @@ async def atualizar_status_divergencia(
 
 @router.get("/estatisticas")
 async def obter_estatisticas(
-    db = Depends(get_supabase_client)
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
     """Obtém estatísticas das divergências"""
     try:
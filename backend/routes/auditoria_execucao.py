@@ -5,7 +5,7 @@ from ..repositories.auditoria_execucao import AuditoriaExecucaoRepository
 from ..repositories.divergencia_auditoria import DivergenciaAuditoriaRepository
 from ..services.auditoria_execucao import AuditoriaExecucaoService
 from ..services.divergencia_auditoria import DivergenciaAuditoriaService
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 from ..schemas.responses import StandardResponse
 from ..models.auditoria_execucao import AuditoriaExecucao
 from ..utils.date_utils import formatar_data
@@ -17,13 +17,13 @@ router = APIRouter(redirect_slashes=False, tags=["Auditoria Execução"])
 
 
 def get_auditoria_execucao_repository(
-    db: SupabaseClient = Depends(get_supabase_client),
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client),
 ) -> AuditoriaExecucaoRepository:
     return AuditoriaExecucaoRepository(db)
 
 
 def get_divergencia_auditoria_repository(
-    db: SupabaseClient = Depends(get_supabase_client),
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client),
 ) -> DivergenciaAuditoriaRepository:
     return DivergenciaAuditoriaRepository(db)
 
@@ -231,7 +231,7 @@ async def listar_execucoes(
     data_inicio: Optional[str] = None,
     data_fim: Optional[str] = None,
     status: Optional[str] = None,
-    db=Depends(get_supabase_client),
+    db=Depends(get_async_supabase_client),
 ) -> Dict:
     """Lista execuções de auditoria com paginação e filtros"""
     try:
@@ -250,7 +250,7 @@ async def listar_execucoes(
 
 
 @router.get("/{execucao_id}")
-async def obter_execucao(execucao_id: str, db=Depends(get_supabase_client)) -> Dict:
+async def obter_execucao(execucao_id: str, db=Depends(get_async_supabase_client)) -> Dict:
     """Obtém uma execução de auditoria pelo ID"""
     try:
         repository = AuditoriaExecucaoRepository(db)
@@ -269,7 +269,7 @@ async def obter_execucao(execucao_id: str, db=Depends(get_supabase_client)) -> D
 
 @router.put("/{execucao_id}")
 async def atualizar_execucao(
-    execucao_id: str, data: Dict, db=Depends(get_supabase_client)
+    execucao_id: str, data: Dict, db=Depends(get_async_supabase_client)
 ) -> Dict:
     """Atualiza uma execução de auditoria"""
     try:
@@ -288,7 +288,7 @@ async def atualizar_execucao(
 
 
 @router.delete("/{execucao_id}")
-async def deletar_execucao(execucao_id: str, db=Depends(get_supabase_client)) -> Dict:
+async def deletar_execucao(execucao_id: str, db=Depends(get_async_supabase_client)) -> Dict:
     """Deleta uma execução de auditoria"""
     try:
         repository = AuditoriaExecucaoRepository(db)
@@ -313,7 +313,7 @@ async def listar_divergencias_execucao(
     status: Optional[str] = None,
     tipo: Optional[str] = None,
     prioridade: Optional[str] = None,
-    db=Depends(get_supabase_client),
+    db=Depends(get_async_supabase_client),
 ) -> Dict:
     """Lista divergências de uma execução específica"""
     try:
@@ -334,7 +334,7 @@ async def listar_divergencias_execucao(
 
 @router.get("/{execucao_id}/estatisticas")
 async def obter_estatisticas_execucao(
-    execucao_id: str, db=Depends(get_supabase_client)
+    execucao_id: str, db=Depends(get_async_supabase_client)
 ) -> Dict:
     """Obtém estatísticas de uma execução específica"""
     try:
@@ -9,13 +9,13 @@ from ..models.carteirinha import CarteirinhaCreate, CarteirinhaUpdate, Carteirin
 from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..services.carteirinha import CarteirinhaService
 from ..repositories.carteirinha import CarteirinhaRepository
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 from ..utils.date_utils import format_date_fields, DATE_FIELDS
 
 router = APIRouter(redirect_slashes=False)
 logger = logging.getLogger(__name__)
 
-def get_carteirinha_repository(db: SupabaseClient = Depends(get_supabase_client)) -> CarteirinhaRepository:
+def get_carteirinha_repository(db: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> CarteirinhaRepository:
     return CarteirinhaRepository(db)
 
 def get_carteirinha_service(repo: CarteirinhaRepository = Depends(get_carteirinha_repository)) -> CarteirinhaService:
@@ -191,7 +191,7 @@ async def delete_carteirinha(
 )
 async def migrar_carteirinhas_de_pacientes(
     tamanho_lote: int = Query(100, description="Tamanho do lote para processamento"),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     """
     Migra os números de carteirinha com prefixo "0064" da tabela pacientes para a tabela carteirinhas,
@@ -210,7 +210,7 @@ async def migrar_carteirinhas_de_pacientes(
     """
     try:
         # Obter ID do plano UNIMED
-        plano_result = supabase.table("planos_saude").select("id, nome").ilike("nome", "%UNIMED%").limit(1).execute()
+        plano_result = await supabase.table("planos_saude").select("id, nome").ilike("nome", "%UNIMED%").limit(1).execute()
         
         if not plano_result.data:
             return {
@@ -233,7 +233,7 @@ async def migrar_carteirinhas_de_pacientes(
         usuario_sistema_id = "00000000-0000-0000-0000-000000000000"  # ID padrão do sistema
         
         # Buscar pacientes com carteirinhas começando com "0064" que ainda não foram migradas
-        pacientes_result = supabase.rpc(
+        pacientes_result = await supabase.rpc(
             "buscar_pacientes_para_migracao_carteirinhas",
             {"p_prefixo": "0064", "p_limite": tamanho_lote}
         ).execute()
@@ -265,7 +265,7 @@ async def migrar_carteirinhas_de_pacientes(
                 numero_carteirinha = paciente["numero_carteirinha"]
                 
                 # Verificar se o número de carteirinha já existe para outro paciente
-                carteirinha_existente = supabase.table("carteirinhas") \
+                carteirinha_existente = await supabase.table("carteirinhas") \
                     .select("*") \
                     .eq("numero_carteirinha", numero_carteirinha) \
                     .neq("paciente_id", paciente_id) \
@@ -284,7 +284,7 @@ async def migrar_carteirinhas_de_pacientes(
                     continue
                 
                 # Verificar se já existe uma carteirinha com o mesmo número para o mesmo plano
-                carteirinha_mesmo_plano = supabase.table("carteirinhas") \
+                carteirinha_mesmo_plano = await supabase.table("carteirinhas") \
                     .select("*") \
                     .eq("numero_carteirinha", numero_carteirinha) \
                     .eq("plano_saude_id", plano_unimed_id) \
@@ -312,7 +312,7 @@ async def migrar_carteirinhas_de_pacientes(
                     "updated_by": usuario_sistema_id
                 }
                 
-                resultado_insercao = supabase.table("carteirinhas").insert(nova_carteirinha).execute()
+                resultado_insercao = await supabase.table("carteirinhas").insert(nova_carteirinha).execute()
                 
                 if resultado_insercao.data:
                     detalhes.append({
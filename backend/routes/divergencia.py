@@ -9,20 +9,20 @@ from ..models.divergencia import DivergenciaCreate, DivergenciaUpdate, Divergenc
 from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..services.divergencia import DivergenciaService
 from ..repositories.divergencia import DivergenciaRepository
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 from ..services.auditoria import AuditoriaService
 from ..repositories.auditoria_execucao import AuditoriaExecucaoRepository
 
 router = APIRouter(tags=["Divergências"], redirect_slashes=False)
 logger = logging.getLogger(__name__)
 
-def get_divergencia_repository(db: SupabaseClient = Depends(get_supabase_client)) -> DivergenciaRepository:
+def get_divergencia_repository(db: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> DivergenciaRepository:
     return DivergenciaRepository(db)
 
 def get_divergencia_service(repo: DivergenciaRepository = Depends(get_divergencia_repository)) -> DivergenciaService:
     return DivergenciaService(repo)
 
-def get_auditoria_service(db: SupabaseClient = Depends(get_supabase_client)) -> AuditoriaService:
+def get_auditoria_service(db: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> AuditoriaService:
     divergencia_repo = DivergenciaRepository(db)
     auditoria_repo = AuditoriaExecucaoRepository(db)
     return AuditoriaService(divergencia_repo, auditoria_repo)
@@ -230,13 +230,14 @@ async def get_divergencias_by_sessao(
 async def iniciar_auditoria(
     data_inicio: Optional[str] = None,
     data_fim: Optional[str] = None,
+    incremental: bool = Query(False, description="Audita apenas o que mudou desde a última auditoria"),
     service: AuditoriaService = Depends(get_auditoria_service)
 ):
     """
     Inicia o processo de auditoria
     """
     try:
-        result = await service.realizar_auditoria_completa(data_inicio, data_fim)
+        result = await service.realizar_auditoria_completa(data_inicio, data_fim, incremental)
         return StandardResponse(success=True, data=result)
     except Exception as e:
         logger.error(f"Erro ao iniciar auditoria: {str(e)}")
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Query, Path, Body, status, Depends
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+from datetime import date, datetime
 import logging
 from math import ceil
 from uuid import UUID
@@ -8,18 +10,24 @@ from pydantic import ValidationError
 from ..models.execucao import ExecucaoCreate, ExecucaoUpdate, Execucao
 from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..services.execucao import ExecucaoService
+from ..services.execucao_export import ExecucaoExportService
 from ..repositories.execucao import ExecucaoRepository
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from ..repositories.paginacao import REGEX_TIPO_CONTAGEM
+from ..repositories.views_execucoes import obter_atualizacao_views, solicitar_refresh_views_execucoes
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 
 router = APIRouter(redirect_slashes=False)
 logger = logging.getLogger(__name__)
 
-def get_execucao_repository(db: SupabaseClient = Depends(get_supabase_client)) -> ExecucaoRepository:
+def get_execucao_repository(db: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> ExecucaoRepository:
     return ExecucaoRepository(db)
 
 def get_execucao_service(repo: ExecucaoRepository = Depends(get_execucao_repository)) -> ExecucaoService:
     return ExecucaoService(repo)
 
+def get_execucao_export_service(repo: ExecucaoRepository = Depends(get_execucao_repository)) -> ExecucaoExportService:
+    return ExecucaoExportService(repo)
+
 @router.get("/teste")
 async def test_endpoint():
     return {"message": "Endpoint de execuções está funcionando"}
@@ -40,13 +48,16 @@ async def list_execucoes(
     link_manual_necessario: Optional[bool] = Query(None, description="Filtra execuções que requerem vinculação manual"),
     order_column: str = Query("data_execucao", regex="^(data_execucao|numero_guia|codigo_ficha|paciente_nome|status|link_manual_necessario)$"),
     order_direction: str = Query("desc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="Paginação por cursor: vazio na primeira página, depois o next_cursor da resposta anterior. Quando informado, o offset é ignorado."),
+    count: str = Query("exact", regex=REGEX_TIPO_CONTAGEM, description="Contagem do total: exact, planned (estimativa do planejador) ou estimated"),
+    fonte: str = Query("tabela", regex="^(tabela|view)$", description="tabela (padrão) ou view: lê das views materializadas, com a data do último refresh em atualizado_em; volta para a tabela se houver execuções alteradas depois dele"),
     service: ExecucaoService = Depends(get_execucao_service)
 ):
     try:
         logger.info(f"Listando execuções com parâmetros: limit={limit}, offset={offset}, search={search}, "
                     f"numero_guia={numero_guia}, paciente_id={paciente_id}, data_inicio={data_inicio}, data_fim={data_fim}, "
                     f"status_vinculacao={status_vinculacao}, link_manual_necessario={link_manual_necessario}, "
-                    f"order_column={order_column}, order_direction={order_direction}")
+                    f"order_column={order_column}, order_direction={order_direction}, fonte={fonte}")
         
         is_vinculada = None
         if status_vinculacao == "vinculada":
@@ -65,7 +76,10 @@ async def list_execucoes(
             is_vinculada=is_vinculada,
             link_manual_necessario=link_manual_necessario,
             order_column=order_column,
-            order_direction=order_direction
+            order_direction=order_direction,
+            cursor=cursor,
+            count=count,
+            fonte=fonte
         )
         
         # Log para depuração
@@ -78,15 +92,84 @@ async def list_execucoes(
             total=result["total"],
             page=(offset // limit) + 1,
             total_pages=ceil(result["total"] / limit),
-            has_more=offset + limit < result["total"]
+            has_more=result["next_cursor"] is not None if cursor is not None else offset + limit < result["total"],
+            next_cursor=result["next_cursor"],
+            atualizado_em=result["atualizado_em"]
         )
         
         logger.info(f"Resposta gerada com sucesso: {len(result['items'])} itens, total={result['total']}")
         return response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao listar execuções: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao listar execuções: {str(e)}")
 
+@router.get("/export",
+            summary="Exportar Execuções",
+            description="Exporta as execuções dos filtros da listagem em xlsx ou csv, enviando o arquivo enquanto é gerado")
+async def export_execucoes(
+    formato: str = Query("xlsx", regex="^(xlsx|csv)$", description="Formato do arquivo: xlsx ou csv"),
+    search: Optional[str] = None,
+    numero_guia: Optional[str] = None,
+    data_inicio: Optional[date] = Query(None, description="Data de execução inicial (YYYY-MM-DD)"),
+    data_fim: Optional[date] = Query(None, description="Data de execução final (YYYY-MM-DD)"),
+    status_vinculacao: Optional[str] = Query(None, regex="^(vinculada|nao_vinculada)$", description="Filtra por status de vinculação (sessao_id IS NOT NULL ou IS NULL)"),
+    link_manual_necessario: Optional[bool] = Query(None, description="Filtra execuções que requerem vinculação manual"),
+    order_column: str = Query("data_execucao", regex="^(data_execucao|numero_guia|codigo_ficha|paciente_nome|status|link_manual_necessario)$"),
+    order_direction: str = Query("desc", regex="^(asc|desc)$"),
+    service: ExecucaoExportService = Depends(get_execucao_export_service)
+):
+    if data_inicio and data_fim and data_inicio > data_fim:
+        raise HTTPException(status_code=400, detail="data_inicio deve ser anterior ou igual a data_fim")
+
+    is_vinculada = None
+    if status_vinculacao == "vinculada":
+        is_vinculada = True
+    elif status_vinculacao == "nao_vinculada":
+        is_vinculada = False
+
+    logger.info(f"Exportando execuções ({formato}): search={search}, numero_guia={numero_guia}, "
+                f"data_inicio={data_inicio}, data_fim={data_fim}, status_vinculacao={status_vinculacao}, "
+                f"link_manual_necessario={link_manual_necessario}")
+
+    stream = service.stream_export(
+        formato,
+        search=search,
+        numero_guia=numero_guia,
+        data_inicio=data_inicio,
+        data_fim=data_fim,
+        is_vinculada=is_vinculada,
+        link_manual_necessario=link_manual_necessario,
+        order_column=order_column,
+        order_direction=order_direction
+    )
+    media_types = {
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "csv": "text/csv; charset=utf-8",
+    }
+    filename = f"execucoes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return StreamingResponse(
+        stream,
+        media_type=media_types[formato],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/views/refresh",
+            response_model=StandardResponse[dict],
+            summary="Solicitar Refresh das Views de Execuções",
+            description="Pede a atualização das views materializadas de execuções (ex.: após uma importação em lote). O refresh é feito pelo banco em até alguns minutos, uma vez para vários pedidos seguidos")
+async def solicitar_refresh_views(
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client)
+):
+    if not await solicitar_refresh_views_execucoes(db):
+        raise HTTPException(status_code=500, detail="Erro ao solicitar o refresh das views de execuções")
+    return StandardResponse(
+        success=True,
+        data={"atualizado_em": await obter_atualizacao_views(db)},
+        message="Refresh das views de execuções solicitado"
+    )
+
 @router.get("/{id}",
             response_model=StandardResponse[Execucao],
             summary="Buscar Execução",
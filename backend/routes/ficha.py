@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path, Body, status
 from typing import Dict, List, Optional
 from uuid import UUID
 from pydantic import ValidationError
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 import json
 
@@ -11,19 +11,20 @@ from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..services.ficha import FichaService
 from ..repositories.ficha import FichaRepository
 from ..utils.date_utils import DateEncoder
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 
 # Importações para sessões
 from ..schemas.sessao import Sessao, SessaoUpdate
 from ..services.sessao import SessaoService
 from ..repositories.sessao import SessaoRepository
+from ..services.sessoes_lote import criar_sessoes_em_lote, gerar_sessoes_ficha, gerar_sessoes_fichas_sem_sessoes
 
 router = APIRouter(redirect_slashes=False)
 logger = logging.getLogger(__name__)
 
 
 def get_ficha_repository(
-    db: SupabaseClient = Depends(get_supabase_client),
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client),
 ) -> FichaRepository:
     return FichaRepository(db)
 
@@ -95,7 +96,7 @@ async def listar_fichas_pendentes(
     processado: Optional[bool] = None,
     order_column: str = "created_at",
     order_direction: str = "desc",
-    db = Depends(get_supabase_client)
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
     """Lista fichas pendentes com paginação e filtros"""
     try:
@@ -121,7 +122,7 @@ async def listar_fichas_pendentes(
         query = query.range(offset, offset + limit - 1)
         
         # Executar a query
-        result = query.execute()
+        result = await query.execute()
         
         # Formatar as datas nos resultados
         items = []
@@ -155,12 +156,12 @@ async def listar_fichas_pendentes(
 async def processar_ficha_pendente(
     id: str,
     opcoes: Dict,
-    db = Depends(get_supabase_client)
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
     """Processa uma ficha pendente, criando ou vinculando a uma guia"""
     try:
         # Buscar a ficha pendente
-        ficha_pendente = db.from_("fichas_pendentes").select("*").eq("id", id).execute()
+        ficha_pendente = await db.from_("fichas_pendentes").select("*").eq("id", id).execute()
         
         if not ficha_pendente.data:
             raise HTTPException(status_code=404, detail="Ficha pendente não encontrada")
@@ -186,13 +187,13 @@ async def processar_ficha_pendente(
             logger.info(f"Buscando carteirinha com número: '{carteirinha_numero}'")
             
             # Primeiro tenta buscar com o formato exato
-            carteirinha_query = db.from_("carteirinhas").select("*").eq("numero_carteirinha", carteirinha_numero).execute()
+            carteirinha_query = await db.from_("carteirinhas").select("*").eq("numero_carteirinha", carteirinha_numero).execute()
             
             # Se não encontrar, tenta buscar removendo pontos e hífens
             if not carteirinha_query.data:
                 carteirinha_numero_limpo = carteirinha_numero.replace(".", "").replace("-", "").strip()
                 logger.info(f"Carteirinha não encontrada com formato exato. Tentando com número limpo: '{carteirinha_numero_limpo}'")
-                carteirinha_query = db.from_("carteirinhas").select("*").ilike("numero_carteirinha", f"%{carteirinha_numero_limpo}%").execute()
+                carteirinha_query = await db.from_("carteirinhas").select("*").ilike("numero_carteirinha", f"%{carteirinha_numero_limpo}%").execute()
             
             if not carteirinha_query.data:
                 logger.warning(f"Carteirinha não encontrada para o número: '{carteirinha_numero}'")
@@ -210,7 +211,7 @@ async def processar_ficha_pendente(
             # Verificar se já existe uma guia com o mesmo número
             numero_guia = ficha_data.get("numero_guia")
             logger.info(f"Verificando se já existe uma guia com o número: '{numero_guia}'")
-            guia_existente = db.from_("guias").select("*").eq("numero_guia", numero_guia).execute()
+            guia_existente = await db.from_("guias").select("*").eq("numero_guia", numero_guia).execute()
             
             if guia_existente.data:
                 logger.info(f"Guia já existe. Usando guia existente com ID: {guia_existente.data[0].get('id')}")
@@ -218,12 +219,12 @@ async def processar_ficha_pendente(
             else:
                 # Buscar procedimento (usando um padrão)
                 logger.info("Buscando procedimento do tipo 'procedimento'...")
-                procedimento_query = db.from_("procedimentos").select("*").eq("tipo", "procedimento").limit(1).execute()
+                procedimento_query = await db.from_("procedimentos").select("*").eq("tipo", "procedimento").limit(1).execute()
                 
                 if not procedimento_query.data:
                     logger.info("Nenhum procedimento do tipo 'procedimento' encontrado. Buscando qualquer tipo...")
                     # Se não encontrar, busca qualquer tipo
-                    procedimento_query = db.from_("procedimentos").select("*").limit(1).execute()
+                    procedimento_query = await db.from_("procedimentos").select("*").limit(1).execute()
                     
                 if not procedimento_query.data:
                     logger.warning("Nenhum procedimento encontrado no sistema.")
@@ -252,7 +253,7 @@ async def processar_ficha_pendente(
                 
                 logger.info(f"Criando guia com dados: {guia_data}")
                 
-                guia_result = db.from_("guias").insert(guia_data).execute()
+                guia_result = await db.from_("guias").insert(guia_data).execute()
                 
                 if not guia_result.data:
                     logger.error("Erro ao criar guia: nenhum dado retornado")
@@ -278,7 +279,7 @@ async def processar_ficha_pendente(
         
         # Verificar se já existe uma ficha com o mesmo código
         logger.info(f"Verificando se já existe uma ficha com o código: '{codigo_ficha}'")
-        ficha_existente = db.from_("fichas").select("*").eq("codigo_ficha", codigo_ficha).execute()
+        ficha_existente = await db.from_("fichas").select("*").eq("codigo_ficha", codigo_ficha).execute()
         
         if ficha_existente.data:
             logger.warning(f"Ficha com código '{codigo_ficha}' já existe. ID: {ficha_existente.data[0].get('id')}")
@@ -302,7 +303,7 @@ async def processar_ficha_pendente(
         }
         
         logger.info(f"Criando ficha com dados: {ficha_insert}")
-        ficha_result = db.from_("fichas").insert(ficha_insert).execute()
+        ficha_result = await db.from_("fichas").insert(ficha_insert).execute()
         
         if not ficha_result.data:
             logger.error("Erro ao criar ficha: nenhum dado retornado")
@@ -316,7 +317,7 @@ async def processar_ficha_pendente(
         
         # Excluir a ficha pendente após processamento bem-sucedido
         logger.info(f"Excluindo ficha pendente após processamento bem-sucedido. ID: {id}")
-        db.from_("fichas_pendentes").delete().eq("id", id).execute()
+        await db.from_("fichas_pendentes").delete().eq("id", id).execute()
         
         return {
             "success": True,
@@ -338,12 +339,12 @@ async def processar_ficha_pendente(
 @router.delete("/pendentes/{id}", response_model=StandardResponse[bool])
 async def excluir_ficha_pendente(
     id: str,
-    db = Depends(get_supabase_client)
+    db = Depends(get_async_supabase_client)
 ) -> Dict:
     """Exclui uma ficha pendente"""
     try:
         # Verificar se a ficha pendente existe
-        ficha_pendente = db.from_("fichas_pendentes").select("*").eq("id", id).execute()
+        ficha_pendente = await db.from_("fichas_pendentes").select("*").eq("id", id).execute()
         
         if not ficha_pendente.data:
             raise HTTPException(status_code=404, detail="Ficha pendente não encontrada")
@@ -352,7 +353,7 @@ async def excluir_ficha_pendente(
         storage_id = ficha_pendente.data[0].get("storage_id")
         
         # Excluir a ficha pendente
-        result = db.from_("fichas_pendentes").delete().eq("id", id).execute()
+        result = await db.from_("fichas_pendentes").delete().eq("id", id).execute()
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Erro ao excluir ficha pendente")
@@ -360,7 +361,7 @@ async def excluir_ficha_pendente(
         # Tentar excluir o arquivo do storage (se existir)
         if storage_id:
             try:
-                db.from_("storage").delete().eq("id", storage_id).execute()
+                await db.from_("storage").delete().eq("id", storage_id).execute()
             except Exception as e:
                 logger.warning(f"Não foi possível excluir o arquivo do storage: {str(e)}")
         
@@ -378,6 +379,61 @@ async def excluir_ficha_pendente(
         )
 
 
+@router.post(
+    "/sessoes/lote",
+    response_model=StandardResponse[Dict],
+    summary="Criar Sessões de Várias Fichas",
+    description="Cria as sessões de várias fichas em inserts de várias linhas, pulando as ordens de execução já existentes"
+)
+async def create_sessoes_lote(
+    dados: Dict = Body(..., description="{'fichas': {ficha_id: [sessões]}}"),
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client)
+):
+    try:
+        sessoes_por_ficha = dados.get("fichas") or {}
+        if not isinstance(sessoes_por_ficha, dict) or not sessoes_por_ficha:
+            raise HTTPException(status_code=400, detail="Nenhuma ficha fornecida para criação de sessões")
+
+        resultado = await criar_sessoes_em_lote(
+            db,
+            sessoes_por_ficha,
+            somente_fichas_sem_sessoes=bool(dados.get("somente_fichas_sem_sessoes", False))
+        )
+        resultado.pop("itens")
+        return StandardResponse(
+            success=resultado["erros"] == 0 and resultado["sessoes_invalidas"] == 0,
+            data=resultado,
+            message=f"{resultado['sessoes_criadas']} sessões criadas em {resultado['fichas_processadas']} fichas"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao criar sessões em lote: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao criar sessões em lote: {str(e)}")
+
+
+@router.post(
+    "/sessoes/gerar-pendentes",
+    response_model=StandardResponse[Dict],
+    summary="Gerar Sessões das Fichas sem Sessões",
+    description="Gera as sessões semanais de todas as fichas que ainda não possuem sessões"
+)
+async def gerar_sessoes_fichas_pendentes(
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client)
+):
+    try:
+        resultado = await gerar_sessoes_fichas_sem_sessoes(db)
+        resultado.pop("itens")
+        return StandardResponse(
+            success=resultado["erros"] == 0 and resultado["sessoes_invalidas"] == 0,
+            data=resultado,
+            message=f"{resultado['sessoes_criadas']} sessões criadas em {resultado['fichas_processadas']} fichas"
+        )
+    except Exception as e:
+        logger.error(f"Erro ao gerar sessões das fichas sem sessões: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao gerar sessões das fichas sem sessões: {str(e)}")
+
+
 @router.get(
     "/{id}",
     response_model=StandardResponse[Ficha],
@@ -558,7 +614,7 @@ async def list_sessoes_by_ficha(
     ficha_id: UUID = Path(..., description="ID da ficha"),
     page: int = Query(1, ge=1, description="Número da página"),
     limit: int = Query(50, ge=1, le=100, description="Itens por página"),
-    db: SupabaseClient = Depends(get_supabase_client)
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         # Verificar se a ficha existe
@@ -578,14 +634,14 @@ async def list_sessoes_by_ficha(
             .order("ordem_execucao", desc=False)\
             .range(offset, offset + limit - 1)
         
-        result = query.execute()
+        result = await query.execute()
         
         # Contar total de registros
         count_query = db.from_("sessoes").select("id", count="exact")\
             .eq("ficha_id", str(ficha_id))\
             .is_("deleted_at", "null")
         
-        count_result = count_query.execute()
+        count_result = await count_query.execute()
         total = count_result.count if hasattr(count_result, 'count') else 0
         
         # Se não houver sessões, retornar lista vazia
@@ -673,7 +729,7 @@ async def update_sessao_by_ficha(
     ficha_id: UUID = Path(..., description="ID da ficha"),
     sessao_id: UUID = Path(..., description="ID da sessão"),
     dados: SessaoUpdate = Body(..., description="Dados da sessão a serem atualizados"),
-    db: SupabaseClient = Depends(get_supabase_client)
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         # Verificar se a ficha existe
@@ -724,7 +780,7 @@ async def update_sessao_by_ficha(
 async def create_multiple_sessoes(
     ficha_id: UUID = Path(..., description="ID da ficha"),
     dados: Dict = Body(..., description="Dados das sessões a serem criadas"),
-    db: SupabaseClient = Depends(get_supabase_client)
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         # Verificar se a ficha existe
@@ -737,25 +793,15 @@ async def create_multiple_sessoes(
         if not sessoes:
             raise HTTPException(status_code=400, detail="Nenhuma sessão fornecida para criação")
         
-        # Criar sessões
-        created_items = []
-        user_id = "00000000-0000-0000-0000-000000000000"  # ID padrão para criação
-        
+        # Garantir que as sessões sigam a ordem enviada; ordens já existentes são puladas
         for i, sessao_data in enumerate(sessoes):
-            # Garantir que a sessão esteja vinculada à ficha correta
-            sessao_data["ficha_id"] = str(ficha_id)
             sessao_data["ordem_execucao"] = i + 1
-            
-            # Adicionar campos de auditoria
-            sessao_data["created_by"] = user_id
-            sessao_data["updated_by"] = user_id
-            
-            # Inserir no banco
-            result = db.from_("sessoes").insert(sessao_data).execute()
-            
-            if result.data:
-                created_items.append(result.data[0])
-        
+
+        resultado = await criar_sessoes_em_lote(db, {str(ficha_id): sessoes}, retornar_registros=True)
+        if resultado["log_erros"] and not resultado["sessoes_criadas"]:
+            raise HTTPException(status_code=400, detail="; ".join(resultado["log_erros"]))
+        created_items = resultado["itens"]
+
         return StandardResponse(
             success=True,
             data={
@@ -778,7 +824,7 @@ async def create_multiple_sessoes(
 )
 async def gerar_sessoes_para_ficha(
     ficha_id: UUID = Path(..., description="ID da ficha"),
-    db: SupabaseClient = Depends(get_supabase_client)
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     try:
         # Verificar se a ficha existe
@@ -787,66 +833,44 @@ async def gerar_sessoes_para_ficha(
         if not ficha:
             raise HTTPException(status_code=404, detail="Ficha não encontrada")
         
-        # Verificar se já existem sessões para esta ficha
-        sessoes_existentes = db.from_("sessoes").select("*").eq("ficha_id", str(ficha_id)).is_("deleted_at", "null").execute()
-        
-        if sessoes_existentes.data and len(sessoes_existentes.data) > 0:
-            return StandardResponse(
-                success=True,
-                data={
-                    "message": f"Já existem {len(sessoes_existentes.data)} sessões para esta ficha",
-                    "sessoes": sessoes_existentes.data
-                }
-            )
-        
         # Obter o total de sessões da ficha
-        total_sessoes = ficha.get("total_sessoes", 0)
+        total_sessoes = ficha.get("total_sessoes") or 0
         if total_sessoes <= 0:
             return StandardResponse(
                 success=False,
                 data=None,
                 message="A ficha não possui um total de sessões definido"
             )
-        
-        # Data base para as sessões (data da ficha)
-        data_base = datetime.fromisoformat(ficha.get("data_atendimento").replace("Z", "+00:00"))
-        
-        # Gerar sessões
-        sessoes = []
-        for i in range(total_sessoes):
-            data_sessao = data_base + timedelta(days=i * 7)  # Uma sessão por semana
-            
-            sessao = {
-                "ficha_id": str(ficha_id),
-                "guia_id": ficha.get("guia_id"),
-                "data_sessao": data_sessao.date().isoformat(),
-                "possui_assinatura": False,
-                "procedimento_id": str(uuid.uuid4()),  # Placeholder
-                "profissional_executante": "",
-                "status": "pendente",
-                "numero_guia": ficha.get("numero_guia"),
-                "codigo_ficha": ficha.get("codigo_ficha"),
-                "ordem_execucao": i + 1,
-                "status_biometria": "nao_verificado",
-                "created_by": "00000000-0000-0000-0000-000000000000",
-                "updated_by": "00000000-0000-0000-0000-000000000000"
-            }
-            
-            sessoes.append(sessao)
-        
-        # Inserir sessões no banco
-        result = db.from_("sessoes").insert(sessoes).execute()
-        
-        if not result.data:
+
+        # Uma sessão por semana a partir da data da ficha; fichas com sessões são ignoradas
+        resultado = await criar_sessoes_em_lote(
+            db,
+            {str(ficha_id): gerar_sessoes_ficha(ficha, total_sessoes)},
+            somente_fichas_sem_sessoes=True,
+            retornar_registros=True
+        )
+
+        if resultado["fichas_ignoradas"]:
+            sessoes_existentes = await db.from_("sessoes").select("*").eq("ficha_id", str(ficha_id)).is_("deleted_at", "null").execute()
+            return StandardResponse(
+                success=True,
+                data={
+                    "message": f"Já existem {len(sessoes_existentes.data)} sessões para esta ficha",
+                    "sessoes": sessoes_existentes.data
+                }
+            )
+
+        if not resultado["itens"]:
             raise HTTPException(status_code=500, detail="Erro ao criar sessões")
-        
+
+        result = resultado["itens"]
         return StandardResponse(
             success=True,
             data={
-                "created": len(result.data),
-                "items": result.data
+                "created": len(result),
+                "items": result
             },
-            message=f"{len(result.data)} sessões criadas com sucesso"
+            message=f"{len(result)} sessões criadas com sucesso"
         )
     except HTTPException:
         raise
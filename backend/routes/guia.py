@@ -9,14 +9,14 @@ from ..models.guia import GuiaCreate, GuiaUpdate, Guia
 from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..services.guia import GuiaService
 from ..repositories.guia import GuiaRepository
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 
 router = APIRouter(redirect_slashes=False)
 logger = logging.getLogger(__name__)
 
 
 def get_guia_repository(
-    db: SupabaseClient = Depends(get_supabase_client),
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client),
 ) -> GuiaRepository:
     return GuiaRepository(db)
 
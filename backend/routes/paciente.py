@@ -10,16 +10,15 @@ from ..models.paciente import PacienteCreate, PacienteUpdate, Paciente
 from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..services.paciente import PacienteService
 from ..repositories.paciente import PacienteRepository
+from ..repositories.paginacao import REGEX_TIPO_CONTAGEM
 from ..services.ficha import FichaService
 from ..repositories.ficha import FichaRepository
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 from backend.repositories.database_supabase import (
-    get_supabase_client,
-    SupabaseClient,
     get_carteirinhas_by_paciente,
     get_guias_by_paciente,
 )
 import pymysql
-import uuid
 import datetime
 import sshtunnel
 from ..config.config import settings
@@ -30,7 +29,7 @@ logger = logging.getLogger(__name__)
 
 
 def get_paciente_repository(
-    db: SupabaseClient = Depends(get_supabase_client),
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client),
 ) -> PacienteRepository:
     return PacienteRepository(db)
 
@@ -42,7 +41,7 @@ def get_paciente_service(
 
 
 def get_ficha_repository(
-    db: SupabaseClient = Depends(get_supabase_client),
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client),
 ) -> FichaRepository:
     return FichaRepository(db)
 
@@ -71,6 +70,8 @@ async def list_pacientes(
     fields: str = Query("*", description="Campos a serem retornados (ex: 'id,nome,cpf'). Por padrão, retorna todos os campos."),
     order_column: str = Query("nome", regex="^(nome|nome_responsavel|cpf|rg|data_nascimento|telefone|email|cidade|data_registro_origem)$"),
     order_direction: str = Query("asc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="Paginação por cursor: vazio na primeira página, depois o next_cursor da resposta anterior. Quando informado, o offset é ignorado."),
+    count: str = Query("exact", regex=REGEX_TIPO_CONTAGEM, description="Contagem do total: exact, planned (estimativa do planejador) ou estimated"),
     service: PacienteService = Depends(get_paciente_service),
 ):
     result = await service.list_pacientes(
@@ -80,15 +81,23 @@ async def list_pacientes(
         fields=fields,
         order_column=order_column,
         order_direction=order_direction,
+        cursor=cursor,
+        count=count,
     )
 
+    if cursor is not None:
+        has_more = result["next_cursor"] is not None
+    else:
+        has_more = offset + limit < result["total"]
+
     return PaginatedResponse(
         success=True,
         items=result["items"],
         total=result["total"],
         page=(offset // limit) + 1,
         total_pages=(result["total"] + limit - 1) // limit,
-        has_more=offset + limit < result["total"],
+        has_more=has_more,
+        next_cursor=result["next_cursor"],
     )
 
 
@@ -150,6 +159,27 @@ async def get_last_update(
         )
 
 
+@router.get(
+    "/busca",
+    response_model=StandardResponse,
+    summary="Buscar pacientes e guias",
+    description="Busca por nome, CPF, número da carteirinha ou número da guia, ordenada por relevância"
+)
+async def buscar_pacientes(
+    q: str = Query(..., min_length=2, description="Termo de busca"),
+    limit: int = Query(20, ge=1, le=100),
+    prefixo: bool = Query(False, description="Modo autocomplete: só nomes com palavras começando pelo termo e documentos começando pelos dígitos (mais rápido, para buscar a cada tecla)"),
+    service: PacienteService = Depends(get_paciente_service),
+):
+    """
+    Busca usada na caixa de pesquisa do frontend. Cada resultado traz o tipo
+    do que foi encontrado (paciente, cpf, carteirinha ou guia), o paciente
+    relacionado e o valor encontrado.
+    """
+    resultados = await service.buscar_pacientes(q, limit, prefixo)
+    return StandardResponse(success=True, data=resultados)
+
+
 @router.get(
     "/{id}",
     response_model=StandardResponse[Paciente],
@@ -213,7 +243,7 @@ async def list_carteirinhas_by_paciente(
     id: UUID = Path(...),
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: SupabaseClient = Depends(get_supabase_client),
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client),
 ):
     try:
         result = await get_carteirinhas_by_paciente(
@@ -244,7 +274,7 @@ async def list_guias_by_paciente(
     id: UUID = Path(...),
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: SupabaseClient = Depends(get_supabase_client),
+    db: AsyncSupabaseClient = Depends(get_async_supabase_client),
 ):
     try:
         result = await get_guias_by_paciente(str(id), db, limit=limit, offset=offset)
@@ -684,17 +714,17 @@ async def importar_pacientes_mysql(
         
         # Se o usuário for "sistema", vamos verificar se o UUID correspondente existe
         if usuario_id == "sistema":
-            db = get_supabase_client()
+            db = get_async_supabase_client()
             sistema_uuid = "00000000-0000-0000-0000-000000000000"
             
             # Verificar se o usuário sistema já existe
-            result = db.from_("usuarios").select("*").eq("id", sistema_uuid).execute()
+            result = await db.from_("usuarios").select("*").eq("id", sistema_uuid).execute()
             
             if not result.data:
                 logger.info("Usuário sistema não encontrado, criando-o agora")
                 try:
                     # Criar usuário sistema se não existir
-                    db.from_("usuarios").insert({
+                    await db.from_("usuarios").insert({
                         "id": sistema_uuid,
                         "nome": "Sistema",
                         "email": "sistema@sistema.com",
@@ -719,8 +749,8 @@ async def importar_pacientes_mysql(
             
         # Buscar a última importação para controle de datas
         # Utilizamos a tabela controle_importacao_pacientes
-        db = get_supabase_client()
-        ultima_importacao_result = db.from_("controle_importacao_pacientes") \
+        db = get_async_supabase_client()
+        ultima_importacao_result = await db.from_("controle_importacao_pacientes") \
             .select("*") \
             .order("timestamp_importacao", desc=True) \
             .limit(1) \
@@ -773,36 +803,22 @@ async def importar_pacientes_mysql(
                 }
             }
         
-        # Importar pacientes para o Supabase
-        repository = PacienteRepository(get_supabase_client())
-        total_importados = 0
-        total_atualizados = 0
-        erros = []
-        
         # Importar DateEncoder para tratamento global de datas
         from ..utils.date_utils import DateEncoder
+        from ..services.importacao_pacientes import importar_pacientes_em_lote
         import json
-        
+
+        erros = []
+
         # Rastrear datas máximas nesta importação
         data_registro_max = None
         data_atualizacao_max = None
-        
-        # Testar conexão e obter cursor
-        connection, cursor = await testar_conexao_mysql(database)
-        if not connection or not cursor:
-            return {
-                "success": False,
-                "message": f"Erro ao estabelecer conexão com o banco de dados MySQL {database}",
-                "importados": 0,
-                "total": 0,
-                "erros": []
-            }
-        
+
         # Consultar o ID do plano Unimed uma única vez antes de iniciar a importação
         plano_unimed_id = None
         try:
             # Buscar especificamente o plano Unimed, já que é o único importado atualmente
-            plano_saude_result = db.from_("planos_saude").select("id").ilike("nome", "%unimed%").is_("deleted_at", "null").execute()
+            plano_saude_result = await db.from_("planos_saude").select("id").ilike("nome", "%unimed%").is_("deleted_at", "null").execute()
             
             if plano_saude_result.data and len(plano_saude_result.data) > 0:
                 plano_unimed_id = plano_saude_result.data[0]["id"]
@@ -844,261 +860,63 @@ async def importar_pacientes_mysql(
                 }
             }
         
-        # +++ Log Adicionado: Confirmar plano_unimed_id ANTES do loop +++
-        logger.info(f"DEBUG: Valor de plano_unimed_id ANTES do loop: {plano_unimed_id}")
-        # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-
+        # Validação e mapeamento locais; a gravação é feita em lote no final
+        pacientes_mapeados = []
         for paciente_mysql in pacientes_mysql:
+            nome_paciente = paciente_mysql.get('client_nome', 'Nome não disponível')
+
+            # Pular paciente se não tiver nome
+            client_nome = paciente_mysql.get('client_nome', '')
+            if not client_nome or client_nome.strip() == '':
+                erros.append({
+                    "paciente": nome_paciente,
+                    "erro": "Paciente sem nome - registro ignorado"
+                })
+                logger.warning(f"Pulando paciente sem nome: {nome_paciente}")
+                continue
+
+            # Atualizar as datas máximas de registro e atualização vistas nesta importação
+            data_registro_origem = paciente_mysql.get('client_registration_date')
+            if data_registro_origem and (data_registro_max is None or data_registro_origem > data_registro_max):
+                data_registro_max = data_registro_origem
+            data_atualizacao_origem = paciente_mysql.get('client_update_date')
+            if data_atualizacao_origem and (data_atualizacao_max is None or data_atualizacao_origem > data_atualizacao_max):
+                data_atualizacao_max = data_atualizacao_origem
+
+            # Mapear dados do MySQL para o formato do Supabase
             try:
-                # Verificar se tem o campo obrigatório nome
-                client_nome = paciente_mysql.get('client_nome', '')
-                
-                # Pular paciente se não tiver nome
-                if not client_nome or client_nome.strip() == '':
-                    erro = {
-                        "paciente": paciente_mysql.get('client_nome', 'Nome não disponível'),
-                        "erro": "Paciente sem nome - registro ignorado"
-                    }
-                    erros.append(erro)
-                    logger.warning(f"Pulando paciente sem nome: {paciente_mysql.get('client_nome', 'Nome não disponível')}")
-                    continue
-                
-                # Extrair as datas do registro original (se disponíveis)
-                data_registro_origem = None
-                data_atualizacao_origem = None
-                
-                try:
-                    if 'client_registration_date' in paciente_mysql and paciente_mysql['client_registration_date']:
-                        data_registro_origem = paciente_mysql['client_registration_date']
-                        # Atualizar a data máxima de registro vista nesta importação
-                        if data_registro_max is None or data_registro_origem > data_registro_max:
-                            data_registro_max = data_registro_origem
-                except Exception as e:
-                    logger.warning(f"Erro ao processar data_registro_origem: {str(e)}")
-                
-                try:
-                    if 'client_update_date' in paciente_mysql and paciente_mysql['client_update_date']:
-                        data_atualizacao_origem = paciente_mysql['client_update_date']
-                        # Atualizar a data máxima de atualização vista nesta importação
-                        if data_atualizacao_max is None or data_atualizacao_origem > data_atualizacao_max:
-                            data_atualizacao_max = data_atualizacao_origem
-                except Exception as e:
-                    logger.warning(f"Erro ao processar data_atualizacao_origem: {str(e)}")
-                
-                # Mapear dados do MySQL para o formato do Supabase
-                try:
-                    paciente_dict = mapear_paciente(paciente_mysql, usuario_id)
-                    
-                    # Serializar todas as datas logo após o mapeamento, antes de qualquer operação
-                    paciente_dict = json.loads(json.dumps(paciente_dict, cls=DateEncoder))
-                except Exception as e:
-                    logger.error(f"Erro ao mapear paciente {paciente_mysql.get('client_nome', 'Nome não disponível')}: {str(e)}")
-                    erro = {
-                        "paciente": paciente_mysql.get('client_nome', 'Nome não disponível'),
-                        "erro": f"Erro no mapeamento: {str(e)}"
-                    }
-                    erros.append(erro)
-                    continue
-                
-                # Log para verificar o valor de id_origem antes de criar o objeto
-                logger.info(f"Valor de id_origem antes de criar PacienteCreate: {paciente_dict.get('id_origem')}")
-                
-                # Garantir que id_origem não seja nulo antes de criar o objeto
-                if not paciente_dict.get('id_origem') or str(paciente_dict.get('id_origem')).strip() == '':
-                    paciente_dict['id_origem'] = f"ORIGEM-{str(uuid.uuid4())[-8:]}"
-                    logger.info(f"FINAL: Definindo ID de origem de emergência: {paciente_dict['id_origem']}")
-                
-                # Verificar se já existe um paciente com este id_origem
-                try:
-                    id_origem = paciente_dict.get('id_origem')
-                    paciente_existente = await repository.get_by_id_origem(id_origem)
-                except Exception as e:
-                    logger.error(f"Erro ao verificar existência do paciente {paciente_dict.get('nome')}: {str(e)}")
-                    erro = {
-                        "paciente": paciente_dict.get('nome', 'Nome não disponível'),
-                        "erro": f"Erro ao verificar existência: {str(e)}"
-                    }
-                    erros.append(erro)
-                    continue
-                
-                paciente_obj_para_carteirinha = None # Resetar para cada paciente
-
-                try:
-                    if paciente_existente:
-                        # O paciente já existe, atualizar em vez de criar
-                        logger.info(f"Paciente com id_origem {id_origem} já existe. Atualizando dados.")
-
-                        # Preservar o ID original e atualizar os outros campos
-                        id_existente = paciente_existente.get('id')
-                        paciente_dict['updated_at'] = datetime.datetime.now().isoformat()  # Já serializar a data
-
-                        # Remover id do dict pois não podemos alterar o id
-                        if 'id' in paciente_dict:
-                            del paciente_dict['id']
-
-                        # Serializar as datas antes de criar o objeto para evitar erro de serialização
-                        paciente_dict = json.loads(json.dumps(paciente_dict, cls=DateEncoder))
-
-                        # Atualizar usando o dicionário diretamente
-                        update_response = await repository.update(UUID(id_existente), paciente_dict)
-                        logger.info(f"DEBUG Update Response - ID Origem: {id_origem}, Tipo: {type(update_response).__name__}, Resposta: {update_response!r}")
-
-                        # --- Correção Final: Usar o dicionário retornado diretamente ---
-                        paciente_dict_atualizado = update_response if isinstance(update_response, dict) else None
-                        paciente_obj_para_carteirinha = paciente_dict_atualizado
-                        # --- Fim Correção Final ---
-                        
-                        if paciente_dict_atualizado:
-                            total_importados += 1 # Conta como processado
-                            total_atualizados += 1
-                            logger.info(f"Paciente atualizado com sucesso: {paciente_dict_atualizado.get('nome', 'N/A')} (ID: {id_existente})")
-                        else:
-                            logger.error(f"Falha ao obter/processar dicionário do paciente atualizado {paciente_dict.get('nome')} após PATCH. Resposta: {update_response!r}")
-                            erro = {
-                                "paciente": paciente_dict.get('nome', 'Nome não disponível'),
-                                "erro": "Falha ao processar resposta da atualização."
-                            }
-                            erros.append(erro)
-                            paciente_obj_para_carteirinha = None # Evita processar carteirinha
-                    else:
-                        # O paciente não existe, criar um novo
-                        try:
-                            # Serializar as datas antes de criar o objeto
-                            paciente_dict = json.loads(json.dumps(paciente_dict, cls=DateEncoder))
-                            paciente_create = PacienteCreate(**paciente_dict)
-                            logger.info(f"Objeto PacienteCreate criado com id_origem: {paciente_create.id_origem if hasattr(paciente_create, 'id_origem') else 'NÃO POSSUI'}")
-
-                            # +++ Log Adicionado: Inspecionar resposta do create +++
-                            create_response = await repository.create(paciente_create)
-                            logger.info(f"DEBUG Create Response - ID Origem: {paciente_create.id_origem}, Tipo: {type(create_response).__name__}, Resposta: {create_response!r}")
-                            # ++++++++++++++++++++++++++++++++++++++++++++++++++++++
-
-                            # --- Correção Final: Usar o dicionário retornado diretamente ---
-                            created_paciente_dict = create_response if isinstance(create_response, dict) else None
-                            paciente_obj_para_carteirinha = created_paciente_dict
-                            # --- Fim Correção Final ---
-                            
-                            if created_paciente_dict:
-                                total_importados += 1
-                                logger.info(f"Paciente importado com sucesso: {created_paciente_dict.get('nome','N/A')} (ID: {created_paciente_dict.get('id')})")
-                            else:
-                                logger.error(f"Falha ao obter/processar dicionário do paciente criado {paciente_dict.get('nome')} após POST. Resposta: {create_response!r}")
-                                erro = {
-                                    "paciente": paciente_dict.get('nome', 'Nome não disponível'),
-                                    "erro": "Falha ao processar resposta da criação."
-                                }
-                                erros.append(erro)
-                                paciente_obj_para_carteirinha = None # Evita processar carteirinha
-                                continue # Pula para o próximo paciente
-
-                        except Exception as e:
-                            # Make this log super clear
-                            error_type = type(e).__name__
-                            error_repr = repr(e)
-                            # Tenta obter o nome do paciente do dict original se possível
-                            paciente_nome_inner_exc = 'Nome Indisponível'
-                            if 'paciente_dict' in locals() and isinstance(paciente_dict, dict):
-                                paciente_nome_inner_exc = paciente_dict.get('nome', 'Nome Indisponível no Inner Except')
-                            elif 'paciente_create' in locals() and hasattr(paciente_create, 'nome'):
-                                paciente_nome_inner_exc = paciente_create.nome
-                            
-                            logger.error(f"Erro ao criar paciente {paciente_nome_inner_exc}: Tipo={error_type}, Repr={error_repr}")
-                            erro = {
-                                "paciente": paciente_nome_inner_exc,
-                                "erro": f"Erro ao criar: {error_repr}"
-                            }
-                            erros.append(erro)
-                            # Pula para o próximo paciente
-                            paciente_obj_para_carteirinha = None # Garante que não tentará criar carteirinha
-                            continue # Pula para o próximo paciente
-
-                    # Log que estava faltando (deve funcionar agora)
-                    if paciente_obj_para_carteirinha:
-                        num_cart = paciente_obj_para_carteirinha.get('numero_carteirinha')
-                        pac_id = paciente_obj_para_carteirinha.get('id')
-                        logger.info(f"DEBUG Carteirinha Check - Paciente ID: {pac_id}, "
-                                    f"Numero Carteirinha: '{num_cart}' (Tipo: {type(num_cart).__name__}), "
-                                    f"Plano Unimed ID: {plano_unimed_id}")
-                    else:
-                        logger.info("DEBUG Carteirinha Check - paciente_obj_para_carteirinha é None, pulando carteirinha.")
-                    
-                    # ----- Lógica da Carteirinha (Unificada) -----
-                    # Usa paciente_obj_para_carteirinha que agora é um DICIONÁRIO
-                    if paciente_obj_para_carteirinha and paciente_obj_para_carteirinha.get('numero_carteirinha') and plano_unimed_id:
-                        # Usa .get() para segurança e ['id'] para acesso
-                        numero_carteirinha = paciente_obj_para_carteirinha.get('numero_carteirinha', '').strip()
-                        paciente_id_atual = paciente_obj_para_carteirinha['id'] # Extrai o ID do dicionário
-                        paciente_nome_atual = paciente_obj_para_carteirinha.get('nome', 'Nome Indisponível')
-                        
-                        if numero_carteirinha:
-                            try:
-                                # Verificar se o paciente já tem alguma carteirinha com este número para o plano Unimed
-                                carteirinhas_existentes = db.from_("carteirinhas")\
-                                    .select("id,numero_carteirinha,plano_saude_id")\
-                                    .eq("paciente_id", paciente_id_atual)\
-                                    .eq("plano_saude_id", plano_unimed_id)\
-                                    .is_("deleted_at", "null")\
-                                    .execute()
-
-                                carteirinha_existente_com_numero = None
-                                if carteirinhas_existentes.data:
-                                    for c in carteirinhas_existentes.data:
-                                        if c.get("numero_carteirinha") == numero_carteirinha:
-                                            carteirinha_existente_com_numero = c
-                                            break
+                paciente_dict = mapear_paciente(paciente_mysql, usuario_id)
+                paciente_dict = json.loads(json.dumps(paciente_dict, cls=DateEncoder))
+            except Exception as e:
+                logger.error(f"Erro ao mapear paciente {nome_paciente}: {str(e)}")
+                erros.append({
+                    "paciente": nome_paciente,
+                    "erro": f"Erro no mapeamento: {str(e)}"
+                })
+                continue
+
+            # id_origem é a chave do upsert: sem ele o paciente seria duplicado a cada importação
+            if paciente_dict.get('id_origem') is None:
+                erros.append({
+                    "paciente": nome_paciente,
+                    "erro": "Paciente sem client_id válido - registro ignorado"
+                })
+                logger.warning(f"Pulando paciente sem id de origem: {nome_paciente}")
+                continue
+
+            pacientes_mapeados.append(paciente_dict)
+
+        resultado_lote = await importar_pacientes_em_lote(
+            db,
+            pacientes_mapeados,
+            plano_unimed_id,
+            usuario_id
+        )
+        erros.extend({"paciente": "Importação em lote", "erro": erro} for erro in resultado_lote["log_erros"])
 
-                                if not carteirinha_existente_com_numero:
-                                    # Criar nova carteirinha
-                                    nova_carteirinha = {
-                                        "paciente_id": paciente_id_atual, # Usa o ID extraído do dicionário
-                                        "plano_saude_id": plano_unimed_id,
-                                        "numero_carteirinha": numero_carteirinha,
-                                        "status": "ativa",
-                                        "created_by": usuario_id,
-                                        "updated_by": usuario_id
-                                    }
-                                    carteirinha_result = db.from_("carteirinhas").insert(nova_carteirinha).execute()
-                                    if carteirinha_result.data:
-                                        logger.info(f"Carteirinha criada automaticamente para {paciente_nome_atual}, número: {numero_carteirinha}")
-                                    else:
-                                        logger.warning(f"Falha ao criar carteirinha para {paciente_nome_atual}: {carteirinha_result.error}")
-                                else:
-                                    logger.info(f"Paciente {paciente_nome_atual} já possui carteirinha {numero_carteirinha} para o plano Unimed")
-                            except Exception as e:
-                                logger.error(f"Erro ao processar carteirinha para {paciente_nome_atual}: {str(e)}")
-                                # Não falhar a importação só porque a carteirinha falhou
-                    elif paciente_obj_para_carteirinha and not paciente_obj_para_carteirinha.get('numero_carteirinha'):
-                        # +++ Log Adicionado: Caso onde numero_carteirinha é 'falsy' +++
-                        logger.info(f"DEBUG Carteirinha Skip - Paciente {paciente_obj_para_carteirinha.get('nome', 'N/A')} não possui numero_carteirinha.")
-                        # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-                    elif not plano_unimed_id:
-                        # +++ Log Adicionado: Caso onde plano_unimed_id é None (não deveria acontecer aqui, mas por segurança) +++
-                        logger.warning("DEBUG Carteirinha Skip - plano_unimed_id é None dentro do loop.")
-                        # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+        total_importados = resultado_lote["total_processado"]
+        total_atualizados = resultado_lote["registros_atualizados"] + resultado_lote["registros_inalterados"]
 
-                    # ----- Fim Lógica da Carteirinha -----
-                except Exception as e:
-                    error_type = type(e).__name__
-                    error_repr = repr(e)
-                    logger.error(f"Erro interno ao processar o paciente {paciente_dict.get('nome', 'Nome Indisponível')}: Tipo={error_type}, Repr={error_repr}")
-                    erro = {
-                        "paciente": paciente_dict.get('nome', 'Nome Indisponível'),
-                        "erro": f"Erro interno: {error_repr}"
-                    }
-                    erros.append(erro)
-                    continue
-            except Exception as e:
-                # Registrar erro para este paciente (loop principal)
-                error_type = type(e).__name__
-                error_repr = repr(e)
-                error_str = str(e)
-                logger.error(f"Erro CRÍTICO ao importar paciente {paciente_mysql.get('client_nome', 'Nome não disponível')}: Tipo={error_type}, Repr={error_repr}, Str={error_str}")
-                erro = {
-                    "paciente": paciente_mysql.get('client_nome', 'Nome não disponível'),
-                    "erro": f"Erro CRÍTICO - Tipo: {error_type}, Detalhes: {error_repr}" # Usar repr
-                }
-                erros.append(erro)
-        
         # Registrar a importação no controle de importação
         if total_importados > 0 or total_atualizados > 0:
             try:
@@ -1123,7 +941,7 @@ async def importar_pacientes_mysql(
                 # Serializar novamente para garantir que não há objetos datetime
                 import_data = json.loads(json.dumps(import_data, cls=DateEncoder))
                 
-                db.from_("controle_importacao_pacientes").insert(import_data).execute()
+                await db.from_("controle_importacao_pacientes").insert(import_data).execute()
                 logger.info("Registro de importação salvo com sucesso")
             except Exception as e:
                 logger.error(f"Erro ao registrar importação: {str(e)}")
@@ -1137,6 +955,7 @@ async def importar_pacientes_mysql(
             "total": len(pacientes_mysql),
             "total_erros": len(erros),
             "total_atualizados": total_atualizados,
+            "carteirinhas_criadas": resultado_lote["carteirinhas_criadas"],
             "erros": erros,
             "connection_status": {
                 "success": True,
@@ -9,14 +9,14 @@ from ..models.plano_saude import PlanoSaudeCreate, PlanoSaudeUpdate, PlanoSaude
 from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..services.plano_saude import PlanoSaudeService
 from ..repositories.plano_saude import PlanoSaudeRepository
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 
 router = APIRouter(redirect_slashes=False)
 logger = logging.getLogger(__name__)
 
 
-def get_plano_saude_repository(db: SupabaseClient = Depends(
-    get_supabase_client)) -> PlanoSaudeRepository:
+def get_plano_saude_repository(db: AsyncSupabaseClient = Depends(
+    get_async_supabase_client)) -> PlanoSaudeRepository:
     return PlanoSaudeRepository(db)
 
 
@@ -9,12 +9,12 @@ from ..models.procedimento import ProcedimentoCreate, ProcedimentoUpdate, Proced
 from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..services.procedimento import ProcedimentoService
 from ..repositories.procedimento import ProcedimentoRepository
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 
 router = APIRouter(redirect_slashes=False)
 logger = logging.getLogger(__name__)
 
-def get_procedimento_repository(db: SupabaseClient = Depends(get_supabase_client)) -> ProcedimentoRepository:
+def get_procedimento_repository(db: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> ProcedimentoRepository:
     return ProcedimentoRepository(db)
 
 def get_procedimento_service(repo: ProcedimentoRepository = Depends(get_procedimento_repository)) -> ProcedimentoService:
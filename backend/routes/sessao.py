@@ -9,12 +9,12 @@ from ..schemas.sessao import SessaoCreate, SessaoUpdate, Sessao
 from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..services.sessao import SessaoService
 from ..repositories.sessao import SessaoRepository
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 
 router = APIRouter(redirect_slashes=False)
 logger = logging.getLogger(__name__)
 
-def get_sessao_repository(db: SupabaseClient = Depends(get_supabase_client)) -> SessaoRepository:
+def get_sessao_repository(db: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> SessaoRepository:
     return SessaoRepository(db)
 
 def get_sessao_service(repo: SessaoRepository = Depends(get_sessao_repository)) -> SessaoService:
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Query, Path, Body, status, Depends, UploadFile, File
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+from datetime import date, datetime, timezone
 import logging
 from math import ceil
 from uuid import UUID
@@ -11,12 +13,12 @@ from ..schemas.responses import StandardResponse, PaginatedResponse
 from ..models.storage import StorageCreate, StorageUpdate, Storage
 from ..services.storage import StorageService
 from ..repositories.storage import StorageRepository
-from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+from backend.repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
 
 router = APIRouter(redirect_slashes=False)
 logger = logging.getLogger(__name__)
 
-def get_storage_repository(db: SupabaseClient = Depends(get_supabase_client)) -> StorageRepository:
+def get_storage_repository(db: AsyncSupabaseClient = Depends(get_async_supabase_client)) -> StorageRepository:
     return StorageRepository(db)
 
 def get_storage_service(repo: StorageRepository = Depends(get_storage_repository)) -> StorageService:
@@ -142,28 +144,52 @@ async def get_files_by_reference(
 
 @router.get("/download/all",
             summary="Download de Todos os Arquivos",
-            description="Baixa todos os arquivos em um arquivo ZIP")
+            description="Baixa todos os arquivos em um arquivo ZIP, enviado enquanto é gerado")
 async def download_all_files(
+    prefix: Optional[str] = Query(None, description="Só os arquivos cujo caminho começa com o prefixo (ex.: fichas/)"),
+    start_date: Optional[date] = Query(None, description="Só os arquivos modificados a partir desta data"),
+    end_date: Optional[date] = Query(None, description="Só os arquivos modificados até esta data (inclusive)"),
     service: StorageService = Depends(get_storage_service)
 ):
-    zip_content = await service.download_all_files()
-    if not zip_content:
-        raise HTTPException(status_code=500, detail="Erro ao gerar arquivo ZIP")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date deve ser anterior ou igual a end_date")
+
+    # O gerador é síncrono (boto3); o StreamingResponse o consome em uma thread
+    zip_stream = service.download_all_files(prefix, start_date, end_date)
+    filename = f"arquivos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        zip_stream,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.post("/sync",
             response_model=StandardResponse[bool],
             summary="Sincronizar com R2",
             description="Sincroniza a tabela storage com os arquivos do Cloudflare R2")
 async def sync_with_r2(
+    modified_since: Optional[datetime] = Query(
+        None,
+        description="Sincronização incremental: só arquivos modificados a partir desta data, sem remover registros"
+    ),
     service: StorageService = Depends(get_storage_service)
 ):
     try:
-        result = await service.sync_with_r2()
+        if modified_since and modified_since.tzinfo is None:
+            modified_since = modified_since.replace(tzinfo=timezone.utc)
+
+        result = await service.sync_with_r2(modified_since)
         return StandardResponse(
-            success=True,
-            data=result,
-            message="Sincronização bidirecional concluída com sucesso"
+            success=result["erros"] == 0,
+            data=result["erros"] == 0,
+            message=(
+                f"Sincronização {'incremental' if result['incremental'] else 'bidirecional'} concluída: "
+                f"{result['adicionados']} registros adicionados, {result['removidos']} removidos, "
+                f"{result['erros']} erros"
+            )
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao sincronizar com R2: {str(e)}")
         raise HTTPException(
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import tempfile
 import logging
 import json
@@ -7,9 +8,11 @@ from fastapi import APIRouter, UploadFile, File, Form
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from backend.services.storage_r2 import storage
-from backend.utils.pdf_processor import extract_info_from_pdf
+from backend.utils.pdf_processor import extract_info_from_pdf, salvar_pdf_temporario
+from backend.utils.cache_extracao import get_cache_extracao
 from backend.utils.date_utils import formatar_data, format_date, DATE_FIELDS, DateEncoder
-from backend.repositories.database_supabase import create_storage, get_supabase_client
+from backend.repositories.database_supabase import create_storage
+from backend.repositories.database_async import get_async_supabase_client
 from uuid import UUID
 import time
 from fastapi import HTTPException
@@ -137,15 +140,18 @@ async def upload_pdf(
         modelo_ia: Modelo de IA a ser usado (claude, gemini, mistral)
         prompt_path: Caminho para um arquivo de prompt personalizado (opcional)
     """
-    resultados = []
     start_time = time.time()
-    
-    for file in files:
+
+    async def processar(file: UploadFile) -> Dict:
         try:
-            resultado = await process_pdf(file, modelo_ia, prompt_path)
-            resultados.append(resultado)
+            return await process_pdf(file, modelo_ia, prompt_path)
         except Exception as e:
-            resultados.append({"arquivo": file.filename, "erro": str(e), "status": "falha"})
+            return {"arquivo": file.filename, "erro": str(e), "status": "falha"}
+
+    # Os arquivos são processados em paralelo; o limite de chamadas simultâneas
+    # a cada provedor de IA fica em utils/pdf_processor.py. O gather devolve os
+    # resultados na mesma ordem dos arquivos enviados.
+    resultados = list(await asyncio.gather(*(processar(file) for file in files)))
     
     end_time = time.time()
     logger.info(f"Tempo total de processamento: {end_time - start_time:.2f} segundos")
@@ -185,20 +191,14 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
             status_code=500, detail=f"Chave API para o modelo {modelo_ia} não configurada"
         )
 
-    # Criar diretório temporário para arquivos se não existir
-    temp_dir = "temp_pdf"
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
-
-    # Salvar arquivo para processamento
-    temp_file_path = f"{temp_dir}/{file.filename}"
-    with open(temp_file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    # Salvar arquivo para processamento: cópia em blocos para um arquivo
+    # temporário exclusivo, já calculando o hash usado no cache de extrações
+    temp_file_path, hash_pdf, tamanho_arquivo = await salvar_pdf_temporario(file)
 
     try:
         # Extrair informações do PDF
         resultado_extracao = await extract_info_from_pdf(
-            temp_file_path, api_key, modelo_ia, prompt_path
+            temp_file_path, api_key, modelo_ia, prompt_path, hash_pdf=hash_pdf
         )
         
         # Log da resposta completa da IA
@@ -219,11 +219,11 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
             # Tentar obter o paciente_id a partir da carteirinha extraída
             paciente_id_encontrado = None
             numero_carteirinha_extraido = dados_ficha.get('paciente_carteirinha')
-            supabase = get_supabase_client() # Garante que temos a conexão
+            supabase = get_async_supabase_client() # Garante que temos a conexão
             
             if numero_carteirinha_extraido:
                 try:
-                    carteirinha_response = supabase.table("carteirinhas") \
+                    carteirinha_response = await supabase.table("carteirinhas") \
                         .select("paciente_id") \
                         .eq("numero_carteirinha", numero_carteirinha_extraido) \
                         .eq("status", "ativa") \
@@ -238,7 +238,7 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
                              logger.warning(f"Carteirinha {numero_carteirinha_extraido} encontrada, mas sem paciente_id associado.")
                     else:
                         # Se não encontrar ativa, tenta qualquer uma com o número
-                        carteirinha_response_any = supabase.table("carteirinhas") \
+                        carteirinha_response_any = await supabase.table("carteirinhas") \
                             .select("paciente_id") \
                             .eq("numero_carteirinha", numero_carteirinha_extraido) \
                             .limit(1) \
@@ -268,7 +268,7 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
                 nome_arquivo = f"{codigo}_{timestamp}.pdf"
             
             # Conectar ao Supabase
-            supabase = get_supabase_client()
+            supabase = get_async_supabase_client()
             
             # Verificar se a guia existe no sistema
             numero_guia = dados_ficha.get('numero_guia')
@@ -276,7 +276,7 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
             guia_existe = False
             if numero_guia:
                 # Buscar a guia no banco de dados
-                guia_response = supabase.table("guias").select("id").eq("numero_guia", numero_guia).execute()
+                guia_response = await supabase.table("guias").select("id").eq("numero_guia", numero_guia).execute()
                 
                 if guia_response.data and len(guia_response.data) > 0:
                     guia_existe = True
@@ -299,19 +299,21 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
                     sessao = convert_all_date_fields(sessao)
 
             # Fazer upload para R2
-            storage_url = storage.upload(
-                file_path=temp_file_path, 
-                destination_blob_name=f"{caminho_armazenamento}/{nome_arquivo}"
+            # Upload síncrono (boto3) fora do event loop
+            storage_url = await asyncio.to_thread(
+                storage.upload_file,
+                temp_file_path,
+                f"{caminho_armazenamento}/{nome_arquivo}"
             )
             
             # Criar registro no Supabase Storage
-            storage_record = create_storage(
-                nome=nome_arquivo,
-                url=storage_url,
-                size=file.size,
-                content_type=file.content_type,
-                tipo_referencia=caminho_armazenamento # 'fichas' ou 'fichas_pendentes'
-            )
+            storage_record = await create_storage({
+                "nome": nome_arquivo,
+                "url": storage_url,
+                "size": tamanho_arquivo,
+                "content_type": file.content_type,
+                "tipo_referencia": caminho_armazenamento # 'fichas' ou 'fichas_pendentes'
+            }, supabase)
             
             storage_id = storage_record["id"]
             
@@ -336,7 +338,7 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
                 # Remover chaves com valor None antes de inserir
                 dados_para_inserir_ficha = {k: v for k, v in dados_para_inserir_ficha.items() if v is not None}
 
-                response_ficha = supabase.table("fichas").insert(dados_para_inserir_ficha).execute()
+                response_ficha = await supabase.table("fichas").insert(dados_para_inserir_ficha).execute()
                 
                 if response_ficha.data:
                     logger.info(f"Ficha criada com sucesso: {response_ficha.data[0].get('id')}")
@@ -347,7 +349,7 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
                         logger.info(f"Gerando sessões automaticamente para a ficha: {ficha_id}")
                         
                         # Verificar se já existem sessões para esta ficha
-                        sessoes_existentes = supabase.table("sessoes").select("*").eq("ficha_id", ficha_id).execute()
+                        sessoes_existentes = await supabase.table("sessoes").select("*").eq("ficha_id", ficha_id).execute()
                         
                         if not sessoes_existentes.data or len(sessoes_existentes.data) == 0:
                             # Obter o total de sessões da ficha
@@ -486,7 +488,7 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
                                                 logger.error(f"Sessão sem ordem_execucao: {sessao}")
                                         
                                         logger.info(f"Tentando inserir {len(sessoes)} sessões no banco")
-                                        result = supabase.table("sessoes").insert(sessoes).execute()
+                                        result = await supabase.table("sessoes").insert(sessoes).execute()
                                         logger.info(f"Sessões criadas automaticamente: {len(result.data)} sessões")
                                         logger.info(f"Resposta da inserção: {json.dumps(result.data, default=str)}")
                                     except Exception as e:
@@ -531,7 +533,7 @@ async def process_pdf(file: UploadFile, modelo_ia: str = "claude", prompt_path:
                         "observacoes": "Guia não encontrada no sistema"
                     }
                     
-                    pendente_response = supabase.table("fichas_pendentes").insert(pendente_data).execute()
+                    pendente_response = await supabase.table("fichas_pendentes").insert(pendente_data).execute()
                     
                     if pendente_response.data:
                         logger.info(f"Ficha pendente criada: {pendente_response.data[0].get('id')}")
@@ -634,4 +636,27 @@ async def listar_prompts_disponiveis():
         return {"success": True, "prompts": prompts}
     except Exception as e:
         logger.error(f"Erro ao listar prompts: {str(e)}")
-        return {"success": False, "message": f"Erro ao listar prompts: {str(e)}"} 
\ No newline at end of file
+        return {"success": False, "message": f"Erro ao listar prompts: {str(e)}"} 
+
+@router.get("/cache-extracao")
+async def estatisticas_cache_extracao():
+    """
+    Estatísticas do cache de extrações de PDF (hits, misses e entradas).
+    """
+    cache = get_cache_extracao()
+    if cache is None:
+        return {"success": True, "ativo": False}
+    return {"success": True, "ativo": True, **cache.estatisticas()}
+
+
+@router.delete("/cache-extracao")
+async def limpar_cache_extracao():
+    """
+    Remove todas as extrações em cache, forçando uma nova chamada à IA nos próximos uploads.
+    """
+    cache = get_cache_extracao()
+    if cache is None:
+        return {"success": True, "removidas": 0}
+    removidas = cache.limpar()
+    logger.info(f"Cache de extrações limpo: {removidas} entradas removidas")
+    return {"success": True, "removidas": removidas}
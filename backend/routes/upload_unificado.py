@@ -1,4 +1,5 @@
 import os
+import asyncio
 import json
 import time
 import logging
@@ -9,9 +10,9 @@ from typing import Dict, List, Optional
 from fastapi import APIRouter, File, Form, UploadFile, HTTPException
 from pydantic import ValidationError
 
-from config.config import get_supabase_client
+from backend.repositories.database_async import get_async_supabase_client
 from services.storage_r2 import storage
-from utils.pdf_processor import extract_info_from_pdf
+from utils.pdf_processor import extract_info_from_pdf, salvar_pdf_temporario
 from utils.date_utils import formatar_data
 from utils.json_encoder import CustomEncoder
 
@@ -61,15 +62,18 @@ async def upload_pdf_unificado(
         modelo_ia: Modelo de IA a ser usado (claude, gemini, mistral)
         prompt_path: Caminho para um arquivo de prompt personalizado (opcional)
     """
-    resultados = []
     start_time = time.time()
-    
-    for file in files:
+
+    async def processar(file: UploadFile) -> Dict:
         try:
-            resultado = await process_pdf_unificado(file, modelo_ia, prompt_path)
-            resultados.append(resultado)
+            return await process_pdf_unificado(file, modelo_ia, prompt_path)
         except Exception as e:
-            resultados.append({"arquivo": file.filename, "erro": str(e), "status": "falha"})
+            return {"arquivo": file.filename, "erro": str(e), "status": "falha"}
+
+    # Os arquivos são processados em paralelo; o limite de chamadas simultâneas
+    # a cada provedor de IA fica em utils/pdf_processor.py. O gather devolve os
+    # resultados na mesma ordem dos arquivos enviados.
+    resultados = list(await asyncio.gather(*(processar(file) for file in files)))
     
     end_time = time.time()
     logger.info(f"Tempo total de processamento: {end_time - start_time:.2f} segundos")
@@ -109,20 +113,14 @@ async def process_pdf_unificado(file: UploadFile, modelo_ia: str = "claude", pro
             status_code=500, detail=f"Chave API para o modelo {modelo_ia} não configurada"
         )
 
-    # Criar diretório temporário para arquivos se não existir
-    temp_dir = "temp_pdf"
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
-
-    # Salvar arquivo para processamento
-    temp_file_path = f"{temp_dir}/{file.filename}"
-    with open(temp_file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    # Salvar arquivo para processamento: cópia em blocos para um arquivo
+    # temporário exclusivo, já calculando o hash usado no cache de extrações
+    temp_file_path, hash_pdf, tamanho_arquivo = await salvar_pdf_temporario(file)
 
     try:
         # Extrair informações do PDF
         resultado_extracao = await extract_info_from_pdf(
-            temp_file_path, api_key, modelo_ia, prompt_path
+            temp_file_path, api_key, modelo_ia, prompt_path, hash_pdf=hash_pdf
         )
         
         # Log da resposta completa da IA
@@ -152,7 +150,7 @@ async def process_pdf_unificado(file: UploadFile, modelo_ia: str = "claude", pro
                 nome_arquivo = f"{codigo}_{timestamp}.pdf"
             
             # Conectar ao Supabase
-            supabase = get_supabase_client()
+            supabase = get_async_supabase_client()
             
             # Verificar se a guia existe no sistema
             numero_guia = dados_ficha.get('numero_guia')
@@ -160,7 +158,7 @@ async def process_pdf_unificado(file: UploadFile, modelo_ia: str = "claude", pro
             guia_existe = False
             if numero_guia:
                 # Buscar a guia no banco de dados
-                guia_response = supabase.table("guias").select("id").eq("numero_guia", numero_guia).execute()
+                guia_response = await supabase.table("guias").select("id").eq("numero_guia", numero_guia).execute()
                 
                 if guia_response.data and len(guia_response.data) > 0:
                     guia_existe = True
@@ -177,7 +175,7 @@ async def process_pdf_unificado(file: UploadFile, modelo_ia: str = "claude", pro
             logger.info(f"Caminho completo no R2: {dest_name}")
             
             # Fazer upload para o R2
-            url = storage.upload_file(temp_file_path, dest_name)
+            url = await asyncio.to_thread(storage.upload_file, temp_file_path, dest_name)
             
             if not url:
                 logger.error(f"Falha no upload do arquivo para R2: {dest_name}")
@@ -193,7 +191,7 @@ async def process_pdf_unificado(file: UploadFile, modelo_ia: str = "claude", pro
             storage_data = {
                 "nome": nome_arquivo,
                 "url": url,
-                "size": os.path.getsize(temp_file_path),
+                "size": tamanho_arquivo,
                 "content_type": "application/pdf",
                 "tipo_referencia": "ficha" if guia_existe else "ficha_pendente"
             }
@@ -202,7 +200,7 @@ async def process_pdf_unificado(file: UploadFile, modelo_ia: str = "claude", pro
             logger.info(json.dumps(storage_data, cls=CustomEncoder, indent=2))
             
             # Criar registro na tabela storage
-            storage_response = supabase.table("storage").insert(storage_data).execute()
+            storage_response = await supabase.table("storage").insert(storage_data).execute()
             
             if not storage_response.data:
                 logger.error("Falha ao registrar arquivo na tabela storage")
@@ -243,7 +241,7 @@ async def process_pdf_unificado(file: UploadFile, modelo_ia: str = "claude", pro
                         "total_sessoes": dados_ficha.get("total_sessoes", 1)
                     }
                     
-                    ficha_response = supabase.table("fichas").insert(ficha_data).execute()
+                    ficha_response = await supabase.table("fichas").insert(ficha_data).execute()
                     
                     if ficha_response.data:
                         logger.info(f"Ficha criada com sucesso: {ficha_response.data[0].get('id')}")
@@ -285,7 +283,7 @@ async def process_pdf_unificado(file: UploadFile, modelo_ia: str = "claude", pro
                         "observacoes": "Guia não encontrada no sistema"
                     }
                     
-                    pendente_response = supabase.table("fichas_pendentes").insert(pendente_data).execute()
+                    pendente_response = await supabase.table("fichas_pendentes").insert(pendente_data).execute()
                     
                     if pendente_response.data:
                         logger.info(f"Ficha pendente criada: {pendente_response.data[0].get('id')}")
@@ -1,8 +1,11 @@
 import logging
+from datetime import date
+from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel
-from supabase import AsyncClient # Correção: Importar AsyncClient da biblioteca principal
-from ..repositories.database_supabase import get_supabase_client
+from pydantic import BaseModel, Field
+from ..repositories.database_async import get_async_supabase_client, AsyncSupabaseClient
+from ..repositories.views_execucoes import solicitar_refresh_views_execucoes
+from ..services.vinculacao_incremental import vincular_execucoes_incremental
 from ..schemas.responses import StandardResponse
 import json
 from backend.utils.date_utils import DateEncoder # Para serializar JSON com datas/UUIDs
@@ -14,6 +17,14 @@ class VinculacaoManualRequest(BaseModel):
     execucao_id: str
     sessao_id: str
 
+class VinculacaoBatchRequest(BaseModel):
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
+    execucao_ids: Optional[List[str]] = None
+    cursor: Optional[str] = None
+    tamanho_lote: int = Field(1000, ge=1, le=5000)
+    max_lotes: Optional[int] = Field(None, ge=1)
+
 @router.post(
     "/manual",
     summary="Vincula manualmente uma execução a uma sessão",
@@ -23,7 +34,7 @@ class VinculacaoManualRequest(BaseModel):
 )
 async def vincular_manual(
     vinculacao_data: VinculacaoManualRequest,
-    supabase: AsyncClient = Depends(get_supabase_client) # Tipo correto
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     """
     Realiza a vinculação manual de uma execução (geralmente originada do scraping)
@@ -88,50 +99,60 @@ async def vincular_manual(
     tags=["Vinculações"]
 )
 async def vincular_batch(
-    supabase: AsyncClient = Depends(get_supabase_client) # Tipo correto
+    dados: Optional[VinculacaoBatchRequest] = None,
+    supabase: AsyncSupabaseClient = Depends(get_async_supabase_client)
 ):
     """
-    Executa as funções SQL 'vincular_sessoes_execucoes' e 'vincular_sessoes_mesmo_dia'
-    para tentar vincular automaticamente as execuções pendentes às sessões correspondentes
-    com base nas regras de confiança definidas.
+    Vincula automaticamente as execuções pendentes às sessões correspondentes,
+    com as regras de confiança de 'vincular_sessoes_execucoes' e
+    'vincular_sessoes_mesmo_dia', em lotes limitados (função SQL
+    'vincular_execucoes_lote').
+
+    O escopo pode ser limitado por data_inicio/data_fim (data da execução) e
+    por execucao_ids. Com max_lotes o processamento para antes do fim e a
+    resposta traz proximo_cursor, que deve ser enviado em cursor para continuar.
     """
-    logger.info("Iniciando processo de vinculação em lote via RPC...")
+    dados = dados or VinculacaoBatchRequest()
+    if dados.data_inicio and dados.data_fim and dados.data_inicio > dados.data_fim:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="data_inicio deve ser anterior ou igual a data_fim")
+
+    logger.info(
+        f"Iniciando vinculação em lote (datas {dados.data_inicio} a {dados.data_fim}, "
+        f"{len(dados.execucao_ids) if dados.execucao_ids else 'todas as'} execuções, lotes de {dados.tamanho_lote})"
+    )
     try:
-        # Chamar a primeira função de vinculação batch
-        logger.info("Executando RPC: vincular_sessoes_execucoes")
-        rpc_response_1 = await supabase.rpc('vincular_sessoes_execucoes').execute()
-        # Verificar se houve erro na chamada RPC (a função em si pode não retornar dados, mas a chamada pode falhar)
-        # A biblioteca supabase-py v1 pode não levantar exceção em erro de RPC, verificar a resposta.
-        # Em supabase-py v2, erros são levantados como PostgrestAPIError ou APIError.
-        # Adapte a verificação de erro conforme a versão da sua biblioteca.
-        # Exemplo genérico (pode precisar de ajuste):
-        if hasattr(rpc_response_1, 'error') and rpc_response_1.error:
-             logger.error(f"Erro ao executar RPC vincular_sessoes_execucoes: {rpc_response_1.error}")
-             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro ao executar vinculação em lote (passo 1): {rpc_response_1.error}")
-        logger.info("RPC vincular_sessoes_execucoes concluída.")
-
-
-        # Chamar a segunda função de vinculação batch para casos múltiplos
-        logger.info("Executando RPC: vincular_sessoes_mesmo_dia")
-        rpc_response_2 = await supabase.rpc('vincular_sessoes_mesmo_dia').execute()
-        if hasattr(rpc_response_2, 'error') and rpc_response_2.error:
-             logger.error(f"Erro ao executar RPC vincular_sessoes_mesmo_dia: {rpc_response_2.error}")
-             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro ao executar vinculação em lote (passo 2): {rpc_response_2.error}")
-        logger.info("RPC vincular_sessoes_mesmo_dia concluída.")
-
-        logger.info("Processo de vinculação em lote disparado com sucesso.")
-        return StandardResponse(success=True, message="Processo de vinculação em lote disparado com sucesso.")
+        resultado = await vincular_execucoes_incremental(
+            supabase,
+            data_inicio=dados.data_inicio,
+            data_fim=dados.data_fim,
+            execucao_ids=dados.execucao_ids,
+            cursor=dados.cursor,
+            tamanho_lote=dados.tamanho_lote,
+            max_lotes=dados.max_lotes,
+        )
+
+        if resultado["processadas"]:
+            await solicitar_refresh_views_execucoes(supabase)
+
+        mensagem = (
+            f"{resultado['vinculadas']} execuções vinculadas e {resultado['revisao_manual']} marcadas para revisão manual "
+            f"({resultado['processadas']} processadas em {resultado['lotes']} lotes)"
+        )
+        if not resultado["concluido"]:
+            mensagem += "; processamento parcial, continue com proximo_cursor"
+        logger.info(f"Vinculação em lote: {mensagem}")
+        return StandardResponse(success=True, data=resultado, message=mensagem)
 
     except HTTPException as e:
         raise e
     except Exception as e:
-        logger.exception(f"Erro inesperado ao disparar vinculação em lote: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno ao disparar a vinculação em lote: {e}")
+        logger.exception(f"Erro inesperado na vinculação em lote: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno ao processar a vinculação em lote: {e}")
 
 @router.post("/agendamentos/batch")
 async def vincular_agendamentos_batch():
     """Endpoint para executar a função batch `vincular_agendamentos` no banco de dados."""
-    supabase = get_supabase_client()
+    supabase = get_async_supabase_client()
     try:
         # Chama a função SQL `vincular_agendamentos`
         response = await supabase.rpc("vincular_agendamentos").execute()
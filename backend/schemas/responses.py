@@ -20,4 +20,8 @@ class PaginatedResponse(StandardResponse, Generic[T]):
     total: int
     page: int
     total_pages: int
-    has_more: bool
\ No newline at end of file
+    has_more: bool
+    # Preenchido na paginação por cursor: valor a enviar em `cursor` para a próxima página
+    next_cursor: Optional[str] = None
+    # Preenchido na leitura por view materializada: início do último refresh da view
+    atualizado_em: Optional[str] = None
\ No newline at end of file
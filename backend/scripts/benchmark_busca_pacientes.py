@@ -0,0 +1,114 @@
+"""
+Benchmark da busca de pacientes: ilike sem índice x buscar_pacientes_guias (trigram).
+
+Usa termos reais tirados da própria tabela de pacientes (prefixos de nomes,
+trechos de sobrenomes, dígitos de CPF e de números de guia), simulando o que
+o frontend envia a cada tecla, e mede a latência de:
+
+  - ilike:    a busca antiga da listagem (nome.ilike.%termo%,cpf.ilike.%termo%)
+  - prefixo:  buscar_pacientes_guias com p_prefixo = true (autocomplete)
+  - completa: buscar_pacientes_guias com p_prefixo = false
+
+A latência inclui a ida e volta ao Supabase; para isolar o tempo do banco,
+compare com o EXPLAIN ANALYZE da função no SQL Editor.
+
+Uso:
+    python backend/scripts/benchmark_busca_pacientes.py
+    python backend/scripts/benchmark_busca_pacientes.py --termos 200 --limite 20
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Adicionar o diretório raiz do projeto ao PYTHONPATH
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.repositories.database_async import get_async_supabase_client, close_async_supabase_client
+
+
+async def gerar_termos(supabase, quantidade: int, semente: int = 42):
+    """Monta termos de busca a partir de uma amostra de pacientes e guias."""
+    rnd = random.Random(semente)
+    pacientes = await supabase.table("pacientes") \
+        .select("nome, cpf") \
+        .is_("deleted_at", "null") \
+        .limit(1000) \
+        .execute()
+    guias = await supabase.table("guias").select("numero_guia").limit(200).execute()
+
+    termos = []
+    for paciente in pacientes.data or []:
+        palavras = (paciente.get("nome") or "").split()
+        if palavras:
+            termos.append(palavras[0][:rnd.randint(2, 5)])
+        if len(palavras) > 1:
+            termos.append(rnd.choice(palavras[1:])[:rnd.randint(3, 6)])
+        cpf = "".join(c for c in (paciente.get("cpf") or "") if c.isdigit())
+        if len(cpf) >= 6:
+            termos.append(cpf[:rnd.randint(3, 6)])
+    for guia in guias.data or []:
+        numero = guia.get("numero_guia") or ""
+        if len(numero) >= 4:
+            termos.append(numero[:rnd.randint(4, len(numero))])
+
+    rnd.shuffle(termos)
+    return termos[:quantidade]
+
+
+async def medir(nome: str, consulta, termos):
+    tempos = []
+    resultados = 0
+    for termo in termos:
+        inicio = time.perf_counter()
+        response = await consulta(termo).execute()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        resultados += len(response.data or [])
+
+    tempos.sort()
+    p95 = tempos[max(0, int(len(tempos) * 0.95) - 1)]
+    print(
+        f"{nome:<9} | {len(termos):>4} buscas | mediana {statistics.median(tempos):7.1f} ms | "
+        f"p95 {p95:7.1f} ms | máx {tempos[-1]:7.1f} ms | {resultados / len(termos):5.1f} resultados/busca"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark da busca de pacientes")
+    parser.add_argument("--termos", "-n", type=int, default=100, help="Quantidade de buscas (padrão: 100)")
+    parser.add_argument("--limite", "-l", type=int, default=20, help="Resultados por busca (padrão: 20)")
+    args = parser.parse_args()
+
+    supabase = get_async_supabase_client()
+    try:
+        total = await supabase.table("pacientes").select("id", count="planned").limit(1).execute()
+        print(f"Pacientes (estimativa): {total.count}")
+
+        termos = await gerar_termos(supabase, args.termos)
+        if not termos:
+            print("Nenhum paciente encontrado para montar os termos de busca")
+            sys.exit(1)
+
+        await medir("ilike", lambda termo: supabase.table("pacientes")
+                    .select("*")
+                    .is_("deleted_at", "null")
+                    .or_(f"nome.ilike.%{termo}%,cpf.ilike.%{termo}%")
+                    .order("nome")
+                    .limit(args.limite), termos)
+        await medir("prefixo", lambda termo: supabase.rpc("buscar_pacientes_guias", {
+            "p_termo": termo, "p_limite": args.limite, "p_prefixo": True,
+        }), termos)
+        await medir("completa", lambda termo: supabase.rpc("buscar_pacientes_guias", {
+            "p_termo": termo, "p_limite": args.limite, "p_prefixo": False,
+        }), termos)
+    finally:
+        await close_async_supabase_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""
+Benchmark da serialização das listagens: pipeline antigo x novo.
+
+Monta páginas de execuções sintéticas, com as mesmas colunas que o Supabase
+devolve (strings, números, booleanos e nulos), e mede por página:
+
+  - format_date_fields: versão antiga (cópia + json.dumps de teste por linha,
+    com ida e volta pelo DateEncoder quando falha) x atual (uma passada só);
+  - resposta: JSONResponse (json da biblioteca padrão) x FastJSONResponse (orjson);
+  - total: as duas etapas juntas, como numa requisição de listagem.
+
+Não acessa o banco.
+
+Uso:
+    python backend/scripts/benchmark_serializacao_json.py
+    python backend/scripts/benchmark_serializacao_json.py --itens 100 --repeticoes 2000
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+# Adicionar o diretório raiz do projeto ao PYTHONPATH
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi.responses import JSONResponse
+
+from backend.utils.date_utils import DATE_FIELDS, DateEncoder, format_date, format_date_fields
+from backend.utils.json_response import FastJSONResponse
+
+
+def format_date_fields_antigo(data, fields):
+    """format_date_fields como era antes da troca (referência para comparação)."""
+    result = dict(data)
+    for field in fields:
+        if field in result and result[field] is not None:
+            result[field] = format_date(result[field])
+    try:
+        json.dumps(result)
+    except TypeError:
+        result = json.loads(json.dumps(result, cls=DateEncoder))
+    return result
+
+
+def gerar_pagina(itens: int, com_datas: bool = False):
+    """Linhas no formato da tabela execucoes; com_datas=True simula dados vindos de model_dump()."""
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    linhas = []
+    for i in range(itens):
+        criado = base + timedelta(minutes=i)
+        linha = {
+            "id": str(uuid.uuid4()),
+            "guia_id": str(uuid.uuid4()),
+            "sessao_id": str(uuid.uuid4()) if i % 3 else None,
+            "paciente_id": str(uuid.uuid4()),
+            "data_execucao": (date(2024, 1, 1) + timedelta(days=i % 90)).isoformat(),
+            "data_atendimento": (date(2024, 1, 1) + timedelta(days=i % 90)).isoformat(),
+            "paciente_nome": f"Paciente de Teste {i}",
+            "paciente_carteirinha": f"0064{i:012d}",
+            "numero_guia": f"{40000000 + i}",
+            "codigo_ficha": f"FICHA{i:06d}",
+            "codigo_ficha_temp": False,
+            "origem": "unimed_scraping",
+            "profissional_executante": "Profissional Exemplo",
+            "conselho_profissional": "CRP",
+            "numero_conselho": "12345",
+            "uf_conselho": "SP",
+            "codigo_cbo": "251510",
+            "status_biometria": "nao_verificado",
+            "observacoes": None,
+            "ordem_execucao": i % 4,
+            "link_manual_necessario": False,
+            "created_at": criado.isoformat(),
+            "updated_at": criado.isoformat(),
+            "created_by": str(uuid.uuid4()),
+            "updated_by": str(uuid.uuid4()),
+            "deleted_at": None,
+        }
+        if com_datas:
+            linha["data_execucao"] = date(2024, 1, 1) + timedelta(days=i % 90)
+            linha["created_at"] = criado
+        linhas.append(linha)
+    return linhas
+
+
+def medir(funcao, repeticoes: int) -> float:
+    """Mediana em microssegundos."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1_000_000)
+    return statistics.median(tempos)
+
+
+def resposta(itens):
+    return {"success": True, "items": itens, "total": 10000, "page": 1, "total_pages": 100, "has_more": True}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--itens", type=int, default=100, help="Itens por página")
+    parser.add_argument("--repeticoes", type=int, default=1000, help="Páginas medidas por cenário")
+    args = parser.parse_args()
+
+    print(f"Página de {args.itens} itens, mediana de {args.repeticoes} repetições (µs por página)\n")
+    print(f"{'cenário':<42}{'antigo':>10}{'novo':>10}{'ganho':>8}")
+
+    for com_datas in (False, True):
+        pagina = gerar_pagina(args.itens, com_datas)
+        rotulo = "date/datetime" if com_datas else "linhas do Supabase"
+
+        antigo = medir(lambda: [format_date_fields_antigo(i, DATE_FIELDS) for i in pagina], args.repeticoes)
+        novo = medir(lambda: [format_date_fields(i, DATE_FIELDS) for i in pagina], args.repeticoes)
+        print(f"{'format_date_fields (' + rotulo + ')':<42}{antigo:>10.0f}{novo:>10.0f}{antigo / novo:>7.1f}x")
+
+        formatados = [format_date_fields(i, DATE_FIELDS) for i in pagina]
+        antigo_json = medir(lambda: JSONResponse(resposta(formatados)), args.repeticoes)
+        novo_json = medir(lambda: FastJSONResponse(resposta(formatados)), args.repeticoes)
+        print(f"{'resposta (' + rotulo + ')':<42}{antigo_json:>10.0f}{novo_json:>10.0f}{antigo_json / novo_json:>7.1f}x")
+
+        total_antigo = medir(
+            lambda: JSONResponse(resposta([format_date_fields_antigo(i, DATE_FIELDS) for i in pagina])),
+            args.repeticoes
+        )
+        total_novo = medir(
+            lambda: FastJSONResponse(resposta([format_date_fields(i, DATE_FIELDS) for i in pagina])),
+            args.repeticoes
+        )
+        print(f"{'total (' + rotulo + ')':<42}{total_antigo:>10.0f}{total_novo:>10.0f}{total_antigo / total_novo:>7.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
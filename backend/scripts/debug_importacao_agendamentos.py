@@ -15,8 +15,8 @@ sys.path.insert(0, project_root)
 # --- Imports do Projeto ---
 # Tentar importar os módulos necessários do projeto
 try:
-    from backend.routes.agendamento import buscar_agendamentos_mysql, mapear_agendamento, testar_conexao_mysql
-    from backend.repositories.database_supabase import get_supabase_client, SupabaseClient
+    from backend.routes.agendamento import buscar_agendamentos_mysql, mapear_agendamento, testar_conexao_mysql, CacheMapeamentoAgendamento
+    from backend.repositories.database_async import get_async_supabase_client
     from backend.config.config import Settings # Para carregar configurações se necessário
     from backend.utils.date_utils import DateEncoder # Para imprimir JSONs com datas
 except ImportError as e:
@@ -61,7 +61,9 @@ async def main():
 
     # 2. Obter Cliente Supabase (necessário para `mapear_agendamento`)
     try:
-        supabase_client = get_supabase_client()
+        supabase_client = get_async_supabase_client()
+        cache_mapeamento = CacheMapeamentoAgendamento(supabase_client)
+        await cache_mapeamento.carregar()
         logger.info("Cliente Supabase obtido com sucesso.")
     except Exception as e:
         logger.error(f"Erro ao obter cliente Supabase: {e}")
@@ -104,10 +106,11 @@ async def main():
         # Chamar a função de mapeamento
         logger.debug("Chamando mapear_agendamento...")
         try:
-            agendamento_mapeado = mapear_agendamento(
+            agendamento_mapeado = await mapear_agendamento(
                 agendamento_mysql,
                 USUARIO_ID_DEBUG,
-                supabase_client
+                supabase_client,
+                cache_mapeamento
             )
             logger.debug("Dados Mapeados (prontos para Supabase):")
             # Usar json.dumps com DateEncoder para lidar com tipos datetime/date
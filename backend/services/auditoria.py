@@ -1,11 +1,11 @@
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 import logging
 import traceback
 from fastapi import APIRouter, HTTPException
 
 # Importações necessárias
-from backend.config.config import supabase
+from backend.repositories.database_async import get_async_supabase_client
 
 # Imports do database_supabase
 from backend.repositories.database_supabase import (list_fichas, list_execucoes,
@@ -17,26 +17,36 @@ from backend.repositories.auditoria_repository import (
     registrar_execucao_auditoria,
     buscar_divergencias_view,
     obter_ultima_auditoria,
+    obter_marca_auditoria_incremental,
     atualizar_status_divergencia,
     calcular_estatisticas_divergencias,
-    registrar_divergencia_detalhada,
     registrar_divergencia,
-    limpar_divergencias_db,
     listar_divergencias,
-    atualizar_ficha_ids_divergencias
+    atualizar_ficha_ids_divergencias,
+    buscar_escopo_alterado,
+    carregar_dados_auditoria,
+    resolver_divergencias_ausentes,
+    reabrir_divergencias_encontradas,
+    limpar_divergencias_sem_chave,
+    ColetorDivergencias
 )
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 
+supabase = get_async_supabase_client()
+
 # Classe AuditoriaService
 class AuditoriaService:
     def __init__(self, divergencia_repo, auditoria_repo):
         self.divergencia_repo = divergencia_repo
         self.auditoria_repo = auditoria_repo
         
-    async def realizar_auditoria(self, data_inicial=None, data_final=None):
-        return await realizar_auditoria_fichas_execucoes(data_inicial, data_final)
+    async def realizar_auditoria(self, data_inicial=None, data_final=None, incremental=False):
+        return await realizar_auditoria_fichas_execucoes(data_inicial, data_final, incremental)
+
+    async def realizar_auditoria_completa(self, data_inicial=None, data_final=None, incremental=False):
+        return await self.realizar_auditoria(data_inicial, data_final, incremental)
         
     async def listar_divergencias(
         self, 
@@ -60,7 +70,7 @@ class AuditoriaService:
                      f"order_direction={order_direction}")
         
         # Chamando a função existente com os parâmetros convertidos
-        result = listar_divergencias(
+        result = await listar_divergencias(
             page=page, 
             per_page=per_page, 
             data_inicio=data_inicio, 
@@ -85,14 +95,14 @@ class AuditoriaService:
             "offset": offset
         }
         
-    def atualizar_status_divergencia(self, id, novo_status, usuario_id=None):
-        return atualizar_status_divergencia(id, novo_status, usuario_id)
+    async def atualizar_status_divergencia(self, id, novo_status, usuario_id=None):
+        return await atualizar_status_divergencia(id, novo_status, usuario_id)
         
-    def calcular_estatisticas_divergencias(self):
-        return calcular_estatisticas_divergencias()
+    async def calcular_estatisticas_divergencias(self):
+        return await calcular_estatisticas_divergencias()
         
-    def obter_ultima_auditoria(self):
-        return obter_ultima_auditoria()
+    async def obter_ultima_auditoria(self):
+        return await obter_ultima_auditoria()
 
 # Criar router com prefixo
 router = APIRouter(prefix="/divergencias", tags=["divergencias"])
@@ -302,312 +312,366 @@ def get_divergencia_priority(tipo: str) -> str:
     
     return prioridades.get(tipo, "MEDIA")
 
+def avaliar_regras_auditoria(
+    sessoes_data: List[Dict],
+    execucoes_data: List[Dict],
+    guias: List[Dict],
+    execucoes_guias_data: List[Dict]
+) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Avalia as regras de auditoria sobre as sessões, execuções e guias carregadas.
+
+    Returns:
+        Tuple: (divergências encontradas, contagem por tipo)
+    """
+    divergencias = []
+    registrar = divergencias.append
+
+    # Validar e formatar dados para processamento
+    def validar_lista_dados(response, nome_item):
+        """Valida se os dados foram carregados corretamente"""
+        if not response:
+            logging.warning(f"Nenhum dado encontrado para {nome_item}")
+            return []
+
+        if isinstance(response, list):
+            dados = response
+        elif isinstance(response, dict):
+            dados = response.get('data', [])
+        else:
+            logging.error(
+                f"Formato inválido para {nome_item}: {type(response)}")
+            return []
+
+        # Validação adicional
+        dados_validos = []
+        for item in dados:
+            if isinstance(item, dict):
+                dados_validos.append(item)
+            else:
+                logging.warning(
+                    f"Item inválido em {nome_item}: {type(item)}")
+
+        return dados_validos
+
+    fichas = validar_lista_dados(sessoes_data, "fichas")
+    execucoes = validar_lista_dados(execucoes_data, "execucoes")
+
+    # Logging detalhado
+    logging.info(f"Fichas válidas carregadas: {len(fichas)}")
+    logging.info(f"Execuções válidas carregadas: {len(execucoes)}")
+
+    # Indexação por código_ficha para facilitar busca
+    mapa_fichas = {}
+    mapa_execucoes = {}
+    execucoes_por_guia = {}
+
+    # Mapear fichas por código
+    for f in fichas:
+        ficha_data = f.get("fichas", {})
+        codigo = ficha_data.get("codigo_ficha")
+        if codigo:
+            mapa_fichas[codigo] = ficha_data
+        else:
+            logging.warning(f"Ficha sem código: {f}")
+
+    # Mapear execuções por código
+    for e in execucoes:
+        codigo = safe_get_value(e, "codigo_ficha")
+
+        if codigo:
+            mapa_execucoes[codigo] = e
+        else:
+            logging.warning(f"Execução sem código: {e}")
+
+    # Mapear execuções por guia (todas as execuções das guias auditadas)
+    for e in execucoes_guias_data:
+        numero_guia = safe_get_value(e, "numero_guia")
+        if numero_guia:
+            if numero_guia not in execucoes_por_guia:
+                execucoes_por_guia[numero_guia] = []
+            execucoes_por_guia[numero_guia].append(e)
+
+    # Inicializar contadores de divergências
+    divergencias_encontradas = {
+        "ficha_sem_execucao": 0,
+        "execucao_sem_ficha": 0,
+        "data_divergente": 0,
+        "sessao_sem_assinatura": 0,
+        "guia_vencida": 0,
+        "quantidade_excedida": 0,
+        "falta_data_execucao": 0,
+        "duplicidade": 0
+    }
+
+    # 1. Verifica datas divergentes
+    for codigo_ficha, execucao in mapa_execucoes.items():
+        ficha = mapa_fichas.get(codigo_ficha)
+        if ficha and ficha.get("data_atendimento") and ficha["data_atendimento"] != execucao["data_execucao"]:
+            if not execucao.get("numero_guia"):
+                logging.warning(f"Execução sem número de guia: {codigo_ficha}")
+                continue
+
+            registrar({
+                "numero_guia": execucao["numero_guia"],
+                "tipo": "data_divergente",
+                "descricao": f"Data de atendimento ({ficha['data_atendimento']}) diferente da execução ({execucao['data_execucao']})",
+                "paciente_nome": execucao["paciente_nome"] or ficha["paciente_nome"],
+                "codigo_ficha": codigo_ficha,
+                "data_execucao": execucao["data_execucao"],
+                "data_atendimento": ficha["data_atendimento"],
+                "prioridade": "MEDIA",
+                "status": "pendente",
+                "ficha_id": ficha.get("id"),
+                "execucao_id": execucao.get("id")
+            })
+            divergencias_encontradas["data_divergente"] += 1
+
+    # 2. Verifica sessões sem assinatura
+    for sessao in sessoes_data:
+        ficha_dados = sessao.get("fichas", {})
+
+        # Verifica se a sessão foi executada E não possui assinatura
+        if sessao.get("status") == "executada" and not sessao.get("possui_assinatura"):
+            # Usar data_sessao tanto para data_execucao quanto para data_atendimento
+            data_sessao = sessao.get("data_sessao")
+
+            logging.info(f"""
+                Registrando divergência sessão sem assinatura:
+                Sessão ID: {sessao.get('id')}
+                Data sessão: {data_sessao}
+                Ficha: {ficha_dados.get('codigo_ficha')}
+            """)
+
+            registrar({
+                "numero_guia": ficha_dados.get("numero_guia"),
+                "tipo": "sessao_sem_assinatura",
+                "descricao": f"Sessão do dia {data_sessao} executada sem assinatura",
+                "paciente_nome": ficha_dados.get("paciente_nome"),
+                "codigo_ficha": ficha_dados.get("codigo_ficha"),
+                "data_execucao": data_sessao,
+                "data_atendimento": data_sessao,
+                "prioridade": "ALTA",
+                "ficha_id": sessao.get("ficha_id"),
+                "detalhes": {
+                    "sessao_id": sessao.get("id"),
+                    "data_sessao": data_sessao
+                }
+            })
+            divergencias_encontradas["sessao_sem_assinatura"] += 1
+
+    # 3. e 4. Verifica execuções sem ficha e fichas sem execução
+    todos_codigos = set(list(mapa_fichas.keys()) + list(mapa_execucoes.keys()))
+    for codigo_ficha in todos_codigos:
+        execucao = mapa_execucoes.get(codigo_ficha)
+        ficha = mapa_fichas.get(codigo_ficha)
+
+        if execucao and not ficha:
+            registrar({
+                "numero_guia": execucao.get("guias", {}).get("numero_guia"),
+                "tipo": "execucao_sem_ficha",
+                "descricao": "Execução sem ficha correspondente",
+                "paciente_nome": execucao.get("paciente_nome"),
+                "codigo_ficha": codigo_ficha,
+                "data_execucao": execucao.get("data_execucao"),
+                "prioridade": "ALTA",
+                "execucao_id": execucao.get("id")
+            })
+            divergencias_encontradas["execucao_sem_ficha"] += 1
+
+        elif ficha and not execucao:
+            ficha_data = ficha
+            registrar({
+                "numero_guia": ficha_data.get("numero_guia"),
+                "tipo": "ficha_sem_execucao",
+                "descricao": "Ficha sem execução correspondente",
+                "paciente_nome": ficha_data.get("paciente_nome"),
+                "codigo_ficha": codigo_ficha,
+                "data_atendimento": ficha_data.get("data_atendimento"),
+                "prioridade": "ALTA",
+                "ficha_id": ficha_data.get("id")
+            })
+            divergencias_encontradas["ficha_sem_execucao"] += 1
+
+    # 5. Verifica quantidade excedida por guia
+    for guia in guias:
+        execucoes_guia = execucoes_por_guia.get(guia["numero_guia"], [])
+        if len(execucoes_guia) > (guia.get("quantidade_autorizada") or 0):
+            registrar({
+                "numero_guia": guia["numero_guia"],
+                "tipo": "quantidade_excedida",
+                "descricao": f"Quantidade de execuções ({len(execucoes_guia)}) excede o autorizado ({guia['quantidade_autorizada']})",
+                "paciente_nome": execucoes_guia[0]["paciente_nome"] if execucoes_guia else "",
+                "detalhes": {
+                    "quantidade_autorizada": guia["quantidade_autorizada"],
+                    "quantidade_executada": len(execucoes_guia)
+                },
+                "prioridade": "ALTA",
+                "status": "pendente"
+            })
+            divergencias_encontradas["quantidade_excedida"] += 1
+
+        # 6. Verifica guia vencida
+        if guia.get("data_validade"):
+            data_validade = datetime.strptime(guia["data_validade"], "%Y-%m-%d")
+            if datetime.now() > data_validade:
+                registrar({
+                    "numero_guia": guia["numero_guia"],
+                    "tipo": "guia_vencida",
+                    "descricao": f"Guia vencida em {guia['data_validade']}",
+                    "paciente_nome": execucoes_guia[0]["paciente_nome"] if execucoes_guia else "",
+                    "detalhes": {
+                        "data_validade": guia["data_validade"]
+                    },
+                    "prioridade": "ALTA",
+                    "status": "pendente"
+                })
+                divergencias_encontradas["guia_vencida"] += 1
+
+    # 7. Verifica falta de data de execução
+    execucoes_sem_data = verificar_falta_data_execucao(execucoes_data)
+    for execucao in execucoes_sem_data:
+        registrar({
+            "numero_guia": execucao.get("numero_guia"),
+            "tipo": "falta_data_execucao",
+            "descricao": "Execução sem data registrada",
+            "paciente_nome": execucao.get("paciente_nome"),
+            "codigo_ficha": execucao.get("codigo_ficha"),
+            "prioridade": "ALTA",
+            "execucao_id": execucao.get("id")
+        })
+        divergencias_encontradas["falta_data_execucao"] += 1
+
+    # 8. Verifica duplicidades
+    duplicatas = verificar_duplicidade_execucoes(execucoes_data)
+    for grupo_duplicado in duplicatas:
+        primeira_exec = grupo_duplicado[0]
+
+        ficha = mapa_fichas.get(primeira_exec.get("codigo_ficha"))
+
+        registrar({
+            "numero_guia": primeira_exec["numero_guia"],
+            "tipo": "duplicidade",
+            "descricao": (
+                f"Sessão {primeira_exec['sessao_id']} da ficha {primeira_exec['codigo_ficha']} "
+                f"processada {len(grupo_duplicado)} vezes"
+            ),
+            "paciente_nome": primeira_exec["paciente_nome"],
+            "codigo_ficha": primeira_exec.get("codigo_ficha"),
+            "data_execucao": primeira_exec["data_execucao"],
+            "data_atendimento": ficha["data_atendimento"] if ficha else None,
+            "carteirinha": primeira_exec.get("carteirinha"),
+            "prioridade": "ALTA",
+            "detalhes": {
+                "total_duplicatas": len(grupo_duplicado),
+                "execucoes_ids": [exec["id"] for exec in grupo_duplicado],
+                "datas_execucao": [exec["data_execucao"] for exec in grupo_duplicado],
+                "sessao_id": primeira_exec.get("sessao_id")
+            }
+        })
+        divergencias_encontradas["duplicidade"] += 1
+
+    return divergencias, divergencias_encontradas
+
 async def realizar_auditoria_fichas_execucoes(
     data_inicial: str = None,
-    data_final: str = None
+    data_final: str = None,
+    incremental: bool = False
 ):
     """
     Realiza auditoria comparando sessões e execuções diretamente das tabelas.
+
+    As divergências são gravadas com upsert pela chave estável
+    (chave_auditoria); divergências abertas que não aparecem mais dentro do
+    escopo auditado são marcadas como resolvidas.
+
+    No modo incremental só são reauditadas as fichas e guias com fichas,
+    sessões, execuções ou guias alteradas desde a última auditoria. Checagens
+    que dependem apenas do relógio (guia vencida) só são reavaliadas para
+    registros alterados; uma auditoria completa periódica cobre o restante.
     
     Args:
         data_inicial: Data de início do período de auditoria (opcional)
         data_final: Data de fim do período de auditoria (opcional)
+        incremental: Audita apenas o que mudou desde a última auditoria
         
     Returns:
         Dict: Resultado da auditoria com estatísticas
     """
     try:
-        # Limpa divergências antigas
-        limpar_divergencias_db()
+        inicio = datetime.now(timezone.utc).isoformat()
+
+        # Define o escopo: tudo (auditoria completa) ou apenas o que mudou
+        escopo = None
+        desde = None
+        if incremental:
+            # Só auditorias sem janela de datas servem de marca (ver obter_marca_auditoria_incremental)
+            desde = await obter_marca_auditoria_incremental()
+            if desde:
+                escopo = await buscar_escopo_alterado(desde)
+            else:
+                logging.info("Nenhuma auditoria anterior sem janela de datas encontrada, executando auditoria completa")
+        if escopo is None and not (data_inicial or data_final):
+            # Divergências gravadas antes da chave estável são recriadas
+            await limpar_divergencias_sem_chave()
 
-        # Busca os dados diretamente das tabelas
+        # Busca os dados das tabelas
         try:
-            # Buscar sessões com dados de fichas
-            sessoes = supabase.table("sessoes") \
-                .select("*, fichas!sessoes_ficha_id_fkey(*)") \
-                .execute()
-
-            # Buscar execuções com dados de guias
-            execucoes = supabase.table("execucoes") \
-                .select("*, guias!execucoes_guia_id_fkey(*)") \
-                .execute()
-
-            # Buscar guias com dados de carteirinhas
-            guias_response = supabase.table("guias") \
-                .select("*, carteirinhas!guias_carteirinha_id_fkey(*)") \
-                .execute()
-            guias = guias_response.data if guias_response and hasattr(
-                guias_response, 'data') else []
-
-            # Extrair dados das respostas
-            sessoes_data = sessoes.data if sessoes and hasattr(
-                sessoes, 'data') else []
-            execucoes_data = execucoes.data if execucoes and hasattr(
-                execucoes, 'data') else []
+            dados = await carregar_dados_auditoria(data_inicial, data_final, escopo)
+            sessoes_data = dados["sessoes"]
+            execucoes_data = dados["execucoes"]
+            guias = dados["guias"]
+            execucoes_guias_data = dados["execucoes_guias"]
 
         except Exception as e:
             logging.error(f"Erro ao buscar dados das tabelas: {e}")
             raise Exception(f"Erro ao buscar dados: {e}")
 
-        # Validar e formatar dados para processamento
-        def validar_lista_dados(response, nome_item):
-            """Valida se os dados foram carregados corretamente"""
-            if not response:
-                logging.warning(f"Nenhum dado encontrado para {nome_item}")
-                return []
-
-            if isinstance(response, list):
-                dados = response
-            elif isinstance(response, dict):
-                dados = response.get('data', [])
-            else:
-                logging.error(
-                    f"Formato inválido para {nome_item}: {type(response)}")
-                return []
-
-            # Validação adicional
-            dados_validos = []
-            for item in dados:
-                if isinstance(item, dict):
-                    dados_validos.append(item)
-                else:
-                    logging.warning(
-                        f"Item inválido em {nome_item}: {type(item)}")
-
-            return dados_validos
-
-        fichas = validar_lista_dados(sessoes_data, "fichas")
-        execucoes = validar_lista_dados(execucoes_data, "execucoes")
-
-        # Logging detalhado
-        logging.info(f"Fichas válidas carregadas: {len(fichas)}")
-        logging.info(f"Execuções válidas carregadas: {len(execucoes)}")
-
-        # Indexação por código_ficha para facilitar busca
-        mapa_fichas = {}
-        mapa_execucoes = {}
-        execucoes_por_guia = {}
-
-        # Mapear fichas por código
-        for f in fichas:
-            ficha_data = f.get("fichas", {})
-            codigo = ficha_data.get("codigo_ficha")
-            if codigo:
-                mapa_fichas[codigo] = ficha_data
-            else:
-                logging.warning(f"Ficha sem código: {f}")
-
-        # Mapear execuções por código e guia
-        for e in execucoes:
-            codigo = safe_get_value(e, "codigo_ficha")
-            numero_guia = safe_get_value(e, "numero_guia")
+        # Escopo usado para resolver divergências que deixaram de existir
+        if escopo is None and (data_inicial or data_final):
+            escopo = {
+                "codigos_ficha": {
+                    (s.get("fichas") or {}).get("codigo_ficha") for s in sessoes_data
+                } | {e.get("codigo_ficha") for e in execucoes_data},
+                "numeros_guia": {g.get("numero_guia") for g in guias},
+            }
 
-            if codigo:
-                mapa_execucoes[codigo] = e
-            else:
-                logging.warning(f"Execução sem código: {e}")
-
-            if numero_guia:
-                if numero_guia not in execucoes_por_guia:
-                    execucoes_por_guia[numero_guia] = []
-                execucoes_por_guia[numero_guia].append(e)
-
-        # Inicializar contadores de divergências
-        divergencias_encontradas = {
-            "ficha_sem_execucao": 0,
-            "execucao_sem_ficha": 0,
-            "data_divergente": 0,
-            "sessao_sem_assinatura": 0,
-            "guia_vencida": 0,
-            "quantidade_excedida": 0,
-            "falta_data_execucao": 0,
-            "duplicidade": 0
+        # Avaliar as regras de auditoria
+        divergencias, divergencias_encontradas = avaliar_regras_auditoria(
+            sessoes_data, execucoes_data, guias, execucoes_guias_data
+        )
+        fichas = [s for s in sessoes_data if isinstance(s, dict)]
+        execucoes = [e for e in execucoes_data if isinstance(e, dict)]
+        logging.info(f"Sessões avaliadas: {len(fichas)}, execuções avaliadas: {len(execucoes)}")
+
+        # Divergências encontradas são acumuladas e gravadas em lote
+        coletor = ColetorDivergencias()
+        for divergencia in divergencias:
+            coletor.adicionar(divergencia)
+
+        # Gravar as divergências encontradas
+        await coletor.flush()
+
+        # Resolver divergências que não foram encontradas novamente e reabrir as que voltaram
+        resolvidas_auditoria = await resolver_divergencias_ausentes(coletor.chaves, escopo)
+        reabertas_auditoria = await reabrir_divergencias_encontradas(coletor.chaves)
+
+        metricas = {
+            "modo": "incremental" if desde and incremental else "completa",
+            "alteracoes_desde": desde,
+            "resolvidas_automaticamente": resolvidas_auditoria,
+            "reabertas": reabertas_auditoria,
+            "divergencias_gravadas": coletor.gravadas,
+            "divergencias_com_falha": coletor.falhas + coletor.invalidas
         }
 
-        # 1. Verifica datas divergentes
-        for codigo_ficha, execucao in mapa_execucoes.items():
-            ficha = mapa_fichas.get(codigo_ficha)
-            if ficha and ficha.get("data_atendimento") and ficha["data_atendimento"] != execucao["data_execucao"]:
-                if not execucao.get("numero_guia"):
-                    logging.warning(f"Execução sem número de guia: {codigo_ficha}")
-                    continue
-
-                registrar_divergencia_detalhada({
-                    "numero_guia": execucao["numero_guia"],
-                    "tipo": "data_divergente",
-                    "descricao": f"Data de atendimento ({ficha['data_atendimento']}) diferente da execução ({execucao['data_execucao']})",
-                    "paciente_nome": execucao["paciente_nome"] or ficha["paciente_nome"],
-                    "codigo_ficha": codigo_ficha,
-                    "data_execucao": execucao["data_execucao"],
-                    "data_atendimento": ficha["data_atendimento"],
-                    "prioridade": "MEDIA",
-                    "status": "pendente",
-                    "ficha_id": ficha.get("id"),
-                    "execucao_id": execucao.get("id")
-                })
-                divergencias_encontradas["data_divergente"] += 1
-
-        # 2. Verifica sessões sem assinatura
-        for sessao in sessoes_data:
-            ficha_dados = sessao.get("fichas", {})
-
-            # Verifica se a sessão foi executada E não possui assinatura
-            if sessao.get("status") == "executada" and not sessao.get("possui_assinatura"):
-                # Usar data_sessao tanto para data_execucao quanto para data_atendimento
-                data_sessao = sessao.get("data_sessao")
-
-                logging.info(f"""
-                    Registrando divergência sessão sem assinatura:
-                    Sessão ID: {sessao.get('id')}
-                    Data sessão: {data_sessao}
-                    Ficha: {ficha_dados.get('codigo_ficha')}
-                """)
-
-                registrar_divergencia_detalhada({
-                    "numero_guia": ficha_dados.get("numero_guia"),
-                    "tipo": "sessao_sem_assinatura",
-                    "descricao": f"Sessão do dia {data_sessao} executada sem assinatura",
-                    "paciente_nome": ficha_dados.get("paciente_nome"),
-                    "codigo_ficha": ficha_dados.get("codigo_ficha"),
-                    "data_execucao": data_sessao,
-                    "data_atendimento": data_sessao,
-                    "prioridade": "ALTA",
-                    "ficha_id": sessao.get("ficha_id"),
-                    "detalhes": {
-                        "sessao_id": sessao.get("id"),
-                        "data_sessao": data_sessao
-                    }
-                })
-                divergencias_encontradas["sessao_sem_assinatura"] += 1
-
-        # 3. e 4. Verifica execuções sem ficha e fichas sem execução
-        todos_codigos = set(list(mapa_fichas.keys()) + list(mapa_execucoes.keys()))
-        for codigo_ficha in todos_codigos:
-            execucao = mapa_execucoes.get(codigo_ficha)
-            ficha = mapa_fichas.get(codigo_ficha)
-
-            if execucao and not ficha:
-                registrar_divergencia_detalhada({
-                    "numero_guia": execucao.get("guias", {}).get("numero_guia"),
-                    "tipo": "execucao_sem_ficha",
-                    "descricao": "Execução sem ficha correspondente",
-                    "paciente_nome": execucao.get("paciente_nome"),
-                    "codigo_ficha": codigo_ficha,
-                    "data_execucao": execucao.get("data_execucao"),
-                    "prioridade": "ALTA",
-                    "execucao_id": execucao.get("id")
-                })
-                divergencias_encontradas["execucao_sem_ficha"] += 1
-
-            elif ficha and not execucao:
-                ficha_data = ficha.get("fichas", {})
-                registrar_divergencia_detalhada({
-                    "numero_guia": ficha_data.get("numero_guia"),
-                    "tipo": "ficha_sem_execucao",
-                    "descricao": "Ficha sem execução correspondente",
-                    "paciente_nome": ficha_data.get("paciente_nome"),
-                    "codigo_ficha": codigo_ficha,
-                    "data_atendimento": ficha_data.get("data_atendimento"),
-                    "prioridade": "ALTA",
-                    "ficha_id": ficha_data.get("id")
-                })
-                divergencias_encontradas["ficha_sem_execucao"] += 1
-
-        # 5. Verifica quantidade excedida por guia
-        for guia in guias:
-            execucoes_guia = execucoes_por_guia.get(guia["numero_guia"], [])
-            if len(execucoes_guia) > guia.get("quantidade_autorizada", 0):
-                registrar_divergencia_detalhada({
-                    "numero_guia": guia["numero_guia"],
-                    "tipo": "quantidade_excedida",
-                    "descricao": f"Quantidade de execuções ({len(execucoes_guia)}) excede o autorizado ({guia['quantidade_autorizada']})",
-                    "paciente_nome": execucoes_guia[0]["paciente_nome"] if execucoes_guia else "",
-                    "detalhes": {
-                        "quantidade_autorizada": guia["quantidade_autorizada"],
-                        "quantidade_executada": len(execucoes_guia)
-                    },
-                    "prioridade": "ALTA",
-                    "status": "pendente"
-                })
-                divergencias_encontradas["quantidade_excedida"] += 1
-
-            # 6. Verifica guia vencida
-            if guia.get("data_validade"):
-                data_validade = datetime.strptime(guia["data_validade"], "%Y-%m-%d")
-                if datetime.now() > data_validade:
-                    registrar_divergencia_detalhada({
-                        "numero_guia": guia["numero_guia"],
-                        "tipo": "guia_vencida",
-                        "descricao": f"Guia vencida em {guia['data_validade']}",
-                        "paciente_nome": execucoes_guia[0]["paciente_nome"] if execucoes_guia else "",
-                        "detalhes": {
-                            "data_validade": guia["data_validade"]
-                        },
-                        "prioridade": "ALTA",
-                        "status": "pendente"
-                    })
-                    divergencias_encontradas["guia_vencida"] += 1
-
-        # 7. Verifica falta de data de execução
-        execucoes_sem_data = verificar_falta_data_execucao(execucoes_data)
-        for execucao in execucoes_sem_data:
-            registrar_divergencia_detalhada({
-                "numero_guia": execucao.get("numero_guia"),
-                "tipo": "falta_data_execucao",
-                "descricao": "Execução sem data registrada",
-                "paciente_nome": execucao.get("paciente_nome"),
-                "codigo_ficha": execucao.get("codigo_ficha"),
-                "prioridade": "ALTA",
-                "execucao_id": execucao.get("id")
-            })
-            divergencias_encontradas["falta_data_execucao"] += 1
-
-        # 8. Verifica duplicidades
-        duplicatas = verificar_duplicidade_execucoes(execucoes_data)
-        for grupo_duplicado in duplicatas:
-            primeira_exec = grupo_duplicado[0]
-            
-            # Busca a ficha correspondente para obter dados complementares
-            ficha = None
-            if primeira_exec.get("codigo_ficha"):
-                ficha_response = (
-                    supabase.table("fichas")
-                    .select("*")
-                    .eq("codigo_ficha", primeira_exec["codigo_ficha"])
-                    .execute()
-                )
-                if ficha_response.data:
-                    ficha = ficha_response.data[0]
-
-            registrar_divergencia_detalhada({
-                "numero_guia": primeira_exec["numero_guia"],
-                "tipo": "duplicidade",
-                "descricao": (
-                    f"Sessão {primeira_exec['sessao_id']} da ficha {primeira_exec['codigo_ficha']} "
-                    f"processada {len(grupo_duplicado)} vezes"
-                ),
-                "paciente_nome": primeira_exec["paciente_nome"],
-                "codigo_ficha": primeira_exec.get("codigo_ficha"),
-                "data_execucao": primeira_exec["data_execucao"],
-                "data_atendimento": ficha["data_atendimento"] if ficha else None,
-                "carteirinha": primeira_exec.get("carteirinha"),
-                "prioridade": "ALTA",
-                "detalhes": {
-                    "total_duplicatas": len(grupo_duplicado),
-                    "execucoes_ids": [exec["id"] for exec in grupo_duplicado],
-                    "datas_execucao": [exec["data_execucao"] for exec in grupo_duplicado],
-                    "sessao_id": primeira_exec.get("sessao_id")
-                }
-            })
-            divergencias_encontradas["duplicidade"] += 1
-
         # Calcular estatísticas finais
         total_divergencias = sum(divergencias_encontradas.values())
         total_resolvidas = 0
 
         # Buscar contagens da tabela de divergências para obter resolvidas
         divergencias_count = (
-            supabase.table("divergencias")
+            await supabase.table("divergencias")
             .select("status", count="exact")
             .eq("status", "resolvida")
             .execute()
@@ -617,7 +681,7 @@ async def realizar_auditoria_fichas_execucoes(
             total_resolvidas = divergencias_count.count
 
         # Registrar execução da auditoria com estatísticas completas
-        registrar_execucao_auditoria(
+        await registrar_execucao_auditoria(
             data_inicial=data_inicial,
             data_final=data_final,
             total_protocolos=len(fichas) + len(execucoes),
@@ -625,7 +689,9 @@ async def realizar_auditoria_fichas_execucoes(
             divergencias_por_tipo=divergencias_encontradas,
             total_fichas=len(fichas),
             total_execucoes=len(execucoes),
-            total_resolvidas=total_resolvidas
+            total_resolvidas=total_resolvidas,
+            data_execucao=inicio,
+            metricas_adicionais=metricas
         )
 
         return {
@@ -635,7 +701,8 @@ async def realizar_auditoria_fichas_execucoes(
                 "total_execucoes": len(execucoes),
                 "divergencias_por_tipo": divergencias_encontradas,
                 "total_divergencias": total_divergencias,
-                "total_resolvidas": total_resolvidas
+                "total_resolvidas": total_resolvidas,
+                **metricas
             }
         }
 
@@ -646,7 +713,7 @@ async def realizar_auditoria_fichas_execucoes(
 
 
 @router.get("/")
-def listar_divergencias_route(
+async def listar_divergencias_route(
         page: int = 1,
         per_page: int = 10,
         data_inicio: Optional[str] = None,
@@ -671,7 +738,7 @@ def listar_divergencias_route(
         Dict: Lista paginada de divergências
     """
     try:
-        return listar_divergencias(
+        return await listar_divergencias(
             page=page,
             per_page=per_page,
             data_inicio=data_inicio,
@@ -690,7 +757,8 @@ def listar_divergencias_route(
 @router.post("/auditoria/executar")
 async def executar_auditoria_route(
     data_inicial: Optional[str] = None,
-    data_final: Optional[str] = None
+    data_final: Optional[str] = None,
+    incremental: bool = False
 ):
     """
     Executa a auditoria de divergências
@@ -698,6 +766,7 @@ async def executar_auditoria_route(
     Args:
         data_inicial: Data de início do período (opcional)
         data_final: Data de fim do período (opcional)
+        incremental: Audita apenas o que mudou desde a última auditoria
         
     Returns:
         Dict: Resultado da auditoria
@@ -705,7 +774,8 @@ async def executar_auditoria_route(
     try:
         resultado = await realizar_auditoria_fichas_execucoes(
             data_inicial=data_inicial,
-            data_final=data_final
+            data_final=data_final,
+            incremental=incremental
         )
         return resultado
     except Exception as e:
@@ -733,7 +803,7 @@ async def atualizar_status_divergencia_route(
         Dict: Resultado da operação
     """
     try:
-        resultado = atualizar_status_divergencia(
+        resultado = await atualizar_status_divergencia(
             id=id,
             novo_status=novo_status,
             usuario_id=usuario_id
@@ -755,7 +825,7 @@ async def obter_estatisticas_route():
         Dict: Estatísticas das divergências
     """
     try:
-        return calcular_estatisticas_divergencias()
+        return await calcular_estatisticas_divergencias()
     except Exception as e:
         logging.error(f"Erro ao obter estatísticas: {str(e)}")
         logging.error(traceback.format_exc())
@@ -772,7 +842,7 @@ async def obter_ultima_auditoria_route():
         Dict: Dados da última auditoria
     """
     try:
-        return obter_ultima_auditoria()
+        return await obter_ultima_auditoria()
     except Exception as e:
         logging.error(f"Erro ao obter última auditoria: {str(e)}")
         logging.error(traceback.format_exc())
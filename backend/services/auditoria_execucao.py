@@ -205,7 +205,7 @@ class AuditoriaExecucaoService:
             from ..repositories.auditoria_repository import buscar_divergencias_view
             
             # Buscar divergências relacionadas a esta execução
-            result = buscar_divergencias_view(
+            result = await buscar_divergencias_view(
                 page=page,
                 per_page=per_page,
                 status=status,
@@ -26,7 +26,10 @@ class ExecucaoService:
         is_vinculada: Optional[bool] = None,
         link_manual_necessario: Optional[bool] = None,
         order_column: str = "data_execucao",
-        order_direction: str = "desc"
+        order_direction: str = "desc",
+        cursor: Optional[str] = None,
+        count: str = "exact",
+        fonte: str = "tabela"
     ) -> Dict:
         try:
             data_inicio_dt: Optional[date] = None
@@ -54,7 +57,10 @@ class ExecucaoService:
                 is_vinculada=is_vinculada,
                 link_manual_necessario=link_manual_necessario,
                 order_column=order_column,
-                order_direction=order_direction
+                order_direction=order_direction,
+                cursor=cursor,
+                count=count,
+                fonte=fonte
             )
             
             items = []
@@ -74,7 +80,9 @@ class ExecucaoService:
                 "items": items,
                 "total": result.get("total", 0),
                 "limit": result.get("limit", limit),
-                "offset": result.get("offset", offset)
+                "offset": result.get("offset", offset),
+                "next_cursor": result.get("next_cursor"),
+                "atualizado_em": result.get("atualizado_em")
             }
         except HTTPException as he:
             raise he
@@ -1,9 +1,121 @@
-from typing import Dict, List
-from datetime import datetime
+"""
+Exportação de execuções para Excel e CSV.
+
+O modo streaming (stream_export) percorre ExecucaoRepository.list página a
+página, por cursor, com os mesmos filtros da listagem, e escreve cada linha
+assim que a página chega, sem montar a lista completa nem um DataFrame:
+
+- csv: cada página vira um pedaço do arquivo, enviado ao cliente na hora;
+- xlsx: o xlsxwriter em modo constant_memory grava as linhas em arquivos
+  temporários e o .xlsx final é montado em disco e enviado em pedaços.
+
+Em ambos a memória usada fica limitada a uma página de execuções.
+"""
+import asyncio
+import csv
+import logging
+import tempfile
+import time
+from datetime import date, datetime
+from io import BytesIO, StringIO
+from typing import Any, AsyncIterator, Dict, List, Optional
+
 import pandas as pd
-from io import BytesIO
+import xlsxwriter
+
 from ..repositories.execucao import ExecucaoRepository
 
+logger = logging.getLogger(__name__)
+
+TAMANHO_PAGINA_EXPORTACAO = 1000
+TAMANHO_PEDACO_EXPORTACAO = 1024 * 1024  # 1 MiB
+FORMATOS_EXPORTACAO = ("xlsx", "csv")
+
+# (cabeçalho, campo da execução)
+COLUNAS_EXPORTACAO = (
+    ('Data de Execução', 'data_execucao'),
+    ('Data de Atendimento', 'data_atendimento'),
+    ('Paciente', 'paciente_nome'),
+    ('Carteirinha', 'paciente_carteirinha'),
+    ('Número da Guia', 'numero_guia'),
+    ('Código da Ficha', 'codigo_ficha'),
+    ('Status Biometria', 'status_biometria'),
+    ('Origem', 'origem'),
+    ('Profissional', 'profissional_executante'),
+    ('Conselho', 'conselho_profissional'),
+    ('Nº Conselho', 'numero_conselho'),
+    ('UF Conselho', 'uf_conselho'),
+    ('Código CBO', 'codigo_cbo'),
+    ('Data de Criação', 'created_at'),
+)
+CAMPOS_DATA = ('data_execucao', 'data_atendimento', 'created_at')
+STATUS_BIOMETRIA = {
+    'nao_verificado': 'Não Verificado',
+    'verificado': 'Verificado',
+    'falha': 'Falha'
+}
+
+
+def _formatar_data(valor: Any) -> Optional[str]:
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(str(valor)).strftime('%d/%m/%Y %H:%M')
+    except ValueError:
+        pass
+    # Formatos que o fromisoformat não aceita (ex.: frações com menos de 6 dígitos)
+    data = pd.to_datetime(valor, errors='coerce')
+    if pd.isna(data):
+        return None
+    return data.strftime('%d/%m/%Y %H:%M')
+
+
+def _linha_exportacao(execucao: Dict) -> List[Any]:
+    """Valores de uma execução na ordem de COLUNAS_EXPORTACAO, já formatados."""
+    linha = []
+    for _, campo in COLUNAS_EXPORTACAO:
+        valor = execucao.get(campo)
+        if campo in CAMPOS_DATA:
+            valor = _formatar_data(valor)
+        elif campo == 'status_biometria':
+            valor = STATUS_BIOMETRIA.get(valor)
+        linha.append(valor)
+    return linha
+
+
+class _PlanilhaExecucoes:
+    """Planilha 'Execuções' com a formatação de sempre, escrita linha a linha."""
+
+    def __init__(self, destino, constant_memory: bool = False):
+        opcoes = {'constant_memory': True} if constant_memory else {'in_memory': True}
+        self.workbook = xlsxwriter.Workbook(destino, opcoes)
+        self.worksheet = self.workbook.add_worksheet('Execuções')
+        self.linha_atual = 0
+
+        header_format = self.workbook.add_format({
+            'bold': True,
+            'text_wrap': True,
+            'valign': 'top',
+            'bg_color': '#D9EAD3',
+            'border': 1
+        })
+        cell_format = self.workbook.add_format({
+            'text_wrap': True,
+            'border': 1
+        })
+
+        for col_num, (cabecalho, _) in enumerate(COLUNAS_EXPORTACAO):
+            self.worksheet.set_column(col_num, col_num, 15, cell_format)
+            self.worksheet.write(0, col_num, cabecalho, header_format)
+
+    def adicionar(self, execucao: Dict) -> None:
+        self.linha_atual += 1
+        self.worksheet.write_row(self.linha_atual, 0, _linha_exportacao(execucao))
+
+    def fechar(self) -> None:
+        self.workbook.close()
+
+
 class ExecucaoExportService:
     def __init__(self, repository: ExecucaoRepository):
         self.repository = repository
@@ -12,69 +124,110 @@ class ExecucaoExportService:
         """
         Exporta uma lista de execuções para Excel
         """
-        # Prepara os dados para o Excel
-        data = []
-        for execucao in execucoes:
-            data.append({
-                'Data de Execução': execucao.get('data_execucao'),
-                'Data de Atendimento': execucao.get('data_atendimento'),
-                'Paciente': execucao.get('paciente_nome'),
-                'Carteirinha': execucao.get('paciente_carteirinha'),
-                'Número da Guia': execucao.get('numero_guia'),
-                'Código da Ficha': execucao.get('codigo_ficha'),
-                'Status Biometria': execucao.get('status_biometria'),
-                'Origem': execucao.get('origem'),
-                'Profissional': execucao.get('profissional_executante'),
-                'Conselho': execucao.get('conselho_profissional'),
-                'Nº Conselho': execucao.get('numero_conselho'),
-                'UF Conselho': execucao.get('uf_conselho'),
-                'Código CBO': execucao.get('codigo_cbo'),
-                'Data de Criação': execucao.get('created_at')
-            })
-
-        # Cria o DataFrame
-        df = pd.DataFrame(data)
-
-        # Formata as datas
-        date_columns = ['Data de Execução', 'Data de Atendimento', 'Data de Criação']
-        for col in date_columns:
-            df[col] = pd.to_datetime(df[col]).dt.strftime('%d/%m/%Y %H:%M')
-
-        # Formata o status da biometria
-        status_map = {
-            'nao_verificado': 'Não Verificado',
-            'verificado': 'Verificado',
-            'falha': 'Falha'
-        }
-        df['Status Biometria'] = df['Status Biometria'].map(status_map)
-
-        # Cria o arquivo Excel em memória
         output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Execuções', index=False)
-            
-            # Formata a planilha
-            worksheet = writer.sheets['Execuções']
-            workbook = writer.book
-            
-            # Define formatos
-            header_format = workbook.add_format({
-                'bold': True,
-                'text_wrap': True,
-                'valign': 'top',
-                'bg_color': '#D9EAD3',
-                'border': 1
-            })
-            
-            cell_format = workbook.add_format({
-                'text_wrap': True,
-                'border': 1
-            })
-
-            # Aplica os formatos
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-                worksheet.set_column(col_num, col_num, 15, cell_format)
+        planilha = _PlanilhaExecucoes(output)
+        for execucao in execucoes:
+            planilha.adicionar(execucao)
+        planilha.fechar()
 
         output.seek(0)
-        return output
\ No newline at end of file
+        return output
+
+    async def iter_execucoes(
+        self,
+        search: Optional[str] = None,
+        numero_guia: Optional[str] = None,
+        data_inicio: Optional[date] = None,
+        data_fim: Optional[date] = None,
+        is_vinculada: Optional[bool] = None,
+        link_manual_necessario: Optional[bool] = None,
+        order_column: str = "data_execucao",
+        order_direction: str = "desc",
+        tamanho_pagina: int = TAMANHO_PAGINA_EXPORTACAO
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Percorre as execuções dos filtros informados página a página, por
+        cursor e sem contagem do total.
+
+        Yields:
+            List[Dict]: Execuções de cada página
+        """
+        cursor = ""
+        while cursor is not None:
+            pagina = await self.repository.list(
+                limit=tamanho_pagina,
+                search=search,
+                numero_guia=numero_guia,
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                is_vinculada=is_vinculada,
+                link_manual_necessario=link_manual_necessario,
+                order_column=order_column,
+                order_direction=order_direction,
+                cursor=cursor,
+                count=None
+            )
+            if pagina["items"]:
+                yield pagina["items"]
+            cursor = pagina["next_cursor"]
+
+    async def stream_export(self, formato: str = "xlsx", **filtros) -> AsyncIterator[bytes]:
+        """
+        Gera o arquivo de exportação em pedaços, para ser enviado por
+        StreamingResponse. Aceita os mesmos filtros de iter_execucoes.
+
+        Ao final registra no log o número de linhas e o tempo gasto.
+
+        Yields:
+            bytes: Pedaços do arquivo
+        """
+        if formato not in FORMATOS_EXPORTACAO:
+            raise ValueError(f"Formato de exportação inválido: {formato}")
+
+        inicio = time.monotonic()
+        metricas = {"linhas": 0, "paginas": 0}
+        if formato == "csv":
+            gerador = self._stream_csv(metricas, filtros)
+        else:
+            gerador = self._stream_xlsx(metricas, filtros)
+
+        async for pedaco in gerador:
+            yield pedaco
+
+        logger.info(
+            f"Exportação de execuções ({formato}): {metricas['linhas']} linhas em "
+            f"{metricas['paginas']} páginas, {time.monotonic() - inicio:.1f}s"
+        )
+
+    async def _stream_csv(self, metricas: Dict[str, int], filtros: Dict) -> AsyncIterator[bytes]:
+        # BOM para o Excel reconhecer UTF-8; ';' é o separador esperado no Excel em pt-BR
+        buffer = StringIO()
+        escritor = csv.writer(buffer, delimiter=';')
+        escritor.writerow(cabecalho for cabecalho, _ in COLUNAS_EXPORTACAO)
+        yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+
+        async for execucoes in self.iter_execucoes(**filtros):
+            buffer.seek(0)
+            buffer.truncate()
+            escritor.writerows(_linha_exportacao(execucao) for execucao in execucoes)
+            metricas["paginas"] += 1
+            metricas["linhas"] += len(execucoes)
+            yield buffer.getvalue().encode('utf-8')
+
+    async def _stream_xlsx(self, metricas: Dict[str, int], filtros: Dict) -> AsyncIterator[bytes]:
+        # O .xlsx é um ZIP cujo índice só existe no fim: monta em disco e envia em seguida
+        with tempfile.TemporaryFile() as arquivo:
+            planilha = _PlanilhaExecucoes(arquivo, constant_memory=True)
+            async for execucoes in self.iter_execucoes(**filtros):
+                for execucao in execucoes:
+                    planilha.adicionar(execucao)
+                metricas["paginas"] += 1
+                metricas["linhas"] += len(execucoes)
+            await asyncio.to_thread(planilha.fechar)
+
+            arquivo.seek(0)
+            while True:
+                pedaco = await asyncio.to_thread(arquivo.read, TAMANHO_PEDACO_EXPORTACAO)
+                if not pedaco:
+                    break
+                yield pedaco
@@ -0,0 +1,131 @@
+"""
+Importação em lote de pacientes e carteirinhas do sistema Aba.
+
+Em vez de quatro ou cinco idas ao Supabase por paciente (verificar, inserir
+ou atualizar, buscar carteirinhas e inserir a carteirinha), a importação:
+
+1. grava os pacientes com sincronizar_dimensao (carga única das linhas
+   existentes e upsert em lotes pela chave id_origem, regravando só os
+   novos e alterados);
+2. carrega de uma vez o mapa id_origem -> id e os números de carteirinha
+   já usados no plano (filtrados no servidor);
+3. insere em lotes apenas as carteirinhas cujo número ainda não existe.
+
+O número da carteirinha é único por plano (UNIQUE(plano_saude_id,
+numero_carteirinha)), e a restrição vale também para linhas com soft delete:
+por isso a verificação é pelo número dentro do plano, incluindo as excluídas.
+"""
+import logging
+from typing import Any, Dict, List
+
+from postgrest.types import ReturnMethod
+
+from ..repositories.database_async import AsyncSupabaseClient
+from .sincronizacao_dimensoes import (
+    TAMANHO_LOTE_SINCRONIZACAO,
+    carregar_linhas_supabase,
+    carregar_mapa_ids,
+    sincronizar_dimensao,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def _inserir_carteirinhas(
+    supabase: AsyncSupabaseClient,
+    carteirinhas: List[Dict[str, Any]],
+    tamanho_lote: int,
+    resultado: Dict[str, Any]
+) -> None:
+    for inicio in range(0, len(carteirinhas), tamanho_lote):
+        lote = carteirinhas[inicio:inicio + tamanho_lote]
+        try:
+            await supabase.table("carteirinhas").insert(lote, returning=ReturnMethod.minimal).execute()
+            resultado["carteirinhas_criadas"] += len(lote)
+        except Exception as e:
+            logger.error(f"Erro no insert em lote de carteirinhas, inserindo linha a linha: {e}")
+            for carteirinha in lote:
+                try:
+                    await supabase.table("carteirinhas").insert(carteirinha, returning=ReturnMethod.minimal).execute()
+                    resultado["carteirinhas_criadas"] += 1
+                except Exception as erro:
+                    mensagem = (
+                        f"Erro ao criar carteirinha {carteirinha['numero_carteirinha']} "
+                        f"do paciente {carteirinha['paciente_id']}: {erro}"
+                    )
+                    logger.error(mensagem)
+                    resultado["log_erros"].append(mensagem)
+                    resultado["erros"] += 1
+
+
+async def importar_pacientes_em_lote(
+    supabase: AsyncSupabaseClient,
+    pacientes: List[Dict[str, Any]],
+    plano_saude_id: str,
+    usuario_id: str,
+    tamanho_lote: int = TAMANHO_LOTE_SINCRONIZACAO
+) -> Dict[str, Any]:
+    """
+    Grava os pacientes (já mapeados para as colunas do Supabase, com id_origem)
+    e cria as carteirinhas que faltam no plano informado.
+
+    Returns:
+        Dict: contadores de sincronizar_dimensao (novos_registros,
+        registros_atualizados, registros_inalterados, erros, log_erros,
+        total_processado) mais carteirinhas_criadas e carteirinhas_existentes
+    """
+    resultado = await sincronizar_dimensao(
+        supabase,
+        "pacientes",
+        ("id_origem",),
+        pacientes,
+        colunas_somente_criacao=("created_by",),
+        tamanho_lote=tamanho_lote,
+    )
+    resultado["carteirinhas_criadas"] = 0
+    resultado["carteirinhas_existentes"] = 0
+
+    ids_pacientes = await carregar_mapa_ids(supabase, "pacientes", "id_origem")
+    # Inclui carteirinhas excluídas (soft delete): o número continua ocupado no plano
+    existentes = {
+        (linha.get("numero_carteirinha") or "").strip(): linha["paciente_id"]
+        for linha in await carregar_linhas_supabase(
+            supabase,
+            "carteirinhas",
+            "id, paciente_id, numero_carteirinha",
+            filtros={"plano_saude_id": plano_saude_id},
+        )
+    }
+
+    novas = []
+    for paciente in pacientes:
+        numero_carteirinha = (paciente.get("numero_carteirinha") or "").strip()
+        paciente_id = ids_pacientes.get(str(paciente.get("id_origem")))
+        if not numero_carteirinha or not paciente_id:
+            continue
+        if numero_carteirinha in existentes:
+            if existentes[numero_carteirinha] != paciente_id:
+                logger.warning(
+                    f"Carteirinha {numero_carteirinha} já cadastrada no plano para outro paciente "
+                    f"({existentes[numero_carteirinha]}); paciente {paciente_id} mantido sem carteirinha nova"
+                )
+            resultado["carteirinhas_existentes"] += 1
+            continue
+        existentes[numero_carteirinha] = paciente_id
+        novas.append({
+            "paciente_id": paciente_id,
+            "plano_saude_id": plano_saude_id,
+            "numero_carteirinha": numero_carteirinha,
+            "status": "ativa",
+            "created_by": usuario_id,
+            "updated_by": usuario_id,
+        })
+
+    await _inserir_carteirinhas(supabase, novas, tamanho_lote, resultado)
+
+    logger.info(
+        f"Importação de pacientes: {resultado['novos_registros']} novos, "
+        f"{resultado['registros_atualizados']} atualizados, {resultado['registros_inalterados']} inalterados, "
+        f"{resultado['carteirinhas_criadas']} carteirinhas criadas, {resultado['erros']} erros"
+    )
+    return resultado
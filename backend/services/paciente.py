@@ -22,7 +22,9 @@ class PacienteService:
         search: Optional[str] = None,
         fields: str = "*",
         order_column: str = "nome",
-        order_direction: str = "asc"
+        order_direction: str = "asc",
+        cursor: Optional[str] = None,
+        count: str = "exact"
     ) -> Dict:
         """
         Lista pacientes com paginação, busca e ordenação.
@@ -34,6 +36,8 @@ class PacienteService:
             fields: Campos a serem retornados (ex: "id,nome,cpf"). Por padrão, retorna todos os campos.
             order_column: Coluna para ordenação
             order_direction: Direção da ordenação (asc ou desc)
+            cursor: Cursor para paginação keyset (None usa offset)
+            count: Tipo de contagem do total (exact, planned ou estimated)
             
         Returns:
             Dicionário com os resultados paginados
@@ -45,15 +49,20 @@ class PacienteService:
                 search=search,
                 fields=fields,
                 order_column=order_column,
-                order_direction=order_direction
+                order_direction=order_direction,
+                cursor=cursor,
+                count=count
             )
             
             return {
                 "items": [Paciente.model_validate(item) for item in result.get("items", [])],
                 "total": result.get("total", 0),
                 "limit": result.get("limit", limit),
-                "offset": result.get("offset", offset)
+                "offset": result.get("offset", offset),
+                "next_cursor": result.get("next_cursor")
             }
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Erro ao listar pacientes: {str(e)}")
             raise HTTPException(
@@ -136,6 +145,19 @@ class PacienteService:
                 detail=f"Erro ao excluir paciente: {str(e)}"
             )
 
+    async def buscar_pacientes(self, termo: str, limite: int = 20, prefixo: bool = False) -> List[Dict]:
+        """
+        Busca rápida de pacientes e guias (nome, CPF, carteirinha, número da guia).
+        """
+        try:
+            return await self.repository.buscar(termo.strip(), limite, prefixo)
+        except Exception as e:
+            logger.error(f"Erro na busca de pacientes: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erro na busca de pacientes: {str(e)}"
+            )
+
     async def get_last_update(self) -> dict:
         """
         Obtém a data da última atualização na tabela de pacientes.
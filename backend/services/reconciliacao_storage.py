@@ -0,0 +1,189 @@
+"""
+Reconciliação da tabela storage com os arquivos do bucket R2.
+
+Em vez de uma consulta por arquivo do bucket e de uma gravação por registro:
+
+1. a listagem paginada do R2 é lida uma vez (em uma thread, pois o boto3 é síncrono);
+2. as URLs ativas da tabela storage são carregadas em páginas, só com as
+   colunas usadas na comparação;
+3. a diferença é calculada em memória e aplicada com inserts de várias linhas
+   e soft-deletes por lote de ids.
+
+No modo incremental (`modified_since`) só os objetos modificados a partir da
+data são considerados: a existência deles é verificada com consultas por lote
+de URLs e nada é removido, já que a listagem filtrada não mostra quais
+arquivos deixaram de existir. A remoção fica para as execuções completas.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, UTC
+from typing import Any, Dict, List, Optional
+
+from postgrest.types import ReturnMethod
+
+from ..repositories.database_async import AsyncSupabaseClient
+from .sincronizacao_dimensoes import TAMANHO_PAGINA_SUPABASE
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE_STORAGE = 500
+# URLs por consulta de existência no modo incremental (limitado pelo tamanho da URL do filtro in_)
+TAMANHO_LOTE_URLS = 100
+
+
+async def _carregar_urls_ativas(supabase: AsyncSupabaseClient) -> Dict[str, List[str]]:
+    """Retorna {url: [ids]} dos registros ativos da tabela storage."""
+    urls: Dict[str, List[str]] = {}
+    inicio = 0
+    while True:
+        response = await supabase.table("storage") \
+            .select("id, url") \
+            .is_("deleted_at", "null") \
+            .order("id") \
+            .range(inicio, inicio + TAMANHO_PAGINA_SUPABASE - 1) \
+            .execute()
+        pagina = response.data or []
+        for linha in pagina:
+            urls.setdefault(linha["url"], []).append(linha["id"])
+        if len(pagina) < TAMANHO_PAGINA_SUPABASE:
+            return urls
+        inicio += TAMANHO_PAGINA_SUPABASE
+
+
+async def _urls_existentes(supabase: AsyncSupabaseClient, urls: List[str]) -> set:
+    """Retorna quais das URLs já têm registro ativo (uma consulta por lote)."""
+    existentes = set()
+    for inicio in range(0, len(urls), TAMANHO_LOTE_URLS):
+        response = await supabase.table("storage") \
+            .select("url") \
+            .in_("url", urls[inicio:inicio + TAMANHO_LOTE_URLS]) \
+            .is_("deleted_at", "null") \
+            .execute()
+        existentes.update(linha["url"] for linha in response.data or [])
+    return existentes
+
+
+async def _inserir_registros(
+    supabase: AsyncSupabaseClient,
+    registros: List[Dict[str, Any]],
+    tamanho_lote: int,
+    resultado: Dict[str, Any]
+) -> None:
+    for inicio in range(0, len(registros), tamanho_lote):
+        lote = registros[inicio:inicio + tamanho_lote]
+        try:
+            await supabase.table("storage").insert(lote, returning=ReturnMethod.minimal).execute()
+            resultado["adicionados"] += len(lote)
+        except Exception as e:
+            logger.error(f"Erro no insert em lote da tabela storage, inserindo linha a linha: {e}")
+            for registro in lote:
+                try:
+                    await supabase.table("storage").insert(registro, returning=ReturnMethod.minimal).execute()
+                    resultado["adicionados"] += 1
+                except Exception as erro:
+                    mensagem = f"Erro ao adicionar {registro['url']}: {erro}"
+                    logger.error(mensagem)
+                    resultado["log_erros"].append(mensagem)
+                    resultado["erros"] += 1
+
+
+async def _remover_registros(
+    supabase: AsyncSupabaseClient,
+    ids: List[str],
+    usuario_id: str,
+    tamanho_lote: int,
+    resultado: Dict[str, Any]
+) -> None:
+    for inicio in range(0, len(ids), tamanho_lote):
+        lote = ids[inicio:inicio + tamanho_lote]
+        try:
+            await supabase.table("storage") \
+                .update({"deleted_at": datetime.now(UTC).isoformat(), "updated_by": usuario_id},
+                        returning=ReturnMethod.minimal) \
+                .in_("id", lote) \
+                .is_("deleted_at", "null") \
+                .execute()
+            resultado["removidos"] += len(lote)
+        except Exception as e:
+            mensagem = f"Erro ao remover {len(lote)} registros da tabela storage: {e}"
+            logger.error(mensagem)
+            resultado["log_erros"].append(mensagem)
+            resultado["erros"] += len(lote)
+
+
+async def reconciliar_storage_r2(
+    supabase: AsyncSupabaseClient,
+    storage_r2,
+    usuario_id: str,
+    modified_since: Optional[datetime] = None,
+    tamanho_lote: int = TAMANHO_LOTE_STORAGE
+) -> Dict[str, Any]:
+    """
+    Reconcilia a tabela storage com o bucket R2.
+
+    Args:
+        supabase: Cliente assíncrono
+        storage_r2: Instância de StorageR2
+        usuario_id: created_by/updated_by dos registros gravados
+        modified_since: Se informado, execução incremental (só objetos
+            modificados a partir da data, sem remoções)
+        tamanho_lote: Registros por insert/update
+
+    Returns:
+        Dict: total_r2, total_storage, adicionados, removidos, erros,
+        log_erros e incremental
+    """
+    resultado = {
+        "total_r2": 0,
+        "total_storage": None,
+        "adicionados": 0,
+        "removidos": 0,
+        "erros": 0,
+        "log_erros": [],
+        "incremental": modified_since is not None,
+    }
+
+    # Erros na listagem interrompem a reconciliação: uma listagem incompleta
+    # faria os registros dos arquivos não listados serem removidos
+    arquivos = await asyncio.to_thread(lambda: list(storage_r2.iter_files(modified_since=modified_since)))
+    arquivos_por_url = {storage_r2.get_url(arquivo["key"]): arquivo for arquivo in arquivos}
+    resultado["total_r2"] = len(arquivos_por_url)
+    logger.info(f"Encontrados {len(arquivos_por_url)} arquivos no R2")
+
+    if modified_since is None:
+        urls_storage = await _carregar_urls_ativas(supabase)
+        resultado["total_storage"] = sum(len(ids) for ids in urls_storage.values())
+        logger.info(f"Encontrados {resultado['total_storage']} registros ativos na tabela storage")
+        urls_existentes = set(urls_storage)
+        ids_remover = [
+            id_registro
+            for url, ids in urls_storage.items()
+            if url not in arquivos_por_url
+            for id_registro in ids
+        ]
+    else:
+        urls_existentes = await _urls_existentes(supabase, list(arquivos_por_url))
+        ids_remover = []
+
+    novos = [
+        {
+            "nome": os.path.basename(arquivo["key"]),
+            "content_type": arquivo.get("content_type", "application/pdf"),
+            "size": arquivo.get("size", 0),
+            "url": url,
+            "created_by": usuario_id,
+            "updated_by": usuario_id,
+        }
+        for url, arquivo in arquivos_por_url.items()
+        if url not in urls_existentes
+    ]
+
+    await _inserir_registros(supabase, novos, tamanho_lote, resultado)
+    await _remover_registros(supabase, ids_remover, usuario_id, tamanho_lote, resultado)
+
+    logger.info(
+        f"Sincronização concluída: {resultado['adicionados']} registros adicionados, "
+        f"{resultado['removidos']} registros removidos, {resultado['erros']} erros"
+    )
+    return resultado
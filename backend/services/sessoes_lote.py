@@ -0,0 +1,269 @@
+"""
+Criação de sessões de fichas em lote.
+
+Em vez de uma inserção (e uma verificação) por sessão ou por ficha, as
+sessões de muitas fichas são:
+
+1. validadas localmente (ficha, data da sessão e ordem de execução);
+2. agrupadas em lotes de fichas, com uma única consulta por lote para saber
+   quais sessões (ficha_id + ordem_execucao) já existem;
+3. inseridas em inserts de várias linhas, com gravação linha a linha apenas
+   quando um lote falha, para isolar as sessões com erro.
+
+Também gera as sessões semanais de fichas que ainda não têm nenhuma, a partir
+do total_sessoes e da data de atendimento.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from postgrest.types import ReturnMethod
+
+from ..repositories.database_async import AsyncSupabaseClient
+from .sincronizacao_dimensoes import TAMANHO_PAGINA_SUPABASE, carregar_linhas_supabase
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE_SESSOES = 500
+# Fichas por consulta de existência (limitado pelo tamanho da URL do filtro in_)
+TAMANHO_LOTE_FICHAS = 200
+USUARIO_SISTEMA = "00000000-0000-0000-0000-000000000000"
+
+
+def _converter_data(valor: Any) -> Optional[date]:
+    """Aceita date/datetime, ISO (com ou sem hora) e DD/MM/YYYY."""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    if isinstance(valor, str) and valor.strip():
+        texto = valor.strip()
+        try:
+            return datetime.fromisoformat(texto.replace("Z", "+00:00")).date()
+        except ValueError:
+            pass
+        try:
+            return datetime.strptime(texto, "%d/%m/%Y").date()
+        except ValueError:
+            return None
+    return None
+
+
+def gerar_sessoes_ficha(ficha: Dict[str, Any], total_sessoes: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Gera as sessões de uma ficha, uma por semana a partir da data de
+    atendimento (ou de hoje, se a ficha não tiver data).
+    """
+    total = total_sessoes if total_sessoes is not None else (ficha.get("total_sessoes") or 1)
+    data_base = _converter_data(ficha.get("data_atendimento")) or date.today()
+
+    return [
+        {
+            "ficha_id": str(ficha["id"]),
+            "guia_id": ficha.get("guia_id"),
+            "data_sessao": (data_base + timedelta(days=i * 7)).isoformat(),
+            "possui_assinatura": False,
+            "procedimento_id": None,
+            "profissional_executante": "",
+            "status": "pendente",
+            "numero_guia": ficha.get("numero_guia"),
+            "codigo_ficha": ficha.get("codigo_ficha"),
+            "ordem_execucao": i + 1,
+            "status_biometria": "nao_verificado",
+        }
+        for i in range(max(1, total))
+    ]
+
+
+def _preparar_sessao(sessao: Dict[str, Any], ficha_id: str, ordem: int, usuario_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Valida e completa uma sessão; retorna (sessão, None) ou (None, erro)."""
+    data_sessao = _converter_data(sessao.get("data_sessao"))
+    if data_sessao is None:
+        return None, f"Ficha {ficha_id}, sessão {ordem}: data_sessao ausente ou inválida ({sessao.get('data_sessao')})"
+
+    ordem_execucao = sessao.get("ordem_execucao") or ordem
+    try:
+        ordem_execucao = int(ordem_execucao)
+    except (TypeError, ValueError):
+        return None, f"Ficha {ficha_id}, sessão {ordem}: ordem_execucao inválida ({ordem_execucao})"
+
+    return {
+        **sessao,
+        "ficha_id": ficha_id,
+        "data_sessao": data_sessao.isoformat(),
+        "ordem_execucao": ordem_execucao,
+        "created_by": sessao.get("created_by") or usuario_id,
+        "updated_by": sessao.get("updated_by") or usuario_id,
+    }, None
+
+
+async def _sessoes_existentes(supabase: AsyncSupabaseClient, fichas_ids: List[str]) -> Dict[str, set]:
+    """Retorna {ficha_id: {ordens já existentes}} para um lote de fichas (uma consulta paginada)."""
+    existentes: Dict[str, set] = {ficha_id: set() for ficha_id in fichas_ids}
+    inicio = 0
+    while True:
+        response = await supabase.table("sessoes") \
+            .select("id, ficha_id, ordem_execucao") \
+            .in_("ficha_id", fichas_ids) \
+            .is_("deleted_at", "null") \
+            .order("id") \
+            .range(inicio, inicio + TAMANHO_PAGINA_SUPABASE - 1) \
+            .execute()
+        pagina = response.data or []
+        for linha in pagina:
+            existentes.setdefault(str(linha["ficha_id"]), set()).add(linha.get("ordem_execucao"))
+        if len(pagina) < TAMANHO_PAGINA_SUPABASE:
+            return existentes
+        inicio += TAMANHO_PAGINA_SUPABASE
+
+
+async def _inserir_individualmente(
+    supabase: AsyncSupabaseClient,
+    linhas: List[Dict[str, Any]],
+    retornar: bool,
+    resultado: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Insere as sessões uma a uma, registrando os erros; retorna as inseridas."""
+    inseridas = []
+    for linha in linhas:
+        try:
+            if retornar:
+                response = await supabase.table("sessoes").insert(linha).execute()
+                inseridas.extend(response.data or [])
+            else:
+                await supabase.table("sessoes").insert(linha, returning=ReturnMethod.minimal).execute()
+                inseridas.append(linha)
+        except Exception as e:
+            mensagem = f"Erro ao inserir sessão {linha.get('ordem_execucao')} da ficha {linha.get('ficha_id')}: {e}"
+            logger.error(mensagem)
+            resultado["log_erros"].append(mensagem)
+            resultado["erros"] += 1
+    return inseridas
+
+
+async def criar_sessoes_em_lote(
+    supabase: AsyncSupabaseClient,
+    sessoes_por_ficha: Dict[str, Iterable[Dict[str, Any]]],
+    somente_fichas_sem_sessoes: bool = False,
+    retornar_registros: bool = False,
+    usuario_id: str = USUARIO_SISTEMA,
+    tamanho_lote: int = TAMANHO_LOTE_SESSOES
+) -> Dict[str, Any]:
+    """
+    Cria as sessões de várias fichas.
+
+    Args:
+        supabase: Cliente assíncrono
+        sessoes_por_ficha: {ficha_id: [sessões]}; ordem_execucao, quando
+            ausente, é a posição da sessão na lista (1, 2, 3...)
+        somente_fichas_sem_sessoes: True pula as fichas que já têm qualquer
+            sessão; False pula apenas as sessões cuja ordem já existe na ficha
+        retornar_registros: True devolve as sessões criadas em "itens"
+            (mais lento: o banco precisa retornar as linhas)
+        usuario_id: created_by/updated_by das sessões que não informarem
+        tamanho_lote: Sessões por insert
+
+    Returns:
+        Dict: fichas_processadas, fichas_ignoradas, sessoes_criadas,
+        sessoes_existentes, sessoes_invalidas, erros, log_erros e itens
+    """
+    resultado = {
+        "fichas_processadas": 0,
+        "fichas_ignoradas": 0,
+        "sessoes_criadas": 0,
+        "sessoes_existentes": 0,
+        "sessoes_invalidas": 0,
+        "erros": 0,
+        "log_erros": [],
+        "itens": [],
+    }
+
+    # Validação local antes de qualquer ida ao banco
+    preparadas: Dict[str, List[Dict[str, Any]]] = {}
+    for ficha_id, sessoes in sessoes_por_ficha.items():
+        ficha_id = str(ficha_id)
+        for ordem, sessao in enumerate(sessoes, start=1):
+            linha, erro = _preparar_sessao(sessao, ficha_id, ordem, usuario_id)
+            if erro:
+                resultado["sessoes_invalidas"] += 1
+                resultado["log_erros"].append(erro)
+                continue
+            preparadas.setdefault(ficha_id, []).append(linha)
+
+    fichas_ids = list(preparadas)
+    for inicio_fichas in range(0, len(fichas_ids), TAMANHO_LOTE_FICHAS):
+        lote_fichas = fichas_ids[inicio_fichas:inicio_fichas + TAMANHO_LOTE_FICHAS]
+        existentes = await _sessoes_existentes(supabase, lote_fichas)
+
+        novas = []
+        for ficha_id in lote_fichas:
+            ordens_existentes = existentes.get(ficha_id, set())
+            if somente_fichas_sem_sessoes and ordens_existentes:
+                resultado["fichas_ignoradas"] += 1
+                continue
+            resultado["fichas_processadas"] += 1
+            # Ordens repetidas na própria requisição também contam como existentes
+            ordens_vistas = set(ordens_existentes)
+            for linha in preparadas[ficha_id]:
+                if linha["ordem_execucao"] in ordens_vistas:
+                    resultado["sessoes_existentes"] += 1
+                    continue
+                ordens_vistas.add(linha["ordem_execucao"])
+                novas.append(linha)
+
+        # O insert de várias linhas usa a união das colunas; sessões com
+        # conjuntos de colunas diferentes vão em inserts separados
+        grupos: Dict[frozenset, List[Dict[str, Any]]] = {}
+        for linha in novas:
+            grupos.setdefault(frozenset(linha), []).append(linha)
+
+        for linhas_grupo in grupos.values():
+            for inicio in range(0, len(linhas_grupo), tamanho_lote):
+                lote = linhas_grupo[inicio:inicio + tamanho_lote]
+                try:
+                    if retornar_registros:
+                        response = await supabase.table("sessoes").insert(lote).execute()
+                        inseridas = response.data or []
+                    else:
+                        await supabase.table("sessoes").insert(lote, returning=ReturnMethod.minimal).execute()
+                        inseridas = lote
+                except Exception as e:
+                    logger.error(f"Erro no insert em lote de sessões, inserindo linha a linha: {e}")
+                    inseridas = await _inserir_individualmente(supabase, lote, retornar_registros, resultado)
+                resultado["sessoes_criadas"] += len(inseridas)
+                if retornar_registros:
+                    resultado["itens"].extend(inseridas)
+
+    logger.info(
+        f"Sessões em lote: {resultado['sessoes_criadas']} criadas, "
+        f"{resultado['sessoes_existentes']} já existentes, {resultado['sessoes_invalidas']} inválidas, "
+        f"{resultado['erros']} erros ({resultado['fichas_processadas']} fichas, "
+        f"{resultado['fichas_ignoradas']} ignoradas)"
+    )
+    return resultado
+
+
+async def gerar_sessoes_fichas_sem_sessoes(
+    supabase: AsyncSupabaseClient,
+    usuario_id: str = USUARIO_SISTEMA
+) -> Dict[str, Any]:
+    """
+    Gera as sessões semanais de todas as fichas ativas que ainda não têm sessões.
+    As fichas são lidas em páginas e as sessões gravadas com criar_sessoes_em_lote.
+    """
+    fichas = await carregar_linhas_supabase(
+        supabase,
+        "fichas",
+        "id, codigo_ficha, data_atendimento, total_sessoes, numero_guia, guia_id, deleted_at"
+    )
+    fichas = [ficha for ficha in fichas if not ficha.get("deleted_at")]
+    logger.info(f"Gerando sessões para as fichas sem sessões ({len(fichas)} fichas ativas)")
+
+    resultado = await criar_sessoes_em_lote(
+        supabase,
+        {ficha["id"]: gerar_sessoes_ficha(ficha) for ficha in fichas},
+        somente_fichas_sem_sessoes=True,
+        usuario_id=usuario_id,
+    )
+    resultado["total_fichas"] = len(fichas)
+    return resultado
@@ -0,0 +1,211 @@
+"""
+Sincronização em lote das tabelas auxiliares importadas do sistema Aba.
+
+Em vez de consultar e inserir/atualizar cada registro (uma ou duas idas ao
+Supabase por linha), a sincronização:
+
+1. recebe os registros já lidos do MySQL e mapeados para as colunas do Supabase;
+2. carrega de uma vez (paginado) as linhas existentes da tabela de destino;
+3. compara localmente, separando novos, alterados e inalterados;
+4. grava apenas novos e alterados com upsert em lotes pela chave de origem.
+"""
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from postgrest.types import ReturnMethod
+
+from ..repositories.database_async import AsyncSupabaseClient
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_PAGINA_SUPABASE = 1000
+TAMANHO_LOTE_SINCRONIZACAO = 500
+
+
+def _normalizar(valor: Any) -> Any:
+    """
+    Normaliza um valor para comparação entre MySQL e Supabase: números viram
+    texto (ids VARCHAR no Supabase x INT no MySQL) e datas viram datetime UTC
+    sem fuso (o Supabase devolve timestamptz em ISO com +00:00).
+    """
+    if valor is None or isinstance(valor, bool):
+        return valor
+    if isinstance(valor, (int, float, Decimal)):
+        return str(valor)
+    if isinstance(valor, datetime):
+        if valor.tzinfo is not None:
+            valor = valor.astimezone(timezone.utc).replace(tzinfo=None)
+        return valor
+    if isinstance(valor, str) and len(valor) >= 19 and valor[4] == "-" and valor[10] in "T ":
+        try:
+            return _normalizar(datetime.fromisoformat(valor))
+        except ValueError:
+            return valor
+    return valor
+
+
+def _valor_chave(registro: Dict[str, Any], chave: Sequence[str]) -> tuple:
+    return tuple(_normalizar(registro.get(coluna)) for coluna in chave)
+
+
+async def carregar_linhas_supabase(
+    supabase: AsyncSupabaseClient,
+    tabela: str,
+    colunas: str,
+    filtros: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Carrega todas as linhas de uma tabela, paginando pelo limite do PostgREST.
+    filtros ({coluna: valor}) é aplicado no servidor, com igualdade.
+    """
+    linhas: List[Dict[str, Any]] = []
+    inicio = 0
+    while True:
+        query = supabase.table(tabela).select(colunas)
+        for coluna, valor in (filtros or {}).items():
+            query = query.eq(coluna, valor)
+        response = await query \
+            .order("id") \
+            .range(inicio, inicio + TAMANHO_PAGINA_SUPABASE - 1) \
+            .execute()
+        pagina = response.data or []
+        linhas.extend(pagina)
+        if len(pagina) < TAMANHO_PAGINA_SUPABASE:
+            return linhas
+        inicio += TAMANHO_PAGINA_SUPABASE
+
+
+async def carregar_mapa_ids(
+    supabase: AsyncSupabaseClient,
+    tabela: str,
+    coluna_origem: str
+) -> Dict[str, str]:
+    """Retorna {id de origem (texto): id do Supabase} de uma tabela importada."""
+    linhas = await carregar_linhas_supabase(supabase, tabela, f"id, {coluna_origem}")
+    return {
+        str(linha[coluna_origem]): linha["id"]
+        for linha in linhas
+        if linha.get(coluna_origem) is not None
+    }
+
+
+async def _gravar_individualmente(
+    supabase: AsyncSupabaseClient,
+    tabela: str,
+    on_conflict: str,
+    linhas: List[Dict[str, Any]],
+    chave: Sequence[str],
+    resultado: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Grava as linhas uma a uma, registrando os erros; retorna as gravadas."""
+    gravadas = []
+    for linha in linhas:
+        try:
+            await supabase.table(tabela) \
+                .upsert(linha, on_conflict=on_conflict, returning=ReturnMethod.minimal) \
+                .execute()
+            gravadas.append(linha)
+        except Exception as e:
+            identificacao = ", ".join(f"{coluna}={linha.get(coluna)}" for coluna in chave)
+            mensagem = f"Erro ao gravar {tabela} ({identificacao}): {e}"
+            logger.error(mensagem)
+            resultado["log_erros"].append(mensagem)
+            resultado["erros"] += 1
+    return gravadas
+
+
+async def sincronizar_dimensao(
+    supabase: AsyncSupabaseClient,
+    tabela: str,
+    chave: Sequence[str],
+    registros: Iterable[Dict[str, Any]],
+    colunas_somente_criacao: Sequence[str] = (),
+    tamanho_lote: int = TAMANHO_LOTE_SINCRONIZACAO
+) -> Dict[str, Any]:
+    """
+    Sincroniza `registros` com a tabela `tabela` do Supabase pela `chave`
+    (colunas com índice único, usadas como on_conflict do upsert).
+
+    Um registro é considerado alterado quando alguma das suas colunas difere
+    da linha existente; as linhas inalteradas não são regravadas. As colunas
+    em `colunas_somente_criacao` só são gravadas na inserção: na atualização
+    mantêm o valor atual (lido na carga), o que permite o upsert em tabelas
+    com colunas NOT NULL que a importação não deve sobrescrever. Como no
+    upsert de agendamentos, registros com conjuntos de colunas diferentes são
+    gravados separadamente e, se um lote falhar, suas linhas são gravadas uma
+    a uma para isolar apenas as que têm erro.
+
+    Returns:
+        Dict: novos_registros, registros_atualizados, registros_inalterados,
+        erros, log_erros e total_processado
+    """
+    resultado = {
+        "novos_registros": 0,
+        "registros_atualizados": 0,
+        "registros_inalterados": 0,
+        "erros": 0,
+        "log_erros": [],
+        "total_processado": 0,
+    }
+
+    # Uma mesma chave não pode aparecer duas vezes no mesmo upsert;
+    # prevalece a última ocorrência, como no processamento linha a linha
+    por_chave = {_valor_chave(registro, chave): registro for registro in registros}
+    if not por_chave:
+        return resultado
+
+    colunas = set(chave) | set(colunas_somente_criacao)
+    for registro in por_chave.values():
+        colunas.update(registro)
+    existentes = {
+        _valor_chave(linha, chave): linha
+        for linha in await carregar_linhas_supabase(supabase, tabela, ", ".join(sorted(colunas)))
+    }
+
+    agora = datetime.now(timezone.utc).isoformat()
+    novos, alterados = [], []
+    for valor_chave, registro in por_chave.items():
+        existente = existentes.get(valor_chave)
+        if existente is None:
+            novos.append({**registro, "created_at": agora, "updated_at": agora})
+            continue
+        atualizacao = {
+            **registro,
+            **{coluna: existente.get(coluna) for coluna in colunas_somente_criacao},
+        }
+        if any(_normalizar(valor) != _normalizar(existente.get(coluna)) for coluna, valor in atualizacao.items()):
+            alterados.append({**atualizacao, "updated_at": agora})
+        else:
+            resultado["registros_inalterados"] += 1
+
+    logger.info(
+        f"Sincronização de {tabela}: {len(novos)} novos, {len(alterados)} alterados, "
+        f"{resultado['registros_inalterados']} inalterados"
+    )
+
+    on_conflict = ",".join(chave)
+    for contador, linhas_tipo in (("novos_registros", novos), ("registros_atualizados", alterados)):
+        grupos: Dict[frozenset, List[Dict[str, Any]]] = {}
+        for linha in linhas_tipo:
+            grupos.setdefault(frozenset(linha), []).append(linha)
+
+        for linhas_grupo in grupos.values():
+            for inicio in range(0, len(linhas_grupo), tamanho_lote):
+                lote = linhas_grupo[inicio:inicio + tamanho_lote]
+                try:
+                    await supabase.table(tabela) \
+                        .upsert(lote, on_conflict=on_conflict, returning=ReturnMethod.minimal) \
+                        .execute()
+                except Exception as e:
+                    logger.error(f"Erro no upsert em lote de {tabela}, gravando linha a linha: {e}")
+                    lote = await _gravar_individualmente(supabase, tabela, on_conflict, lote, chave, resultado)
+                resultado[contador] += len(lote)
+
+    resultado["total_processado"] = (
+        resultado["novos_registros"]
+        + resultado["registros_atualizados"]
+        + resultado["registros_inalterados"]
+    )
+    return resultado
@@ -1,12 +1,12 @@
-from datetime import datetime, UTC
-from typing import Dict, List, Optional
+from datetime import date, datetime, time, timedelta, UTC
+from typing import Dict, Iterator, Optional
 from uuid import UUID
 import logging
 from ..repositories.storage import StorageRepository
 from ..models.storage import StorageCreate, StorageUpdate, Storage
 from backend.services.storage_r2 import storage as storage_r2_client
+from .reconciliacao_storage import reconciliar_storage_r2
 from fastapi import HTTPException
-import os
 
 logger = logging.getLogger(__name__)
 
@@ -133,15 +133,25 @@ class StorageService:
                 status_code=500, detail=f"Erro ao fazer upload do arquivo: {str(e)}"
             )
 
-    async def download_all_files(self):
-        """Download de todos os arquivos em um ZIP"""
-        try:
-            return await self.storage_r2.download_all_files()
-        except Exception as e:
-            logger.error(f"Erro ao baixar arquivos: {str(e)}")
-            raise HTTPException(
-                status_code=500, detail=f"Erro ao baixar arquivos: {str(e)}"
-            )
+    def download_all_files(
+        self,
+        prefix: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Iterator[bytes]:
+        """
+        Download dos arquivos em um ZIP gerado em pedaços (ver StorageR2.stream_zip).
+
+        Args:
+            prefix: Só as chaves que começam com o prefixo (ex.: "fichas/")
+            start_date: Só os arquivos modificados a partir deste dia (UTC)
+            end_date: Só os arquivos modificados até este dia, inclusive (UTC)
+        """
+        modified_since = datetime.combine(start_date, time.min, tzinfo=UTC) if start_date else None
+        modified_until = (
+            datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=UTC) if end_date else None
+        )
+        return self.storage_r2.stream_zip(prefix, modified_since, modified_until)
 
     async def get_files_by_entidade(self, entidade: str, entidade_id: str):
         """Obtém arquivos por entidade"""
@@ -153,76 +163,26 @@ class StorageService:
                 status_code=500, detail=f"Erro ao buscar arquivos da entidade: {str(e)}"
             )
 
-    async def sync_with_r2(self) -> bool:
-        """Sincroniza a tabela storage com os arquivos do R2"""
-        try:
-            # Lista todos os arquivos no R2
-            r2_files = self.storage_r2.list_files()
-
-            # Verifica se r2_files é uma lista
-            if not isinstance(r2_files, list):
-                logger.error(f"Erro: r2_files não é uma lista: {r2_files}")
-                return False
+    async def sync_with_r2(self, modified_since: Optional[datetime] = None) -> Dict:
+        """
+        Sincroniza a tabela storage com os arquivos do R2 (ver reconciliacao_storage).
 
+        Args:
+            modified_since: Se informado, só considera os arquivos modificados a
+                partir da data e não remove registros (execução incremental)
+        """
+        try:
             # Obtém o usuário do sistema (admin)
             admin_user_id = await self._get_or_create_admin_user()
             if not admin_user_id:
-                logger.error("Não foi possível obter ou criar o usuário admin")
-                return False
-
-            # Cria um conjunto com as URLs de todos os arquivos no R2
-            r2_urls = {self.storage_r2.get_url(file["key"]) for file in r2_files if isinstance(file, dict) and "key" in file}
-            logger.info(f"Encontrados {len(r2_urls)} arquivos no R2")
-
-            # Obtém todos os registros ativos da tabela storage
-            storage_records = await self._get_all_active_storage_records()
-            logger.info(f"Encontrados {len(storage_records)} registros ativos na tabela storage")
-
-            # Adiciona novos arquivos que existem no R2 mas não na tabela storage
-            added_count = 0
-            for file in r2_files:
-                try:
-                    # Verifica se o arquivo tem a chave necessária
-                    if not isinstance(file, dict) or "key" not in file:
-                        logger.error(f"Arquivo inválido: {file}")
-                        continue
-
-                    # Gera a URL do arquivo
-                    url = self.storage_r2.get_url(file["key"])
-
-                    # Verifica se o arquivo já existe no banco
-                    existing = await self.repository.get_by_path(url)
-
-                    if not existing:
-                        # Cria um novo registro
-                        storage_data = StorageCreate(
-                            nome=os.path.basename(file["key"]),
-                            content_type=file.get("content_type", "application/pdf"),
-                            size=file.get("size", 0),
-                            url=url,
-                            created_by=admin_user_id,  # UUID do admin como string
-                            updated_by=admin_user_id,  # UUID do admin como string
-                        )
-                        await self.repository.create(storage_data)
-                        added_count += 1
-                except Exception as e:
-                    logger.error(f"Erro ao processar arquivo {file}: {str(e)}")
-                    continue
+                raise Exception("Não foi possível obter ou criar o usuário admin")
 
-            # Remove registros da tabela storage que não existem mais no R2
-            removed_count = 0
-            for record in storage_records:
-                if record["url"] not in r2_urls:
-                    try:
-                        # Marca o registro como excluído na tabela storage
-                        await self.repository.delete(record["id"])
-                        removed_count += 1
-                        logger.info(f"Registro removido: {record['nome']} (URL: {record['url']})")
-                    except Exception as e:
-                        logger.error(f"Erro ao remover registro {record['id']}: {str(e)}")
-
-            logger.info(f"Sincronização concluída: {added_count} registros adicionados, {removed_count} registros removidos")
-            return True
+            return await reconciliar_storage_r2(
+                self.repository.db,
+                self.storage_r2,
+                admin_user_id,
+                modified_since=modified_since,
+            )
 
         except Exception as e:
             logger.error(f"Erro ao sincronizar com R2: {str(e)}")
@@ -235,7 +195,7 @@ class StorageService:
         try:
             # Busca um usuário admin existente
             result = (
-                self.repository.db.from_("usuarios")
+                await self.repository.db.from_("usuarios")
                 .select("id")
                 .eq("tipo_usuario", "admin")
                 .eq("ativo", True)
@@ -247,7 +207,7 @@ class StorageService:
 
             # Se não encontrou, cria um novo usuário admin
             result = (
-                self.repository.db.from_("usuarios")
+                await self.repository.db.from_("usuarios")
                 .insert(
                     {
                         "nome": "System Admin",
@@ -296,12 +256,3 @@ class StorageService:
             return "unknown"
         except:
             return "unknown"
-
-    async def _get_all_active_storage_records(self) -> List[Dict]:
-        """Obtém todos os registros ativos da tabela storage"""
-        try:
-            result = self.repository.db.from_("storage").select("*").is_("deleted_at", "null").execute()
-            return result.data if result.data else []
-        except Exception as e:
-            logger.error(f"Erro ao obter registros da tabela storage: {str(e)}")
-            return []
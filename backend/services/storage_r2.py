@@ -1,8 +1,11 @@
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
 import boto3
 from botocore.config import Config
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
+import zipfile
 import logging
 from dotenv import load_dotenv
 
@@ -11,6 +14,37 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Downloads em andamento/prontos à frente da entrada sendo escrita no ZIP
+JANELA_DOWNLOAD_ZIP = 8
+# Bytes acumulados antes de enviar um pedaço do ZIP ao cliente
+TAMANHO_PEDACO_ZIP = 1024 * 1024
+
+
+class _SaidaZip:
+    """
+    Destino não posicionável para o ZipFile: acumula os bytes escritos para que
+    o gerador os envie aos poucos. Sem tell/seek o zipfile grava os tamanhos em
+    data descriptors após cada entrada, em vez de voltar ao cabeçalho.
+    """
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self.tamanho = 0
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        self.tamanho += len(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        self.tamanho = 0
+        return dados
+
 
 class StorageR2:
     def __init__(self):
@@ -94,28 +128,54 @@ class StorageR2:
             logger.error(f"Erro ao deletar arquivos: {str(e)}")
             return False
 
-    def list_files(self) -> List[Dict]:
+    def iter_files(
+        self,
+        prefix: Optional[str] = None,
+        modified_since: Optional[datetime] = None,
+        modified_until: Optional[datetime] = None,
+    ) -> Iterator[Dict]:
+        """
+        Percorre os arquivos do bucket página a página (sem montar a lista inteira).
+
+        Args:
+            prefix (Optional[str]): Só as chaves que começam com o prefixo
+            modified_since (Optional[datetime]): Só os modificados a partir desta data (com fuso)
+            modified_until (Optional[datetime]): Só os modificados antes desta data (com fuso)
+
+        Yields:
+            Dict: key, size, last_modified (ISO) e content_type de cada arquivo
+        """
+        paginator = self.client.get_paginator('list_objects_v2')
+        params = {"Bucket": self.bucket}
+        if prefix:
+            params["Prefix"] = prefix
+
+        for page in paginator.paginate(**params):
+            for obj in page.get('Contents', []):
+                if modified_since and obj['LastModified'] < modified_since:
+                    continue
+                if modified_until and obj['LastModified'] >= modified_until:
+                    continue
+                yield {
+                    'key': obj['Key'],
+                    'size': obj['Size'],
+                    'last_modified': obj['LastModified'].isoformat(),
+                    'content_type': 'application/pdf'  # Assumindo que todos são PDFs por enquanto
+                }
+
+    def list_files(self, prefix: Optional[str] = None) -> List[Dict]:
         """
         Lista todos os arquivos no bucket, incluindo os da pasta fichas.
-        
+
+        Args:
+            prefix (Optional[str]): Só as chaves que começam com o prefixo
+
         Returns:
             List[Dict]: Lista de arquivos com suas informações
         """
         try:
             logger.info("Listando arquivos do R2...")
-            paginator = self.client.get_paginator('list_objects_v2')
-            files = []
-
-            for page in paginator.paginate(Bucket=self.bucket):
-                if 'Contents' in page:
-                    for obj in page['Contents']:
-                        files.append({
-                            'key': obj['Key'],
-                            'size': obj['Size'],
-                            'last_modified': obj['LastModified'].isoformat(),
-                            'content_type': 'application/pdf'  # Assumindo que todos são PDFs por enquanto
-                        })
-
+            files = list(self.iter_files(prefix))
             logger.info(f"Total de arquivos encontrados: {len(files)}")
             return files
 
@@ -135,52 +195,70 @@ class StorageR2:
         """
         return f"{self.public_url_prefix}/{key}"
 
-    def download_all_files_as_zip(self) -> Optional[bytes]:
-        """
-        Baixa todos os arquivos do bucket e os compacta em um arquivo ZIP.
-
-        Returns:
-            Optional[bytes]: Conteúdo do arquivo ZIP em bytes ou None se houver erro
-        """
+    def _download(self, key: str) -> Optional[bytes]:
         try:
-            import io
-            import zipfile
-            from concurrent.futures import ThreadPoolExecutor, as_completed
-
-            # Criar um buffer em memória para o ZIP
-            zip_buffer = io.BytesIO()
-            
-            # Listar todos os arquivos no bucket
-            files = self.list_files()
-            
-            # Criar o arquivo ZIP
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                def download_and_add_to_zip(file_info):
-                    try:
-                        # Baixar o arquivo do R2
-                        response = self.client.get_object(Bucket=self.bucket, Key=file_info['key'])
-                        file_content = response['Body'].read()
-                        
-                        # Adicionar ao ZIP
-                        zip_file.writestr(file_info['key'], file_content)
-                        return True
-                    except Exception as e:
-                        logger.error(f"Erro ao processar arquivo {file_info['key']}: {str(e)}")
-                        return False
-
-                # Usar ThreadPoolExecutor para baixar arquivos em paralelo
-                with ThreadPoolExecutor(max_workers=5) as executor:
-                    futures = [executor.submit(download_and_add_to_zip, file) for file in files]
-                    for future in as_completed(futures):
-                        future.result()
-
-            # Retornar o conteúdo do ZIP
-            return zip_buffer.getvalue()
-
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+            return response['Body'].read()
         except Exception as e:
-            logger.error(f"Erro ao criar arquivo ZIP: {str(e)}")
+            logger.error(f"Erro ao processar arquivo {key}: {str(e)}")
             return None
 
+    def stream_zip(
+        self,
+        prefix: Optional[str] = None,
+        modified_since: Optional[datetime] = None,
+        modified_until: Optional[datetime] = None,
+        window: int = JANELA_DOWNLOAD_ZIP,
+    ) -> Iterator[bytes]:
+        """
+        Gera um arquivo ZIP com os arquivos do bucket em pedaços, para ser
+        enviado por StreamingResponse enquanto é montado.
+
+        Os downloads rodam em paralelo, limitados a `window` arquivos à frente
+        da entrada atual; as entradas são escritas no ZIP uma de cada vez, na
+        ordem da listagem. A memória usada fica limitada à janela de arquivos
+        mais um pedaço do ZIP, qualquer que seja o tamanho do bucket.
+        Arquivos que falharem no download são registrados no log e ignorados.
+
+        Yields:
+            bytes: Pedaços do arquivo ZIP
+        """
+        saida = _SaidaZip()
+        total = 0
+        arquivos = self.iter_files(prefix, modified_since, modified_until)
+
+        with ThreadPoolExecutor(max_workers=window) as executor:
+            pendentes = deque()
+
+            def agendar():
+                for file_info in arquivos:
+                    pendentes.append((file_info, executor.submit(self._download, file_info['key'])))
+                    if len(pendentes) >= window:
+                        return
+
+            try:
+                with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                    agendar()
+                    while pendentes:
+                        file_info, future = pendentes.popleft()
+                        agendar()
+                        content = future.result()
+                        if content is None:
+                            continue
+
+                        zip_file.writestr(file_info['key'], content)
+                        total += 1
+                        if saida.tamanho >= TAMANHO_PEDACO_ZIP:
+                            yield saida.retirar()
+            finally:
+                # Cliente desconectado ou erro: não esperar os downloads restantes
+                for _, future in pendentes:
+                    future.cancel()
+
+        # Diretório central do ZIP, escrito ao fechar o arquivo
+        yield saida.retirar()
+        logger.info(f"ZIP gerado com {total} arquivos")
+
 
 # Cria uma instância global do StorageR2
 storage = StorageR2()
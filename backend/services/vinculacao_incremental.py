@@ -0,0 +1,97 @@
+"""
+Vinculação incremental de execuções às sessões.
+
+Chama a função vincular_execucoes_lote (migração 25) em laço: cada chamada
+vincula um lote limitado de execuções ainda sem sessão, em sua própria
+transação, e devolve as contagens de cada passo e o último id processado,
+usado como cursor da chamada seguinte. Assim nenhuma chamada segura locks nas
+tabelas inteiras nem estoura o timeout do PostgREST.
+
+O escopo pode ser limitado por janela de datas (data_execucao) e/ou por uma
+lista de ids (ex.: execuções recém-importadas). Com `max_lotes` a execução
+para antes do fim e devolve `proximo_cursor` para ser continuada depois.
+"""
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from ..repositories.database_async import AsyncSupabaseClient
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE_VINCULACAO = 1000
+PASSOS_VINCULACAO = (
+    "exato",
+    "exato_sem_ordem",
+    "tolerancia_ordem",
+    "tolerancia_sem_ordem",
+    "mesmo_dia",
+    "revisao_manual",
+)
+
+
+async def vincular_execucoes_incremental(
+    supabase: AsyncSupabaseClient,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    execucao_ids: Optional[List[str]] = None,
+    cursor: Optional[str] = None,
+    tamanho_lote: int = TAMANHO_LOTE_VINCULACAO,
+    max_lotes: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Vincula as execuções não vinculadas do escopo, lote a lote.
+
+    Args:
+        supabase: Cliente assíncrono
+        data_inicio, data_fim: Janela de data_execucao (inclusive)
+        execucao_ids: Restringe às execuções informadas
+        cursor: proximo_cursor de uma execução anterior interrompida por max_lotes
+        tamanho_lote: Execuções por chamada da função
+        max_lotes: Para depois deste número de lotes (None = até o fim)
+
+    Returns:
+        Dict: lotes, processadas, vinculadas, contagem de cada passo,
+        concluido e proximo_cursor
+    """
+    resultado: Dict[str, Any] = {
+        "lotes": 0,
+        "processadas": 0,
+        "vinculadas": 0,
+        **{passo: 0 for passo in PASSOS_VINCULACAO},
+        "concluido": False,
+        "proximo_cursor": cursor,
+    }
+
+    params = {
+        "p_data_inicio": data_inicio.isoformat() if data_inicio else None,
+        "p_data_fim": data_fim.isoformat() if data_fim else None,
+        "p_execucao_ids": execucao_ids or None,
+        "p_limite": tamanho_lote,
+    }
+
+    while max_lotes is None or resultado["lotes"] < max_lotes:
+        response = await supabase.rpc(
+            "vincular_execucoes_lote",
+            {**params, "p_apos_id": resultado["proximo_cursor"]}
+        ).execute()
+        lote = response.data or {}
+
+        resultado["lotes"] += 1
+        resultado["processadas"] += lote.get("processadas", 0)
+        for passo in PASSOS_VINCULACAO:
+            resultado[passo] += lote.get(passo, 0)
+        resultado["vinculadas"] = sum(resultado[passo] for passo in PASSOS_VINCULACAO if passo != "revisao_manual")
+        resultado["proximo_cursor"] = lote.get("ultimo_id")
+        resultado["concluido"] = bool(lote.get("concluido", True))
+
+        logger.info(
+            f"Vinculação lote {resultado['lotes']}: {lote.get('processadas', 0)} execuções, "
+            + ", ".join(f"{passo}={lote.get(passo, 0)}" for passo in PASSOS_VINCULACAO)
+            + f" (acumulado: {resultado['processadas']} processadas, {resultado['vinculadas']} vinculadas)"
+        )
+        if resultado["concluido"]:
+            resultado["proximo_cursor"] = None
+            break
+
+    return resultado
@@ -0,0 +1,164 @@
+"""
+Cache persistente das extrações de PDF feitas pelos modelos de IA.
+
+A chave é o hash do conteúdo do PDF + modelo + hash do prompt: o mesmo
+arquivo enviado de novo (com outro nome, inclusive) reaproveita o resultado
+da extração anterior sem uma nova chamada ao Claude/Gemini/Mistral. Só
+extrações validadas com sucesso são guardadas.
+
+Os resultados ficam em um arquivo SQLite local, com expiração por idade
+(EXTRACAO_CACHE_TTL_DIAS) e limite de entradas (EXTRACAO_CACHE_MAX_ENTRADAS,
+removendo as usadas há mais tempo).
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from ..config.config import settings
+from ..utils.date_utils import DateEncoder
+
+logger = logging.getLogger(__name__)
+
+
+def chave_extracao(hash_pdf: str, modelo: str, prompt: str) -> str:
+    """Monta a chave do cache a partir do sha256 do PDF, do modelo e do prompt."""
+    hash_prompt = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"{hash_pdf}:{modelo}:{hash_prompt}"
+
+
+class CacheExtracao:
+    """
+    Cache de extrações em SQLite. As operações são rápidas e locais, então
+    são feitas de forma síncrona, protegidas por um lock (a conexão é
+    compartilhada entre as requisições).
+    """
+
+    def __init__(self, caminho: str, ttl_segundos: float, max_entradas: int):
+        self.caminho = caminho
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extracoes (
+                chave TEXT PRIMARY KEY,
+                resultado TEXT NOT NULL,
+                criado_em REAL NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extracoes_acesso ON extracoes(ultimo_acesso)")
+        self._conn.commit()
+
+    def obter(self, chave: str) -> Optional[Dict[str, Any]]:
+        """Retorna o resultado da extração em cache ou None (ausente ou expirado)."""
+        agora = time.time()
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT resultado, criado_em FROM extracoes WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha is None or agora - linha[1] > self.ttl_segundos:
+                if linha is not None:
+                    self._conn.execute("DELETE FROM extracoes WHERE chave = ?", (chave,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE extracoes SET ultimo_acesso = ? WHERE chave = ?", (agora, chave))
+            self._conn.commit()
+            self.hits += 1
+
+        dados = json.loads(linha[0])
+        # O DataFrame não é serializado: é refeito a partir dos registros validados
+        return {
+            "json": dados["json"],
+            "dataframe": pd.DataFrame(dados["json"]["registros"]),
+            "dados_ficha": dados["dados_ficha"],
+            "status_validacao": "sucesso",
+            "cache": True,
+        }
+
+    def salvar(self, chave: str, resultado: Dict[str, Any]):
+        """Guarda uma extração bem-sucedida e aplica a expiração e o limite de entradas."""
+        if resultado.get("status_validacao") != "sucesso":
+            return
+        conteudo = json.dumps(
+            {"json": resultado["json"], "dados_ficha": resultado["dados_ficha"]},
+            cls=DateEncoder,
+            ensure_ascii=False,
+        )
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extracoes (chave, resultado, criado_em, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                (chave, conteudo, agora, agora),
+            )
+            self._conn.execute("DELETE FROM extracoes WHERE criado_em < ?", (agora - self.ttl_segundos,))
+            self._conn.execute(
+                """
+                DELETE FROM extracoes WHERE chave IN (
+                    SELECT chave FROM extracoes ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entradas,),
+            )
+            self._conn.commit()
+
+    def limpar(self) -> int:
+        """Remove todas as entradas; retorna quantas foram removidas."""
+        with self._lock:
+            removidas = self._conn.execute("DELETE FROM extracoes").rowcount
+            self._conn.commit()
+        return removidas
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de hits/misses desde o início do processo e tamanho do cache."""
+        with self._lock:
+            entradas = self._conn.execute("SELECT COUNT(*) FROM extracoes").fetchone()[0]
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": round(self.hits / consultas, 4) if consultas else 0.0,
+            "entradas": entradas,
+            "max_entradas": self.max_entradas,
+            "ttl_dias": self.ttl_segundos / 86400,
+            "caminho": self.caminho,
+        }
+
+
+_cache_extracao: Optional[CacheExtracao] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache_extracao() -> Optional[CacheExtracao]:
+    """Retorna o cache global de extrações, ou None se estiver desativado."""
+    global _cache_extracao
+    if not settings.EXTRACAO_CACHE_ATIVO:
+        return None
+    with _cache_lock:
+        if _cache_extracao is None:
+            _cache_extracao = CacheExtracao(
+                settings.EXTRACAO_CACHE_CAMINHO,
+                settings.EXTRACAO_CACHE_TTL_DIAS * 86400,
+                settings.EXTRACAO_CACHE_MAX_ENTRADAS,
+            )
+            logger.info(
+                f"Cache de extrações em {settings.EXTRACAO_CACHE_CAMINHO} "
+                f"(ttl={settings.EXTRACAO_CACHE_TTL_DIAS} dias, máx={settings.EXTRACAO_CACHE_MAX_ENTRADAS})"
+            )
+    return _cache_extracao
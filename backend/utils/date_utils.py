@@ -3,6 +3,7 @@ import re
 import logging
 import json
 from typing import Any, Dict, Union, Optional, TypeVar, List, cast
+from decimal import Decimal
 from dateutil import parser
 from uuid import UUID
 
@@ -99,30 +100,43 @@ def format_date(value: Union[date, datetime, T]) -> Union[str, T]:
         return value.isoformat()
     return cast(T, value)
 
+# Tipos que já vêm prontos no JSON do Supabase e não precisam de conversão
+_TIPOS_JSON = (str, int, float, bool, type(None))
+
+def _para_json(valor: Any) -> Any:
+    """Converte date/datetime para ISO e Decimal para float, inclusive dentro de dicts e listas"""
+    if type(valor) in _TIPOS_JSON:
+        return valor
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, dict):
+        return {chave: _para_json(item) for chave, item in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_para_json(item) for item in valor]
+    return valor
+
 def format_date_fields(data: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
     """
     Formata campos de data em um dicionário para string ISO.
+
+    Todas as datas e Decimals do dicionário são convertidos numa única
+    passada, e não só os de `fields`. Antes, um json.dumps de teste por
+    linha detectava as datas fora da lista. As linhas do Supabase já vêm
+    em JSON e são apenas copiadas.
     
     Args:
         data: Dicionário contendo os dados
-        fields: Lista de campos que podem conter datas
+        fields: Lista de campos que podem conter datas (mantido por compatibilidade)
         
     Returns:
         Dict: Dicionário com datas formatadas como strings ISO
     """
-    result = dict(data)
-    for field in fields:
-        if field in result and result[field] is not None:
-            result[field] = format_date(result[field])
-    
-    # Tenta serializar para verificar se não há outros objetos datetime
-    try:
-        json.dumps(result)
-    except TypeError:
-        # Se houver erro, faz uma serialização completa
-        result = json.loads(json.dumps(result, cls=DateEncoder))
-        
-    return result
+    return {
+        campo: valor if type(valor) in _TIPOS_JSON else _para_json(valor)
+        for campo, valor in data.items()
+    }
 
 # Lista de campos que são datas em toda a aplicação
 # SEMPRE ATUALIZE ESTA LISTA ao adicionar novos campos de data!
@@ -276,14 +290,8 @@ def ensure_serializable(data: Any) -> Any:
     """
     if data is None:
         return None
-        
-    try:
-        # Tenta serializar
-        json.dumps(data)
-        return data
-    except TypeError:
-        # Se falhar, aplica o DateEncoder
-        return json.loads(json.dumps(data, cls=DateEncoder))
+
+    return _para_json(data)
 
 # --- Encoder adicionado daqui --- 
 class DateUUIDEncoder(json.JSONEncoder):
@@ -0,0 +1,30 @@
+"""
+Resposta JSON padrão da API, serializada com orjson.
+
+O orjson serializa date, datetime, UUID e dataclasses nativamente, e bem mais
+rápido que o json da biblioteca padrão. Decimal não é nativo: vira float, como
+no DateEncoder. Registrada como default_response_class em backend/app.py.
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _padrao(obj: Any) -> Any:
+    """Tipos que o orjson não serializa sozinho"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Tipo não serializável em JSON: {type(obj).__name__}")
+
+
+def dumps(conteudo: Any) -> bytes:
+    return orjson.dumps(conteudo, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
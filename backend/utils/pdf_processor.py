@@ -1,7 +1,12 @@
 import os
+import asyncio
 import base64
+import hashlib
 import json
 import logging
+import mmap
+import random
+import tempfile
 import anthropic
 from google import genai
 from google.genai import types
@@ -10,11 +15,139 @@ from pydantic import ValidationError
 import pandas as pd
 import requests
 from mistralai import Mistral
+from ..config.config import settings
 from ..models.execucao import DadosGuia
+from ..utils.cache_extracao import chave_extracao, get_cache_extracao
+from ..utils.pdf_texto import extrair_ficha_texto
 from ..utils.date_utils import formatar_data
 
 logger = logging.getLogger(__name__)
 
+# Status HTTP que indicam limite de taxa ou sobrecarga temporária do provedor
+STATUS_RETENTATIVA = {429, 500, 502, 503, 504, 529}
+ESPERA_BASE_SEGUNDOS = 2.0
+ESPERA_MAXIMA_SEGUNDOS = 60.0
+
+# Uploads são copiados para o disco em blocos, sem carregar o arquivo inteiro
+DIRETORIO_TEMPORARIO = "temp_pdf"
+TAMANHO_BLOCO_UPLOAD = 1024 * 1024
+
+# Semáforos por provedor, criados no primeiro uso (dentro do event loop)
+_semaforos_provedor = {}
+
+
+def _semaforo(provedor: str) -> asyncio.Semaphore:
+    """Retorna o semáforo que limita as chamadas simultâneas ao provedor."""
+    if provedor not in _semaforos_provedor:
+        limite = {
+            "claude": settings.EXTRACAO_CONCORRENCIA_CLAUDE,
+            "gemini": settings.EXTRACAO_CONCORRENCIA_GEMINI,
+            "mistral": settings.EXTRACAO_CONCORRENCIA_MISTRAL,
+        }[provedor]
+        _semaforos_provedor[provedor] = asyncio.Semaphore(max(1, limite))
+    return _semaforos_provedor[provedor]
+
+
+def _status_erro(erro: Exception):
+    """Status HTTP de um erro dos SDKs (Anthropic/Mistral usam status_code, Gemini usa code)."""
+    status = getattr(erro, "status_code", None)
+    if status is None:
+        status = getattr(erro, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def _espera_retentativa(erro: Exception, tentativa: int) -> float:
+    """Usa o retry-after do provedor quando houver; senão, backoff exponencial com jitter."""
+    resposta = getattr(erro, "response", None)
+    if resposta is None:
+        resposta = getattr(erro, "raw_response", None)
+    headers = getattr(resposta, "headers", None)
+    if headers:
+        try:
+            return min(float(headers.get("retry-after")), ESPERA_MAXIMA_SEGUNDOS)
+        except (TypeError, ValueError):
+            pass
+    espera = min(ESPERA_BASE_SEGUNDOS * 2 ** (tentativa - 1), ESPERA_MAXIMA_SEGUNDOS)
+    return espera * random.uniform(0.5, 1.0)
+
+
+async def chamar_provedor(provedor: str, chamada):
+    """
+    Executa `chamada` (função sem argumentos que retorna uma corrotina) respeitando
+    o limite de concorrência do provedor. Erros de limite de taxa/sobrecarga são
+    tentados novamente até EXTRACAO_MAX_TENTATIVAS vezes; o semáforo é liberado
+    durante a espera para não segurar a vaga de outras extrações.
+    """
+    tentativa = 1
+    while True:
+        try:
+            async with _semaforo(provedor):
+                return await chamada()
+        except Exception as e:
+            status = _status_erro(e)
+            if status not in STATUS_RETENTATIVA or tentativa >= settings.EXTRACAO_MAX_TENTATIVAS:
+                raise
+            espera = _espera_retentativa(e, tentativa)
+            logger.warning(
+                f"{provedor}: status {status} na tentativa {tentativa}/{settings.EXTRACAO_MAX_TENTATIVAS}, "
+                f"nova tentativa em {espera:.1f}s"
+            )
+            await asyncio.sleep(espera)
+            tentativa += 1
+
+
+async def salvar_pdf_temporario(file, temp_dir: str = DIRETORIO_TEMPORARIO):
+    """
+    Grava um UploadFile em um arquivo temporário exclusivo, em blocos, calculando
+    o sha256 durante a cópia.
+
+    Returns:
+        Tupla (caminho do arquivo, sha256 em hex, tamanho em bytes). O chamador
+        remove o arquivo ao terminar.
+    """
+    os.makedirs(temp_dir, exist_ok=True)
+    nome = os.path.basename(file.filename or "arquivo.pdf")
+    fd, caminho = tempfile.mkstemp(dir=temp_dir, suffix=f"_{nome}")
+    hash_pdf = hashlib.sha256()
+    tamanho = 0
+    try:
+        with os.fdopen(fd, "wb") as destino:
+            while True:
+                bloco = await file.read(TAMANHO_BLOCO_UPLOAD)
+                if not bloco:
+                    break
+                hash_pdf.update(bloco)
+                destino.write(bloco)
+                tamanho += len(bloco)
+    except Exception:
+        os.unlink(caminho)
+        raise
+    return caminho, hash_pdf.hexdigest(), tamanho
+
+
+def hash_arquivo(caminho: str) -> str:
+    """sha256 de um arquivo, lido em blocos."""
+    hash_pdf = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_UPLOAD), b""):
+            hash_pdf.update(bloco)
+    return hash_pdf.hexdigest()
+
+
+def _ler_pdf(caminho: str, em_base64: bool = False):
+    """
+    Lê o PDF para envio ao provedor. O base64 (Claude) é gerado direto do
+    arquivo mapeado em memória, sem uma cópia intermediária em bytes. Gemini
+    e Mistral recebem os bytes do arquivo, que precisam estar inteiros na
+    memória: uma única leitura.
+    Chamar fora do event loop (asyncio.to_thread).
+    """
+    if em_base64:
+        with open(caminho, "rb") as arquivo, mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as conteudo:
+            return base64.b64encode(conteudo).decode("ascii")
+    with open(caminho, "rb") as arquivo:
+        return arquivo.read()
+
 
 # Função para carregar prompt de um arquivo
 def carregar_prompt(prompt_path=None):
@@ -71,7 +204,13 @@ def carregar_prompt(prompt_path=None):
 
 
 # Função para extrair informações de um PDF
-async def extract_info_from_pdf(pdf_path: str, api_key: str, modelo: str = "claude", prompt_path: str = None):
+async def extract_info_from_pdf(
+    pdf_path: str,
+    api_key: str,
+    modelo: str = "claude",
+    prompt_path: str = None,
+    hash_pdf: str = None
+):
     """
     Extrai informações de um arquivo PDF usando o modelo de IA especificado.
     
@@ -80,6 +219,7 @@ async def extract_info_from_pdf(pdf_path: str, api_key: str, modelo: str = "clau
         api_key: Chave da API do modelo selecionado
         modelo: Modelo de IA a ser usado ("claude", "gemini", "mistral")
         prompt_path: Caminho para o arquivo de prompt personalizado (opcional)
+        hash_pdf: sha256 do arquivo, se já calculado no upload (salvar_pdf_temporario)
         
     Returns:
         Dicionário com as informações extraídas e status da validação
@@ -87,30 +227,54 @@ async def extract_info_from_pdf(pdf_path: str, api_key: str, modelo: str = "clau
     if not os.path.isfile(pdf_path):
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
 
-    pdf_data = None
+    if os.path.getsize(pdf_path) == 0:
+        raise HTTPException(status_code=500, detail="Erro ao ler PDF: arquivo vazio")
+
     try:
-        with open(pdf_path, "rb") as pdf_file:
-            pdf_data = base64.b64encode(pdf_file.read()).decode("utf-8")
-            pdf_binary = open(pdf_path, "rb").read()  # Para APIs que precisam do arquivo binário
+        if hash_pdf is None:
+            hash_pdf = await asyncio.to_thread(hash_arquivo, pdf_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao ler PDF: {str(e)}")
-
-    if not pdf_data:
-        raise HTTPException(status_code=500, detail="Erro ao ler PDF: arquivo vazio")
     
     # Carregar o prompt personalizado ou usar o padrão
     prompt = carregar_prompt(prompt_path)
+
+    # O mesmo PDF já extraído com este modelo e prompt não é enviado de novo à IA
+    cache = get_cache_extracao()
+    chave_cache = chave_extracao(hash_pdf, modelo, prompt)
+    if cache:
+        resultado_cache = cache.obter(chave_cache)
+        if resultado_cache:
+            logger.info(f"Extração de {os.path.basename(pdf_path)} encontrada no cache ({modelo})")
+            return resultado_cache
+
+    # PDFs com camada de texto são lidos localmente; só os digitalizados (ou com
+    # leitura duvidosa) vão para a IA. Um prompt personalizado sempre usa a IA.
+    if settings.EXTRACAO_TEXTO_LOCAL_ATIVO and not prompt_path:
+        dados_texto = await asyncio.to_thread(extrair_ficha_texto, pdf_path)
+        if dados_texto:
+            resultado = processar_dados_extraidos(dados_texto, None)
+            if resultado["status_validacao"] == "sucesso":
+                logger.info(f"Ficha {os.path.basename(pdf_path)} extraída da camada de texto, sem IA")
+                resultado["origem"] = "texto_local"
+                return resultado
+            logger.info(f"Leitura local de {os.path.basename(pdf_path)} não validou, usando {modelo}")
     
     # Usar o modelo especificado
     try:
         if modelo == "claude":
-            return await extract_with_claude(pdf_data, api_key, prompt)
+            pdf_data = await asyncio.to_thread(_ler_pdf, pdf_path, True)
+            resultado = await extract_with_claude(pdf_data, api_key, prompt)
         elif modelo == "gemini":
-            return await extract_with_gemini(pdf_binary, api_key, prompt)
+            pdf_binary = await asyncio.to_thread(_ler_pdf, pdf_path)
+            resultado = await extract_with_gemini(pdf_binary, api_key, prompt)
         elif modelo == "mistral":
-            return await extract_with_mistral(pdf_path, api_key, prompt)
+            resultado = await extract_with_mistral(pdf_path, api_key, prompt)
         else:
             raise ValueError(f"Modelo não suportado: {modelo}")
+        if cache:
+            cache.salvar(chave_cache, resultado)
+        return resultado
     except Exception as e:
         logger.error(f"Erro ao extrair informações com o modelo {modelo}: {str(e)}")
         return {
@@ -121,10 +285,11 @@ async def extract_info_from_pdf(pdf_path: str, api_key: str, modelo: str = "clau
 
 async def extract_with_claude(pdf_data: str, api_key: str, prompt: str):
     """Extrai informações de PDF usando a API Claude da Anthropic"""
-    client = anthropic.Anthropic(api_key=api_key)
+    # As retentativas ficam com chamar_provedor, que conhece o limite por provedor
+    client = anthropic.AsyncAnthropic(api_key=api_key, max_retries=0)
 
     try:
-        response = client.beta.messages.create(
+        response = await chamar_provedor("claude", lambda: client.beta.messages.create(
             model="claude-3-5-sonnet-20241022",
             betas=["pdfs-2024-09-25"],
             max_tokens=4096,
@@ -147,7 +312,7 @@ async def extract_with_claude(pdf_data: str, api_key: str, prompt: str):
                     ],
                 }
             ],
-        )
+        ))
 
         # Parse a resposta JSON
         dados_extraidos = json.loads(response.content[0].text)
@@ -181,10 +346,10 @@ async def extract_with_gemini(pdf_binary: bytes, api_key: str, prompt: str):
         ]
         
         # Fazer a chamada à API
-        response = client.models.generate_content(
+        response = await chamar_provedor("gemini", lambda: client.aio.models.generate_content(
             model="gemini-2.0-flash-exp",
             contents=contents
-        )
+        ))
         
         # Extrair o JSON da resposta
         response_text = response.text
@@ -216,26 +381,26 @@ async def extract_with_mistral(pdf_path: str, api_key: str, prompt: str):
         client = Mistral(api_key=api_key)
         
         # Fazer upload do arquivo PDF para o Mistral
-        with open(pdf_path, "rb") as pdf_file:
-            uploaded_file = client.files.upload(
-                file={
-                    "file_name": os.path.basename(pdf_path),
-                    "content": pdf_file,
-                },
-                purpose="ocr"
-            )
+        pdf_content = await asyncio.to_thread(_ler_pdf, pdf_path)
+        uploaded_file = await chamar_provedor("mistral", lambda: client.files.upload_async(
+            file={
+                "file_name": os.path.basename(pdf_path),
+                "content": pdf_content,
+            },
+            purpose="ocr"
+        ))
         
         # Obter URL assinada para o arquivo
-        signed_url = client.files.get_signed_url(file_id=uploaded_file.id)
+        signed_url = await chamar_provedor("mistral", lambda: client.files.get_signed_url_async(file_id=uploaded_file.id))
         
         # Processar o documento com OCR
-        ocr_response = client.ocr.process(
+        ocr_response = await chamar_provedor("mistral", lambda: client.ocr.process_async(
             model="mistral-ocr-latest",
             document={
                 "type": "document_url",
                 "document_url": signed_url.url
             }
-        )
+        ))
         
         # Extrair o texto do documento processado
         document_text = "\n\n".join([f"### Página {i+1}\n{ocr_response.pages[i].markdown}" for i in range(len(ocr_response.pages))])
@@ -260,12 +425,12 @@ async def extract_with_mistral(pdf_path: str, api_key: str, prompt: str):
         ]
         
         # Obter a resposta do chat
-        chat_response = client.chat.complete(
+        chat_response = await chamar_provedor("mistral", lambda: client.chat.complete_async(
             model="mistral-small-latest",
             messages=messages,
             temperature=0.0,
             max_tokens=8000
-        )
+        ))
         
         # Extrair o conteúdo da resposta
         response_text = chat_response.choices[0].message.content
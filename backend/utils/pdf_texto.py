@@ -0,0 +1,116 @@
+"""
+Extração local de fichas a partir da camada de texto do PDF.
+
+Fichas geradas digitalmente têm texto selecionável: nesse caso as linhas de
+sessão (ordem, data, carteirinha, nome, guia) são lidas com pdfplumber e
+expressões regulares, sem chamar nenhum modelo de IA. O resultado segue a
+mesma estrutura de `DadosGuia` que os modelos devolvem.
+
+Quando o PDF é digitalizado (sem texto) ou a leitura não é confiável, a função
+retorna None e `extract_info_from_pdf` segue para o modelo de IA.
+"""
+import io
+import logging
+import re
+from typing import Any, Dict, List, Optional, Union
+
+import pdfplumber
+
+from ..utils.date_utils import formatar_data
+
+logger = logging.getLogger(__name__)
+
+# Abaixo disso (caracteres por página) o PDF é tratado como digitalizado
+MIN_CARACTERES_POR_PAGINA = 40
+
+RE_CODIGO_FICHA = re.compile(r"FICHA\s*:?\s*(?:N[º°o.]*\s*)?([A-Z0-9]{2}-[A-Z0-9]{4,})", re.IGNORECASE)
+# 1- 05/03/2025 0064.0317.025711.00-1 ARTHUR BRANQUINHO 47616351 ...
+RE_LINHA_SESSAO = re.compile(
+    r"^\s*(?P<ordem>\d{1,2})\s*[-–.)]\s*"
+    r"(?P<data>\d{2}/\d{2}/\d{2,4})\s+"
+    r"(?P<carteirinha>\d[\d.\-]{7,}\d)\s*-?\s*"
+    r"(?P<nome>[A-ZÀ-Ü][A-ZÀ-Ü' ]+?)\s+"
+    r"(?P<guia>\d{6,})"
+    r"(?P<resto>.*)$"
+)
+
+
+def _linhas_sessao(pagina) -> List[Dict[str, Any]]:
+    """Lê as linhas numeradas de sessão de uma página."""
+    registros = []
+    texto = pagina.extract_text() or ""
+    # Assinaturas em fichas digitais são imagens ou traços desenhados na linha
+    desenhos = list(pagina.images) + list(pagina.curves)
+    palavras = pagina.extract_words() if desenhos else []
+
+    for linha in texto.splitlines():
+        match = RE_LINHA_SESSAO.match(linha)
+        if not match:
+            continue
+
+        possui_assinatura = bool(match.group("resto").strip())
+        if not possui_assinatura and desenhos:
+            guia = match.group("guia")
+            palavra_guia = next((p for p in palavras if p["text"] == guia), None)
+            if palavra_guia:
+                possui_assinatura = any(
+                    d["x0"] > palavra_guia["x1"]
+                    and d["top"] < palavra_guia["bottom"]
+                    and d["bottom"] > palavra_guia["top"]
+                    for d in desenhos
+                )
+
+        registros.append({
+            "ordem_execucao": int(match.group("ordem")),
+            "data_atendimento": formatar_data(match.group("data")),
+            "paciente_carteirinha": match.group("carteirinha"),
+            "paciente_nome": " ".join(match.group("nome").split()),
+            "guia_id": match.group("guia"),
+            "possui_assinatura": possui_assinatura,
+        })
+    return registros
+
+
+def extrair_ficha_texto(pdf: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+    """
+    Tenta extrair a ficha (caminho do arquivo ou bytes) pela camada de texto.
+    Retorna o dicionário no formato de `DadosGuia` ou None quando o PDF não tem
+    texto ou o resultado não é confiável: sem código da ficha, sem linhas de
+    sessão, ordem das linhas repetida ou mais de uma carteirinha/guia no mesmo
+    documento.
+
+    Função síncrona (CPU): chamar com asyncio.to_thread no código assíncrono.
+    """
+    try:
+        origem = io.BytesIO(pdf) if isinstance(pdf, bytes) else pdf
+        with pdfplumber.open(origem) as documento:
+            paginas = list(documento.pages)
+            if not paginas:
+                return None
+            textos = [pagina.extract_text() or "" for pagina in paginas]
+            if sum(len(t.strip()) for t in textos) < MIN_CARACTERES_POR_PAGINA * len(paginas):
+                return None
+
+            match_codigo = RE_CODIGO_FICHA.search("\n".join(textos))
+            if not match_codigo:
+                return None
+
+            registros = []
+            for pagina in paginas:
+                registros.extend(_linhas_sessao(pagina))
+    except Exception as e:
+        logger.warning(f"Não foi possível ler a camada de texto do PDF: {str(e)}")
+        return None
+
+    if not registros:
+        return None
+    ordens = [r["ordem_execucao"] for r in registros]
+    if len(set(ordens)) != len(ordens):
+        return None
+    if len({r["paciente_carteirinha"] for r in registros}) > 1 or len({r["guia_id"] for r in registros}) > 1:
+        return None
+
+    return {
+        "codigo_ficha": match_codigo.group(1).upper(),
+        "registros": sorted(registros, key=lambda r: r["ordem_execucao"]),
+    }
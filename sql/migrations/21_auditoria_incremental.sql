@@ -0,0 +1,30 @@
+-- Migração: auditoria incremental de divergências
+-- Objetivo: permitir que realizar_auditoria_fichas_execucoes atualize/resolva
+-- divergências por uma chave estável em vez de apagar e reinserir tudo, e
+-- localizar rapidamente os registros alterados desde a última auditoria.
+
+-- Chave estável da divergência (ex: 'ficha_sem_execucao:F123', 'duplicidade:<ficha>|<sessao_id>|<guia>|<data>')
+ALTER TABLE divergencias ADD COLUMN IF NOT EXISTS chave_auditoria text;
+
+-- Índice único usado pelo upsert (on_conflict=chave_auditoria).
+-- Divergências antigas ficam com chave nula e não conflitam entre si.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_divergencias_chave_auditoria
+    ON divergencias (chave_auditoria);
+
+-- Busca das divergências abertas dentro do escopo da auditoria
+CREATE INDEX IF NOT EXISTS idx_divergencias_status_codigo_ficha
+    ON divergencias (status, codigo_ficha);
+CREATE INDEX IF NOT EXISTS idx_divergencias_status_numero_guia
+    ON divergencias (status, numero_guia);
+
+-- Busca dos registros alterados desde a última auditoria
+CREATE INDEX IF NOT EXISTS idx_fichas_updated_at ON fichas (updated_at);
+CREATE INDEX IF NOT EXISTS idx_sessoes_updated_at ON sessoes (updated_at);
+CREATE INDEX IF NOT EXISTS idx_execucoes_updated_at ON execucoes (updated_at);
+CREATE INDEX IF NOT EXISTS idx_guias_updated_at ON guias (updated_at);
+
+-- Filtros por janela de datas e por ficha/guia
+CREATE INDEX IF NOT EXISTS idx_sessoes_data_sessao ON sessoes (data_sessao);
+CREATE INDEX IF NOT EXISTS idx_execucoes_data_execucao ON execucoes (data_execucao);
+CREATE INDEX IF NOT EXISTS idx_execucoes_codigo_ficha ON execucoes (codigo_ficha);
+CREATE INDEX IF NOT EXISTS idx_execucoes_numero_guia ON execucoes (numero_guia);
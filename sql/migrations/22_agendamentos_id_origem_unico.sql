@@ -0,0 +1,14 @@
+-- Migração: upsert em lote dos agendamentos importados do MySQL
+-- Objetivo: permitir que a importação grave os agendamentos com
+-- upsert(on_conflict='id_origem') em vez de consultar e inserir/atualizar
+-- linha a linha.
+
+-- Agendamentos duplicados pelo id_origem impedem a criação do índice.
+-- Para conferir antes de aplicar:
+--   SELECT id_origem, count(*) FROM agendamentos
+--   WHERE id_origem IS NOT NULL GROUP BY id_origem HAVING count(*) > 1;
+
+-- Índice único usado pelo upsert. Agendamentos criados manualmente ficam
+-- com id_origem nulo e não conflitam entre si.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_agendamentos_id_origem
+    ON agendamentos (id_origem);
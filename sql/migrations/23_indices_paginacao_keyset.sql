@@ -0,0 +1,15 @@
+-- Migração: índices para a paginação por cursor (keyset)
+-- Objetivo: as listagens com `cursor` ordenam por (coluna, id) e filtram a
+-- partir da última linha da página anterior; com estes índices cada página é
+-- lida direto do índice, sem percorrer as linhas das páginas anteriores.
+-- Os índices são parciais (deleted_at IS NULL), como as próprias listagens.
+
+-- Pacientes: ordenação padrão por nome
+CREATE INDEX IF NOT EXISTS idx_pacientes_nome_id_ativos
+    ON pacientes (nome, id)
+    WHERE deleted_at IS NULL;
+
+-- Execuções: ordenação padrão por data de execução (desc)
+CREATE INDEX IF NOT EXISTS idx_execucoes_data_execucao_id_ativos
+    ON execucoes (data_execucao DESC, id DESC)
+    WHERE deleted_at IS NULL;
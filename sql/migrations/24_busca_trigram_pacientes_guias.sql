@@ -0,0 +1,152 @@
+-- Migração: busca de pacientes e guias com índices trigram
+-- Objetivo: a busca da listagem (nome.ilike.%termo%) lia a tabela inteira a
+-- cada tecla digitada. Com pg_trgm os padrões LIKE '%termo%' e a similaridade
+-- por palavra usam índice GIN; unaccent permite achar "Joao" em "João".
+--
+-- A busca é feita pela função buscar_pacientes_guias, usada pelo endpoint
+-- GET /pacientes/busca:
+--   p_prefixo = true  -> nomes com alguma palavra começando pelo termo e
+--                        documentos começando pelos dígitos (autocomplete)
+--   p_prefixo = false -> trechos em qualquer posição e nomes parecidos
+--                        (tolerante a erros de digitação), ordenados por relevância
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() é STABLE (depende do dicionário configurado); esta versão com o
+-- dicionário fixo pode ser IMMUTABLE e, portanto, usada em índices.
+CREATE OR REPLACE FUNCTION f_unaccent(text)
+RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+-- Normalizações usadas nos índices e na função de busca
+CREATE OR REPLACE FUNCTION f_busca_texto(text)
+RETURNS text AS $$
+    SELECT lower(f_unaccent($1))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+CREATE OR REPLACE FUNCTION f_busca_documento(text)
+RETURNS text AS $$
+    SELECT regexp_replace(lower($1), '[^a-z0-9]', '', 'g')
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+CREATE INDEX IF NOT EXISTS idx_pacientes_nome_trgm
+    ON pacientes USING gin (f_busca_texto(nome) gin_trgm_ops)
+    WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_pacientes_cpf_trgm
+    ON pacientes USING gin (f_busca_documento(cpf) gin_trgm_ops)
+    WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_carteirinhas_numero_trgm
+    ON carteirinhas USING gin (f_busca_documento(numero_carteirinha) gin_trgm_ops)
+    WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_guias_numero_guia_trgm
+    ON guias USING gin (f_busca_documento(numero_guia) gin_trgm_ops)
+    WHERE deleted_at IS NULL;
+
+DROP FUNCTION IF EXISTS buscar_pacientes_guias;
+
+-- Busca por nome, CPF, número da carteirinha e número da guia.
+-- Cada fonte é limitada separadamente (usando o próprio índice) e o
+-- resultado final é ordenado pela relevância (1.0 = começa com o termo).
+CREATE OR REPLACE FUNCTION buscar_pacientes_guias(
+    p_termo text,
+    p_limite int DEFAULT 20,
+    p_prefixo boolean DEFAULT false
+)
+RETURNS TABLE (
+    tipo text,
+    id uuid,
+    paciente_id uuid,
+    paciente_nome text,
+    valor text,
+    relevancia real
+) AS $$
+#variable_conflict use_column
+DECLARE
+    -- % e _ digitados pelo usuário não podem virar curingas do LIKE
+    v_texto text := regexp_replace(f_busca_texto(trim(coalesce(p_termo, ''))), '[%_\\]', '', 'g');
+    v_documento text := f_busca_documento(coalesce(p_termo, ''));
+    v_limite int := least(greatest(coalesce(p_limite, 20), 1), 100);
+    v_padrao_nome text;
+    v_padrao_palavra text;
+    v_padrao_documento text;
+BEGIN
+    IF length(v_texto) < 2 THEN
+        RETURN;
+    END IF;
+    -- CPF, carteirinha e guia só são buscados quando o termo tem números
+    IF v_documento !~ '[0-9]' THEN
+        v_documento := NULL;
+    END IF;
+
+    -- Os padrões são montados aqui para que cada condição use o índice trigram
+    IF p_prefixo THEN
+        v_padrao_nome := v_texto || '%';
+        v_padrao_palavra := '% ' || v_texto || '%';
+        v_padrao_documento := v_documento || '%';
+    ELSE
+        v_padrao_nome := '%' || v_texto || '%';
+        v_padrao_palavra := v_padrao_nome;
+        v_padrao_documento := '%' || v_documento || '%';
+    END IF;
+
+    RETURN QUERY
+    SELECT r.tipo, r.id, r.paciente_id, r.paciente_nome, r.valor, r.relevancia
+    FROM (
+        (
+            SELECT 'paciente'::text AS tipo, p.id, p.id AS paciente_id, p.nome AS paciente_nome,
+                   p.nome AS valor,
+                   CASE WHEN f_busca_texto(p.nome) LIKE v_texto || '%' THEN 1.0
+                        ELSE word_similarity(v_texto, f_busca_texto(p.nome)) END::real AS relevancia
+            FROM pacientes p
+            WHERE p.deleted_at IS NULL
+              AND (
+                  f_busca_texto(p.nome) LIKE v_padrao_nome
+                  OR f_busca_texto(p.nome) LIKE v_padrao_palavra
+                  -- Nomes parecidos (erros de digitação) só na busca completa
+                  OR (NOT p_prefixo AND v_texto <% f_busca_texto(p.nome))
+              )
+            ORDER BY relevancia DESC, p.nome
+            LIMIT v_limite
+        )
+        UNION ALL
+        (
+            SELECT 'cpf'::text, p.id, p.id, p.nome, p.cpf,
+                   CASE WHEN f_busca_documento(p.cpf) LIKE v_documento || '%' THEN 1.0 ELSE 0.5 END::real
+            FROM pacientes p
+            WHERE length(v_documento) >= 3
+              AND p.deleted_at IS NULL
+              AND f_busca_documento(p.cpf) LIKE v_padrao_documento
+            LIMIT v_limite
+        )
+        UNION ALL
+        (
+            SELECT 'carteirinha'::text, c.id, c.paciente_id, p.nome, c.numero_carteirinha,
+                   CASE WHEN f_busca_documento(c.numero_carteirinha) LIKE v_documento || '%' THEN 1.0 ELSE 0.5 END::real
+            FROM carteirinhas c
+            JOIN pacientes p ON p.id = c.paciente_id
+            WHERE length(v_documento) >= 3
+              AND c.deleted_at IS NULL
+              AND f_busca_documento(c.numero_carteirinha) LIKE v_padrao_documento
+            LIMIT v_limite
+        )
+        UNION ALL
+        (
+            SELECT 'guia'::text, g.id, g.paciente_id, p.nome, g.numero_guia,
+                   CASE WHEN f_busca_documento(g.numero_guia) LIKE v_documento || '%' THEN 1.0 ELSE 0.5 END::real
+            FROM guias g
+            JOIN pacientes p ON p.id = g.paciente_id
+            WHERE length(v_documento) >= 3
+              AND g.deleted_at IS NULL
+              AND f_busca_documento(g.numero_guia) LIKE v_padrao_documento
+            LIMIT v_limite
+        )
+    ) r
+    ORDER BY r.relevancia DESC, r.paciente_nome
+    LIMIT v_limite;
+END;
+$$ LANGUAGE plpgsql STABLE;
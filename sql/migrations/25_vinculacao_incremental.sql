@@ -0,0 +1,261 @@
+-- Migração: vinculação incremental de execuções e sessões
+-- Objetivo: vincular_sessoes_execucoes() e vincular_sessoes_mesmo_dia() cruzam
+-- as tabelas execucoes e sessoes inteiras, em uma única transação e sem limite
+-- de datas; com um histórico grande a chamada segura os locks por minutos e
+-- estoura o timeout do PostgREST.
+--
+-- vincular_execucoes_lote() aplica as mesmas regras (exato com/sem ordem,
+-- tolerância de 1 dia com/sem ordem e grupos do mesmo dia) a um lote limitado
+-- de execuções não vinculadas, selecionadas por janela de datas ou por lista
+-- de ids e percorridas por id (p_apos_id). O backend chama a função em laço,
+-- um lote por transação, até a resposta trazer concluido = true.
+
+-- Sessões: busca por guia + data (+ ordem) nos passos exatos e de tolerância
+CREATE INDEX IF NOT EXISTS idx_sessoes_guia_data_ordem
+    ON sessoes (numero_guia, data_sessao, ordem_execucao)
+    WHERE deleted_at IS NULL;
+
+-- Execuções ainda não vinculadas: busca pela mesma chave e seleção dos lotes
+CREATE INDEX IF NOT EXISTS idx_execucoes_guia_data_ordem_pendentes
+    ON execucoes (numero_guia, data_execucao, ordem_execucao)
+    WHERE sessao_id IS NULL AND deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_execucoes_pendentes_vinculo_id
+    ON execucoes (id)
+    WHERE sessao_id IS NULL AND deleted_at IS NULL;
+
+DROP FUNCTION IF EXISTS vincular_execucoes_lote;
+
+CREATE OR REPLACE FUNCTION vincular_execucoes_lote(
+    p_data_inicio date DEFAULT NULL,
+    p_data_fim date DEFAULT NULL,
+    p_execucao_ids uuid[] DEFAULT NULL,
+    p_apos_id uuid DEFAULT NULL,
+    p_limite int DEFAULT 1000
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_ids uuid[];
+    v_ultimo_id uuid;
+    v_processadas integer;
+    v_exato integer := 0;
+    v_exato_sem_ordem integer := 0;
+    v_tolerancia_ordem integer := 0;
+    v_tolerancia_sem_ordem integer := 0;
+    v_mesmo_dia integer := 0;
+    v_revisao_manual integer := 0;
+    v_contagem integer;
+    grupo RECORD;
+BEGIN
+    -- Lote de execuções não vinculadas, em ordem de id a partir do cursor
+    SELECT array_agg(l.id ORDER BY l.id), count(*)
+      INTO v_ids, v_processadas
+    FROM (
+        SELECT e.id
+        FROM execucoes e
+        WHERE e.sessao_id IS NULL
+          AND e.deleted_at IS NULL
+          AND (p_apos_id IS NULL OR e.id > p_apos_id)
+          AND (p_data_inicio IS NULL OR e.data_execucao >= p_data_inicio)
+          AND (p_data_fim IS NULL OR e.data_execucao <= p_data_fim)
+          AND (p_execucao_ids IS NULL OR e.id = ANY(p_execucao_ids))
+        ORDER BY e.id
+        LIMIT greatest(coalesce(p_limite, 1000), 1)
+    ) l;
+
+    IF v_processadas = 0 THEN
+        RETURN jsonb_build_object(
+            'processadas', 0,
+            'ultimo_id', p_apos_id,
+            'concluido', true,
+            'exato', 0,
+            'exato_sem_ordem', 0,
+            'tolerancia_ordem', 0,
+            'tolerancia_sem_ordem', 0,
+            'mesmo_dia', 0,
+            'revisao_manual', 0
+        );
+    END IF;
+    v_ultimo_id := v_ids[v_processadas];
+
+    -- Passo 1: Vinculação Exata (Guia + Data + Ordem), só vínculos únicos
+    WITH exatas AS (
+        SELECT e.id AS execucao_id, s.id AS sessao_id, s.codigo_ficha AS sessao_codigo_ficha,
+               count(*) OVER (PARTITION BY e.id) AS num_sessoes
+        FROM execucoes e
+        JOIN sessoes s ON e.numero_guia = s.numero_guia
+                      AND e.data_execucao = s.data_sessao
+                      AND e.ordem_execucao = s.ordem_execucao
+        WHERE e.id = ANY(v_ids)
+          AND e.sessao_id IS NULL
+          AND e.ordem_execucao IS NOT NULL
+          AND s.deleted_at IS NULL
+    )
+    UPDATE execucoes e
+    SET sessao_id = vu.sessao_id,
+        codigo_ficha = vu.sessao_codigo_ficha,
+        codigo_ficha_temp = FALSE,
+        link_manual_necessario = FALSE
+    FROM exatas vu
+    WHERE e.id = vu.execucao_id
+      AND vu.num_sessoes = 1;
+    GET DIAGNOSTICS v_exato = ROW_COUNT;
+
+    -- Passo 1.1: Vinculação Exata (Guia + Data, SEM Ordem)
+    WITH exatas_sem_ordem AS (
+        SELECT e.id AS execucao_id, s.id AS sessao_id, s.codigo_ficha AS sessao_codigo_ficha,
+               count(*) OVER (PARTITION BY e.id) AS num_sessoes
+        FROM execucoes e
+        JOIN sessoes s ON e.numero_guia = s.numero_guia
+                      AND e.data_execucao = s.data_sessao
+        WHERE e.id = ANY(v_ids)
+          AND e.sessao_id IS NULL
+          AND e.ordem_execucao IS NULL
+          AND s.ordem_execucao IS NULL
+          AND s.deleted_at IS NULL
+    )
+    UPDATE execucoes e
+    SET sessao_id = vu.sessao_id,
+        codigo_ficha = vu.sessao_codigo_ficha,
+        codigo_ficha_temp = FALSE,
+        link_manual_necessario = FALSE
+    FROM exatas_sem_ordem vu
+    WHERE e.id = vu.execucao_id
+      AND vu.num_sessoes = 1;
+    GET DIAGNOSTICS v_exato_sem_ordem = ROW_COUNT;
+
+    -- Passo 2: Tolerância+Ordem (Guia + Data +/- 1d + Ordem).
+    -- BETWEEN no lugar de abs(diferença) <= 1 para usar o índice de sessoes.
+    WITH tolerancia_ordem AS (
+        SELECT e.id AS execucao_id, s.id AS sessao_id, s.codigo_ficha AS sessao_codigo_ficha,
+               count(*) OVER (PARTITION BY e.id) AS num_sessoes
+        FROM execucoes e
+        JOIN sessoes s ON e.numero_guia = s.numero_guia
+                      AND s.data_sessao BETWEEN e.data_execucao - 1 AND e.data_execucao + 1
+                      AND e.ordem_execucao = s.ordem_execucao
+        WHERE e.id = ANY(v_ids)
+          AND e.sessao_id IS NULL
+          AND e.ordem_execucao IS NOT NULL
+          AND s.deleted_at IS NULL
+    )
+    UPDATE execucoes e
+    SET sessao_id = vu.sessao_id,
+        codigo_ficha = vu.sessao_codigo_ficha,
+        codigo_ficha_temp = FALSE,
+        link_manual_necessario = FALSE
+    FROM tolerancia_ordem vu
+    WHERE e.id = vu.execucao_id
+      AND vu.num_sessoes = 1;
+    GET DIAGNOSTICS v_tolerancia_ordem = ROW_COUNT;
+
+    -- Passo 3: Tolerância s/ Ordem (Unicidade - Guia + Data +/- 1d)
+    WITH tolerancia_sem_ordem AS (
+        SELECT e.id AS execucao_id, s.id AS sessao_id, s.codigo_ficha AS sessao_codigo_ficha,
+               count(*) OVER (PARTITION BY e.id) AS num_sessoes
+        FROM execucoes e
+        JOIN sessoes s ON e.numero_guia = s.numero_guia
+                      AND s.data_sessao BETWEEN e.data_execucao - 1 AND e.data_execucao + 1
+        WHERE e.id = ANY(v_ids)
+          AND e.sessao_id IS NULL
+          AND s.deleted_at IS NULL
+    )
+    UPDATE execucoes e
+    SET sessao_id = vu.sessao_id,
+        codigo_ficha = vu.sessao_codigo_ficha,
+        codigo_ficha_temp = FALSE,
+        link_manual_necessario = FALSE
+    FROM tolerancia_sem_ordem vu
+    WHERE e.id = vu.execucao_id
+      AND vu.num_sessoes = 1;
+    GET DIAGNOSTICS v_tolerancia_sem_ordem = ROW_COUNT;
+
+    -- Passo 4: grupos com várias execuções/sessões no mesmo dia e guia,
+    -- restritos às guias e datas das execuções do lote ainda sem vínculo
+    FOR grupo IN
+        WITH grupos_lote AS (
+            SELECT DISTINCT e.numero_guia, e.data_execucao AS data
+            FROM execucoes e
+            WHERE e.id = ANY(v_ids)
+              AND e.sessao_id IS NULL
+              AND e.link_manual_necessario = FALSE
+        ),
+        execucoes_grupo AS (
+            SELECT gl.numero_guia, gl.data,
+                   count(*) AS qtd_execucoes,
+                   count(DISTINCT e.ordem_execucao) AS qtd_ordem_exec_unicas
+            FROM grupos_lote gl
+            JOIN execucoes e ON e.numero_guia = gl.numero_guia
+                            AND e.data_execucao = gl.data
+            WHERE e.sessao_id IS NULL
+              AND e.link_manual_necessario = FALSE
+              AND e.deleted_at IS NULL
+            GROUP BY gl.numero_guia, gl.data
+        ),
+        sessoes_grupo AS (
+            SELECT gl.numero_guia, gl.data,
+                   count(*) AS qtd_sessoes,
+                   count(DISTINCT s.ordem_execucao) AS qtd_ordem_sess_unicas
+            FROM grupos_lote gl
+            JOIN sessoes s ON s.numero_guia = gl.numero_guia
+                          AND s.data_sessao = gl.data
+            WHERE s.deleted_at IS NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM execucoes ev
+                  WHERE ev.sessao_id = s.id AND ev.deleted_at IS NULL
+              )
+            GROUP BY gl.numero_guia, gl.data
+        )
+        SELECT eg.numero_guia, eg.data, eg.qtd_execucoes, eg.qtd_ordem_exec_unicas,
+               sg.qtd_sessoes, sg.qtd_ordem_sess_unicas
+        FROM execucoes_grupo eg
+        JOIN sessoes_grupo sg ON sg.numero_guia = eg.numero_guia AND sg.data = eg.data
+        WHERE eg.qtd_execucoes > 1 OR sg.qtd_sessoes > 1
+    LOOP
+        IF grupo.qtd_execucoes = grupo.qtd_sessoes
+           AND grupo.qtd_ordem_exec_unicas = grupo.qtd_execucoes
+           AND grupo.qtd_ordem_sess_unicas = grupo.qtd_sessoes
+        THEN
+            UPDATE execucoes e
+            SET sessao_id = s.id,
+                codigo_ficha = s.codigo_ficha,
+                codigo_ficha_temp = FALSE,
+                link_manual_necessario = FALSE
+            FROM sessoes s
+            WHERE e.numero_guia = grupo.numero_guia
+              AND e.data_execucao = grupo.data
+              AND e.sessao_id IS NULL
+              AND e.deleted_at IS NULL
+              AND s.numero_guia = e.numero_guia
+              AND s.data_sessao = e.data_execucao
+              AND s.ordem_execucao = e.ordem_execucao
+              AND s.deleted_at IS NULL;
+            GET DIAGNOSTICS v_contagem = ROW_COUNT;
+            v_mesmo_dia := v_mesmo_dia + v_contagem;
+        ELSE
+            UPDATE execucoes e
+            SET link_manual_necessario = TRUE
+            WHERE e.numero_guia = grupo.numero_guia
+              AND e.data_execucao = grupo.data
+              AND e.sessao_id IS NULL
+              AND e.deleted_at IS NULL;
+            GET DIAGNOSTICS v_contagem = ROW_COUNT;
+            v_revisao_manual := v_revisao_manual + v_contagem;
+        END IF;
+    END LOOP;
+
+    RETURN jsonb_build_object(
+        'processadas', v_processadas,
+        'ultimo_id', v_ultimo_id,
+        'concluido', v_processadas < greatest(coalesce(p_limite, 1000), 1),
+        'exato', v_exato,
+        'exato_sem_ordem', v_exato_sem_ordem,
+        'tolerancia_ordem', v_tolerancia_ordem,
+        'tolerancia_sem_ordem', v_tolerancia_sem_ordem,
+        'mesmo_dia', v_mesmo_dia,
+        'revisao_manual', v_revisao_manual
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION vincular_execucoes_lote(date, date, uuid[], uuid, int) IS
+    'Vincula um lote limitado de execuções não vinculadas às sessões (mesmas regras de vincular_sessoes_execucoes e vincular_sessoes_mesmo_dia), por janela de datas ou lista de ids';
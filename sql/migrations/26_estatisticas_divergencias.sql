@@ -0,0 +1,43 @@
+-- Migração: estatísticas agregadas das divergências
+-- Objetivo: os cards do dashboard baixavam todas as linhas de divergencias
+-- (select *) e contavam por tipo, prioridade e status no Python. A função
+-- abaixo agrupa no banco e devolve um único JSON:
+--   {"total": n, "por_tipo": {...}, "por_prioridade": {...}, "por_status": {...}}
+-- Como a contagem em Python, considera todas as linhas da tabela (a listagem
+-- de divergências também não filtra deleted_at).
+
+-- Permite calcular os três agrupamentos com um index-only scan
+CREATE INDEX IF NOT EXISTS idx_divergencias_tipo_prioridade_status
+    ON divergencias (tipo, prioridade, status);
+
+DROP FUNCTION IF EXISTS estatisticas_divergencias;
+
+CREATE OR REPLACE FUNCTION estatisticas_divergencias()
+RETURNS JSONB AS $$
+    WITH contagem AS (
+        SELECT tipo::text AS tipo,
+               coalesce(prioridade, 'MEDIA') AS prioridade,
+               coalesce(status::text, 'pendente') AS status,
+               count(*) AS qtd
+        FROM divergencias
+        GROUP BY 1, 2, 3
+    )
+    SELECT jsonb_build_object(
+        'total', (SELECT coalesce(sum(qtd), 0) FROM contagem),
+        'por_tipo', coalesce(
+            (SELECT jsonb_object_agg(tipo, qtd) FROM (SELECT tipo, sum(qtd) AS qtd FROM contagem GROUP BY tipo) t),
+            '{}'::jsonb
+        ),
+        'por_prioridade', coalesce(
+            (SELECT jsonb_object_agg(prioridade, qtd) FROM (SELECT prioridade, sum(qtd) AS qtd FROM contagem GROUP BY prioridade) p),
+            '{}'::jsonb
+        ),
+        'por_status', coalesce(
+            (SELECT jsonb_object_agg(status, qtd) FROM (SELECT status, sum(qtd) AS qtd FROM contagem GROUP BY status) s),
+            '{}'::jsonb
+        )
+    )
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION estatisticas_divergencias() IS
+    'Contagem das divergências por tipo, prioridade e status para os cards do dashboard';
@@ -0,0 +1,199 @@
+-- Migração: leitura da listagem de execuções pelas views materializadas
+-- Objetivo: a listagem e a busca de execuções podem ler de mv_execucoes /
+-- mv_execucoes_recentes (fonte=view) em vez da tabela execucoes. Para isso:
+--
+-- 1. As views são recriadas com as colunas usadas pelos filtros da listagem
+--    (link_manual_necessario, observacoes, paciente_id) e com índice único
+--    em id, exigido pelo REFRESH ... CONCURRENTLY.
+-- 2. Os triggers que faziam REFRESH das duas views a cada comando em
+--    execucoes são removidos: uma importação em lote disparava um refresh
+--    completo por comando (e, sem índice único, o CONCURRENTLY falhava).
+-- 3. A tabela controle_views_materializadas guarda quando cada view foi
+--    atualizada (atualizado_em, exposto na resposta da listagem) e se há
+--    refresh pendente.
+-- 4. Importações e vinculações em lote pedem o refresh com
+--    solicitar_refresh_execucoes_views(), que só marca o pedido. O job
+--    'refresh_execucoes_views_pendente' (pg_cron, a cada minuto) executa o
+--    refresh quando não chega pedido novo há p_espera, ou quando o pedido
+--    mais antigo já espera p_espera_maxima: vários pedidos seguidos viram um
+--    único refresh. O job de 30 minutos continua como garantia.
+
+-- 1. Views
+DROP TRIGGER IF EXISTS trigger_refresh_mv_execucoes ON execucoes;
+DROP TRIGGER IF EXISTS trigger_refresh_mv_execucoes_recentes ON execucoes;
+DROP FUNCTION IF EXISTS refresh_mv_execucoes();
+DROP FUNCTION IF EXISTS refresh_mv_execucoes_recentes();
+
+DROP MATERIALIZED VIEW IF EXISTS mv_execucoes_recentes;
+DROP MATERIALIZED VIEW IF EXISTS mv_execucoes;
+
+CREATE MATERIALIZED VIEW mv_execucoes AS
+SELECT
+    e.id,
+    e.guia_id,
+    e.sessao_id,
+    e.paciente_id,
+    e.data_execucao,
+    e.data_atendimento,
+    e.paciente_nome,
+    e.paciente_carteirinha,
+    e.numero_guia,
+    e.codigo_ficha,
+    e.codigo_ficha_temp,
+    e.origem,
+    e.ordem_execucao,
+    e.status_biometria,
+    e.conselho_profissional,
+    e.numero_conselho,
+    e.uf_conselho,
+    e.codigo_cbo,
+    e.profissional_executante,
+    e.observacoes,
+    e.link_manual_necessario,
+    g.data_solicitacao AS data_solicitacao_guia,
+    g.data_autorizacao AS data_autorizacao_guia,
+    g.quantidade_autorizada,
+    g.quantidade_executada,
+    g.status AS status_guia,
+    p.codigo AS codigo_procedimento,
+    p.nome AS nome_procedimento,
+    p.valor AS valor_procedimento,
+    ps.nome AS plano_saude,
+    ps.registro_ans,
+    e.created_at,
+    e.created_by,
+    e.updated_at,
+    e.updated_by,
+    e.deleted_at
+FROM execucoes e
+    LEFT JOIN guias g ON e.guia_id = g.id
+    LEFT JOIN procedimentos p ON g.procedimento_id = p.id
+    LEFT JOIN carteirinhas c ON g.carteirinha_id = c.id
+    LEFT JOIN planos_saude ps ON c.plano_saude_id = ps.id
+WHERE e.deleted_at IS NULL;
+
+CREATE UNIQUE INDEX idx_mv_execucoes_id ON mv_execucoes (id);
+-- Ordenação padrão da listagem e paginação por cursor
+CREATE INDEX idx_mv_execucoes_data_id ON mv_execucoes (data_execucao DESC, id DESC);
+CREATE INDEX idx_mv_execucoes_paciente ON mv_execucoes (paciente_nome);
+CREATE INDEX idx_mv_execucoes_carteirinha ON mv_execucoes (paciente_carteirinha);
+CREATE INDEX idx_mv_execucoes_guia ON mv_execucoes (numero_guia);
+CREATE INDEX idx_mv_execucoes_codigo_ficha ON mv_execucoes (codigo_ficha);
+CREATE INDEX idx_mv_execucoes_profissional ON mv_execucoes (profissional_executante);
+CREATE INDEX idx_mv_execucoes_sessao ON mv_execucoes (sessao_id);
+CREATE INDEX idx_mv_execucoes_link_manual ON mv_execucoes (link_manual_necessario);
+
+-- Execuções dos últimos 90 dias (contados a partir do último refresh)
+CREATE MATERIALIZED VIEW mv_execucoes_recentes AS
+SELECT *
+FROM mv_execucoes
+WHERE data_execucao >= CURRENT_DATE - INTERVAL '90 days';
+
+CREATE UNIQUE INDEX idx_mv_execucoes_recentes_id ON mv_execucoes_recentes (id);
+CREATE INDEX idx_mv_execucoes_recentes_data_id ON mv_execucoes_recentes (data_execucao DESC, id DESC);
+CREATE INDEX idx_mv_execucoes_recentes_paciente ON mv_execucoes_recentes (paciente_nome);
+CREATE INDEX idx_mv_execucoes_recentes_guia ON mv_execucoes_recentes (numero_guia);
+CREATE INDEX idx_mv_execucoes_recentes_profissional ON mv_execucoes_recentes (profissional_executante);
+
+-- Execuções inseridas, alteradas ou excluídas (soft delete) depois do último
+-- refresh: updated_at é preenchido no insert e atualizado pelo trigger
+-- update_execucoes_updated_at
+CREATE INDEX IF NOT EXISTS idx_execucoes_updated_at ON execucoes (updated_at);
+
+-- 2. Controle de atualização
+CREATE TABLE IF NOT EXISTS controle_views_materializadas (
+    nome text PRIMARY KEY,
+    atualizado_em timestamptz,          -- início do último refresh concluído
+    duracao_ms integer,                 -- duração do último refresh
+    refresh_solicitado_em timestamptz,  -- último pedido de refresh
+    refresh_pendente_desde timestamptz  -- pedido mais antigo ainda não atendido
+);
+
+INSERT INTO controle_views_materializadas (nome, atualizado_em)
+VALUES ('mv_execucoes', now()), ('mv_execucoes_recentes', now())
+ON CONFLICT (nome) DO UPDATE SET atualizado_em = EXCLUDED.atualizado_em;
+
+-- 3. Refresh
+CREATE OR REPLACE FUNCTION refresh_execucoes_views_manual()
+RETURNS void AS $$
+DECLARE
+    v_inicio timestamptz := clock_timestamp();
+BEGIN
+    -- Um refresh por vez (job de 30 minutos, job de pendentes ou chamada manual)
+    IF NOT pg_try_advisory_xact_lock(hashtext('refresh_execucoes_views')) THEN
+        RAISE NOTICE 'Refresh das views de execuções já em andamento';
+        RETURN;
+    END IF;
+
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_execucoes;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_execucoes_recentes;
+
+    -- Pedidos feitos depois do início deste refresh continuam pendentes
+    UPDATE controle_views_materializadas
+    SET atualizado_em = v_inicio,
+        duracao_ms = (extract(epoch FROM clock_timestamp() - v_inicio) * 1000)::integer,
+        refresh_pendente_desde = CASE
+            WHEN refresh_solicitado_em > v_inicio THEN refresh_pendente_desde
+            ELSE NULL
+        END
+    WHERE nome IN ('mv_execucoes', 'mv_execucoes_recentes');
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION solicitar_refresh_execucoes_views()
+RETURNS void AS $$
+    UPDATE controle_views_materializadas
+    SET refresh_solicitado_em = now(),
+        refresh_pendente_desde = coalesce(refresh_pendente_desde, now())
+    WHERE nome IN ('mv_execucoes', 'mv_execucoes_recentes');
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION refresh_execucoes_views_pendente(
+    p_espera interval DEFAULT interval '1 minute',
+    p_espera_maxima interval DEFAULT interval '10 minutes'
+)
+RETURNS boolean AS $$
+DECLARE
+    v_solicitado timestamptz;
+    v_pendente_desde timestamptz;
+BEGIN
+    SELECT refresh_solicitado_em, refresh_pendente_desde
+    INTO v_solicitado, v_pendente_desde
+    FROM controle_views_materializadas
+    WHERE nome = 'mv_execucoes';
+
+    IF v_pendente_desde IS NULL THEN
+        RETURN false;
+    END IF;
+    -- Ainda chegando pedidos (importação em andamento): espera, até o limite
+    IF v_solicitado > now() - p_espera AND v_pendente_desde > now() - p_espera_maxima THEN
+        RETURN false;
+    END IF;
+
+    PERFORM refresh_execucoes_views_manual();
+    RETURN true;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT SELECT ON controle_views_materializadas TO authenticated;
+GRANT SELECT ON mv_execucoes, mv_execucoes_recentes TO authenticated;
+GRANT EXECUTE ON FUNCTION refresh_execucoes_views_manual() TO authenticated;
+GRANT EXECUTE ON FUNCTION solicitar_refresh_execucoes_views() TO authenticated;
+
+-- 4. Jobs
+SELECT cron.schedule(
+    'refresh_execucoes_views',
+    '*/30 * * * *',
+    'SELECT refresh_execucoes_views_manual();'
+);
+
+SELECT cron.schedule(
+    'refresh_execucoes_views_pendente',
+    '* * * * *',
+    'SELECT refresh_execucoes_views_pendente();'
+);
+
+COMMENT ON TABLE controle_views_materializadas IS
+    'Última atualização e pedidos de refresh das views materializadas de execuções';
+COMMENT ON FUNCTION solicitar_refresh_execucoes_views() IS
+    'Marca refresh pendente das views de execuções; executado pelo job refresh_execucoes_views_pendente';